@@ -21,10 +21,20 @@ import time
 from typing import Dict, List, Optional, Tuple
 import sqlite3
 
+from backend.services.data_provider import DataProvider, get_data_provider
+from backend.services.kline_store import get_kline_store
+from backend.services.indicators import IndicatorSpec, Indicators, compute_indicators
+
+# 技术指标口径（统一指标库）
+TECH_INDICATOR_SPEC = IndicatorSpec(ma_periods=(5, 10, 20, 60), rsi_period=14, macd=(12, 26), macd_signal=9,
+                                    boll=(20, 2.0), vol_period=None, momentum_periods=())
+
 class DeepStockAnalyzer:
     """深度股票分析引擎 - 集成LLM专业分析"""
     
-    def __init__(self):
+    def __init__(self, provider: DataProvider = None):
+        # 数据源：直连/录制/回放，默认按 CCHAN_DATA_MODE 创建
+        self.provider = provider or get_data_provider()
         self.db_path = "data/cchan_web.db"
         self.analysis_cache = {}
         self.init_analysis_database()
@@ -116,13 +126,8 @@ class DeepStockAnalyzer:
     def _get_basic_info(self, symbol: str) -> Dict:
         """获取基础信息"""
         try:
-            # 使用baostock获取基础信息
-            import baostock as bs
-            lg = bs.login()
-            
-            # 获取股票基础信息
-            rs = bs.query_stock_basic(code=symbol)
-            basic_df = rs.get_data()
+            # 使用baostock获取基础信息（共享会话，不再每次登录）
+            basic_df = self.provider.query_stock_basic(code=symbol)
             
             if not basic_df.empty:
                 stock_info = basic_df.iloc[0]
@@ -137,7 +142,6 @@ class DeepStockAnalyzer:
             else:
                 result = self._get_fallback_basic_info(symbol)
             
-            bs.logout()
             return result
             
         except Exception as e:
@@ -177,20 +181,12 @@ class DeepStockAnalyzer:
     def _get_price_data(self, symbol: str, days: int = 60) -> Dict:
         """获取价格数据"""
         try:
-            import baostock as bs
-            lg = bs.login()
-            
             end_date = datetime.now().strftime('%Y-%m-%d')
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
             
-            # 获取日K数据
-            rs = bs.query_history_k_data_plus(symbol,
-                'date,open,high,low,close,volume,amount,turn',
-                start_date=start_date, 
-                end_date=end_date,
-                frequency='d')
-            df = rs.get_data()
-            bs.logout()
+            # 获取日K数据（本地存储只请求增量，经共享会话访问BaoStock）
+            df = get_kline_store(self.provider).get_history(symbol, start_date, end_date,
+                fields='date,open,high,low,close,volume,amount,turn')
             
             if df.empty:
                 return self._get_simulated_price_data(symbol)
@@ -262,32 +258,23 @@ class DeepStockAnalyzer:
             if len(df) < 20:
                 return self._get_simulated_technical_indicators()
             
-            # 计算各种技术指标
+            # 计算各种技术指标（统一指标库，一次算完）
             close_prices = df['close']
+            indicators = compute_indicators(close_prices, spec=TECH_INDICATOR_SPEC)
             
-            # 移动平均线
-            ma5 = close_prices.rolling(5).mean().iloc[-1] if len(df) >= 5 else close_prices.iloc[-1]
-            ma10 = close_prices.rolling(10).mean().iloc[-1] if len(df) >= 10 else close_prices.iloc[-1]
-            ma20 = close_prices.rolling(20).mean().iloc[-1] if len(df) >= 20 else close_prices.iloc[-1]
-            ma60 = close_prices.rolling(60).mean().iloc[-1] if len(df) >= 60 else close_prices.iloc[-1]
-            
-            # RSI指标
-            rsi_14 = self._calculate_rsi(close_prices, 14)
-            
-            # MACD指标
-            macd_signal = self._calculate_macd_signal(close_prices)
-            
-            # 布林带
-            bollinger_position = self._calculate_bollinger_position(close_prices)
+            # 移动平均线（帧长不足时取最新收盘价）
+            latest = indicators.at()
+            last_close = float(close_prices.iloc[-1])
+            ma5, ma10, ma20, ma60 = (latest[f'ma{p}'] if len(df) >= p else last_close for p in (5, 10, 20, 60))
             
             return {
                 'ma5': float(ma5),
                 'ma10': float(ma10),
                 'ma20': float(ma20),
                 'ma60': float(ma60),
-                'rsi_14': float(rsi_14),
-                'macd_signal': macd_signal,
-                'bollinger_position': float(bollinger_position),
+                'rsi_14': float(self._calculate_rsi(indicators)),
+                'macd_signal': self._calculate_macd_signal(indicators),
+                'bollinger_position': float(self._calculate_bollinger_position(close_prices, indicators)),
                 'ma_trend': self._analyze_ma_trend(ma5, ma10, ma20),
                 'trend_strength': self._calculate_trend_strength(close_prices)
             }
@@ -296,59 +283,38 @@ class DeepStockAnalyzer:
             print(f"⚠️ 计算技术指标失败: {e}")
             return self._get_simulated_technical_indicators()
     
-    def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> float:
-        """计算RSI指标"""
-        try:
-            delta = prices.diff()
-            gain = delta.where(delta > 0, 0).rolling(period).mean()
-            loss = -delta.where(delta < 0, 0).rolling(period).mean()
-            rs = gain / (loss + 1e-10)
-            rsi = 100 - (100 / (1 + rs))
-            return float(rsi.iloc[-1])
-        except:
-            return 50.0
+    def _calculate_rsi(self, indicators: Indicators) -> float:
+        """RSI指标（取自 compute_indicators 结果）"""
+        rsi = indicators['rsi'][-1]
+        return 50.0 if np.isnan(rsi) else float(rsi)
     
-    def _calculate_macd_signal(self, prices: pd.Series) -> str:
-        """计算MACD信号"""
-        try:
-            ema12 = prices.ewm(span=12).mean()
-            ema26 = prices.ewm(span=26).mean()
-            macd = ema12 - ema26
-            signal = macd.ewm(span=9).mean()
-            
-            current_macd = macd.iloc[-1]
-            current_signal = signal.iloc[-1]
-            prev_macd = macd.iloc[-2] if len(macd) > 1 else current_macd
-            prev_signal = signal.iloc[-2] if len(signal) > 1 else current_signal
-            
-            if current_macd > current_signal and prev_macd <= prev_signal:
-                return '金叉买入'
-            elif current_macd < current_signal and prev_macd >= prev_signal:
-                return '死叉卖出'
-            elif current_macd > current_signal:
-                return '多头持续'
-            else:
-                return '空头持续'
-        except:
-            return '中性'
+    def _calculate_macd_signal(self, indicators: Indicators) -> str:
+        """计算MACD信号（DIF 与 DEA 的交叉）"""
+        macd, signal = indicators['macd'], indicators['macd_signal']
+        current_macd, current_signal = macd[-1], signal[-1]
+        prev_macd = macd[-2] if len(macd) > 1 else current_macd
+        prev_signal = signal[-2] if len(signal) > 1 else current_signal
+        
+        if current_macd > current_signal and prev_macd <= prev_signal:
+            return '金叉买入'
+        elif current_macd < current_signal and prev_macd >= prev_signal:
+            return '死叉卖出'
+        elif current_macd > current_signal:
+            return '多头持续'
+        else:
+            return '空头持续'
     
-    def _calculate_bollinger_position(self, prices: pd.Series, period: int = 20) -> float:
+    def _calculate_bollinger_position(self, prices: pd.Series, indicators: Indicators) -> float:
         """计算布林带位置"""
-        try:
-            sma = prices.rolling(period).mean()
-            std = prices.rolling(period).std()
-            upper = sma + (std * 2)
-            lower = sma - (std * 2)
-            
-            current_price = prices.iloc[-1]
-            current_upper = upper.iloc[-1]
-            current_lower = lower.iloc[-1]
-            
-            # 计算价格在布林带中的位置 (0-1)
-            position = (current_price - current_lower) / (current_upper - current_lower)
-            return max(0, min(1, position))
-        except:
+        current_upper = indicators['boll_upper'][-1]
+        current_lower = indicators['boll_lower'][-1]
+        
+        # 计算价格在布林带中的位置 (0-1)；带宽为 0 或指标缺失时取中性值
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position = (prices.iloc[-1] - current_lower) / (current_upper - current_lower)
+        if not np.isfinite(position):
             return 0.5
+        return max(0, min(1, position))
     
     def _analyze_ma_trend(self, ma5: float, ma10: float, ma20: float) -> str:
         """分析均线趋势"""
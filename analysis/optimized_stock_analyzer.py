@@ -16,10 +16,15 @@ from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from backend.services.data_provider import DataProvider, get_data_provider
+from backend.services.stock_universe import BOARD_PREFIXES, get_stock_universe
+
 class OptimizedStockAnalyzer:
     """优化版股票分析器"""
     
-    def __init__(self):
+    def __init__(self, provider: DataProvider = None):
+        # 数据源：直连/录制/回放，默认按 CCHAN_DATA_MODE 创建
+        self.provider = provider or get_data_provider()
         self.fallback_mode = False
         self.analysis_results = {}
         
@@ -81,13 +86,10 @@ class OptimizedStockAnalyzer:
         
         # 策略1: 尝试使用baostock获取实时数据
         try:
-            import baostock as bs
-            lg = bs.login()
+            lg = self.provider.login()
             if lg.error_code == '0':
                 print("📊 使用BaoStock获取股票数据...")
-                stock_rs = bs.query_all_stock(day=datetime.now().strftime('%Y-%m-%d'))
-                stock_df = stock_rs.get_data()
-                bs.logout()
+                stock_df = get_stock_universe(self.provider).get()
                 
                 if not stock_df.empty:
                     print(f"✅ BaoStock成功获取 {len(stock_df)} 只股票")
@@ -103,12 +105,7 @@ class OptimizedStockAnalyzer:
         """处理baostock数据"""
         try:
             # 按市场分类并增加样本数量
-            markets = {
-                '上海主板': stock_df[stock_df['code'].str.startswith('sh.6')],
-                '深圳主板': stock_df[stock_df['code'].str.startswith('sz.000')],
-                '中小板': stock_df[stock_df['code'].str.startswith('sz.002')],
-                '创业板': stock_df[stock_df['code'].str.startswith('sz.30')]
-            }
+            markets = {board: stock_df[stock_df['board'] == board] for board in BOARD_PREFIXES}
             
             sample_stocks = []
             for market_name, market_stocks in markets.items():
@@ -252,20 +249,15 @@ class OptimizedStockAnalyzer:
     def _analyze_with_real_data(self, symbol, stock_name, config):
         """使用真实数据进行分析"""
         try:
-            import baostock as bs
-            lg = bs.login()
-            
-            # 获取历史数据
+            # 获取历史数据（共享会话，避免每只股票一次登录/登出）
             end_date = datetime.now().strftime('%Y-%m-%d')
             start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
             
-            rs = bs.query_history_k_data_plus(symbol,
+            df = self.provider.query_history_k_data_plus(symbol,
                 'date,code,open,high,low,close,volume',
                 start_date=start_date, 
                 end_date=end_date,
                 frequency='d')
-            df = rs.get_data()
-            bs.logout()
             
             if df.empty or len(df) < 5:
                 return None
@@ -586,7 +578,7 @@ class OptimizedStockAnalyzer:
         # 使用深度分析器
         try:
             from analysis.deep_stock_analyzer import DeepStockAnalyzer
-            deep_analyzer = DeepStockAnalyzer()
+            deep_analyzer = DeepStockAnalyzer(self.provider)
             use_deep_analysis = True
             print("🧠 启用深度LLM分析...")
         except:
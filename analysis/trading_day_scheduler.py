@@ -11,7 +11,10 @@ import threading
 from datetime import datetime, timedelta
 import logging
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from daily_report_generator import DailyReportGenerator
+from backend.services.stock_universe import get_stock_universe
 
 # 配置日志
 log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
@@ -81,7 +84,11 @@ class TradingDayScheduler:
                 
                 logging.info(f"🚀 开始执行交易日分析 - {today} {current_time}")
                 
-                # 检查执行条件
+                # 检查执行条件（节假日直接跳过，不登录数据源）
+                if not self.report_generator.is_trading_day(now):
+                    logging.info(f"📅 {today} 非交易日，跳过执行")
+                    return
+                
                 if not self.is_trading_time():
                     logging.warning(f"⏰ 当前不在交易时间窗口内: {current_time}")
                     return
@@ -118,10 +125,25 @@ class TradingDayScheduler:
         # 可选：添加盘后补发时间
         schedule.every().day.at("15:05").do(self.execute_fallback_report)
         
+        # 盘前预加载股票池，9:25分析时直接命中缓存
+        schedule.every().day.at("08:30").do(self.preload_universe)
+        
         logging.info("⏰ 定时任务已设置:")
         logging.info("   📊 主要执行时间: 9:25-9:29 (每分钟)")
         logging.info("   🔄 备用执行时间: 9:30")
         logging.info("   📋 盘后补发时间: 15:05")
+        logging.info("   📦 股票池预加载: 8:30")
+    
+    def preload_universe(self):
+        """预加载最近交易日股票池到本地缓存"""
+        try:
+            if not self.report_generator.is_trading_day():
+                logging.info("📅 今日非交易日，跳过股票池预加载")
+                return
+            trade_date = get_stock_universe().preload()
+            logging.info(f"📦 股票池已预加载: {trade_date}")
+        except Exception as e:
+            logging.error(f"❌ 预加载股票池失败: {e}")
     
     def execute_fallback_report(self):
         """盘后补发报告"""
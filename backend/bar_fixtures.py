@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试用合成K线
+各 test_*.py 共用的随机走势生成函数，同一 (n, seed, 参数) 总是得到同一份数据
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+def random_bars(n: int, seed: int, drift: float = 0.0, tick: float = 0.05, sigma: float = 0.2,
+                geometric: bool = False, floor: Optional[float] = None, spread: float = 0.3,
+                cycle: float = 0.0, spike: float = 0.0, start: Optional[str] = None) -> pd.DataFrame:
+    """
+    随机K线：open/high/low/close/volume，传 start 时首列为 date（YYYY-MM-DD，按自然日递增）
+
+    geometric=False 为加法游走 10 + Σ N(drift, sigma)，可用 floor 设价格下限，高低点为收盘 ± U(0, spread)；
+    geometric=True 为几何游走 10·exp(Σ N(drift, sigma) + cycle·sin(t/6))，高低点为收盘 × (1 ± U(0, spread))。
+    价格按 tick 取整（默认0.05，制造大量平价），收盘夹在高低点之间；spike 为放量（成交量 ×4）K线的比例。
+    """
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(drift, sigma, n)
+    if geometric:
+        close = 10 * np.exp(np.cumsum(steps) + cycle * np.sin(np.arange(n) / 6))
+        high = close * (1 + rng.uniform(0, spread, n))
+        low = close * (1 - rng.uniform(0, spread, n))
+    else:
+        close = 10 + np.cumsum(steps)
+        if floor is not None:
+            close = np.maximum(close, floor)
+        high = close + rng.uniform(0, spread, n)
+        low = close - rng.uniform(0, spread, n)
+    high = np.round(high / tick) * tick
+    low = np.round(low / tick) * tick
+    close = np.clip(np.round(close / tick) * tick, low, high)
+    volume = rng.uniform(1e5, 1e6, n).round()
+    if spike:
+        volume = volume * np.where(rng.random(n) < spike, 4, 1)
+
+    df = pd.DataFrame({'open': close, 'high': high, 'low': low, 'close': close, 'volume': volume})
+    if start is not None:
+        df.insert(0, 'date', pd.date_range(start, periods=n).strftime('%Y-%m-%d'))
+    return df
@@ -5,69 +5,31 @@ CChanTrader-AI 全市场股票分析
 修正市场覆盖问题，包含沪深两市所有板块
 """
 
-import os, json, pandas as pd, numpy as np
-import baostock as bs
+import os, sys, json, pandas as pd, numpy as np
 from tqdm import tqdm
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.data_provider import get_data_provider
+from backend.services.bar_parser import parse_bars
+from backend.services.indicators import IndicatorSpec, add_indicators
+
 def safe_data_conversion(df: pd.DataFrame) -> pd.DataFrame:
-    """安全的数据转换"""
-    df = df.copy()
-    
-    basic_cols = ['open', 'high', 'low', 'close', 'volume']
-    for col in basic_cols:
-        if col in df.columns:
-            df[col] = df[col].astype(str)
-            df[col] = df[col].str.split().str[0]
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    df = df.dropna(subset=['high', 'low', 'close'])
-    df = df[(df['high'] > 0) & (df['low'] > 0) & (df['close'] > 0)]
-    
-    if 'volume' in df.columns:
-        df['volume'] = df['volume'].fillna(0)
-        
-    return df
+    """安全的数据转换（统一解析器）"""
+    return parse_bars(df)
+
+# 技术指标口径（统一指标库）
+INDICATOR_SPEC = IndicatorSpec(ma_periods=(5, 10, 20, 34), rsi_period=14, vol_period=20, momentum_periods=(5, 10))
 
 def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
-    """添加技术指标"""
+    """添加技术指标（统一指标库，同一帧只算一次）"""
     if len(df) < 20:
         return df
-        
-    # 移动平均线
-    for period in [5, 10, 20, 34]:
-        if len(df) >= period:
-            df[f'ma{period}'] = df['close'].rolling(period).mean()
-    
-    # RSI
-    if len(df) >= 15:
-        delta = df['close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(14).mean()
-        loss = -delta.where(delta < 0, 0).rolling(14).mean()
-        rs = gain / (loss + 1e-10)
-        df['rsi'] = 100 - (100 / (1 + rs))
-        df['rsi'] = df['rsi'].fillna(50)
-    else:
-        df['rsi'] = 50
-    
-    # 成交量指标
-    if len(df) >= 20:
-        df['vol_ma'] = df['volume'].rolling(20).mean()
-        df['vol_ratio'] = df['volume'] / (df['vol_ma'] + 1e-10)
-    else:
-        df['vol_ratio'] = 1.0
-    
-    # 价格动量
-    if len(df) >= 10:
-        df['momentum_5'] = df['close'].pct_change(5)
-        df['momentum_10'] = df['close'].pct_change(10)
-    else:
-        df['momentum_5'] = 0
-        df['momentum_10'] = 0
-    
+    df = add_indicators(df, INDICATOR_SPEC)
+    df['rsi'] = df['rsi'].fillna(50)
     return df
 
 def get_market_info(stock_code: str) -> dict:
@@ -195,14 +157,15 @@ def multi_market_analysis():
     print('=== CChanTrader-AI 全市场股票分析 ===')
     print('🎯 覆盖沪深两市所有板块：主板、中小板、创业板')
     
-    lg = bs.login()
+    # 走进程默认数据源（共享会话、断线重连，支持录制/回放）
+    provider = get_data_provider()
+    lg = provider.login()
     print(f'📊 BaoStock连接状态: {lg.error_code}')
     
     try:
         # 获取所有股票列表
         print('\\n🔍 获取全市场股票列表...')
-        stock_rs = bs.query_all_stock()
-        all_stocks = stock_rs.get_data()
+        all_stocks = provider.query_all_stock()
         
         print(f'📊 市场覆盖统计:')
         sh_count = len(all_stocks[all_stocks['code'].str.startswith('sh.')])
@@ -248,12 +211,11 @@ def multi_market_analysis():
         for _, stock in tqdm(sample_df.iterrows(), total=len(sample_df), desc='获取数据'):
             code = stock['code']
             try:
-                rs = bs.query_history_k_data_plus(code,
+                day_df = provider.query_history_k_data_plus(code,
                     'date,code,open,high,low,close,volume',
                     start_date=start_date, 
                     end_date=end_date,
                     frequency='d')
-                day_df = rs.get_data()
                 
                 if not day_df.empty and len(day_df) >= 30:
                     stock_data[code] = {
@@ -320,7 +282,6 @@ def multi_market_analysis():
         return selected_stocks
         
     finally:
-        bs.logout()
         print('\\n🔚 分析完成')
 
 if __name__ == '__main__':
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 策略参数搜索
+对 cchan_trader_core.PARAMS / cchan_trader_advanced.ADVANCED_PARAMS 做随机搜索或逐次减半（successive halving）：
+- 历史日线拼成一个面板放进共享内存，进程池的各工作进程只读挂载，按试验动态分发
+- 每个试验在各股票的历史截面上调用策略选股，按其后 horizon 根K线先触及止损 / 止盈、否则到期收盘计算收益
+- 每完成一个试验追加一行到检查点文件，中断后以相同数据与设置重跑即跳过已完成的试验
+试验之间相互独立，搜索耗时随进程数近似线性下降（逐次减半每一档之间需要同步一次）
+"""
+
+import os, sys, json, math, time, hashlib
+import multiprocessing as mp
+import numpy as np, pandas as pd
+from tqdm import tqdm
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backend.cchan_trader_core as core
+import backend.cchan_trader_advanced as advanced
+from backend.services.baostock_session import get_bs_session
+from backend.services.data_provider import get_data_provider
+from backend.services.bar_parser import parse_bars
+from backend.services.kline_downloader import download_klines
+from backend.services.shared_arrays import SharedArrays
+from backend.services.stock_universe import get_stock_universe
+from backend.services.structure_cache import StructureCache, set_structure_cache
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+DEFAULT_SEARCH_DIR = os.path.join(DATA_DIR, 'param_search')
+
+# ============================================================================
+# 搜索空间与回测设置
+# ============================================================================
+
+# 各参数的候选取值（同 PARAM_GRID 的写法）；ADVANCED_PARAMS 的嵌套键用点号连接
+CORE_SEARCH_SPACE = {
+    'v_break_min': [1.2, 1.5, 1.8, 2.1, 2.5],
+    'v_pull_max': [0.3, 0.4, 0.5, 0.6, 0.8],
+    'daily_up_cross_ratio': [1.0, 1.01, 1.02, 1.03],
+    'stop_buffer_pct': [0.02, 0.03, 0.04, 0.06],
+}
+
+ADVANCED_SEARCH_SPACE = {
+    'chan.breakout_threshold': [0.01, 0.02, 0.03],
+    'chan.pivot_strength_min': [0.03, 0.05, 0.08],
+    'selection.min_score': [0.5, 0.55, 0.6, 0.65, 0.7],
+    'selection.max_volatility': [0.6, 0.8, 1.0],
+    'risk.stop_loss_pct': [0.05, 0.08, 0.1],
+    'risk.take_profit_ratio': [2, 2.5, 3],
+}
+
+# 历史截面：从第 warmup 根起每 step 根取一个截面，持有 horizon 根
+BACKTEST_SETTINGS = {
+    'warmup': 120,
+    'step': 5,
+    'horizon': 10,
+}
+
+# 评分 = 平均收益 × n / (n + 先验笔数)：交易笔数少的组合向 0 收缩，避免个别交易撞出高分
+SCORE_PRIOR_TRADES = 10
+
+# 面板列（amount 只有 advanced 的流动性过滤用到，缺失时为 NaN）
+PANEL_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+# 工作进程内存结构缓存容量：同一截面在结构参数不变的试验之间复用
+STRUCTURE_CACHE_SIZE = 1 << 16
+
+# ============================================================================
+# 策略适配
+# ============================================================================
+
+def _core_pick(symbol: str, df: pd.DataFrame) -> Optional[Tuple[float, Optional[float]]]:
+    """
+    core 策略：日线过滤链 + 入场量价确认，返回 (止损 / 入场, 止盈 / 入场)
+    历史面板只有日线，入场级别用日线结构代替 30 分钟（v_break_min / v_pull_max 照常生效）
+    """
+    if not core.is_hot_leader(symbol, df)[0]:
+        return None
+    info = core.parse_structure_cached(symbol, df, "D")
+    if not core.passes_daily_filters(symbol, df, info, structural=True):
+        return None
+    ok, tag, entry, stop = core.detect_30m_entry(info)
+    return (stop / entry, None) if ok else None
+
+def _advanced_pick(symbol: str, df: pd.DataFrame) -> Optional[Tuple[float, Optional[float]]]:
+    """advanced 策略：advanced_stock_selection 的止损 / 止盈换算成相对入场价的比例"""
+    result = advanced.advanced_stock_selection(symbol, df)
+    if not result:
+        return None
+    return result['stop_loss'] / result['entry_price'], result['take_profit'] / result['entry_price']
+
+STRATEGIES = {
+    'core': {'params': core.PARAMS, 'space': CORE_SEARCH_SPACE, 'pick': _core_pick},
+    'advanced': {'params': advanced.ADVANCED_PARAMS, 'space': ADVANCED_SEARCH_SPACE, 'pick': _advanced_pick},
+}
+
+@contextmanager
+def applied_params(strategy: str, params: Dict):
+    """临时把参数写入策略参数表（点号表示嵌套键），退出时恢复原值"""
+    saved = []
+    try:
+        for key, value in params.items():
+            *path, leaf = key.split('.')
+            table = STRATEGIES[strategy]['params']
+            for part in path:
+                table = table[part]
+            saved.append((table, leaf, table[leaf]))
+            table[leaf] = value
+        yield
+    finally:
+        for table, leaf, value in reversed(saved):
+            table[leaf] = value
+
+def sample_params(space: Dict[str, list], n_trials: int, seed: int = 0) -> List[Dict]:
+    """
+    从全部组合中不放回随机抽取 n_trials 组：同一 seed 的抽样顺序固定，
+    加大 n_trials 续跑时前面的试验不变（可直接命中检查点）
+    """
+    names = list(space)
+    sizes = [len(space[name]) for name in names]
+    picks = np.random.default_rng(seed).permutation(math.prod(sizes))[:n_trials]
+    trials = []
+    for index in picks:
+        params = {}
+        for name, size in zip(reversed(names), reversed(sizes)):
+            index, k = divmod(int(index), size)
+            params[name] = space[name][k]
+        trials.append({name: params[name] for name in names})
+    return trials
+
+def trial_metrics(returns: List[float]) -> Dict:
+    """一组交易收益的汇总指标，score 为搜索排序依据"""
+    n = len(returns)
+    if not n:
+        return {'trades': 0, 'avg_return': 0.0, 'win_rate': 0.0, 'total_return': 0.0, 'score': 0.0}
+    r = np.asarray(returns, dtype=np.float64)
+    avg = float(r.mean())
+    return {'trades': n, 'avg_return': avg, 'win_rate': float((r > 0).mean()),
+            'total_return': float(r.sum()), 'score': avg * n / (n + SCORE_PRIOR_TRADES)}
+
+def trade_return(high: np.ndarray, low: np.ndarray, close: np.ndarray, t: int, horizon: int,
+                 stop_ratio: float, target_ratio: Optional[float]) -> float:
+    """
+    截面 t 收盘买入，其后 horizon 根内先触及止损 / 止盈即按该价退出，否则按到期收盘退出
+    同一根K线内两者都触及时按止损计（保守）
+    """
+    entry = close[t]
+    path = slice(t + 1, t + horizon + 1)
+    hit_stop = low[path] <= entry * stop_ratio
+    first_stop = int(np.argmax(hit_stop)) if hit_stop.any() else horizon
+    first_target = horizon
+    if target_ratio:
+        hit_target = high[path] >= entry * target_ratio
+        first_target = int(np.argmax(hit_target)) if hit_target.any() else horizon
+    if first_stop < horizon and first_stop <= first_target:
+        return stop_ratio - 1
+    if first_target < horizon:
+        return target_ratio - 1
+    return close[t + horizon] / entry - 1
+
+# ============================================================================
+# 共享面板与工作进程
+# ============================================================================
+
+def build_panel(kline_data: Dict[str, pd.DataFrame]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """{代码: K线} -> (代码列表, 面板数组)：各股票首尾相接，offsets 划分，date 为 datetime64[D]"""
+    frames = {}
+    for symbol, raw in kline_data.items():
+        df = parse_bars(raw)
+        if not df.empty and 'date' in df.columns:
+            frames[symbol] = df
+    lengths = [len(df) for df in frames.values()]
+    arrays = {'offsets': np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)}
+    if not frames:
+        arrays.update({col: np.empty(0) for col in PANEL_COLUMNS}, date=np.empty(0, dtype='datetime64[D]'))
+        return [], arrays
+    arrays['date'] = np.concatenate([pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+                                     for df in frames.values()])
+    for col in PANEL_COLUMNS:
+        arrays[col] = np.concatenate([df[col].to_numpy(dtype=np.float64) if col in df.columns
+                                      else np.full(len(df), np.nan) for df in frames.values()])
+    return list(frames), arrays
+
+# 工作进程内的搜索上下文，由 _init_worker 设置
+_worker_state: dict = {}
+
+def _init_worker(handle, symbols: List[str], order: List[int], strategy: str, settings: Dict):
+    """工作进程初始化：挂载共享面板；结构缓存只用内存层（试验之间复用，不写磁盘）"""
+    _worker_state.clear()
+    _worker_state.update(
+        shared=SharedArrays.attach(handle), symbols=symbols, order=order, strategy=strategy,
+        settings=settings, frames={},
+        previous_cache=set_structure_cache(StructureCache(disk=False, maxsize=STRUCTURE_CACHE_SIZE)),
+    )
+
+def _release_worker():
+    """串行模式下恢复当前进程的结构缓存并释放面板"""
+    state = _worker_state
+    if not state:
+        return
+    set_structure_cache(state['previous_cache'])
+    state['frames'].clear()
+    state['shared'].close()
+    state.clear()
+
+def _symbol_frame(k: int) -> pd.DataFrame:
+    """第 k 只股票的K线（数值列为共享内存上的只读视图，不拷贝）"""
+    frames = _worker_state['frames']
+    if k not in frames:
+        shared = _worker_state['shared']
+        lo, hi = shared['offsets'][k], shared['offsets'][k + 1]
+        data = {'date': np.datetime_as_string(shared['date'][lo:hi])}
+        data.update({col: shared[col][lo:hi] for col in PANEL_COLUMNS})
+        frames[k] = pd.DataFrame(data, copy=False)
+    return frames[k]
+
+def _run_trial(task: Tuple[int, Dict, int]) -> Dict:
+    """在前 budget 只股票（按搜索的固定顺序）的全部历史截面上评估一组参数"""
+    trial_id, params, budget = task
+    state = _worker_state
+    settings, strategy = state['settings'], state['strategy']
+    pick = STRATEGIES[strategy]['pick']
+    horizon = settings['horizon']
+    started = time.perf_counter()
+    returns = []
+    with applied_params(strategy, params):
+        for k in state['order'][:budget]:
+            frame, symbol = _symbol_frame(k), state['symbols'][k]
+            high, low, close = (frame[col].to_numpy() for col in ('high', 'low', 'close'))
+            for t in range(settings['warmup'] - 1, len(frame) - horizon, settings['step']):
+                try:
+                    trade = pick(symbol, frame.iloc[:t + 1])
+                except Exception:
+                    trade = None
+                if trade:
+                    returns.append(trade_return(high, low, close, t, horizon, *trade))
+    return {'trial': trial_id, 'params': params, 'budget': budget, **trial_metrics(returns),
+            'seconds': round(time.perf_counter() - started, 3)}
+
+# ============================================================================
+# 检查点
+# ============================================================================
+
+def _params_key(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True)
+
+class TrialCheckpoint:
+    """
+    试验检查点：每个完成的试验追加一行 JSON（中断时最多丢失正在运行的试验）
+    记录带数据与回测设置的指纹，指纹不同的旧记录不复用
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+
+    def load(self) -> Dict[Tuple[str, int], Dict]:
+        """{(参数键, 预算): 试验记录}；末行不完整（写入时被中断）时忽略"""
+        done = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get('fingerprint') == self.fingerprint:
+                        done[(_params_key(record['params']), record['budget'])] = record
+        except FileNotFoundError:
+            pass
+        return done
+
+    def append(self, record: Dict):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({**record, 'fingerprint': self.fingerprint}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+# ============================================================================
+# 搜索驱动
+# ============================================================================
+
+class ParamSearch:
+    """
+    参数搜索驱动：持有共享面板、进程池与检查点
+
+    with ParamSearch(kline_data, 'core', workers=8, checkpoint=path) as search:
+        results = search.successive_halving(27)
+
+    workers<=1 时在当前进程串行执行（不启动子进程）；budget 为参与评估的股票数，
+    股票按 seed 打乱后取前 budget 只，同一 budget 的试验始终用同一批股票
+    """
+
+    def __init__(self, kline_data: Dict[str, pd.DataFrame], strategy: str = 'core',
+                 space: Dict[str, list] = None, workers: int = None, checkpoint: str = None,
+                 seed: int = 0, progress: bool = True, **settings):
+        if strategy not in STRATEGIES:
+            raise ValueError(f'未知策略: {strategy}')
+        self.strategy = strategy
+        self.space = space or STRATEGIES[strategy]['space']
+        self.seed = seed
+        self.progress = progress
+        self.settings = {**BACKTEST_SETTINGS, **settings}
+        self.symbols, self._arrays = build_panel(kline_data)
+        self.order = [int(k) for k in np.random.default_rng(seed).permutation(len(self.symbols))]
+        self.workers = max(1, (os.cpu_count() or 1) if workers is None else workers)
+        self.checkpoint = TrialCheckpoint(checkpoint, self._fingerprint()) if checkpoint else None
+        self._shared: Optional[SharedArrays] = None
+        self._pool = None
+
+    def _fingerprint(self) -> str:
+        """数据、股票顺序、策略与回测设置的指纹"""
+        digest = hashlib.sha1(json.dumps({'strategy': self.strategy, 'symbols': self.symbols,
+                                          'order': self.order, 'settings': self.settings},
+                                         sort_keys=True).encode('utf-8'))
+        for col in ('offsets', 'close', 'volume'):
+            digest.update(self._arrays[col].tobytes())
+        return digest.hexdigest()[:12]
+
+    def __enter__(self) -> 'ParamSearch':
+        self._shared = SharedArrays.create(self._arrays)
+        init_args = (self._shared.handle, self.symbols, self.order, self.strategy, self.settings)
+        if self.workers == 1:
+            _init_worker(*init_args)
+        else:
+            self._pool = mp.Pool(processes=self.workers, initializer=_init_worker, initargs=init_args)
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        else:
+            _release_worker()
+        if self._shared is not None:
+            self._shared.unlink()
+            self._shared = None
+
+    @property
+    def n_symbols(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def panel_bytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays.values())
+
+    def evaluate(self, tasks: List[Tuple[int, Dict, int]], desc: str = '参数试验') -> List[Dict]:
+        """评估一批 (试验号, 参数, 预算)：检查点里已有的直接复用，其余分发给进程池，按输入顺序返回"""
+        if self._shared is None:
+            raise RuntimeError('ParamSearch 需在 with 语句内使用')
+        done = self.checkpoint.load() if self.checkpoint else {}
+        records, pending = {}, []
+        for trial_id, params, budget in tasks:
+            record = done.get((_params_key(params), budget))
+            if record is not None:
+                records[trial_id] = {**record, 'trial': trial_id, 'resumed': True}
+            else:
+                pending.append((trial_id, params, budget))
+
+        if self._pool is None:
+            results = map(_run_trial, pending)
+        else:
+            # chunksize=1 动态分发，慢试验不会拖住整批
+            results = self._pool.imap_unordered(_run_trial, pending, chunksize=1)
+        for record in tqdm(results, total=len(pending), desc=desc, disable=not self.progress):
+            if self.checkpoint:
+                self.checkpoint.append(record)
+            records[record['trial']] = record
+        return [records[trial_id] for trial_id, _, _ in tasks]
+
+    def random_search(self, n_trials: int) -> List[Dict]:
+        """随机搜索：n_trials 组参数都在全部股票上评估，按评分降序返回"""
+        trials = sample_params(self.space, n_trials, self.seed)
+        records = self.evaluate([(k, params, self.n_symbols) for k, params in enumerate(trials)],
+                                desc='随机搜索')
+        return rank_trials(records)
+
+    def successive_halving(self, n_trials: int, eta: int = 3, min_budget: int = None) -> List[Dict]:
+        """
+        逐次减半：全部试验先用少量股票评估，每档只保留评分前 1/eta 的试验、股票数乘 eta，
+        直到全部股票；返回最后一档（全部股票）的结果，按评分降序
+        """
+        trials = sample_params(self.space, n_trials, self.seed)
+        rungs = int(math.log(len(trials), eta) + 1e-9) + 1 if trials else 1
+        budget = min_budget or math.ceil(self.n_symbols / eta ** (rungs - 1))
+        budget = max(1, min(budget, self.n_symbols))
+        alive = list(range(len(trials)))
+        rung = 0
+        while True:
+            records = self.evaluate([(k, trials[k], budget) for k in alive],
+                                    desc=f'逐次减半 第{rung + 1}档 {len(alive)}组×{budget}只')
+            if budget >= self.n_symbols:
+                return rank_trials(records)
+            alive = [record['trial'] for record in rank_trials(records)[:max(1, len(alive) // eta)]]
+            budget = min(self.n_symbols, budget * eta)
+            rung += 1
+
+def rank_trials(records: List[Dict]) -> List[Dict]:
+    """按评分降序，同分按试验号"""
+    return sorted(records, key=lambda r: (-r['score'], r['trial']))
+
+def report_best(results: List[Dict], top: int = 5) -> List[Dict]:
+    """打印并返回最优的 top 组参数"""
+    best = results[:top]
+    print(f'\n🏆 === 最优参数 (前{len(best)}组) ===')
+    for i, record in enumerate(best, 1):
+        print(f'\n{i}. 评分 {record["score"]:.4f} | 交易 {record["trades"]}笔 | '
+              f'平均收益 {record["avg_return"] * 100:.2f}% | 胜率 {record["win_rate"] * 100:.1f}%')
+        print(f'   {record["params"]}')
+    return best
+
+# ============================================================================
+# 主程序
+# ============================================================================
+
+def param_search_main(strategy: str = 'core', method: str = 'halving', n_trials: int = 27,
+                      test_mode: bool = True, max_stocks: int = 200, workers: int = None,
+                      resume: bool = True):
+    """参数搜索主程序（method: halving=逐次减半 / random=随机搜索；resume=False 时清空检查点重跑）"""
+    load_dotenv()
+
+    print('=== CChanTrader-AI 策略参数搜索 ===')
+    print(f'🔧 策略: {strategy} | 方法: {method} | 试验: {n_trials}组')
+
+    bs_session = get_bs_session()
+    lg = get_data_provider().login()
+    print(f'📊 BaoStock连接: {lg.error_code}')
+
+    try:
+        a_stocks = get_stock_universe().a_shares()
+        if test_mode:
+            a_stocks = a_stocks.head(max_stocks)
+
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = (datetime.now() - timedelta(days=500)).strftime('%Y-%m-%d')
+        settings = BACKTEST_SETTINGS
+        kline_data = download_klines(a_stocks['code'], start_date, end_date,
+                                     fields='date,code,open,high,low,close,volume,amount',
+                                     min_bars=settings['warmup'] + settings['horizon'] + settings['step'],
+                                     desc='数据获取')
+        print(f'✅ 获取数据: {len(kline_data)}只')
+    finally:
+        bs_session.logout()
+
+    checkpoint = os.path.join(DEFAULT_SEARCH_DIR, f'{strategy}_{method}.jsonl')
+    if not resume and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    with ParamSearch(kline_data, strategy, workers=workers, checkpoint=checkpoint) as search:
+        print(f'🧮 共享面板 {search.panel_bytes / 1e6:.1f}MB，{search.workers}个进程')
+        if method == 'random':
+            results = search.random_search(n_trials)
+        else:
+            results = search.successive_halving(n_trials)
+
+    best = report_best(results)
+    os.makedirs(DEFAULT_SEARCH_DIR, exist_ok=True)
+    output_file = os.path.join(DEFAULT_SEARCH_DIR, f'{strategy}_{method}_best.json')
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(best, f, ensure_ascii=False, indent=2)
+    print(f'\n💾 结果已保存至: {output_file}')
+    return best
+
+if __name__ == '__main__':
+    param_search_main()
@@ -5,79 +5,36 @@ CChanTrader-AI 历史回测 - 截止2025年6月6日
 基于6月6日收盘数据预测后续走势
 """
 
-import os, json, pandas as pd, numpy as np
-import baostock as bs
+import os, sys, json, pandas as pd, numpy as np
 from tqdm import tqdm
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.data_provider import get_data_provider
+from backend.services.bar_parser import parse_bars
+from backend.services.indicators import IndicatorSpec, add_indicators
+
 # 设定历史截止日期
 ANALYSIS_DATE = '2025-06-06'  # 仅使用此日期之前的数据
 PREDICTION_START = '2025-06-07'  # 预测起始日期
 
 def safe_data_conversion(df: pd.DataFrame) -> pd.DataFrame:
-    """安全的数据转换"""
-    df = df.copy()
-    
-    basic_cols = ['open', 'high', 'low', 'close', 'volume']
-    for col in basic_cols:
-        if col in df.columns:
-            df[col] = df[col].astype(str)
-            df[col] = df[col].str.split().str[0]
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    df = df.dropna(subset=['high', 'low', 'close'])
-    df = df[(df['high'] > 0) & (df['low'] > 0) & (df['close'] > 0)]
-    
-    if 'volume' in df.columns:
-        df['volume'] = df['volume'].fillna(0)
-        
-    return df
+    """安全的数据转换（统一解析器）"""
+    return parse_bars(df)
+
+# 技术指标口径（统一指标库）
+INDICATOR_SPEC = IndicatorSpec(ma_periods=(5, 10, 20, 34), rsi_period=14, macd=(12, 26), macd_signal=9,
+                               vol_period=20, momentum_periods=(5, 10), volatility_period=10)
 
 def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
-    """添加技术指标"""
+    """添加技术指标（统一指标库，同一帧只算一次）"""
     if len(df) < 20:
         return df
-        
-    # 移动平均线
-    for period in [5, 10, 20, 34]:
-        if len(df) >= period:
-            df[f'ma{period}'] = df['close'].rolling(period).mean()
-    
-    # RSI
-    if len(df) >= 15:
-        delta = df['close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(14).mean()
-        loss = -delta.where(delta < 0, 0).rolling(14).mean()
-        rs = gain / (loss + 1e-10)
-        df['rsi'] = 100 - (100 / (1 + rs))
-        df['rsi'] = df['rsi'].fillna(50)
-    else:
-        df['rsi'] = 50
-    
-    # MACD
-    if len(df) >= 26:
-        ema12 = df['close'].ewm(span=12).mean()
-        ema26 = df['close'].ewm(span=26).mean()
-        df['macd'] = ema12 - ema26
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-        df['macd_hist'] = df['macd'] - df['macd_signal']
-    
-    # 成交量指标
-    if len(df) >= 20:
-        df['vol_ma'] = df['volume'].rolling(20).mean()
-        df['vol_ratio'] = df['volume'] / (df['vol_ma'] + 1e-10)
-    else:
-        df['vol_ratio'] = 1.0
-    
-    # 价格动量和波动率
-    if len(df) >= 10:
-        df['momentum_5'] = df['close'].pct_change(5)
-        df['momentum_10'] = df['close'].pct_change(10)
-        df['volatility'] = df['close'].pct_change().rolling(10).std()
-    
+    df = add_indicators(df, INDICATOR_SPEC)
+    df['rsi'] = df['rsi'].fillna(50)
     return df
 
 class EnhancedChanAnalysis:
@@ -341,14 +298,15 @@ def june6_stock_analysis():
     print(f'📅 分析基准日期: {ANALYSIS_DATE}')
     print(f'🎯 预测验证期间: {PREDICTION_START} 及之后')
     
-    lg = bs.login()
+    # 走进程默认数据源（共享会话、断线重连，支持录制/回放）
+    provider = get_data_provider()
+    lg = provider.login()
     print(f'📊 BaoStock连接状态: {lg.error_code}')
     
     try:
         # 获取股票列表
         print(f'\\n🔍 获取{ANALYSIS_DATE}股票列表...')
-        stock_rs = bs.query_all_stock(ANALYSIS_DATE)
-        stock_df = stock_rs.get_data()
+        stock_df = provider.query_all_stock(day=ANALYSIS_DATE)
         
         if stock_df.empty:
             print('无法获取股票列表')
@@ -366,12 +324,11 @@ def june6_stock_analysis():
         for _, stock in tqdm(a_stocks.iterrows(), total=len(a_stocks), desc='获取数据'):
             code = stock['code']
             try:
-                rs = bs.query_history_k_data_plus(code,
+                day_df = provider.query_history_k_data_plus(code,
                     'date,code,open,high,low,close,volume',
                     start_date=start_date, 
                     end_date=ANALYSIS_DATE,
                     frequency='d')
-                day_df = rs.get_data()
                 
                 if not day_df.empty and len(day_df) >= 40:
                     historical_data[code] = day_df
@@ -434,8 +391,7 @@ def june6_stock_analysis():
         return selected_stocks
         
     finally:
-        bs.logout()
-        print(f'\\n🔚 分析完成')
+        print('\\n🔚 分析完成')
 
 if __name__ == '__main__':
     results = june6_stock_analysis()
\ No newline at end of file
@@ -7,8 +7,7 @@ CChanTrader-AI 高级版本
 - 实盘验证测试框架
 """
 
-import os, json, pandas as pd, numpy as np
-import baostock as bs
+import os, sys, json, pandas as pd, numpy as np
 from tqdm import tqdm
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -17,6 +16,14 @@ from typing import List, Dict, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.data_provider import get_data_provider
+from backend.services.bar_parser import parse_bars
+from backend.services.chan_kernels import extend_pivots, merged_fractal_points
+from backend.services.indicators import IndicatorSpec, add_indicators
+from backend.services.kline_downloader import download_klines
+from backend.services.stock_universe import get_stock_universe
+
 # ============================================================================
 # 高级参数配置
 # ============================================================================
@@ -25,9 +32,11 @@ ADVANCED_PARAMS = {
     # 缠论核心参数
     "chan": {
         "min_segment_bars": 5,      # 最小线段K线数
+        "kline_inclusion": True,    # 识别分型前先做K线包含处理
         "pivot_confirm_bars": 3,    # 中枢确认K线数
         "breakout_threshold": 0.02, # 突破阈值2%
         "pivot_strength_min": 0.05, # 中枢强度最小值5%
+        "pivot_merge": True,        # 相邻重叠中枢合并（中枢延伸）
     },
     
     # 技术指标参数
@@ -65,13 +74,24 @@ ADVANCED_PARAMS = {
     }
 }
 
+def _indicator_spec() -> IndicatorSpec:
+    """ADVANCED_PARAMS["technical"] 对应的指标口径（统一指标库）"""
+    technical = ADVANCED_PARAMS["technical"]
+    return IndicatorSpec(ma_periods=tuple(technical["ma_periods"]), rsi_period=technical["rsi_period"],
+                         macd=(technical["macd_fast"], technical["macd_slow"]),
+                         macd_signal=technical["macd_signal"], vol_period=technical["vol_period"],
+                         momentum_periods=())
+
 # ============================================================================
 # 高级数据结构
 # ============================================================================
 
+# 运行环境为 Python 3.9（不支持 dataclass(slots=True)），记录类显式声明 __slots__
 @dataclass
 class AdvancedSegment:
     """高级线段结构"""
+    __slots__ = ('start_idx', 'end_idx', 'direction', 'start_price', 'end_price', 'high', 'low',
+                 'strength', 'volume_profile', 'duration')
     start_idx: int
     end_idx: int
     direction: str          # 'up' | 'down'
@@ -86,6 +106,8 @@ class AdvancedSegment:
 @dataclass
 class AdvancedPivot:
     """高级中枢结构"""
+    __slots__ = ('start_idx', 'end_idx', 'high', 'low', 'center', 'strength', 'volume_density',
+                 'breakout_probability', 'direction_bias')
     start_idx: int
     end_idx: int
     high: float
@@ -120,17 +142,8 @@ class AdvancedChanAnalyzer:
         
     def _preprocess_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """数据预处理"""
-        df = df.copy()
-        
-        # 数据类型转换
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # 过滤无效数据
-        df = df.dropna(subset=['high', 'low', 'close'])
-        df = df[(df['high'] > 0) & (df['low'] > 0) & (df['close'] > 0)]
+        # 数据类型转换并过滤无效数据（统一解析器，已解析的帧跳过字符串处理）
+        df = parse_bars(df, fill_volume=False)
         
         # 计算技术指标
         df = self._add_technical_indicators(df)
@@ -138,57 +151,19 @@ class AdvancedChanAnalyzer:
         return df
     
     def _add_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """添加技术指标"""
-        # 移动平均线
-        for period in ADVANCED_PARAMS["technical"]["ma_periods"]:
-            if len(df) >= period:
-                df[f'ma{period}'] = df['close'].rolling(period).mean()
-        
-        # RSI
-        if len(df) >= ADVANCED_PARAMS["technical"]["rsi_period"] + 1:
-            delta = df['close'].diff()
-            gain = delta.where(delta > 0, 0).rolling(ADVANCED_PARAMS["technical"]["rsi_period"]).mean()
-            loss = -delta.where(delta < 0, 0).rolling(ADVANCED_PARAMS["technical"]["rsi_period"]).mean()
-            rs = gain / (loss + 1e-10)
-            df['rsi'] = 100 - (100 / (1 + rs))
-        else:
+        """添加技术指标（统一指标库，同一帧只算一次）"""
+        df = add_indicators(df, _indicator_spec())
+        if 'rsi' not in df.columns:
             df['rsi'] = 50
-            
-        # MACD
-        if len(df) >= ADVANCED_PARAMS["technical"]["macd_slow"]:
-            ema12 = df['close'].ewm(span=ADVANCED_PARAMS["technical"]["macd_fast"]).mean()
-            ema26 = df['close'].ewm(span=ADVANCED_PARAMS["technical"]["macd_slow"]).mean()
-            df['macd'] = ema12 - ema26
-            df['macd_signal'] = df['macd'].ewm(span=ADVANCED_PARAMS["technical"]["macd_signal"]).mean()
-            df['macd_hist'] = df['macd'] - df['macd_signal']
-        
-        # 成交量指标
-        if len(df) >= ADVANCED_PARAMS["technical"]["vol_period"]:
-            df['vol_ma'] = df['volume'].rolling(ADVANCED_PARAMS["technical"]["vol_period"]).mean()
-            df['vol_ratio'] = df['volume'] / df['vol_ma']
-        
         return df
     
     def identify_fractal_points(self) -> Tuple[List[int], List[int]]:
         """识别分型点（高点和低点）"""
-        highs, lows = [], []
-        
-        for i in range(2, len(self.df) - 2):
-            # 顶分型：前后两K线的高点都小于当前K线
-            if (self.df['high'].iloc[i] > self.df['high'].iloc[i-1] and
-                self.df['high'].iloc[i] > self.df['high'].iloc[i+1] and
-                self.df['high'].iloc[i] > self.df['high'].iloc[i-2] and
-                self.df['high'].iloc[i] > self.df['high'].iloc[i+2]):
-                highs.append(i)
-            
-            # 底分型：前后两K线的低点都大于当前K线
-            if (self.df['low'].iloc[i] < self.df['low'].iloc[i-1] and
-                self.df['low'].iloc[i] < self.df['low'].iloc[i+1] and
-                self.df['low'].iloc[i] < self.df['low'].iloc[i-2] and
-                self.df['low'].iloc[i] < self.df['low'].iloc[i+2]):
-                lows.append(i)
-        
-        return highs, lows
+        # 包含处理后，顶分型：前后两K线的高点都小于当前K线；底分型：前后两K线的低点都大于当前K线
+        # 下标为原始K线下标（合并K线高点/低点所在的那一根）
+        idx, _, is_low = merged_fractal_points(self.df['high'].to_numpy(), self.df['low'].to_numpy(),
+                                               ADVANCED_PARAMS["chan"]["kline_inclusion"])
+        return idx[~is_low].tolist(), idx[is_low].tolist()
     
     def identify_segments(self) -> List[AdvancedSegment]:
         """识别线段"""
@@ -246,12 +221,14 @@ class AdvancedChanAnalyzer:
         return segments
     
     def identify_pivots(self, segments: List[AdvancedSegment]) -> List[AdvancedPivot]:
-        """识别中枢"""
+        """识别中枢（开启 pivot_merge 时先合并重叠中枢，再只为合并后的中枢计算量能与突破概率）"""
         pivots = []
         
         if len(segments) < 3:
             return pivots
         
+        # 候选中枢：(首段位置, 末段位置, 上沿, 下沿, 中心, 强度)
+        windows = []
         for i in range(len(segments) - 2):
             seg1, seg2, seg3 = segments[i], segments[i+1], segments[i+2]
             
@@ -275,28 +252,44 @@ class AdvancedChanAnalyzer:
                     
                     # 过滤强度不足的中枢
                     if strength >= ADVANCED_PARAMS["chan"]["pivot_strength_min"]:
-                        # 计算成交量密度
-                        pivot_data = self.df.iloc[seg1.start_idx:seg3.end_idx+1]
-                        volume_density = pivot_data['volume'].mean()
-                        
-                        # 计算突破概率（基于历史数据）
-                        breakout_prob = self._calculate_breakout_probability(pivot_data)
-                        
-                        # 方向偏向
-                        direction_bias = 'up' if seg3.strength > seg1.strength else 'down'
-                        
-                        pivot = AdvancedPivot(
-                            start_idx=seg1.start_idx,
-                            end_idx=seg3.end_idx,
-                            high=pivot_high,
-                            low=pivot_low,
-                            center=center,
-                            strength=strength,
-                            volume_density=volume_density,
-                            breakout_probability=breakout_prob,
-                            direction_bias=direction_bias
-                        )
-                        pivots.append(pivot)
+                        windows.append((i, i + 2, pivot_high, pivot_low, center, strength))
+        
+        if not windows:
+            return pivots
+        
+        # 中枢延伸：时间相接且区间重叠的候选并入前一个中枢（排序扫描，O(n log n)）
+        if ADVANCED_PARAMS["chan"]["pivot_merge"]:
+            start = [segments[w[0]].start_idx for w in windows]
+            end = [segments[w[1]].end_idx for w in windows]
+            keep, _, last = extend_pivots(start, end, [w[2] for w in windows], [w[3] for w in windows])
+            groups = [(windows[k], windows[m]) for k, m in zip(keep.tolist(), last.tolist())]
+        else:
+            groups = [(w, w) for w in windows]
+        
+        for head, tail in groups:
+            first_seg, last_seg = segments[head[0]], segments[tail[1]]
+            # 计算成交量密度
+            pivot_data = self.df.iloc[first_seg.start_idx:last_seg.end_idx+1]
+            volume_density = pivot_data['volume'].mean()
+            
+            # 计算突破概率（基于历史数据）
+            breakout_prob = self._calculate_breakout_probability(pivot_data)
+            
+            # 方向偏向：最后一个并入中枢的首末两段力度对比
+            direction_bias = 'up' if last_seg.strength > segments[tail[0]].strength else 'down'
+            
+            pivot = AdvancedPivot(
+                start_idx=first_seg.start_idx,
+                end_idx=last_seg.end_idx,
+                high=head[2],
+                low=head[3],
+                center=head[4],
+                strength=head[5],
+                volume_density=volume_density,
+                breakout_probability=breakout_prob,
+                direction_bias=direction_bias
+            )
+            pivots.append(pivot)
         
         return pivots
     
@@ -783,28 +776,21 @@ def advanced_stock_selection(symbol: str, df: pd.DataFrame) -> Optional[Dict]:
 # 5. 主程序
 # ============================================================================
 
-def advanced_cchan_main(test_mode: bool = True, max_stocks: int = 50):
-    """高级缠论选股主程序"""
+def advanced_cchan_main(test_mode: bool = True, max_stocks: int = 50, workers: int = None):
+    """高级缠论选股主程序（workers: K线下载进程数）"""
     load_dotenv()
     
     print('=== CChanTrader-AI 高级版本 ===')
     print('✨ 精准缠论算法 + 多因子融合 + 实盘验证')
     
-    lg = bs.login()
+    lg = get_data_provider().login()
     print(f'📊 BaoStock连接: {lg.error_code}')
     
     try:
         # 获取股票列表
         print('\\n🔍 获取股票列表...')
-        for days_back in range(0, 10):
-            query_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
-            stock_rs = bs.query_all_stock(query_date)
-            stock_df = stock_rs.get_data()
-            if not stock_df.empty:
-                break
-        
-        # 过滤股票
-        a_stocks = stock_df[stock_df['code'].str.contains('sh.6|sz.0|sz.3')]
+        # 过滤股票（按交易日缓存的股票池）
+        a_stocks = get_stock_universe().a_shares()
         if test_mode:
             a_stocks = a_stocks.head(max_stocks)
         
@@ -812,23 +798,14 @@ def advanced_cchan_main(test_mode: bool = True, max_stocks: int = 50):
         
         # 获取K线数据
         print('\\n📈 获取K线数据...')
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=200)).strftime('%Y-%m-%d')
-        
-        kline_data = {}
-        for _, stock in tqdm(a_stocks.iterrows(), total=len(a_stocks), desc='数据获取'):
-            code = stock['code']
-            try:
-                rs = bs.query_history_k_data_plus(code,
-                    'date,code,open,high,low,close,volume,amount',
-                    start_date=start_date, end_date=end_date, frequency='d')
-                day_df = rs.get_data()
-                
-                if not day_df.empty and len(day_df) >= 60:
-                    kline_data[code] = day_df
-                    
-            except Exception:
-                continue
+        # 以数据源视角的当前时间定区间（回放时为录制时间），保证请求与归档一致
+        now = get_data_provider().now()
+        end_date = now.strftime('%Y-%m-%d')
+        start_date = (now - timedelta(days=200)).strftime('%Y-%m-%d')
+        
+        kline_data = download_klines(a_stocks['code'], start_date, end_date,
+                                     fields='date,code,open,high,low,close,volume,amount',
+                                     workers=workers, min_bars=60, desc='数据获取')
         
         print(f'✅ 获取数据: {len(kline_data)}只')
         
@@ -888,8 +865,7 @@ def advanced_cchan_main(test_mode: bool = True, max_stocks: int = 50):
         return selected_stocks
         
     finally:
-        bs.logout()
-        print('\\n🔚 BaoStock已断开')
+        print('\\n🔚 分析完成')
 
 if __name__ == '__main__':
     results = advanced_cchan_main(test_mode=True, max_stocks=50)
\ No newline at end of file
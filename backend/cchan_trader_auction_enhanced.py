@@ -5,23 +5,31 @@ CChanTrader-AI 竞价数据增强版
 在原有算法基础上集成集合竞价分析，提高选股精确度
 """
 
-import os, json, pandas as pd, numpy as np
-import baostock as bs
-import akshare as ak
+import os, sys, json, pandas as pd, numpy as np
 from tqdm import tqdm
-from datetime import datetime, timedelta
+from datetime import timedelta
 from dotenv import load_dotenv
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.data_provider import DataProvider, get_data_provider
+from backend.services.bar_parser import parse_bars
+from backend.services.indicators import IndicatorSpec, add_indicators
+from backend.services.kline_downloader import download_klines
+from backend.services.stock_universe import get_stock_universe
+
 class AuctionDataAnalyzer:
     """集合竞价数据分析器"""
     
+    def __init__(self, provider: DataProvider = None):
+        self.provider = provider or get_data_provider()
+    
     def get_auction_data(self, symbol: str) -> pd.DataFrame:
         """获取集合竞价数据"""
         try:
             # 使用AKShare获取竞价数据
-            pre_market_df = ak.stock_zh_a_hist_pre_min_em(
+            pre_market_df = self.provider.stock_zh_a_hist_pre_min_em(
                 symbol=symbol,
                 start_time="09:00:00", 
                 end_time="09:30:00"
@@ -143,56 +151,26 @@ class AuctionDataAnalyzer:
             'final_price': 0
         }
 
+# 技术指标口径（统一指标库）
+INDICATOR_SPEC = IndicatorSpec(ma_periods=(5, 10, 20, 34), rsi_period=14, vol_period=20, momentum_periods=(5, 10))
+
 class EnhancedCChanTrader:
     """增强版CChanTrader（集成竞价数据）"""
     
-    def __init__(self):
-        self.auction_analyzer = AuctionDataAnalyzer()
+    def __init__(self, provider: DataProvider = None):
+        self.provider = provider or get_data_provider()
+        self.auction_analyzer = AuctionDataAnalyzer(self.provider)
     
     def safe_data_conversion(self, df: pd.DataFrame) -> pd.DataFrame:
-        """数据安全转换"""
-        df = df.copy()
-        
-        basic_cols = ['open', 'high', 'low', 'close', 'volume']
-        for col in basic_cols:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.split().str[0]
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df = df.dropna(subset=['high', 'low', 'close'])
-        df = df[(df['high'] > 0) & (df['low'] > 0) & (df['close'] > 0)]
-        
-        return df
+        """数据安全转换（统一解析器，已解析的帧只过滤无效行）"""
+        return parse_bars(df, fill_volume=False)
     
     def add_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """添加技术指标"""
+        """添加技术指标（统一指标库，同一帧只算一次）"""
         if len(df) < 20:
             return df
-        
-        # 移动平均线
-        for period in [5, 10, 20, 34]:
-            if len(df) >= period:
-                df[f'ma{period}'] = df['close'].rolling(period).mean()
-        
-        # RSI
-        if len(df) >= 15:
-            delta = df['close'].diff()
-            gain = delta.where(delta > 0, 0).rolling(14).mean()
-            loss = -delta.where(delta < 0, 0).rolling(14).mean()
-            rs = gain / (loss + 1e-10)
-            df['rsi'] = 100 - (100 / (1 + rs))
-            df['rsi'] = df['rsi'].fillna(50)
-        
-        # 成交量指标
-        if len(df) >= 20:
-            df['vol_ma'] = df['volume'].rolling(20).mean()
-            df['vol_ratio'] = df['volume'] / (df['vol_ma'] + 1e-10)
-        
-        # 动量
-        if len(df) >= 10:
-            df['momentum_5'] = df['close'].pct_change(5)
-            df['momentum_10'] = df['close'].pct_change(10)
-        
+        df = add_indicators(df, INDICATOR_SPEC)
+        df['rsi'] = df['rsi'].fillna(50)
         return df
     
     def analyze_stock_with_auction(self, symbol: str, df: pd.DataFrame, stock_name: str) -> dict:
@@ -361,33 +339,25 @@ class EnhancedCChanTrader:
         else:
             return "竞价信号一般，建议观望"
 
-def enhanced_stock_selection():
-    """增强版选股主程序"""
+def enhanced_stock_selection(provider: DataProvider = None, workers: int = None):
+    """增强版选股主程序（provider: 数据源，默认按 CCHAN_DATA_MODE 创建；workers: K线下载进程数）"""
     load_dotenv()
     
     print('=== CChanTrader-AI 竞价数据增强版 ===')
     print('🎯 整合集合竞价分析，提升选股精确度')
     
     # 初始化分析器
-    analyzer = EnhancedCChanTrader()
+    analyzer = EnhancedCChanTrader(provider)
     
     # 连接BaoStock获取基础数据
-    lg = bs.login()
+    lg = analyzer.provider.login()
     print(f'📊 BaoStock连接: {lg.error_code}')
     
     try:
         # 获取股票列表
         print('\n🔍 获取股票列表...')
-        stock_rs = bs.query_all_stock(day='2025-06-26')
-        all_stocks = stock_rs.get_data()
-        
-        # 多市场采样
-        markets = {
-            '上海主板': all_stocks[all_stocks['code'].str.startswith('sh.6')],
-            '深圳主板': all_stocks[all_stocks['code'].str.startswith('sz.000')],
-            '中小板': all_stocks[all_stocks['code'].str.startswith('sz.002')],
-            '创业板': all_stocks[all_stocks['code'].str.startswith('sz.30')]
-        }
+        # 多市场采样（最近交易日的股票池，按板块分组）
+        markets = get_stock_universe(analyzer.provider).by_board()
         
         sample_stocks = []
         for market_name, market_stocks in markets.items():
@@ -401,27 +371,17 @@ def enhanced_stock_selection():
         
         # 获取K线数据
         print('\n📈 获取K线数据...')
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=60)).strftime('%Y-%m-%d')
-        
-        stock_data = {}
-        for _, stock in tqdm(final_sample.iterrows(), total=len(final_sample), desc='获取数据'):
-            code = stock['code']
-            name = stock['code_name']
-            
-            try:
-                rs = bs.query_history_k_data_plus(code,
-                    'date,code,open,high,low,close,volume',
-                    start_date=start_date, 
-                    end_date=end_date,
-                    frequency='d')
-                day_df = rs.get_data()
-                
-                if not day_df.empty and len(day_df) >= 30:
-                    stock_data[code] = {'df': day_df, 'name': name}
-                    
-            except Exception:
-                continue
+        # 以数据源视角的当前时间定区间（回放时为录制时间），保证请求与归档一致
+        now = analyzer.provider.now()
+        end_date = now.strftime('%Y-%m-%d')
+        start_date = (now - timedelta(days=60)).strftime('%Y-%m-%d')
+        
+        names = dict(zip(final_sample['code'], final_sample['code_name']))
+        day_data = download_klines(final_sample['code'], start_date, end_date,
+                                   fields='date,code,open,high,low,close,volume',
+                                   workers=workers, min_bars=30, desc='获取数据',
+                                   provider=analyzer.provider)
+        stock_data = {code: {'df': day_df, 'name': names[code]} for code, day_df in day_data.items()}
         
         print(f'✅ 获取到 {len(stock_data)} 只股票数据')
         
@@ -468,7 +428,6 @@ def enhanced_stock_selection():
         return selected_stocks
         
     finally:
-        bs.logout()
         print('\n🔚 分析完成')
 
 if __name__ == '__main__':
@@ -5,14 +5,28 @@ CChanTrader-AI 核心选股引擎
 基于缠论技术分析的智能选股系统 - 程序就绪版本
 """
 
-import os, json, pandas as pd, numpy as np
-import baostock as bs
+import os, sys, json, math, pandas as pd, numpy as np
 from tqdm import tqdm
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from dataclasses import dataclass
+from functools import cached_property
 from typing import List, Dict, Optional, Tuple
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.data_provider import get_data_provider
+from backend.services.bar_parser import BarPanel, parse_bars
+from backend.services.chan_kernels import (InclusionMerger, IntervalIndex, build_segments, build_strokes,
+                                           extend_pivots, fractal_masks, fractal_sequence,
+                                           merge_inclusion_panel, merged_fractal_points)
+from backend.services.kline_downloader import download_klines
+from backend.services.minute_bars import load_intraday_levels
+from backend.services.stock_universe import get_stock_universe
+from backend.services.indicators import IndicatorSpec, latest_indicators
+from backend.services.indicator_state import IndicatorState
+from backend.services.divergence import MACD_SIGNAL, SegmentAreas, macd_histogram, segment_divergence
+from backend.services.structure_cache import frame_stamp, get_structure_cache, params_hash
+
 # ============================================================================
 # 0. 全局参数表 (PARAMS) - 可随时调优/网格搜索
 # ============================================================================
@@ -20,6 +34,10 @@ from typing import List, Dict, Optional, Tuple
 PARAMS = {
     # 级别与均线
     "periods": ["D", "30m", "5m"],
+    "kline_inclusion": True, # 识别分型前先做K线包含处理
+    "pivot_merge": True,     # 相邻重叠中枢合并（中枢延伸）
+    "segment_mode": "fractal", # 线段口径: fractal=相邻异类分型 / stroke=笔 / feature=特征序列线段
+    "stroke_min_bars": 4,    # 成笔最小间隔（顶底分型所在合并K线的位置差）
     "ma_short": 5,
     "ma_mid": 34, 
     "ma_long": 170,          # 用于超长期支撑
@@ -27,6 +45,7 @@ PARAMS = {
     # 趋势判定
     "daily_up_cross_ratio": 1.02,  # 日线必须突破前高>=2%
     "ma_align_threshold": 0.98,    # MA排列容忍度
+    "divergence_ratio": 0.8,       # 背驰：末段MACD面积 < 前一同向段面积的80%
     
     # 成交量
     "v_break_min": 1.8,      # 放量突破需≥过去5根均量1.8倍
@@ -53,9 +72,11 @@ PARAMS = {
 # 数据结构定义
 # ============================================================================
 
+# 运行环境为 Python 3.9（不支持 dataclass(slots=True)），记录类显式声明 __slots__
 @dataclass
 class Segment:
     """缠论线段"""
+    __slots__ = ('start_idx', 'end_idx', 'direction', 'high', 'low', 'start_price', 'end_price')
     start_idx: int
     end_idx: int
     direction: str  # 'up' | 'down'
@@ -64,9 +85,10 @@ class Segment:
     start_price: float
     end_price: float
 
-@dataclass 
+@dataclass
 class Pivot:
     """缠论中枢"""
+    __slots__ = ('start_idx', 'end_idx', 'high', 'low', 'center', 'strength')
     start_idx: int
     end_idx: int
     high: float
@@ -77,14 +99,136 @@ class Pivot:
 @dataclass
 class Signal:
     """买卖信号"""
+    __slots__ = ('signal_type', 'k_idx', 'price', 'confidence')
     signal_type: str  # '1_buy', '2_buy', '3_buy', '1_sell', '2_sell'
     k_idx: int
     price: float
     confidence: float
 
+class _RecordTable:
+    """
+    NumPy 结构化数组支撑的记录表，可当作只读列表使用：
+    len / 迭代 / 负下标取单条记录，切片与布尔掩码返回同类表（视图，不复制），
+    列直接以属性访问（table.high 为 ndarray），便于向量化判断
+    """
+
+    dtype: np.dtype = None
+
+    def __init__(self, data: np.ndarray = None):
+        self.data = np.zeros(0, dtype=self.dtype) if data is None else data
+
+    @classmethod
+    def from_records(cls, records) -> '_RecordTable':
+        if isinstance(records, cls):
+            return records
+        return cls(np.array([cls._to_row(r) for r in records], dtype=cls.dtype))
+
+    @staticmethod
+    def _to_row(record) -> tuple:
+        raise NotImplementedError
+
+    def _record(self, row):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self):
+        for row in self.data:
+            yield self._record(row)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self._record(self.data[key])
+        return type(self)(self.data[key])
+
+    def __getattr__(self, name):
+        if name != 'data' and name in self.dtype.names:
+            return self.data[name]
+        raise AttributeError(name)
+
+    def __eq__(self, other) -> bool:
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({len(self)} rows)'
+
+    def tail(self, n: int) -> '_RecordTable':
+        """最后 n 条"""
+        return self[max(len(self) - n, 0):]
+
+    def where(self, mask: np.ndarray) -> '_RecordTable':
+        """按布尔掩码筛选"""
+        return self[np.asarray(mask, dtype=bool)]
+
+    def to_records(self) -> list:
+        return list(self)
+
+class SegmentTable(_RecordTable):
+    """线段表：direction 以布尔列 up 存放"""
+
+    dtype = np.dtype([('start_idx', np.int64), ('end_idx', np.int64), ('up', np.bool_),
+                      ('high', np.float64), ('low', np.float64),
+                      ('start_price', np.float64), ('end_price', np.float64)])
+
+    @staticmethod
+    def _to_row(seg: Segment) -> tuple:
+        return (seg.start_idx, seg.end_idx, seg.direction == 'up', seg.high, seg.low,
+                seg.start_price, seg.end_price)
+
+    def _record(self, row) -> Segment:
+        return Segment(int(row['start_idx']), int(row['end_idx']), 'up' if row['up'] else 'down',
+                       float(row['high']), float(row['low']),
+                       float(row['start_price']), float(row['end_price']))
+
+class PivotTable(_RecordTable):
+    """中枢表"""
+
+    dtype = np.dtype([('start_idx', np.int64), ('end_idx', np.int64), ('high', np.float64),
+                      ('low', np.float64), ('center', np.float64), ('strength', np.float64)])
+
+    @staticmethod
+    def _to_row(pivot: Pivot) -> tuple:
+        return (pivot.start_idx, pivot.end_idx, pivot.high, pivot.low, pivot.center, pivot.strength)
+
+    def _record(self, row) -> Pivot:
+        return Pivot(int(row['start_idx']), int(row['end_idx']), float(row['high']),
+                     float(row['low']), float(row['center']), float(row['strength']))
+
+def _columns_to_table(table_cls, columns: Dict[str, np.ndarray]) -> _RecordTable:
+    """列字典 -> 记录表（多余的列忽略）"""
+    first = next(iter(columns.values()))
+    data = np.empty(len(first), dtype=table_cls.dtype)
+    for name in table_cls.dtype.names:
+        data[name] = columns[name]
+    return table_cls(data)
+
+class PivotIndex:
+    """
+    中枢区间索引：按K线下标或价格查询包含它的中枢（列表或 PivotTable 均可），
+    建索引 O(n log n)，每个命中 O(log n)
+    """
+
+    def __init__(self, pivots):
+        self.pivots = pivots
+        table = PivotTable.from_records(pivots)
+        self._bars = IntervalIndex(table.start_idx, table.end_idx)
+        self._prices = IntervalIndex(table.low, table.high)
+
+    def __len__(self) -> int:
+        return len(self.pivots)
+
+    def at_bar(self, k_idx: int) -> List[Pivot]:
+        """时间跨度覆盖第 k_idx 根K线的中枢（按起点先后）"""
+        return [self.pivots[int(k)] for k in self._bars.stab(k_idx)]
+
+    def at_price(self, price: float) -> List[Pivot]:
+        """价格区间 [low, high] 包含 price 的中枢（按起点先后）"""
+        return [self.pivots[int(k)] for k in self._prices.stab(price)]
+
 @dataclass
 class StructureInfo:
-    """结构分析结果"""
+    """结构分析结果（segments / pivots 为记录列表，或列式的 SegmentTable / PivotTable）"""
     segments: List[Segment]
     pivots: List[Pivot]
     trend: str  # 'up' | 'down' | 'side'
@@ -96,6 +240,22 @@ class StructureInfo:
 # 1. 预处理：K线 → 线段/中枢 (核心缠论算法接口)
 # ============================================================================
 
+# tech_indicators 的固定口径
+INDICATOR_MA_PERIODS = (5, 10, 20, 60)
+RSI_PERIOD = 14
+MACD_SPANS = (12, 26)
+# 面板版 MACD 只取最近 MACD_WINDOW 根：更早K线在 EWM 中的权重 < 1e-20，可忽略
+MACD_WINDOW = 600
+TECH_INDICATOR_SPEC = IndicatorSpec(ma_periods=INDICATOR_MA_PERIODS, rsi_period=RSI_PERIOD, macd=MACD_SPANS,
+                                    macd_signal=None, vol_period=None, momentum_periods=())
+# 增量引擎另需 MACD 柱（背驰面积）
+STREAM_INDICATOR_SPEC = IndicatorSpec(ma_periods=INDICATOR_MA_PERIODS, rsi_period=RSI_PERIOD, macd=MACD_SPANS,
+                                      macd_signal=MACD_SIGNAL, vol_period=None, momentum_periods=())
+
+# 影响 parse_structure 结果的 PARAMS 键（结构缓存按这些参数的哈希区分）
+STRUCTURE_PARAM_KEYS = ("kline_inclusion", "pivot_merge", "segment_mode", "stroke_min_bars", "ma_short",
+                        "daily_up_cross_ratio", "divergence_ratio", "vol_ma_period")
+
 def parse_structure(df: pd.DataFrame, period: str = "D") -> StructureInfo:
     """
     将K线数据解析为缠论结构
@@ -114,24 +274,11 @@ def parse_structure(df: pd.DataFrame, period: str = "D") -> StructureInfo:
     if df.empty or len(df) < 10:
         return StructureInfo([], [], 'side', {}, {}, {})
     
-    # 数据预处理
-    df = df.copy()
-    
-    # 更安全的数据类型转换
-    numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # 过滤掉空值和无效数据
-    df = df.dropna(subset=['high', 'low', 'close'])
-    
-    # 确保价格数据为正数
-    df = df[(df['high'] > 0) & (df['low'] > 0) & (df['close'] > 0)]
-    
-    # 修复volume的空值问题
-    if 'volume' in df.columns:
-        df['volume'] = df['volume'].fillna(0)
+    # 数据预处理：统一解析为浮点列，过滤空值/非正价格，volume空值填0
+    # （本地K线存储返回的帧已是浮点列，这里不再做字符串转换）
+    df = parse_bars(df)
+    if len(df) < 10:
+        return StructureInfo([], [], 'side', {}, {}, {})
     
     # ========== 线段识别 (简化版缠论算法) ==========
     segments = _identify_segments(df)
@@ -160,131 +307,500 @@ def parse_structure(df: pd.DataFrame, period: str = "D") -> StructureInfo:
         tech_indicators=tech_indicators
     )
 
-def _identify_segments(df: pd.DataFrame) -> List[Segment]:
-    """线段识别 - 简化版本"""
+def parse_structure_panel(frames, period: str = "D", compact: bool = False) -> Dict[str, StructureInfo]:
+    """
+    多只股票一次解析，结果与逐只 parse_structure 相同
+
+    frames: {symbol: DataFrame} 或已拼接好的 BarPanel
+    compact: segments / pivots 返回 SegmentTable / PivotTable（共享一块结构化数组的视图，
+             不逐条创建记录对象），适合全市场扫描
+    分型、线段、中枢判定、量能与技术指标都在拼接后的数组上向量化计算，
+    逐只循环只剩 StructureInfo 组装；指标与逐只版本只差浮点舍入（相对误差 < 1e-9）
+    """
+    panel = frames if isinstance(frames, BarPanel) else BarPanel.from_frames(frames)
+    if len(panel) == 0:
+        return {}
+
+    lengths = panel.lengths
+    seg = _panel_segments(panel, PARAMS["kline_inclusion"])
+    piv = _panel_pivots(seg)
+    vol_stats = _panel_volume_stats(panel)
+    indicators = _panel_technical_indicators(panel)
+
+    # 按股票切分线段/中枢
+    seg_bounds = np.searchsorted(seg['sym'], np.arange(len(panel) + 1))
+    piv_bounds = np.searchsorted(piv['sym'], np.arange(len(panel) + 1))
+    if compact:
+        seg_table = _columns_to_table(SegmentTable, seg)
+        piv_table = _columns_to_table(PivotTable, piv)
+    else:
+        seg_cols = [seg[name].tolist() for name in SegmentTable.dtype.names]
+        piv_cols = [piv[name].tolist() for name in PivotTable.dtype.names]
+    close = panel.columns['close']
+    ma_short = PARAMS["ma_short"]
+
+    results = {}
+    for k, symbol in enumerate(panel.symbols):
+        n = int(lengths[k])
+        if n < 10:
+            results[symbol] = StructureInfo([], [], 'side', {}, {}, {})
+            continue
+        if compact:
+            segments = seg_table[seg_bounds[k]:seg_bounds[k + 1]]
+            pivots = piv_table[piv_bounds[k]:piv_bounds[k + 1]]
+        else:
+            segments = [Segment(s, e, 'up' if up else 'down', h, l, sp, ep)
+                        for s, e, up, h, l, sp, ep in zip(*(col[seg_bounds[k]:seg_bounds[k + 1]]
+                                                            for col in seg_cols))]
+            pivots = [Pivot(*values) for values in zip(*(col[piv_bounds[k]:piv_bounds[k + 1]]
+                                                         for col in piv_cols))]
+        closes = panel.column('close', k)
+        current_price = closes[-1]
+        trend = (_trend_from_segments(segments, current_price, _tail_mean(closes, ma_short))
+                 if segments and n >= ma_short else 'side')
+        # 背驰只在末段创新高/新低时判定，MACD柱与前缀和只为这些股票计算
+        areas = None
+        if _divergence_pair(segments) is not None:
+            areas = SegmentAreas.from_series(macd_histogram(closes), panel.column('volume', k))
+        results[symbol] = StructureInfo(
+            segments=segments,
+            pivots=pivots,
+            trend=trend,
+            signals=_signals_at(n, current_price, segments, pivots, areas),
+            vol_stats=vol_stats[k],
+            tech_indicators=indicators[k]
+        )
+    return results
+
+def _panel_segments(panel: BarPanel, inclusion: bool) -> Dict[str, np.ndarray]:
+    """面板线段：整个面板一次包含处理、一次识别全部分型，相邻异类分型点构成线段"""
+    n_sym = len(panel)
+    high, low = panel.columns['high'], panel.columns['low']
+    if inclusion:
+        bars, m_offsets = merge_inclusion_panel(high, low, panel.offsets)
+        m_high, m_low, high_idx, low_idx = bars.high, bars.low, bars.high_idx, bars.low_idx
+    else:
+        m_high, m_low, m_offsets = high, low, panel.offsets
+        high_idx = low_idx = np.arange(len(high)) - np.repeat(panel.offsets[:-1], panel.lengths)
+
+    # 跨股票边界的比较无效：只保留各股票内部第 2 ~ 倒数第 3 根
+    mode = PARAMS["segment_mode"]
+    top, bottom = fractal_masks(m_high, m_low)
+    m_lengths = np.diff(m_offsets)
+    sym = np.repeat(np.arange(n_sym), m_lengths)
+    local = np.arange(len(m_high)) - m_offsets[sym]
+    inner = (local >= 2) & (local <= m_lengths[sym] - 3)
+    tops, bottoms = np.flatnonzero(top & inner), np.flatnonzero(bottom & inner)
+
+    p_sym = np.concatenate([sym[tops], sym[bottoms]])
+    p_idx = np.concatenate([high_idx[tops], low_idx[bottoms]])
+    p_price = np.concatenate([m_high[tops], m_low[bottoms]])
+    p_low = np.concatenate([np.zeros(len(tops), dtype=bool), np.ones(len(bottoms), dtype=bool)])
+    p_pos = np.concatenate([local[tops], local[bottoms]])
+    order = np.lexsort((p_low, p_price, p_pos, p_sym))
+    p_sym, p_idx, p_price, p_low = p_sym[order], p_idx[order], p_price[order], p_low[order]
+
+    if mode == 'fractal':
+        starts = np.flatnonzero((p_sym[:-1] == p_sym[1:]) & (p_low[:-1] != p_low[1:]))
+        stops = starts + 1
+    else:
+        # 笔 / 特征序列线段：全面板一次扫描，股票边界处重置
+        ends = build_strokes(p_pos[order], p_price, p_low, PARAMS["stroke_min_bars"], groups=p_sym)
+        p_sym, p_idx, p_price, p_low = p_sym[ends], p_idx[ends], p_price[ends], p_low[ends]
+        if mode == 'stroke':
+            starts = np.flatnonzero(p_sym[:-1] == p_sym[1:])
+            stops = starts + 1
+        else:
+            starts, stops = build_segments(p_price, p_low, groups=p_sym)
+    start_price, end_price = p_price[starts], p_price[stops]
+    return {
+        'sym': p_sym[starts],
+        'start_idx': p_idx[starts],
+        'end_idx': p_idx[stops],
+        'up': p_low[starts],
+        'high': np.maximum(start_price, end_price),
+        'low': np.minimum(start_price, end_price),
+        'start_price': start_price,
+        'end_price': end_price,
+    }
+
+def _panel_pivots(seg: Dict[str, np.ndarray], merge: bool = None) -> Dict[str, np.ndarray]:
+    """面板中枢：同一股票内连续三段，规则同 _pivot_from_segments；merge 默认取 PARAMS["pivot_merge"]"""
+    sym, up, high, low = seg['sym'], seg['up'], seg['high'], seg['low']
+    first = np.flatnonzero(sym[:-2] == sym[2:]) if len(sym) >= 3 else np.empty(0, dtype=np.int64)
+    d1, d2, d3 = up[first], up[first + 1], up[first + 2]
+    pivot_high = np.where(d1, np.minimum(high[first], high[first + 2]), high[first + 1])
+    pivot_low = np.where(d1, low[first + 1], np.maximum(low[first], low[first + 2]))
+    ok = (d1 != d2) & (d2 != d3) & (pivot_high > pivot_low)
+    first, pivot_high, pivot_low = first[ok], pivot_high[ok], pivot_low[ok]
+    start_idx, end_idx = seg['start_idx'][first], seg['end_idx'][first + 2]
+    piv_sym = sym[first]
+    if PARAMS["pivot_merge"] if merge is None else merge:
+        keep, end_idx, _ = extend_pivots(start_idx, end_idx, pivot_high, pivot_low, groups=piv_sym)
+        piv_sym, start_idx = piv_sym[keep], start_idx[keep]
+        pivot_high, pivot_low = pivot_high[keep], pivot_low[keep]
+    return {
+        'sym': piv_sym,
+        'start_idx': start_idx,
+        'end_idx': end_idx,
+        'high': pivot_high,
+        'low': pivot_low,
+        'center': (pivot_high + pivot_low) / 2,
+        'strength': np.abs(pivot_high - pivot_low) / pivot_low,
+    }
+
+def _panel_volume_stats(panel: BarPanel) -> List[Dict[str, float]]:
+    """面板量价统计，口径同 _calculate_volume_stats"""
+    period = PARAMS["vol_ma_period"]
+    volume = panel.tail_matrix('volume', 2 * period - 1)
+    vol_ma = np.lib.stride_tricks.sliding_window_view(volume, period, axis=1).sum(axis=-1) / period
+    counts = (~np.isnan(vol_ma)).sum(axis=1)
+    avg_vol = np.nansum(vol_ma, axis=1) / np.maximum(counts, 1)
+    current_vol = volume[:, -1]
+    recent_vol = volume[:, -3:].mean(axis=1)
+    prev = volume[:, -8:-3]
+    prev_vol = np.nansum(prev, axis=1) / np.maximum((~np.isnan(prev)).sum(axis=1), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_factor = np.where(avg_vol > 0, current_vol / avg_vol, 1.0)
+        pullback_factor = np.where(prev_vol > 0, recent_vol / prev_vol, 1.0)
+
+    stats = []
+    for n, vf, pf, avg in zip(panel.lengths.tolist(), volume_factor.tolist(),
+                              pullback_factor.tolist(), avg_vol.tolist()):
+        if n < period:
+            stats.append({'volume_factor': 1.0, 'pullback_factor': 1.0})
+        else:
+            stats.append({'volume_factor': vf, 'pullback_factor': pf, 'avg_volume': avg})
+    return stats
+
+def _panel_technical_indicators(panel: BarPanel) -> List[Dict[str, float]]:
+    """面板技术指标，口径同 _calculate_technical_indicators（统一指标库，整个面板一次算完）"""
+    lengths = panel.lengths
+    window = int(min(max(lengths.max(), 1), MACD_WINDOW))
+    window = max(window, max(INDICATOR_MA_PERIODS), RSI_PERIOD + 1)
+    latest = latest_indicators(panel.tail_matrix('close', window), spec=TECH_INDICATOR_SPEC).at()
+
+    results = []
+    for k, n in enumerate(lengths.tolist()):
+        indicators = {}
+        if n >= RSI_PERIOD:
+            rsi = latest['rsi'][k]
+            indicators['rsi'] = 50 if np.isnan(rsi) else float(rsi)
+            if n >= max(MACD_SPANS):
+                indicators['macd'] = float(latest['macd'][k])
+            for period in INDICATOR_MA_PERIODS:
+                if n >= period:
+                    indicators[f'ma{period}'] = float(latest[f'ma{period}'][k])
+        results.append(indicators)
+    return results
+
+def structure_table(infos: Dict[str, StructureInfo]) -> pd.DataFrame:
+    """StructureInfo 汇总为一行一只股票的列式表，便于向量化筛选"""
+    rows = []
+    for symbol, info in infos.items():
+        last_pivot = info.pivots[-1] if info.pivots else None
+        rows.append({
+            'symbol': symbol,
+            'trend': info.trend,
+            'segments': len(info.segments),
+            'pivots': len(info.pivots),
+            'pivot_high': last_pivot.high if last_pivot else np.nan,
+            'pivot_low': last_pivot.low if last_pivot else np.nan,
+            'signals': ','.join(tag for tag, sigs in info.signals.items() if sigs),
+            'volume_factor': info.vol_stats.get('volume_factor', np.nan),
+            'pullback_factor': info.vol_stats.get('pullback_factor', np.nan),
+            **{key: info.tech_indicators.get(key, np.nan)
+               for key in ['rsi', 'macd'] + [f'ma{p}' for p in INDICATOR_MA_PERIODS]},
+        })
+    return pd.DataFrame(rows).set_index('symbol') if rows else pd.DataFrame()
+
+def structure_params() -> Dict:
+    """结构解析实际用到的参数与指标口径，作为缓存键的一部分（其他 PARAMS 调整不影响命中）"""
+    params = {key: PARAMS[key] for key in STRUCTURE_PARAM_KEYS}
+    params.update(ma_periods=INDICATOR_MA_PERIODS, rsi_period=RSI_PERIOD,
+                  macd_spans=MACD_SPANS, macd_signal=MACD_SIGNAL, macd_window=MACD_WINDOW)
+    return params
+
+def parse_structure_cached(symbol: str, df: pd.DataFrame, period: str = "D") -> StructureInfo:
+    """带两级缓存的 parse_structure：同一K线、同一结构参数只解析一次（跨进程复用磁盘缓存）"""
+    return get_structure_cache().get_or_compute(symbol, period, df, structure_params(),
+                                                lambda frame: parse_structure(frame, period))
+
+def parse_structure_panel_cached(frames: Dict[str, pd.DataFrame],
+                                 period: str = "D") -> Dict[str, StructureInfo]:
+    """带缓存的面板解析：先查缓存，未命中的股票合并成一个面板解析后回写"""
+    cache = get_structure_cache()
+    key_hash = params_hash(structure_params())
+    infos, missing, stamps = {}, {}, {}
+    for symbol, df in frames.items():
+        stamp = frame_stamp(df)
+        cached = cache.get(symbol, period, stamp, key_hash) if stamp is not None else None
+        if cached is None:
+            missing[symbol], stamps[symbol] = df, stamp
+        infos[symbol] = cached
+    if missing:
+        parsed = parse_structure_panel(missing, period)
+        for symbol, info in parsed.items():
+            infos[symbol] = info
+            if stamps[symbol] is not None:
+                cache.put(symbol, period, stamps[symbol], key_hash, info)
+    return infos
+
+class LazyStructureInfo:
+    """
+    惰性结构分析结果：字段与 StructureInfo 相同，首次访问时才计算并记住
+    只看 tech_indicators / vol_stats 时不会识别线段、中枢，适合先做廉价过滤的逐只选股；
+    各字段的计算与 parse_structure 完全相同，materialize() 得到等价的 StructureInfo
+    """
+
+    FIELDS = ('segments', 'pivots', 'trend', 'signals', 'vol_stats', 'tech_indicators')
+
+    def __init__(self, df: pd.DataFrame, period: str = "D"):
+        self._raw = df
+        self.period = period
+
+    @cached_property
+    def _bars(self) -> Optional[pd.DataFrame]:
+        """解析后的K线，不足10根时为 None（与 parse_structure 的空结构口径一致）"""
+        if self._raw.empty or len(self._raw) < 10:
+            return None
+        df = parse_bars(self._raw)
+        return df if len(df) >= 10 else None
+
+    @cached_property
+    def segments(self) -> List[Segment]:
+        return [] if self._bars is None else _identify_segments(self._bars)
+
+    @cached_property
+    def pivots(self) -> List[Pivot]:
+        return [] if self._bars is None else _identify_pivots(self._bars, self.segments)
+
+    @cached_property
+    def trend(self) -> str:
+        return 'side' if self._bars is None else _determine_trend(self._bars, self.segments, self.pivots)
+
+    @cached_property
+    def signals(self) -> Dict[str, List[Signal]]:
+        if self._bars is None:
+            return {}
+        return _identify_signals(self._bars, self.segments, self.pivots, self.period)
+
+    @cached_property
+    def vol_stats(self) -> Dict[str, float]:
+        return {} if self._bars is None else _calculate_volume_stats(self._bars)
+
+    @cached_property
+    def tech_indicators(self) -> Dict[str, float]:
+        return {} if self._bars is None else _calculate_technical_indicators(self._bars)
+
+    @property
+    def computed(self) -> List[str]:
+        """已经算过的字段"""
+        return [name for name in self.FIELDS if name in self.__dict__]
+
+    def materialize(self) -> StructureInfo:
+        return StructureInfo(*(getattr(self, name) for name in self.FIELDS))
+
+def parse_structure_lazy(df: pd.DataFrame, period: str = "D", symbol: str = None):
+    """结构缓存命中时直接返回缓存的 StructureInfo，否则返回 LazyStructureInfo（按需计算）"""
+    if symbol:
+        stamp = frame_stamp(df)
+        if stamp is not None:
+            cached = get_structure_cache().get(symbol, period, stamp, params_hash(structure_params()))
+            if cached is not None:
+                return cached
+    return LazyStructureInfo(df, period)
+
+def _identify_segments(df: pd.DataFrame, inclusion: bool = None) -> List[Segment]:
+    """
+    线段识别（inclusion 默认取 PARAMS["kline_inclusion"]）
+    PARAMS["segment_mode"] 为 stroke / feature 时先成笔，再按特征序列划分线段
+    """
     segments = []
     if len(df) < 5:
         return segments
         
-    # 寻找局部极值点
-    highs = []
-    lows = []
-    
-    for i in range(2, len(df)-2):
-        # 局部高点
-        if (df['high'].iloc[i] > df['high'].iloc[i-1] and 
-            df['high'].iloc[i] > df['high'].iloc[i+1] and
-            df['high'].iloc[i] > df['high'].iloc[i-2] and 
-            df['high'].iloc[i] > df['high'].iloc[i+2]):
-            highs.append((i, df['high'].iloc[i]))
-            
-        # 局部低点    
-        if (df['low'].iloc[i] < df['low'].iloc[i-1] and
-            df['low'].iloc[i] < df['low'].iloc[i+1] and
-            df['low'].iloc[i] < df['low'].iloc[i-2] and
-            df['low'].iloc[i] < df['low'].iloc[i+2]):
-            lows.append((i, df['low'].iloc[i]))
-    
-    # 合并高低点并排序
-    points = [(idx, price, 'high') for idx, price in highs] + \
-             [(idx, price, 'low') for idx, price in lows]
-    points.sort()
-    
-    # 构建线段
-    for i in range(len(points)-1):
-        start_idx, start_price, start_type = points[i]
-        end_idx, end_price, end_type = points[i+1]
-        
-        if start_type != end_type:  # 高低点交替
-            direction = 'up' if start_type == 'low' else 'down'
-            segment = Segment(
-                start_idx=start_idx,
-                end_idx=end_idx,
-                direction=direction,
-                high=max(start_price, end_price),
-                low=min(start_price, end_price),
-                start_price=start_price,
-                end_price=end_price
-            )
-            segments.append(segment)
+    # 寻找局部极值点：包含处理后向量化识别分型，下标映射回原始K线，合并高低点并按时间排序
+    if inclusion is None:
+        inclusion = PARAMS["kline_inclusion"]
+    if PARAMS["segment_mode"] != 'fractal':
+        return _segments_from_fractals(*fractal_sequence(df['high'].to_numpy(), df['low'].to_numpy(),
+                                                         inclusion))
+    idx, price, is_low = merged_fractal_points(df['high'].to_numpy(), df['low'].to_numpy(), inclusion)
+    
+    # 构建线段：只保留高低点交替的相邻点对
+    for i in np.flatnonzero(is_low[:-1] != is_low[1:]):
+        segments.append(_segment_between(int(idx[i]), price[i], bool(is_low[i]),
+                                         int(idx[i+1]), price[i+1]))
     
     return segments
 
+def _segments_from_fractals(idx: np.ndarray, pos: np.ndarray, price: np.ndarray,
+                            is_low: np.ndarray) -> List[Segment]:
+    """分型序列 -> 笔 -> 线段（两段线性扫描），口径由 PARAMS["segment_mode"] 决定"""
+    ends = build_strokes(pos, price, is_low, PARAMS["stroke_min_bars"])
+    idx, price, is_low = idx[ends].tolist(), price[ends].tolist(), is_low[ends].tolist()
+    if PARAMS["segment_mode"] == 'stroke':
+        starts = range(len(idx) - 1)
+        stops = range(1, len(idx))
+    else:
+        starts, stops = build_segments(price, is_low)
+    return [_segment_between(idx[a], price[a], is_low[a], idx[b], price[b])
+            for a, b in zip(starts, stops)]
+
+def _segment_between(start_idx: int, start_price: float, start_is_low: bool,
+                     end_idx: int, end_price: float) -> Segment:
+    """相邻两个异类分型点构成一条线段"""
+    return Segment(
+        start_idx=start_idx,
+        end_idx=end_idx,
+        direction='up' if start_is_low else 'down',
+        high=max(start_price, end_price),
+        low=min(start_price, end_price),
+        start_price=start_price,
+        end_price=end_price
+    )
+
 def _identify_pivots(df: pd.DataFrame, segments: List[Segment]) -> List[Pivot]:
-    """中枢识别"""
+    """中枢识别（传入 SegmentTable 时向量化计算并返回 PivotTable）"""
+    if isinstance(segments, SegmentTable):
+        columns = {name: segments.data[name] for name in SegmentTable.dtype.names}
+        columns['sym'] = np.zeros(len(segments), dtype=np.int64)
+        return _columns_to_table(PivotTable, _panel_pivots(columns))
+    
     pivots = []
     
     if len(segments) < 3:
         return pivots
         
     # 寻找三段式中枢: 上-下-上 或 下-上-下
+    merge = PARAMS["pivot_merge"]
     for i in range(len(segments)-2):
-        seg1, seg2, seg3 = segments[i], segments[i+1], segments[i+2]
-        
-        # 检查是否形成中枢
-        if (seg1.direction != seg2.direction and 
-            seg2.direction != seg3.direction and
-            seg1.direction == seg3.direction):
-            
-            # 计算中枢范围
-            if seg1.direction == 'up':  # 上-下-上
-                pivot_high = min(seg1.high, seg3.high)
-                pivot_low = seg2.low
-            else:  # 下-上-下
-                pivot_high = seg2.high  
-                pivot_low = max(seg1.low, seg3.low)
-                
-            if pivot_high > pivot_low:  # 有效中枢
-                pivot = Pivot(
-                    start_idx=seg1.start_idx,
-                    end_idx=seg3.end_idx,
-                    high=pivot_high,
-                    low=pivot_low,
-                    center=(pivot_high + pivot_low) / 2,
-                    strength=abs(pivot_high - pivot_low) / pivot_low
-                )
+        pivot = _pivot_from_segments(segments[i], segments[i+1], segments[i+2])
+        if pivot is not None:
+            if merge:
+                _extend_pivot(pivots, pivot)
+            else:
                 pivots.append(pivot)
     
     return pivots
 
+def _extend_pivot(pivots: List[Pivot], pivot: Pivot):
+    """
+    中枢延伸（规则同 chan_kernels.extend_pivots，按起点顺序逐个并入）：
+    新中枢与最后一个中枢时间上相接且价格区间重叠时，延长最后一个中枢的终点（区间不变），否则追加
+    """
+    if pivots:
+        last = pivots[-1]
+        if pivot.start_idx <= last.end_idx and pivot.low <= last.high and pivot.high >= last.low:
+            if pivot.end_idx > last.end_idx:
+                pivots[-1] = Pivot(last.start_idx, pivot.end_idx, last.high, last.low,
+                                   last.center, last.strength)
+            return
+    pivots.append(pivot)
+
+def _pivot_from_segments(seg1: Segment, seg2: Segment, seg3: Segment) -> Optional[Pivot]:
+    """连续三段构成的中枢，不成立返回 None"""
+    # 检查是否形成中枢
+    if (seg1.direction != seg2.direction and 
+        seg2.direction != seg3.direction and
+        seg1.direction == seg3.direction):
+        
+        # 计算中枢范围
+        if seg1.direction == 'up':  # 上-下-上
+            pivot_high = min(seg1.high, seg3.high)
+            pivot_low = seg2.low
+        else:  # 下-上-下
+            pivot_high = seg2.high  
+            pivot_low = max(seg1.low, seg3.low)
+            
+        if pivot_high > pivot_low:  # 有效中枢
+            return Pivot(
+                start_idx=seg1.start_idx,
+                end_idx=seg3.end_idx,
+                high=pivot_high,
+                low=pivot_low,
+                center=(pivot_high + pivot_low) / 2,
+                strength=abs(pivot_high - pivot_low) / pivot_low
+            )
+    return None
+
 def _determine_trend(df: pd.DataFrame, segments: List[Segment], pivots: List[Pivot]) -> str:
     """趋势判定"""
-    if not segments:
+    if not segments or len(df) < PARAMS["ma_short"]:
         return 'side'
         
-    # 基于最后几个线段的方向
+    ma5 = _tail_mean(df['close'].to_numpy(), PARAMS["ma_short"])
+    return _trend_from_segments(segments, df['close'].iloc[-1], ma5)
+
+def _tail_mean(values, period: int) -> float:
+    """最近 period 个值的均值（fsum 精确求和，批量与增量结果逐位一致）"""
+    return math.fsum(values[-period:]) / period
+
+def _trend_from_segments(segments: List[Segment], current_price: float, ma5: float) -> str:
+    """基于最后几个线段的方向，结合MA趋势"""
     recent_segments = segments[-3:] if len(segments) >= 3 else segments
-    up_count = sum(1 for seg in recent_segments if seg.direction == 'up')
-    down_count = sum(1 for seg in recent_segments if seg.direction == 'down')
+    if isinstance(recent_segments, SegmentTable):
+        up_count = int(recent_segments.up.sum())
+        down_count = len(recent_segments) - up_count
+    else:
+        up_count = sum(1 for seg in recent_segments if seg.direction == 'up')
+        down_count = sum(1 for seg in recent_segments if seg.direction == 'down')
     
-    # 结合MA趋势
-    if len(df) >= PARAMS["ma_short"]:
-        ma5 = df['close'].rolling(PARAMS["ma_short"]).mean().iloc[-1]
-        current_price = df['close'].iloc[-1]
-        
-        if up_count > down_count and current_price > ma5:
-            return 'up'
-        elif down_count > up_count and current_price < ma5:
-            return 'down'
+    if up_count > down_count and current_price > ma5:
+        return 'up'
+    elif down_count > up_count and current_price < ma5:
+        return 'down'
             
     return 'side'
 
 def _identify_signals(df: pd.DataFrame, segments: List[Segment], 
                      pivots: List[Pivot], period: str) -> Dict[str, List[Signal]]:
     """信号识别"""
+    areas = None
+    if _divergence_pair(segments) is not None:
+        close = df['close'].to_numpy()
+        volume = df['volume'].to_numpy() if 'volume' in df.columns else np.zeros(len(df))
+        areas = SegmentAreas.from_series(macd_histogram(close), volume)
+    return _signals_at(len(df), df['close'].iloc[-1], segments, pivots, areas)
+
+def _signals_at(n_bars: int, current_price: float, segments: List[Segment],
+                pivots: List[Pivot], areas: SegmentAreas = None) -> Dict[str, List[Signal]]:
+    """
+    以最后一根K线（下标 n_bars-1，收盘价 current_price）为信号点
+    areas: MACD面积/量能前缀和，只在 _divergence_pair 成立时需要（一买/一卖）
+    """
     signals = {'1_buy': [], '2_buy': [], '3_buy': [], '1_sell': [], '2_sell': []}
     
-    if not pivots or len(df) < 10:
+    if n_bars < 10:
+        return signals
+    
+    # 一买/一卖信号：末段与前一同向段的MACD面积背驰
+    pair = _divergence_pair(segments)
+    if pair is not None and areas is not None:
+        prev, last = pair
+        up = last.direction == 'up'
+        result = segment_divergence(areas, (prev.start_idx, prev.end_idx),
+                                    (last.start_idx, last.end_idx), up, PARAMS["divergence_ratio"])
+        if result is not None:
+            tag = '1_sell' if up else '1_buy'
+            # 量能同步萎缩时置信度更高
+            signals[tag].append(Signal(
+                signal_type=tag,
+                k_idx=n_bars-1,
+                price=current_price,
+                confidence=0.85 if result[1] < 1.0 else 0.75
+            ))
+    
+    if not pivots:
         return signals
-        
-    current_price = df['close'].iloc[-1]
     
     # 二买信号：中枢突破
     for pivot in pivots[-2:]:  # 检查最近的中枢
         if current_price > pivot.high * PARAMS["daily_up_cross_ratio"]:
             signal = Signal(
                 signal_type='2_buy',
-                k_idx=len(df)-1,
+                k_idx=n_bars-1,
                 price=current_price,
                 confidence=0.8
             )
@@ -298,7 +814,7 @@ def _identify_signals(df: pd.DataFrame, segments: List[Segment],
             current_price > last_seg.start_price * 1.01):  # 突破回调低点
             signal = Signal(
                 signal_type='3_buy', 
-                k_idx=len(df)-1,
+                k_idx=n_bars-1,
                 price=current_price,
                 confidence=0.7
             )
@@ -306,6 +822,19 @@ def _identify_signals(df: pd.DataFrame, segments: List[Segment],
     
     return signals
 
+def _divergence_pair(segments: List[Segment]) -> Optional[Tuple[Segment, Segment]]:
+    """末段与前一同向段：下跌段创新低、上涨段创新高时返回 (前段, 末段)，否则 None"""
+    if len(segments) < 3:
+        return None
+    prev, last = segments[-3], segments[-1]
+    if prev.direction != last.direction:
+        return None
+    if last.direction == 'down' and last.end_price < prev.end_price:
+        return prev, last
+    if last.direction == 'up' and last.end_price > prev.end_price:
+        return prev, last
+    return None
+
 def _calculate_volume_stats(df: pd.DataFrame) -> Dict[str, float]:
     """量价统计"""
     if len(df) < PARAMS["vol_ma_period"]:
@@ -329,35 +858,233 @@ def _calculate_volume_stats(df: pd.DataFrame) -> Dict[str, float]:
     }
 
 def _calculate_technical_indicators(df: pd.DataFrame) -> Dict[str, float]:
-    """技术指标计算"""
+    """技术指标计算（统一指标库，只算最后一根）"""
     indicators = {}
-    
-    if len(df) < 14:
+    n = len(df)
+    if n < RSI_PERIOD:
         return indicators
-        
-    # RSI计算
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    indicators['rsi'] = rsi.iloc[-1] if not rsi.isna().iloc[-1] else 50
-    
-    # MACD (简化版)
-    if len(df) >= 26:
-        ema12 = df['close'].ewm(span=12).mean()
-        ema26 = df['close'].ewm(span=26).mean()
-        macd = ema12 - ema26
-        indicators['macd'] = macd.iloc[-1]
-        
-    # 移动平均线
-    for period in [5, 10, 20, 60]:
-        if len(df) >= period:
-            ma = df['close'].rolling(period).mean().iloc[-1]
-            indicators[f'ma{period}'] = ma
-            
+
+    latest = latest_indicators(df['close'], spec=TECH_INDICATOR_SPEC).at()
+    indicators['rsi'] = 50 if np.isnan(latest['rsi']) else latest['rsi']
+    if n >= max(MACD_SPANS):
+        indicators['macd'] = latest['macd']
+    for period in INDICATOR_MA_PERIODS:
+        if n >= period:
+            indicators[f'ma{period}'] = latest[f'ma{period}']
     return indicators
 
+# ============================================================================
+# 1.1 增量结构引擎：逐根推入K线，随时取快照
+# ============================================================================
+
+class ChanStream:
+    """
+    增量缠论结构（每个 symbol × 周期 一个实例）
+
+    push(bar) 摊还 O(1)：包含处理、分型确认、线段/中枢追加、均线/RSI/MACD 的增量状态都只处理新K线；
+    snapshot() 返回与 parse_structure(已推入的全部K线) 相同结构的 StructureInfo。
+    最后一根合并K线仍可能被后续K线改写，涉及它的分型/线段/中枢在快照时临时计算，不写入状态。
+    segment_mode 为 stroke / feature 时笔端点可被后续分型替换，推入只记录已定型分型，
+    快照时对分型序列做一次线性扫描（推入仍为 O(1)，快照 O(分型数)）。
+    量能只依赖固定长度的尾部窗口，快照时直接计算。线段/中枢/趋势/信号与批量版本逐位一致；
+    tech_indicators / vol_stats 与批量版本只差浮点舍入（滚动均值/EWM 累加顺序不同，相对误差 < 1e-9）。
+    """
+
+    def __init__(self, period: str = "D", inclusion: bool = None):
+        self.period = period
+        self.inclusion = PARAMS["kline_inclusion"] if inclusion is None else inclusion
+        self.pivot_merge = PARAMS["pivot_merge"]
+        self.segment_mode = PARAMS["segment_mode"]
+        self._points: List[Tuple[int, int, float, bool]] = []   # 已定型分型 (下标, 合并K线位置, 价格, 是否为底)
+        self.close: List[float] = []
+        self.volume: List[float] = []
+        self._merger = InclusionMerger()
+        self._next_fractal = 2                    # 下一个待确认分型的合并K线位置
+        self._last_point: Optional[Tuple[int, float, bool]] = None
+        self._segments: List[Segment] = []
+        self._pivots: List[Pivot] = []
+        # 均线 / RSI / MACD（含 DEA 与柱）的增量状态，每根K线 O(1)
+        self._indicators = IndicatorState(STREAM_INDICATOR_SPEC)
+        self._areas = SegmentAreas()              # MACD柱红绿面积、成交量前缀和（背驰判定）
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    # ------------------------------------------------------------------
+    # 推入K线
+    # ------------------------------------------------------------------
+
+    def push(self, bar) -> bool:
+        """
+        推入一根K线（dict / Series，需含 high/low/close，volume 可缺省）
+        与 parse_bars 口径一致：high/low/close 为空或非正的K线丢弃，返回 False
+        """
+        h, l, c = float(bar['high']), float(bar['low']), float(bar['close'])
+        if not (h > 0 and l > 0 and c > 0):
+            return False
+        v = bar.get('volume', 0.0)
+        v = 0.0 if v is None or v != v else float(v)
+
+        i = len(self.close)
+        self.close.append(c)
+        self.volume.append(v)
+        self._areas.append(self._indicators.update(c)['macd_hist'], v)
+
+        merger = self._merger
+        if self.inclusion:
+            appended = merger.push(i, h, l)
+        else:
+            merger.high.append(h)
+            merger.low.append(l)
+            merger.high_idx.append(i)
+            merger.low_idx.append(i)
+            appended = True
+        # 除最后一根外的合并K线均已定型：确认它们之上的分型
+        if appended:
+            while self._next_fractal + 2 <= len(merger.high) - 2:
+                for point in self._fractals_at(self._next_fractal):
+                    if self.segment_mode == 'fractal':
+                        self._add_point(point, self._segments, self._pivots)
+                    else:
+                        self._points.append((point[0], self._next_fractal, point[1], point[2]))
+                self._next_fractal += 1
+        return True
+
+    def extend(self, df: pd.DataFrame) -> int:
+        """批量推入历史K线（先统一解析），返回接受的根数"""
+        df = parse_bars(df)
+        if df.empty:
+            return 0
+        volume = df['volume'] if 'volume' in df.columns else pd.Series(0.0, index=df.index)
+        accepted = 0
+        for h, l, c, v in zip(df['high'].tolist(), df['low'].tolist(),
+                              df['close'].tolist(), volume.tolist()):
+            accepted += self.push({'high': h, 'low': l, 'close': c, 'volume': v})
+        return accepted
+
+    def _fractals_at(self, j: int) -> List[Tuple[int, float, bool]]:
+        """合并K线 j 上的分型点 (原始下标, 价格, 是否为底)，同一根既顶又底时低价在前"""
+        m = self._merger
+        hs, ls = m.high, m.low
+        h, l = hs[j], ls[j]
+        points = []
+        if h > hs[j-1] and h > hs[j+1] and h > hs[j-2] and h > hs[j+2]:
+            points.append((m.high_idx[j], h, False))
+        if l < ls[j-1] and l < ls[j+1] and l < ls[j-2] and l < ls[j+2]:
+            points.append((m.low_idx[j], l, True))
+        if len(points) == 2 and (l, True) < (h, False):
+            points.reverse()
+        return points
+
+    def _add_point(self, point: Tuple[int, float, bool], segments: List[Segment],
+                   pivots: List[Pivot], last_point: Optional[Tuple[int, float, bool]] = None,
+                   commit: bool = True) -> Tuple[int, float, bool]:
+        """追加分型点：与上一点异类时生成线段，线段满三条时检查中枢"""
+        prev = self._last_point if commit else last_point
+        if prev is not None and prev[2] != point[2]:
+            segments.append(_segment_between(prev[0], prev[1], prev[2], point[0], point[1]))
+            if len(segments) >= 3:
+                pivot = _pivot_from_segments(segments[-3], segments[-2], segments[-1])
+                if pivot is not None:
+                    if self.pivot_merge:
+                        _extend_pivot(pivots, pivot)   # 只替换列表元素，不改写已有记录
+                    else:
+                        pivots.append(pivot)
+        if commit:
+            self._last_point = point
+        return point
+
+    # ------------------------------------------------------------------
+    # 快照
+    # ------------------------------------------------------------------
+
+    def structure(self) -> Tuple[List[Segment], List[Pivot]]:
+        """当前线段与中枢（含依赖最后一根合并K线的临时部分）"""
+        j = self._next_fractal
+        if self.segment_mode != 'fractal':
+            # 笔 / 特征序列线段的端点会被后续分型改写：推入只记录分型，快照时整体线性扫描一次
+            points = list(self._points)
+            if j >= 2 and j + 2 == len(self._merger.high) - 1:
+                points += [(point[0], j, point[1], point[2]) for point in self._fractals_at(j)]
+            if not points:
+                return [], []
+            idx, pos, price, is_low = (np.array(col) for col in zip(*points))
+            segments = _segments_from_fractals(idx, pos, price, is_low.astype(bool))
+            return segments, _identify_pivots(None, segments)
+        segments, pivots = list(self._segments), list(self._pivots)
+        if j >= 2 and j + 2 == len(self._merger.high) - 1:
+            last_point = self._last_point
+            for point in self._fractals_at(j):
+                last_point = self._add_point(point, segments, pivots, last_point, commit=False)
+        return segments, pivots
+
+    def snapshot(self) -> StructureInfo:
+        """与 parse_structure(已推入K线, period) 相同结构的分析结果"""
+        n = len(self.close)
+        if n < 10:
+            return StructureInfo([], [], 'side', {}, {}, {})
+
+        segments, pivots = self.structure()
+        current_price = self.close[-1]
+        ma_short = PARAMS["ma_short"]
+        if segments and n >= ma_short:
+            trend = _trend_from_segments(segments, current_price, _tail_mean(self.close, ma_short))
+        else:
+            trend = 'side'
+
+        return StructureInfo(
+            segments=segments,
+            pivots=pivots,
+            trend=trend,
+            signals=_signals_at(n, current_price, segments, pivots, self._areas),
+            vol_stats=self._volume_stats(),
+            tech_indicators=self._technical_indicators()
+        )
+
+    def _volume_stats(self) -> Dict[str, float]:
+        """同 _calculate_volume_stats，只用最近 2×均量周期-1 根成交量"""
+        period = PARAMS["vol_ma_period"]
+        n = len(self.volume)
+        if n < period:
+            return {'volume_factor': 1.0, 'pullback_factor': 1.0}
+
+        # 最近 period 个滚动均量（不足一个窗口的位置跳过）的平均
+        tail = self.volume[-(2 * period - 1):]
+        offset = n - len(tail)
+        vol_mas = [sum(tail[p - period + 1 - offset:p + 1 - offset]) / period
+                   for p in range(max(n - period, period - 1), n)]
+        avg_vol = sum(vol_mas) / len(vol_mas)
+        current_vol = self.volume[-1]
+        volume_factor = current_vol / avg_vol if avg_vol > 0 else 1.0
+
+        recent = self.volume[-3:]
+        prev = self.volume[-8:-3]
+        recent_vol = sum(recent) / len(recent)
+        prev_vol = sum(prev) / len(prev) if prev else float('nan')
+        pullback_factor = recent_vol / prev_vol if prev_vol > 0 else 1.0
+
+        return {
+            'volume_factor': volume_factor,
+            'pullback_factor': pullback_factor,
+            'avg_volume': avg_vol
+        }
+
+    def _technical_indicators(self) -> Dict[str, float]:
+        """同 _calculate_technical_indicators，直接取增量指标状态的最新值"""
+        indicators = {}
+        n = len(self.close)
+        if n < RSI_PERIOD:
+            return indicators
+
+        latest = self._indicators.latest
+        indicators['rsi'] = 50 if math.isnan(latest['rsi']) else latest['rsi']
+        if n >= max(MACD_SPANS):
+            indicators['macd'] = latest['macd']
+        for period in INDICATOR_MA_PERIODS:
+            if n >= period:
+                indicators[f'ma{period}'] = latest[f'ma{period}']
+        return indicators
+
 # ============================================================================
 # 2. 大级别方向过滤（日线Up-Trend）
 # ============================================================================
@@ -369,7 +1096,7 @@ def is_daily_uptrend(daily_info: StructureInfo, df_day: pd.DataFrame) -> bool:
     b) 收盘价 > 34MA 并高于 pivot_high * daily_up_cross_ratio
     c) 或者MACD金叉 + 价格站上MA170
     """
-    if not daily_info.pivots or len(df_day) < PARAMS["ma_mid"]:
+    if len(df_day) < PARAMS["ma_mid"] or not daily_info.pivots:
         return False
         
     last_pivot = daily_info.pivots[-1]
@@ -392,6 +1119,68 @@ def is_daily_uptrend(daily_info: StructureInfo, df_day: pd.DataFrame) -> bool:
     
     return (cond1 and cond2) or (cond3 and cond4)
 
+def _hot_leader_ok(symbol: str, day_df: pd.DataFrame, day_info) -> bool:
+    return is_hot_leader(symbol, day_df)[0]
+
+def _rsi_band_ok(symbol: str, day_df: pd.DataFrame, day_info) -> bool:
+    rsi = day_info.tech_indicators.get('rsi')
+    return rsi is None or PARAMS["rsi_oversold"] <= rsi <= PARAMS["rsi_overbought"]
+
+def _daily_uptrend_ok(symbol: str, day_df: pd.DataFrame, day_info) -> bool:
+    return is_daily_uptrend(day_info, day_df)
+
+# 日线过滤链 (名称, 是否需要日线结构, 判定函数)：按单只成本从低到高排列，
+# 任一环节不通过即淘汰，后面更贵的环节（线段/中枢识别、分钟线获取）不再执行
+DAILY_FILTERS = (
+    ('hot_leader', False, _hot_leader_ok),        # 最近15根收盘价与成交量
+    ('rsi_band', True, _rsi_band_ok),             # 只需技术指标，惰性结构不识别线段
+    ('daily_uptrend', True, _daily_uptrend_ok),   # 线段、中枢、趋势
+)
+
+def passes_daily_filters(symbol: str, day_df: pd.DataFrame, day_info=None,
+                         structural: Optional[bool] = None) -> bool:
+    """
+    按 DAILY_FILTERS 顺序短路判定
+    structural=False / True 时只跑不需要 / 需要日线结构的环节；day_info 为空时按需惰性解析
+    """
+    for name, needs_structure, check in DAILY_FILTERS:
+        if structural is not None and needs_structure != structural:
+            continue
+        if needs_structure and day_info is None:
+            day_info = parse_structure_lazy(day_df, "D", symbol)
+        if not check(symbol, day_df, day_info):
+            return False
+    return True
+
+def filter_daily_uptrend(kline_data: Dict[str, Dict[str, pd.DataFrame]],
+                         day_infos: Dict[str, StructureInfo] = None) -> List[str]:
+    """
+    日线预筛：返回通过 DAILY_FILTERS 全部环节的股票代码，只有这些股票才需要拉取分钟线
+    先对全部股票做不需要结构的廉价判定，day_infos 为空时只为幸存者做面板解析（走结构缓存）
+    """
+    survivors = {}
+    for symbol, kdict in kline_data.items():
+        day_df = kdict.get("D")
+        if day_df is None or day_df.empty:
+            continue
+        try:
+            if passes_daily_filters(symbol, day_df, structural=False):
+                survivors[symbol] = day_df
+        except Exception:
+            continue
+    if day_infos is None:
+        day_infos = parse_structure_panel_cached(survivors, "D")
+    candidates = []
+    for symbol, day_df in survivors.items():
+        if symbol not in day_infos:
+            continue
+        try:
+            if passes_daily_filters(symbol, day_df, day_infos[symbol], structural=True):
+                candidates.append(symbol)
+        except Exception:
+            continue
+    return candidates
+
 # ============================================================================
 # 3. 中观买点触发（30min 二买/三买 + 量价确认）
 # ============================================================================
@@ -490,9 +1279,11 @@ def is_hot_leader(symbol: str, df_day: pd.DataFrame) -> Tuple[bool, str]:
 # 6. 完整选股函数
 # ============================================================================
 
-def select_stock(symbol: str, kdict: Dict[str, pd.DataFrame]) -> Optional[Dict]:
+def select_stock(symbol: str, kdict: Dict[str, pd.DataFrame],
+                 day_info: StructureInfo = None) -> Optional[Dict]:
     """
-    完整的单只股票选股逻辑
+    完整的单只股票选股逻辑，环节按成本从低到高排列（日线部分见 DAILY_FILTERS）
+    day_info: 已算好的日线结构（面板模式批量解析），为空时惰性解析；各级别解析均走结构缓存
     """
     try:
         # 获取各级别数据
@@ -503,14 +1294,20 @@ def select_stock(symbol: str, kdict: Dict[str, pd.DataFrame]) -> Optional[Dict]:
         if day_df is None or day_df.empty:
             return None
             
-        # Step 1: 日线趋势过滤
-        day_info = parse_structure(day_df, "D")
-        if not is_daily_uptrend(day_info, day_df):
+        # Step 1: 热点验证（只看最近15根K线，最便宜，先做）
+        hot_leader, industry = is_hot_leader(symbol, day_df)
+        if not hot_leader:
             return None
             
-        # Step 2: 30分钟买点检测
+        # Step 2: 日线结构过滤：RSI区间 -> 日线趋势（惰性结构，RSI不通过时不识别线段/中枢）
+        if day_info is None:
+            day_info = parse_structure_lazy(day_df, "D", symbol)
+        if not passes_daily_filters(symbol, day_df, day_info, structural=True):
+            return None
+            
+        # Step 3: 30分钟买点检测
         if m30_df is not None and not m30_df.empty:
-            info_30m = parse_structure(m30_df, "30m")
+            info_30m = parse_structure_cached(symbol, m30_df, "30m")
             ok, tag, entry, stop = detect_30m_entry(info_30m)
             if not ok:
                 return None
@@ -522,25 +1319,11 @@ def select_stock(symbol: str, kdict: Dict[str, pd.DataFrame]) -> Optional[Dict]:
             entry = day_df['close'].iloc[-1]
             stop = entry * (1 - PARAMS["stop_buffer_pct"])
             
-        # Step 3: 5分钟确认 (可选)
+        # Step 4: 5分钟确认 (可选)
         if m5_df is not None and not m5_df.empty:
-            info_5m = parse_structure(m5_df, "5m")
+            info_5m = parse_structure_cached(symbol, m5_df, "5m")
             if not confirm_5m_pullback(info_5m, entry):
                 return None
-                
-        # Step 4: 热点验证
-        hot_leader, industry = is_hot_leader(symbol, day_df)
-        if not hot_leader:
-            return None
-            
-        # Step 5: 技术指标过滤
-        tech_ok = True
-        if 'rsi' in day_info.tech_indicators:
-            rsi = day_info.tech_indicators['rsi']
-            tech_ok = PARAMS["rsi_oversold"] <= rsi <= PARAMS["rsi_overbought"]
-            
-        if not tech_ok:
-            return None
             
         # 计算相对强度
         price_strength = 0
@@ -586,9 +1369,12 @@ def calculate_position_size(account_equity: float, entry_price: float,
 # 8. 主程序入口
 # ============================================================================
 
-def cchan_trader_main(test_mode: bool = True, max_stocks: int = 20):
+def cchan_trader_main(test_mode: bool = True, max_stocks: int = 20, workers: int = None,
+                      use_intraday: bool = True):
     """
     CChanTrader主程序
+    workers: K线下载进程数，默认 KLINE_DOWNLOAD_WORKERS
+    use_intraday: 对日线上升趋势的股票拉取5分钟线并合成30分钟线，启用三级别选股
     """
     # 加载环境变量
     load_dotenv()
@@ -596,26 +1382,22 @@ def cchan_trader_main(test_mode: bool = True, max_stocks: int = 20):
     print('=== CChanTrader-AI 核心选股引擎 ===')
     print(f'参数配置: {json.dumps(PARAMS, indent=2, ensure_ascii=False)}')
     
-    # 登录BaoStock
-    lg = bs.login()
+    # 登录BaoStock（进程共享会话，退出时由 atexit 登出）
+    lg = get_data_provider().login()
     print(f'BaoStock状态: {lg.error_code} - {lg.error_msg}')
     
     try:
         # 获取股票列表
         print('\\n获取股票列表...')
-        for days_back in range(0, 10):
-            query_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
-            stock_rs = bs.query_all_stock(query_date)
-            stock_df = stock_rs.get_data()
-            if not stock_df.empty:
-                break
+        universe = get_stock_universe()
+        stock_df = universe.get()
                 
         if stock_df.empty:
             print('无法获取股票数据')
             return []
             
         # 过滤A股
-        a_stocks = stock_df[stock_df['code'].str.contains('sh.6|sz.0|sz.3')]
+        a_stocks = universe.a_shares()
         if test_mode:
             a_stocks = a_stocks.head(max_stocks)
             
@@ -623,32 +1405,34 @@ def cchan_trader_main(test_mode: bool = True, max_stocks: int = 20):
         
         # 获取K线数据
         print('\\n获取K线数据...')
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=200)).strftime('%Y-%m-%d')
+        # 以数据源视角的当前时间定区间（回放时为录制时间），保证请求与归档一致
+        now = get_data_provider().now()
+        end_date = now.strftime('%Y-%m-%d')
+        start_date = (now - timedelta(days=200)).strftime('%Y-%m-%d')
         
-        kline_data = {}
-        for _, stock in tqdm(a_stocks.iterrows(), total=len(a_stocks), desc='获取K线'):
-            code = stock['code']
-            try:
-                # 只获取日K线 (BaoStock分钟数据有限制)
-                rs_day = bs.query_history_k_data_plus(code,
-                    'date,code,open,high,low,close,volume,amount',
-                    start_date=start_date, end_date=end_date, frequency='d')
-                day_df = rs_day.get_data()
-                
-                if not day_df.empty and len(day_df) >= 60:
-                    kline_data[code] = {'D': day_df}
-                    
-            except Exception as e:
-                continue
+        # 日K线：多进程并行、本地存储只请求增量
+        day_data = download_klines(a_stocks['code'], start_date, end_date,
+                                   fields='date,code,open,high,low,close,volume,amount',
+                                   workers=workers, min_bars=60, desc='获取K线')
+        kline_data = {code: {'D': day_df} for code, day_df in day_data.items()}
                 
         print(f'成功获取 {len(kline_data)} 只股票数据')
         
-        # 执行选股
+        # 日线预筛：先做廉价判定，只为幸存者面板解析日线结构（结果进结构缓存，选股时复用）
+        candidates = filter_daily_uptrend(kline_data)
+        print(f'日线预筛候选: {len(candidates)}只')
+        
+        # 分钟线：BaoStock分钟数据请求成本高，只为日线候选股获取5分钟线，30分钟线本地合成
+        if use_intraday:
+            print('获取分钟线...')
+            for code, levels in load_intraday_levels(candidates, end_date, workers=workers).items():
+                kline_data[code].update(levels)
+        
+        # 执行选股：未通过日线预筛的股票 select_stock 必然淘汰，直接跳过
         print('\\n执行选股分析...')
         results = []
-        for symbol, kdict in tqdm(kline_data.items(), desc='选股分析'):
-            result = select_stock(symbol, kdict)
+        for symbol in tqdm(candidates, desc='选股分析'):
+            result = select_stock(symbol, kline_data[symbol])
             if result:
                 results.append(result)
                 
@@ -672,8 +1456,7 @@ def cchan_trader_main(test_mode: bool = True, max_stocks: int = 20):
         return results
         
     finally:
-        bs.logout()
-        print('BaoStock已登出')
+        print('分析完成')
 
 if __name__ == '__main__':
     # 运行主程序
@@ -7,16 +7,21 @@ CChanTrader-AI 优化版本
 - 实盘验证测试
 """
 
-import os, json, pandas as pd, numpy as np
-import baostock as bs
-from tqdm import tqdm
+import os, sys, json, pandas as pd, numpy as np
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from itertools import product
-import requests
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.data_provider import get_data_provider
+from backend.services.bar_parser import parse_bars
+from backend.services.indicators import IndicatorSpec, add_indicators
+from backend.services.market_cap import get_market_cap_service
+from backend.services.kline_downloader import download_klines
+from backend.services.stock_universe import get_stock_universe
+
 # ============================================================================
 # 参数优化配置
 # ============================================================================
@@ -60,76 +65,25 @@ PARAM_GRID = {
 # ============================================================================
 
 def safe_data_conversion(df: pd.DataFrame) -> pd.DataFrame:
-    """安全的数据转换"""
-    df = df.copy()
-    
-    # 基础数值列
-    basic_cols = ['open', 'high', 'low', 'close', 'volume']
-    
-    for col in basic_cols:
-        if col in df.columns:
-            # 先转换为字符串，然后处理
-            df[col] = df[col].astype(str)
-            # 只保留第一个数值（处理连接的数据）
-            df[col] = df[col].str.split().str[0]
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # 特殊处理amount字段（如果存在连接数据）
-    if 'amount' in df.columns:
-        df['amount'] = df['amount'].astype(str)
-        # 对于amount字段，取第一个有效数值
-        df['amount'] = df['amount'].str.extract(r'([0-9.]+)')[0]
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-    
-    # 过滤无效数据
-    df = df.dropna(subset=['high', 'low', 'close'])
-    df = df[(df['high'] > 0) & (df['low'] > 0) & (df['close'] > 0)]
-    
-    if 'volume' in df.columns:
-        df['volume'] = df['volume'].fillna(0)
-        
-    return df
+    """
+    安全的数据转换：委托给统一解析器
+    已解析的帧（价格列为浮点）不再做字符串处理，只过滤无效行
+    """
+    return parse_bars(df)
+
+# 技术指标口径（统一指标库）
+INDICATOR_SPEC = IndicatorSpec(ma_periods=tuple(BASE_PARAMS["technical"]["ma_periods"]),
+                               rsi_period=BASE_PARAMS["technical"]["rsi_period"],
+                               vol_period=BASE_PARAMS["technical"]["vol_period"],
+                               momentum_periods=(10,), volatility_period=20)
 
 def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
-    """添加技术指标"""
+    """添加技术指标（统一指标库，同一帧只算一次）"""
     if len(df) < 20:
         return df
-        
-    # 移动平均线
-    for period in BASE_PARAMS["technical"]["ma_periods"]:
-        if len(df) >= period:
-            df[f'ma{period}'] = df['close'].rolling(period).mean()
-    
-    # RSI
-    if len(df) >= BASE_PARAMS["technical"]["rsi_period"] + 1:
-        delta = df['close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(BASE_PARAMS["technical"]["rsi_period"]).mean()
-        loss = -delta.where(delta < 0, 0).rolling(BASE_PARAMS["technical"]["rsi_period"]).mean()
-        rs = gain / (loss + 1e-10)
-        df['rsi'] = 100 - (100 / (1 + rs))
-        df['rsi'] = df['rsi'].fillna(50)
-    else:
-        df['rsi'] = 50
-    
-    # 成交量指标
-    if len(df) >= BASE_PARAMS["technical"]["vol_period"]:
-        df['vol_ma'] = df['volume'].rolling(BASE_PARAMS["technical"]["vol_period"]).mean()
-        df['vol_ratio'] = df['volume'] / (df['vol_ma'] + 1e-10)
-    else:
-        df['vol_ratio'] = 1.0
-    
-    # 价格动量
-    if len(df) >= 10:
-        df['momentum'] = df['close'].pct_change(10)
-    else:
-        df['momentum'] = 0
-    
-    # 波动率
-    if len(df) >= 20:
-        df['volatility'] = df['close'].pct_change().rolling(20).std()
-    else:
-        df['volatility'] = 0.01
-    
+    df = add_indicators(df, INDICATOR_SPEC)
+    df['rsi'] = df['rsi'].fillna(50)
+    df['momentum'] = df['momentum_10']
     return df
 
 def get_market_cap_optimized(symbol: str) -> float:
@@ -142,27 +96,12 @@ def get_market_cap_optimized(symbol: str) -> float:
     Returns:
         市值（亿元），失败返回估算值
     """
-    try:
-        # 清理股票代码格式
-        clean_symbol = symbol.replace('sh.', '').replace('sz.', '')
-        
-        # 尝试从东方财富获取（速度较快）
-        market_prefix = '1' if clean_symbol.startswith('6') else '0'
-        url = f"http://push2.eastmoney.com/api/qt/stock/get?secid={market_prefix}.{clean_symbol}&fields=f116,f117"
-        
-        response = requests.get(url, timeout=2)
-        if response.status_code == 200:
-            data = response.json()
-            if 'data' in data and data['data']:
-                market_cap = data['data'].get('f116', 0)  # 总市值
-                if market_cap and market_cap > 0:
-                    return float(market_cap) / 1e8  # 转换为亿元
-        
-        # 备用方案：基于代码特征估算
-        return estimate_market_cap_by_code(clean_symbol)
-        
-    except Exception:
-        return estimate_market_cap_by_code(symbol.replace('sh.', '').replace('sz.', ''))
+    market_cap = get_market_cap_service().get_billion(symbol)
+    if market_cap:
+        return market_cap
+    
+    # 备用方案：基于代码特征估算
+    return estimate_market_cap_by_code(symbol.replace('sh.', '').replace('sz.', ''))
 
 def estimate_market_cap_by_code(symbol: str) -> float:
     """
@@ -405,61 +344,181 @@ def calculate_stock_score(df: pd.DataFrame, symbol: str = '', params: dict = Non
         }
 
 # ============================================================================
-# 选股函数
+# 向量化截面评分
 # ============================================================================
 
-def select_stocks_with_params(kline_data: dict, params: dict) -> list:
-    """使用给定参数进行选股（包含市值筛选）"""
-    selected = []
-    
+# 评分特征：每只股票最后一根K线（与 SimpleChanAnalyzer.analyze_trend 取值一致）
+SCORE_FEATURES = ('close', 'ma5', 'ma20', 'momentum', 'vol_ratio', 'rsi', 'market_cap', 'valid')
+
+def calculate_mktcap_scores(market_cap) -> np.ndarray:
+    """calculate_mktcap_score 的向量版（逐元素结果相同）"""
+    cap = np.asarray(market_cap, dtype=np.float64)
+    return np.select([cap <= 0,
+                      (60 <= cap) & (cap <= 150),
+                      (40 <= cap) & (cap <= 200),
+                      (20 <= cap) & (cap < 40),
+                      (200 < cap) & (cap <= 500),
+                      cap > 500],
+                     [0.2, 1.0, 0.85, 0.6, 0.45, 0.25], 0.1)
+
+def _last_bar_features(df: pd.DataFrame) -> dict:
+    """最后一根K线的评分特征；取值与异常时的默认值同 analyze_trend"""
+    try:
+        latest = df.iloc[-1]
+        has_ma = 'ma5' in latest.index and 'ma20' in latest.index
+        return {'close': latest['close'],
+                'ma5': latest['ma5'] if has_ma else np.nan,
+                'ma20': latest['ma20'] if has_ma else np.nan,
+                'momentum': latest.get('momentum', 0),
+                'vol_ratio': latest.get('vol_ratio', 1.0),
+                'rsi': latest.get('rsi', 50)}
+    except Exception:
+        return {'close': df['close'].iloc[-1] if not df.empty else 0, 'ma5': np.nan, 'ma20': np.nan,
+                'momentum': 0, 'vol_ratio': 1.0, 'rsi': 50}
+
+def extract_score_features(kline_data: dict) -> pd.DataFrame:
+    """
+    全部股票的评分特征表（index 为股票代码，列见 SCORE_FEATURES）
+    与参数无关：网格搜索的每组参数复用同一张表；解析失败的股票 valid=False
+    """
+    get_market_cap_service().get_many(kline_data.keys())
+    rows = {}
     for symbol, df in kline_data.items():
         try:
-            # 传递股票代码以获取市值
-            score_result = calculate_stock_score(df, symbol, params)
-            
-            # 市值筛选：优先40-200亿区间
-            market_cap = score_result.get('market_cap_billion', 0)
-            
-            # 严格市值筛选
-            if market_cap > 0:
-                # 完全排除过小（<20亿）或过大（>1000亿）的股票
-                if market_cap < 20 or market_cap > 1000:
-                    continue
-                
-                # 对于不在目标区间(40-200亿)的股票，提高评分门槛
-                if not (40 <= market_cap <= 200):
-                    # 提高评分要求
-                    min_score = BASE_PARAMS["selection"]["min_score"] + 0.1
-                else:
-                    min_score = BASE_PARAMS["selection"]["min_score"]
-            else:
-                min_score = BASE_PARAMS["selection"]["min_score"]
-            
-            if score_result['total_score'] >= min_score:
-                details = score_result['details']
-                
-                # 计算入场和止损价格
-                current_price = details.get('current_price', 0)
-                stop_loss = current_price * (1 - BASE_PARAMS["risk"]["stop_loss_pct"])
-                take_profit = current_price * (1 + BASE_PARAMS["risk"]["stop_loss_pct"] * BASE_PARAMS["risk"]["take_profit_ratio"])
-                
-                selected.append({
-                    'symbol': symbol,
-                    'entry_price': round(current_price, 2),
-                    'stop_loss': round(stop_loss, 2),
-                    'take_profit': round(take_profit, 2),
-                    'total_score': round(score_result['total_score'], 3),
-                    'market_cap_billion': round(market_cap, 1),
-                    'mktcap_score': round(score_result['mktcap_score'], 3),
-                    'trend': details.get('trend', 'neutral'),
-                    'rsi': round(details.get('rsi', 50), 1),
-                    'volume_ratio': round(details.get('vol_ratio', 1.0), 2),
-                    'momentum': round(details.get('momentum', 0), 4),
-                    'risk_reward_ratio': round(BASE_PARAMS["risk"]["take_profit_ratio"], 1)
-                })
-                
-        except Exception as e:
-            continue
+            row = _last_bar_features(SimpleChanAnalyzer(df).df)
+            row['market_cap'] = get_market_cap_optimized(symbol) if symbol else 0
+            row['valid'] = True
+        except Exception:
+            row = {'close': 0.0, 'ma5': np.nan, 'ma20': np.nan, 'momentum': 0.0, 'vol_ratio': 1.0,
+                   'rsi': 50.0, 'market_cap': 0.0, 'valid': False}
+        rows[symbol] = row
+    table = pd.DataFrame.from_dict(rows, orient='index', columns=list(SCORE_FEATURES))
+    return table.astype({name: np.float64 for name in SCORE_FEATURES[:-1]} | {'valid': bool})
+
+def score_components(features, params: dict) -> dict:
+    """
+    calculate_stock_score 的向量版：features 为特征列（数组 / DataFrame），params 各值可为标量或数组，
+    按 NumPy 广播规则计算（如参数形状 (P, 1) × 股票 (N,) 得到 (P, N)）
+    各分项与总分的加法顺序同标量版本，逐元素结果逐位相同
+    """
+    close = np.asarray(features['close'], dtype=np.float64)
+    ma5 = np.asarray(features['ma5'], dtype=np.float64)
+    ma20 = np.asarray(features['ma20'], dtype=np.float64)
+    momentum = np.asarray(features['momentum'], dtype=np.float64)
+    vol_ratio = np.asarray(features['vol_ratio'], dtype=np.float64)
+    rsi = np.asarray(features['rsi'], dtype=np.float64)
+    market_cap = np.asarray(features['market_cap'], dtype=np.float64)
+    valid = np.asarray(features['valid'], dtype=bool)
+
+    # 趋势（与参数无关）
+    ma_trend = np.select([(close > ma5) & (ma5 > ma20), (close < ma5) & (ma5 < ma20)],
+                         ['bullish', 'bearish'], 'neutral')
+    signals = (2 * (ma_trend == 'bullish') + (momentum > 0.02) + (vol_ratio > 1.5)
+               + ((30 <= rsi) & (rsi <= 70)))
+    trend = np.select([signals >= 3, signals <= 1], ['bullish', 'bearish'], 'neutral')
+    trend_score = np.select([signals >= 3, signals <= 1], [0.25, 0.0], 0.1)
+
+    buy = np.asarray(params['rsi_buy_threshold'], dtype=np.float64)
+    sell = np.asarray(params['rsi_sell_threshold'], dtype=np.float64)
+    rsi_score = np.where((buy <= rsi) & (rsi <= sell), 0.18, np.where(rsi < buy, 0.13, 0.0))
+
+    volume_threshold = np.asarray(params['volume_threshold'], dtype=np.float64)
+    volume_score = np.where(vol_ratio >= volume_threshold, 0.17,
+                            np.where(vol_ratio >= volume_threshold * 0.7, 0.08, 0.0))
+
+    mktcap_score = calculate_mktcap_scores(market_cap) * 0.15
+
+    momentum_threshold = np.asarray(params['momentum_threshold'], dtype=np.float64)
+    abs_momentum = np.abs(momentum)
+    momentum_score = np.where(abs_momentum >= momentum_threshold, 0.15,
+                              np.where(abs_momentum >= momentum_threshold * 0.5, 0.08, 0.0))
+
+    low, high = BASE_PARAMS["selection"]["price_range"]
+    price_score = np.where((low <= close) & (close <= high), 0.1, 0.0)
+
+    score = 0.4 + trend_score
+    score = score + rsi_score
+    score = score + volume_score
+    score = score + mktcap_score
+    score = score + momentum_score
+    score = score + price_score
+
+    # 解析失败的股票同标量版本的异常分支
+    def _valid_only(values, fallback=0.0):
+        return np.where(valid, values, fallback)
+
+    return {
+        'total_score': _valid_only(np.minimum(1.0, score), 0.1),
+        'trend_score': _valid_only(trend_score),
+        'rsi_score': _valid_only(rsi_score),
+        'volume_score': _valid_only(volume_score),
+        'mktcap_score': _valid_only(mktcap_score),
+        'momentum_score': _valid_only(momentum_score),
+        'price_score': _valid_only(price_score),
+        'market_cap_billion': _valid_only(market_cap),
+        'trend': trend,
+        'ma_trend': ma_trend,
+        'signals': signals,
+    }
+
+def score_cross_section(features: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """对特征表中全部股票评分，返回按总分降序的评分表（同分保持原顺序）"""
+    components = score_components(features, params)
+    table = pd.DataFrame(components, index=features.index)
+    table = pd.concat([table, features[['close', 'momentum', 'vol_ratio', 'rsi']]], axis=1)
+    return table.sort_values('total_score', ascending=False, kind='stable')
+
+# ============================================================================
+# 选股函数
+# ============================================================================
+
+def _selection_mask(scores: dict) -> np.ndarray:
+    """
+    市值筛选 + 评分门槛（形状同评分矩阵）：
+    完全排除过小（<20亿）或过大（>1000亿）的股票；不在目标区间(40-200亿)的提高评分门槛
+    """
+    market_cap = scores['market_cap_billion']
+    has_cap = market_cap > 0
+    in_range = (40 <= market_cap) & (market_cap <= 200)
+    min_score = np.where(has_cap & ~in_range, BASE_PARAMS["selection"]["min_score"] + 0.1,
+                         BASE_PARAMS["selection"]["min_score"])
+    excluded = has_cap & ((market_cap < 20) | (market_cap > 1000))
+    return ~excluded & (scores['total_score'] >= min_score)
+
+def select_stocks_with_params(kline_data: dict, params: dict, features: pd.DataFrame = None) -> list:
+    """
+    使用给定参数进行选股（包含市值筛选）
+    全部股票一次向量化评分；features 为 extract_score_features 的特征表，网格搜索时传入以复用
+    """
+    if features is None:
+        features = extract_score_features(kline_data)
+    scores = score_components(features, params)
+    total_score = scores['total_score']
+    market_cap = scores['market_cap_billion']
+    keep = _selection_mask(scores)
+    
+    selected = []
+    for k in np.flatnonzero(keep):
+        # 计算入场和止损价格
+        # 价格与指标保持 np.float64（round 按 NumPy 规则取整，同逐只评分时的结果）
+        current_price = features['close'].iloc[k]
+        stop_loss = current_price * (1 - BASE_PARAMS["risk"]["stop_loss_pct"])
+        take_profit = current_price * (1 + BASE_PARAMS["risk"]["stop_loss_pct"] * BASE_PARAMS["risk"]["take_profit_ratio"])
+        
+        selected.append({
+            'symbol': features.index[k],
+            'entry_price': round(current_price, 2),
+            'stop_loss': round(stop_loss, 2),
+            'take_profit': round(take_profit, 2),
+            'total_score': round(float(total_score[k]), 3),
+            'market_cap_billion': round(float(market_cap[k]), 1),
+            'mktcap_score': round(float(scores['mktcap_score'][k]), 3),
+            'trend': str(scores['trend'][k]),
+            'rsi': round(features['rsi'].iloc[k], 1),
+            'volume_ratio': round(features['vol_ratio'].iloc[k], 2),
+            'momentum': round(features['momentum'].iloc[k], 4),
+            'risk_reward_ratio': round(BASE_PARAMS["risk"]["take_profit_ratio"], 1)
+        })
     
     # 按市值偏好排序：先按总分排序，然后在同分情况下偏好目标市值区间
     def sort_key(stock):
@@ -472,51 +531,71 @@ def select_stocks_with_params(kline_data: dict, params: dict) -> list:
 # 参数优化
 # ============================================================================
 
-def grid_search_optimization(kline_data: dict, historical_data: dict = None) -> dict:
-    """网格搜索参数优化"""
+# 只参与阈值比较的参数：特征表相同时，这些参数的全部组合一次广播评估
+THRESHOLD_PARAMS = ('rsi_buy_threshold', 'rsi_sell_threshold', 'volume_threshold', 'momentum_threshold')
+
+def _round_scores(values: np.ndarray, ndigits: int = 3) -> np.ndarray:
+    """按 Python round 取整（同选股结果里的 total_score）；评分取值很少，只对不同取值逐个取整"""
+    unique, inverse = np.unique(values, return_inverse=True)
+    return np.array([round(float(v), ndigits) for v in unique])[inverse].reshape(values.shape)
+
+def evaluate_param_grid(features: pd.DataFrame, combos: list) -> dict:
+    """
+    一次评估全部阈值参数组合：combos 为 THRESHOLD_PARAMS 取值的元组列表，
+    评分与选股条件在 (组合 × 股票) 矩阵上广播比较；返回各组合的选股数、平均分与评估分数
+    评估口径同原逐组选股：平均分取选股结果中的三位小数总分，趋势多样性为入选股票的趋势种类数 / 3
+    """
+    stacked = {name: np.array([combo[k] for combo in combos])[:, None]
+               for k, name in enumerate(THRESHOLD_PARAMS)}
+    scores = score_components(features, stacked)
+    selected = _selection_mask(scores)
+    rounded = _round_scores(scores['total_score'])
+
+    count = selected.sum(axis=1)
+    avg_score = np.array([np.mean(rounded[k][selected[k]]) if count[k] else 0.0
+                          for k in range(len(combos))])
+    diversity = sum(np.any(selected & (scores['trend'] == trend), axis=1)
+                    for trend in ('bullish', 'neutral', 'bearish')) / 3
+    evaluation = np.where(count > 0, avg_score * 0.5 + (count / 50) * 0.3 + diversity * 0.2, 0.0)
+    return {'selected_count': count, 'avg_score': avg_score, 'evaluation_score': evaluation}
+
+def grid_search_optimization(kline_data: dict, historical_data: dict = None,
+                             features: pd.DataFrame = None) -> dict:
+    """
+    网格搜索参数优化（PARAM_GRID 全部组合）
+    特征只提取一次，阈值参数的组合在 (组合 × 股票) 矩阵上一次广播评估。
+    当前评分只用 ma5 / ma20，均线参数不影响结果：按阈值组合去重排名，
+    均线参数取网格首个取值，并在 inactive_params 中列出
+    """
     print('🔍 开始参数网格搜索优化...')
     
-    best_params = None
-    best_score = 0
-    results = []
-    
-    # 生成参数组合
     param_names = list(PARAM_GRID.keys())
-    param_values = list(PARAM_GRID.values())
+    inactive_params = [name for name in param_names if name not in THRESHOLD_PARAMS]
+    threshold_combos = list(product(*(PARAM_GRID[name] for name in THRESHOLD_PARAMS)))
+    fixed = {name: PARAM_GRID[name][0] for name in inactive_params}
     
-    total_combinations = 1
-    for values in param_values:
-        total_combinations *= len(values)
+    total = int(np.prod([len(values) for values in PARAM_GRID.values()]))
+    print(f'📊 总计 {total} 个参数组合，{", ".join(inactive_params)} 不影响评分，'
+          f'实际评估 {len(threshold_combos)} 个阈值组合')
     
-    print(f'📊 总计 {total_combinations} 个参数组合')
+    if features is None:
+        features = extract_score_features(kline_data)
+    evaluation = evaluate_param_grid(features, threshold_combos)
     
-    # 只测试部分组合（避免时间过长）
-    test_combinations = min(50, total_combinations)
+    best_params = None
+    best_score = 0
+    results = []
     
-    for i, combination in enumerate(product(*param_values)):
-        if i >= test_combinations:
-            break
-            
-        params = dict(zip(param_names, combination))
-        
-        # 执行选股
-        selected = select_stocks_with_params(kline_data, params)
-        
-        # 评估效果（简化版本）
-        if selected:
-            avg_score = np.mean([s['total_score'] for s in selected])
-            stock_count = len(selected)
-            diversity_score = len(set(s['trend'] for s in selected)) / 3  # 趋势多样性
-            
-            # 综合评估分数
-            evaluation_score = avg_score * 0.5 + (stock_count / 50) * 0.3 + diversity_score * 0.2
-        else:
-            evaluation_score = 0
+    # 按 product 顺序遍历，同分时取最先出现的组合
+    for k, threshold_combo in enumerate(threshold_combos):
+        values = fixed | dict(zip(THRESHOLD_PARAMS, threshold_combo))
+        params = {name: values[name] for name in param_names}
+        evaluation_score = float(evaluation['evaluation_score'][k])
         
         results.append({
             'params': params,
-            'selected_count': len(selected),
-            'avg_score': avg_score if selected else 0,
+            'selected_count': int(evaluation['selected_count'][k]),
+            'avg_score': float(evaluation['avg_score'][k]),
             'evaluation_score': evaluation_score
         })
         
@@ -534,7 +613,8 @@ def grid_search_optimization(kline_data: dict, historical_data: dict = None) ->
     return {
         'best_params': best_params,
         'best_score': best_score,
-        'all_results': results[:10]  # 返回前10个结果
+        'inactive_params': inactive_params,
+        'all_results': results[:10]  # 返回前10个结果（阈值组合互不相同）
     }
 
 # ============================================================================
@@ -616,27 +696,20 @@ def simple_backtest(selected_stocks: list, days_forward: int = 30) -> dict:
 # 主程序
 # ============================================================================
 
-def optimized_cchan_main(test_mode: bool = True, max_stocks: int = 50):
-    """优化版本主程序"""
+def optimized_cchan_main(test_mode: bool = True, max_stocks: int = 50, workers: int = None):
+    """优化版本主程序（workers: K线下载进程数）"""
     load_dotenv()
     
     print('=== CChanTrader-AI 优化版本 ===')
     print('🚀 数据修复 + 参数优化 + 实盘验证')
     
-    lg = bs.login()
+    lg = get_data_provider().login()
     print(f'📊 BaoStock连接状态: {lg.error_code}')
     
     try:
         # 获取股票列表
         print('\\n🔍 获取股票列表...')
-        for days_back in range(0, 10):
-            query_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
-            stock_rs = bs.query_all_stock(query_date)
-            stock_df = stock_rs.get_data()
-            if not stock_df.empty:
-                break
-        
-        a_stocks = stock_df[stock_df['code'].str.contains('sh.6|sz.0|sz.3')]
+        a_stocks = get_stock_universe().a_shares()
         if test_mode:
             a_stocks = a_stocks.head(max_stocks)
         
@@ -644,29 +717,34 @@ def optimized_cchan_main(test_mode: bool = True, max_stocks: int = 50):
         
         # 获取K线数据
         print('\\n📈 获取K线数据...')
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=120)).strftime('%Y-%m-%d')
-        
-        kline_data = {}
-        for _, stock in tqdm(a_stocks.iterrows(), total=len(a_stocks), desc='数据获取'):
-            code = stock['code']
-            try:
-                rs = bs.query_history_k_data_plus(code,
-                    'date,code,open,high,low,close,volume',  # 不获取amount避免数据问题
-                    start_date=start_date, end_date=end_date, frequency='d')
-                day_df = rs.get_data()
-                
-                if not day_df.empty and len(day_df) >= 40:
-                    kline_data[code] = day_df
-                    
-            except Exception:
-                continue
+        # 以数据源视角的当前时间定区间（回放时为录制时间），保证请求与归档一致
+        now = get_data_provider().now()
+        end_date = now.strftime('%Y-%m-%d')
+        start_date = (now - timedelta(days=120)).strftime('%Y-%m-%d')
+        
+        kline_data = download_klines(a_stocks['code'], start_date, end_date,
+                                     fields='date,code,open,high,low,close,volume',  # 不获取amount避免数据问题
+                                     workers=workers, min_bars=40, desc='数据获取')
         
         print(f'✅ 成功获取 {len(kline_data)} 只股票数据')
         
+        # 每只股票的指标只算一遍，网格搜索的每组参数都复用同一组指标列
+        kline_data = {symbol: add_technical_indicators(safe_data_conversion(df))
+                      for symbol, df in kline_data.items()}
+        
+        # 一次批量刷新市值缓存，网格搜索中的每组参数都直接命中缓存
+        try:
+            refreshed = get_market_cap_service().bulk_refresh(kline_data.keys())
+            print(f'💰 市值缓存已刷新: {refreshed}只')
+        except Exception as e:
+            print(f'⚠️ 市值批量刷新失败，改为逐只获取: {e}')
+        
+        # 评分特征只提取一次，网格搜索与最终选股共用
+        features = extract_score_features(kline_data)
+        
         # 参数优化
         if len(kline_data) >= 20:  # 数据充足时才进行优化
-            optimization_result = grid_search_optimization(kline_data)
+            optimization_result = grid_search_optimization(kline_data, features=features)
             best_params = optimization_result['best_params']
             print(f'\\n🎯 使用优化参数进行选股...')
         else:
@@ -682,7 +760,7 @@ def optimized_cchan_main(test_mode: bool = True, max_stocks: int = 50):
             print(f'\\n🎯 使用默认参数进行选股...')
         
         # 使用最佳参数选股
-        selected_stocks = select_stocks_with_params(kline_data, best_params)
+        selected_stocks = select_stocks_with_params(kline_data, best_params, features)
         
         print(f'\\n🏆 === 优化选股结果 ({len(selected_stocks)}只) ===')
         
@@ -726,8 +804,7 @@ def optimized_cchan_main(test_mode: bool = True, max_stocks: int = 50):
         return selected_stocks
         
     finally:
-        bs.logout()
-        print('\\n🔚 BaoStock已断开连接')
+        print('\\n🔚 分析完成')
 
 if __name__ == '__main__':
     # 设置随机种子确保可重现性
@@ -10,34 +10,34 @@ import json
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import baostock as bs
-import akshare as ak
 from tqdm import tqdm
 import warnings
 warnings.filterwarnings('ignore')
 
 from backend.services.email_config import EmailSender
+from backend.services.data_provider import DataProvider, get_data_provider
+from backend.services.kline_store import get_kline_store
+from backend.services.bar_parser import parse_bars
+from backend.services.indicators import IndicatorSpec, add_indicators, rsi
+from backend.services.stock_universe import get_stock_universe
+from backend.services.trading_calendar import get_trading_calendar
+
+# 技术指标口径（统一指标库）：均线、RSI、10日量比
+REPORT_INDICATOR_SPEC = IndicatorSpec(ma_periods=(5, 10, 20), rsi_period=14, vol_period=10, momentum_periods=())
 
 class DailyReportGenerator:
     """交易日报生成器"""
     
-    def __init__(self):
+    def __init__(self, provider: DataProvider = None):
+        # 数据源：直连/录制/回放，默认按 CCHAN_DATA_MODE 创建
+        self.provider = provider or get_data_provider()
         self.email_sender = EmailSender()
         self.analysis_results = {}
         self.report_data = {}
         
     def is_trading_day(self, date=None) -> bool:
-        """判断是否为交易日"""
-        if date is None:
-            date = datetime.now()
-        
-        # 简化版：排除周末
-        weekday = date.weekday()
-        if weekday >= 5:  # 周六日
-            return False
-        
-        # TODO: 可以集成节假日API进行更精确判断
-        return True
+        """判断是否为交易日（交易所日历，含节假日）"""
+        return get_trading_calendar(self.provider).is_trading_day(date)
     
     def get_stock_data_quick(self, symbol: str, days: int = 30) -> pd.DataFrame:
         """快速获取股票数据"""
@@ -45,21 +45,14 @@ class DailyReportGenerator:
             end_date = datetime.now().strftime('%Y-%m-%d')
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
             
-            rs = bs.query_history_k_data_plus(symbol,
-                'date,code,open,high,low,close,volume',
-                start_date=start_date, 
-                end_date=end_date,
-                frequency='d')
-            df = rs.get_data()
+            df = get_kline_store(self.provider).get_history(symbol, start_date, end_date,
+                fields='date,code,open,high,low,close,volume')
             
             if df.empty:
                 return pd.DataFrame()
             
-            # 数据转换
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                if col in df.columns:
-                    df[col] = df[col].astype(str).str.split().str[0]
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+            # 数据转换（存储返回的已是浮点列，解析器直接跳过）
+            df = parse_bars(df, drop_invalid=False, fill_volume=False)
             
             return df.dropna()
             
@@ -70,7 +63,7 @@ class DailyReportGenerator:
         """快速获取竞价数据"""
         try:
             # 使用AKShare获取竞价数据
-            pre_market_df = ak.stock_zh_a_hist_pre_min_em(
+            pre_market_df = self.provider.stock_zh_a_hist_pre_min_em(
                 symbol=symbol,
                 start_time="09:00:00", 
                 end_time="09:30:00"
@@ -124,7 +117,8 @@ class DailyReportGenerator:
             if not (2 <= current_price <= 300):
                 return None
             
-            # 技术指标计算
+            # 技术指标计算（整帧一次算完，评分 / RSI / 量比都读同一组列）
+            df = add_indicators(df, REPORT_INDICATOR_SPEC)
             tech_score = self._calculate_tech_indicators(df)
             
             # 竞价数据分析
@@ -172,10 +166,9 @@ class DailyReportGenerator:
         try:
             # 均线
             if len(df) >= 20:
-                ma5 = df['close'].rolling(5).mean().iloc[-1]
-                ma10 = df['close'].rolling(10).mean().iloc[-1] 
-                ma20 = df['close'].rolling(20).mean().iloc[-1]
-                current = df['close'].iloc[-1]
+                latest = add_indicators(df, REPORT_INDICATOR_SPEC).iloc[-1]
+                ma5, ma10, ma20 = latest['ma5'], latest['ma10'], latest['ma20']
+                current = latest['close']
                 
                 if current > ma5 > ma10 > ma20:
                     score += 0.25
@@ -203,12 +196,9 @@ class DailyReportGenerator:
             if len(df) < period + 1:
                 return 50.0
             
-            delta = df['close'].diff()
-            gain = delta.where(delta > 0, 0).rolling(period).mean()
-            loss = -delta.where(delta < 0, 0).rolling(period).mean()
-            rs = gain / (loss + 1e-10)
-            rsi = 100 - (100 / (1 + rs))
-            return float(rsi.iloc[-1])
+            if period == REPORT_INDICATOR_SPEC.rsi_period:
+                return float(add_indicators(df, REPORT_INDICATOR_SPEC)['rsi'].iloc[-1])
+            return float(rsi(df['close'], period)[-1])
         except Exception:
             return 50.0
     
@@ -218,9 +208,7 @@ class DailyReportGenerator:
             if len(df) < 10:
                 return 1.0
             
-            vol_ma = df['volume'].rolling(10).mean().iloc[-1]
-            current_vol = df['volume'].iloc[-1]
-            return float(current_vol / (vol_ma + 1e-10))
+            return float(add_indicators(df, REPORT_INDICATOR_SPEC)['vol_ratio'].iloc[-1])
         except Exception:
             return 1.0
     
@@ -315,27 +303,22 @@ class DailyReportGenerator:
             print("📅 今日非交易日，跳过报告生成")
             return {}
         
-        # 连接数据源
-        lg = bs.login()
+        # 连接数据源（进程共享会话，跨日复用，失效时自动重连）
+        lg = self.provider.login()
         print(f"📊 BaoStock连接: {lg.error_code}")
         
         try:
             # 获取股票列表
             print("🔍 获取股票列表...")
-            stock_rs = bs.query_all_stock(day=datetime.now().strftime('%Y-%m-%d'))
-            all_stocks = stock_rs.get_data()
+            universe = get_stock_universe(self.provider)
+            all_stocks = universe.get()
             
             if all_stocks.empty:
                 print("❌ 无法获取股票列表")
                 return {}
             
             # 快速采样分析 (限制数量以提高速度)
-            markets = {
-                '上海主板': all_stocks[all_stocks['code'].str.startswith('sh.6')],
-                '深圳主板': all_stocks[all_stocks['code'].str.startswith('sz.000')],
-                '中小板': all_stocks[all_stocks['code'].str.startswith('sz.002')],
-                '创业板': all_stocks[all_stocks['code'].str.startswith('sz.30')]
-            }
+            markets = universe.by_board()
             
             sample_stocks = []
             for market_name, market_stocks in markets.items():
@@ -422,9 +405,6 @@ class DailyReportGenerator:
         except Exception as e:
             print(f"❌ 报告生成失败: {e}")
             return {}
-        
-        finally:
-            bs.logout()
     
     def send_daily_report(self) -> bool:
         """发送每日报告"""
@@ -5,12 +5,19 @@ CChanTrader-AI 市值筛选工具
 专门用于40-200亿中小盘股筛选和评分
 """
 
-import requests
+import os
+import sys
 import re
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List
 import logging
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.market_cap import get_market_cap_service
+
+# 批量筛选超过该数量时先整体刷新市值缓存
+BULK_REFRESH_MIN_SYMBOLS = 20
+
 class MarketCapFilter:
     """市值筛选工具"""
     
@@ -43,21 +50,9 @@ class MarketCapFilter:
         try:
             clean_symbol = symbol.replace('sh.', '').replace('sz.', '')
             
-            # 多数据源获取市值
-            sources = [
-                self._fetch_from_eastmoney,
-                self._fetch_from_sina,
-                self._estimate_by_code
-            ]
-            
-            for source_func in sources:
-                try:
-                    result = source_func(clean_symbol)
-                    if result and result.get('market_cap', 0) > 0:
-                        return self._format_result(symbol, result)
-                except Exception as e:
-                    self.logger.debug(f"数据源 {source_func.__name__} 失败: {e}")
-                    continue
+            result = get_market_cap_service().get(clean_symbol)
+            if result and result.get('market_cap', 0) > 0:
+                return self._format_result(symbol, result)
             
             # 兜底估算
             return self._format_result(symbol, self._estimate_by_code(clean_symbol))
@@ -66,47 +61,6 @@ class MarketCapFilter:
             self.logger.error(f"获取市值失败 {symbol}: {e}")
             return {'symbol': symbol, 'market_cap': 0, 'source': 'failed'}
     
-    def _fetch_from_eastmoney(self, symbol: str) -> Optional[Dict]:
-        """从东方财富获取市值"""
-        market_prefix = '1' if symbol.startswith('6') else '0'
-        url = f"http://push2.eastmoney.com/api/qt/stock/get?secid={market_prefix}.{symbol}&fields=f116,f117,f162"
-        
-        response = requests.get(url, timeout=3)
-        if response.status_code == 200:
-            data = response.json()
-            if 'data' in data and data['data']:
-                market_cap = data['data'].get('f116', 0)  # 总市值
-                circulating_cap = data['data'].get('f117', 0)  # 流通市值
-                if market_cap and market_cap > 0:
-                    return {
-                        'market_cap': float(market_cap),
-                        'circulating_cap': float(circulating_cap) if circulating_cap else market_cap,
-                        'source': 'eastmoney'
-                    }
-        return None
-    
-    def _fetch_from_sina(self, symbol: str) -> Optional[Dict]:
-        """从新浪财经获取市值"""
-        url = f"http://hq.sinajs.cn/list={symbol}"
-        response = requests.get(url, timeout=3)
-        
-        if response.status_code == 200 and 'var hq_str_' in response.text:
-            try:
-                data_parts = response.text.split('"')[1].split(',')
-                if len(data_parts) > 20:
-                    price = float(data_parts[3])  # 当前价格
-                    shares = float(data_parts[18]) if data_parts[18] else 0  # 流通股本
-                    if price > 0 and shares > 0:
-                        market_cap = price * shares * 10000  # 万元转元
-                        return {
-                            'market_cap': market_cap,
-                            'circulating_cap': market_cap,
-                            'source': 'sina'
-                        }
-            except (ValueError, IndexError):
-                pass
-        return None
-    
     def _estimate_by_code(self, symbol: str) -> Dict:
         """基于股票代码估算市值"""
         estimates = {
@@ -213,6 +167,13 @@ class MarketCapFilter:
         """
         results = []
         
+        if len(stock_list) >= BULK_REFRESH_MIN_SYMBOLS:
+            try:
+                get_market_cap_service().bulk_refresh(stock_list)
+            except Exception as e:
+                self.logger.warning(f"市值批量刷新失败，改为并发获取: {e}")
+                get_market_cap_service().get_many(stock_list)
+        
         for symbol in stock_list:
             try:
                 cap_info = self.get_market_cap(symbol)
@@ -11,15 +11,21 @@ import json
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import akshare as ak
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.data_provider import DataProvider, get_data_provider
+from backend.services.trading_calendar import get_trading_calendar
+
 class RealTimeAuctionMonitor:
     """实时竞价监控器"""
     
-    def __init__(self, watch_list: list = None):
+    def __init__(self, watch_list: list = None, provider: DataProvider = None):
         self.watch_list = watch_list or []
+        # 数据源：直连/录制/回放，默认按 CCHAN_DATA_MODE 创建
+        self.provider = provider or get_data_provider()
         self.auction_history = {}
         self.signals = {}
         self.is_auction_time = False
@@ -45,9 +51,8 @@ class RealTimeAuctionMonitor:
         auction_start = datetime.strptime("09:15", "%H:%M").time()
         auction_end = datetime.strptime("09:25", "%H:%M").time()
         
-        # 检查是否为交易日（简化版，实际应该检查节假日）
-        weekday = now.weekday()
-        is_trading_day = weekday < 5  # 周一到周五
+        # 检查是否为交易日（交易所日历，含节假日）
+        is_trading_day = get_trading_calendar(self.provider).is_trading_day(now)
         
         self.is_auction_time = (is_trading_day and 
                                auction_start <= current_time <= auction_end)
@@ -61,7 +66,7 @@ class RealTimeAuctionMonitor:
                 return {'status': 'not_auction_time', 'data': None}
             
             # 获取竞价数据
-            pre_market_df = ak.stock_zh_a_hist_pre_min_em(
+            pre_market_df = self.provider.stock_zh_a_hist_pre_min_em(
                 symbol=symbol,
                 start_time="09:00:00", 
                 end_time="09:30:00"
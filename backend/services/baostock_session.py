@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI BaoStock会话管理
+进程内共享一个登录会话：首次查询时登录，会话失效自动重连，进程退出时登出一次
+"""
+
+import os
+import atexit
+import threading
+import pandas as pd
+from typing import Optional
+
+import baostock as bs
+
+# 需要重新登录后重试的错误码：未登录及各类网络断开
+RECONNECT_ERROR_CODES = {
+    '10001001',  # 用户未登陆
+    '10002001',  # 网络错误
+    '10002002',  # 网络连接失败
+    '10002003',  # 网络连接超时
+    '10002004',  # 网络接收时连接断开
+    '10002005',  # 网络发送失败
+    '10002006',  # 网络发送超时
+    '10002007',  # 网络接收错误
+    '10002008',  # 网络接收超时
+}
+
+class BaoStockError(Exception):
+    """BaoStock查询失败"""
+
+    def __init__(self, error_code: str, error_msg: str):
+        super().__init__(f'{error_code} - {error_msg}')
+        self.error_code = error_code
+        self.error_msg = error_msg
+
+class BaoStockSession:
+    """
+    进程级BaoStock会话
+
+    BaoStock客户端使用模块级全局socket，不是线程安全的，所有查询在锁内串行执行。
+    fork出的子进程不能复用父进程的socket，按pid判断是否需要重新登录。
+    """
+
+    def __init__(self, max_retries: int = 2):
+        self.max_retries = max_retries
+        self.login_result = None
+        self.login_count = 0
+        self._pid = None
+        self._lock = threading.RLock()
+
+    @property
+    def is_logged_in(self) -> bool:
+        return self._pid == os.getpid()
+
+    def login(self):
+        """强制(重新)登录，返回BaoStock登录结果"""
+        with self._lock:
+            lg = bs.login()
+            self.login_result = lg
+            self.login_count += 1
+            self._pid = os.getpid() if lg.error_code == '0' else None
+            return lg
+
+    def ensure_login(self):
+        """未登录时才登录，返回最近一次登录结果"""
+        with self._lock:
+            if not self.is_logged_in:
+                return self.login()
+            return self.login_result
+
+    def logout(self):
+        """登出（仅当前进程已登录时）"""
+        with self._lock:
+            if self.is_logged_in:
+                try:
+                    bs.logout()
+                except Exception:
+                    pass
+            self._pid = None
+
+    def query(self, method: str, *args, **kwargs) -> pd.DataFrame:
+        """
+        执行 bs.<method>(*args, **kwargs) 并返回 get_data() 结果
+        会话失效或网络断开时重新登录后重试
+        """
+        func = getattr(bs, method)
+        last_error = None
+        with self._lock:
+            for attempt in range(self.max_retries + 1):
+                if attempt > 0 or not self.is_logged_in:
+                    lg = self.login()
+                    if lg.error_code != '0':
+                        last_error = BaoStockError(lg.error_code, lg.error_msg)
+                        continue
+                try:
+                    rs = func(*args, **kwargs)
+                    if rs.error_code == '0':
+                        # get_data() 会继续翻页，翻页时断线同样重试
+                        return rs.get_data()
+                    last_error = BaoStockError(rs.error_code, rs.error_msg)
+                    if rs.error_code not in RECONNECT_ERROR_CODES:
+                        break
+                except (OSError, EOFError) as e:
+                    last_error = BaoStockError('10002001', str(e))
+                self._pid = None
+        raise last_error
+
+    # ------------------------------------------------------------------
+    # 常用查询
+    # ------------------------------------------------------------------
+
+    def query_history_k_data_plus(self, code: str, fields: str, start_date: str = None,
+                                  end_date: str = None, frequency: str = 'd',
+                                  adjustflag: str = '3') -> pd.DataFrame:
+        return self.query('query_history_k_data_plus', code, fields,
+                          start_date=start_date, end_date=end_date,
+                          frequency=frequency, adjustflag=adjustflag)
+
+    def query_all_stock(self, day: str = None) -> pd.DataFrame:
+        return self.query('query_all_stock', day=day)
+
+    def query_stock_basic(self, code: str = '', code_name: str = '') -> pd.DataFrame:
+        return self.query('query_stock_basic', code=code, code_name=code_name)
+
+    def query_trade_dates(self, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        return self.query('query_trade_dates', start_date=start_date, end_date=end_date)
+
+_session: Optional[BaoStockSession] = None
+_session_lock = threading.Lock()
+
+def get_bs_session() -> BaoStockSession:
+    """进程内共享的BaoStock会话，进程退出时自动登出"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = BaoStockSession()
+            atexit.register(_session.logout)
+        return _session
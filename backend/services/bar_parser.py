@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI K线解析器
+把 BaoStock 返回的字符串行一次性解析为连续的 float64/float32 列，并给出有效性掩码。
+替代各模块复制的 safe_data_conversion（astype(str) + str.split + to_numeric）。
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+# 需要解析为数值的列（存在时才解析，其余列原样保留）
+NUMERIC_FIELDS = ['open', 'high', 'low', 'close', 'preclose', 'volume', 'amount', 'turn', 'pctChg']
+# 决定一行是否有效的价格列：非空且为正
+PRICE_FIELDS = ['high', 'low', 'close']
+
+_FIRST_NUMBER = re.compile(r'[0-9.]+')
+
+def _first_token(value) -> float:
+    """兼容旧逻辑：'12.3 12.4' 形式的粘连数据取第一个数值"""
+    text = str(value).split()
+    try:
+        return float(text[0]) if text else np.nan
+    except ValueError:
+        return np.nan
+
+def _first_number(value) -> float:
+    """兼容旧逻辑：amount 取第一个匹配 [0-9.]+ 的数值"""
+    match = _FIRST_NUMBER.search(str(value))
+    try:
+        return float(match.group(0)) if match else np.nan
+    except ValueError:
+        return np.nan
+
+def parse_column(values, dtype=np.float64, extract_number: bool = False) -> np.ndarray:
+    """
+    单列解析为连续数值数组（无法解析为 NaN）
+
+    已是数值类型时只做 dtype 转换；字符串列先整体 to_numeric，
+    仅对少量解析失败的非空值逐个回退到旧的取首个数值逻辑。
+    """
+    arr = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+    if arr.dtype.kind in 'fiub':
+        return np.ascontiguousarray(arr, dtype=dtype)
+
+    out = pd.to_numeric(pd.Series(arr, copy=False), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+    failed = np.flatnonzero(np.isnan(out))
+    if len(failed):
+        fallback = _first_number if extract_number else _first_token
+        for i in failed:
+            value = arr[i]
+            if value is not None and value == value and value != '':
+                out[i] = fallback(value)
+    return np.ascontiguousarray(out, dtype=dtype)
+
+@dataclass
+class ParsedBars:
+    """解析结果：数值列、逐列有效掩码、行有效掩码"""
+    raw: pd.DataFrame
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+    masks: Dict[str, np.ndarray] = field(default_factory=dict)
+    valid: Optional[np.ndarray] = None
+
+    def to_frame(self, drop_invalid: bool = True, fill_volume: bool = True) -> pd.DataFrame:
+        """组装 DataFrame：保留原列顺序与索引，数值列替换为解析结果"""
+        data = {}
+        for col in self.raw.columns:
+            data[col] = self.columns[col] if col in self.columns else self.raw[col].to_numpy()
+        if fill_volume and 'volume' in self.columns:
+            data['volume'] = np.where(self.masks['volume'], data['volume'], 0).astype(data['volume'].dtype)
+        df = pd.DataFrame(data, index=self.raw.index)
+        if drop_invalid and not self.valid.all():
+            df = df[self.valid]
+        else:
+            # 未丢行时保留 attrs（指标库据此识别已写入的指标列，避免重复计算）
+            df.attrs = dict(self.raw.attrs)
+        return df
+
+def parse_bars_columns(raw: pd.DataFrame, dtype=np.float64,
+                       fields: Iterable[str] = NUMERIC_FIELDS) -> ParsedBars:
+    """解析所有存在的数值列，返回 ParsedBars"""
+    parsed = ParsedBars(raw=raw)
+    for col in fields:
+        if col in raw.columns:
+            values = parse_column(raw[col], dtype=dtype, extract_number=(col == 'amount'))
+            parsed.columns[col] = values
+            parsed.masks[col] = ~np.isnan(values)
+
+    valid = np.ones(len(raw), dtype=bool)
+    for col in PRICE_FIELDS:
+        if col in parsed.columns:
+            # NaN 与任何数比较为 False，一次比较同时排除空值与非正数
+            valid &= parsed.columns[col] > 0
+    parsed.valid = valid
+    return parsed
+
+def parse_bars(raw: pd.DataFrame, dtype=np.float64, drop_invalid: bool = True,
+               fill_volume: bool = True) -> pd.DataFrame:
+    """
+    原始K线 -> 带类型的 DataFrame（替代 safe_data_conversion）
+
+    drop_invalid: 丢弃 high/low/close 为空或非正的行
+    fill_volume:  volume 空值填 0
+    """
+    return parse_bars_columns(raw, dtype=dtype).to_frame(drop_invalid=drop_invalid,
+                                                          fill_volume=fill_volume)
+
+# 面板默认保留的列
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+@dataclass
+class BarPanel:
+    """
+    多只股票K线的列式面板：各股票的有效K线首尾相接存放，
+    第 k 只股票占 [offsets[k], offsets[k+1])，volume 空值已填 0
+    """
+    symbols: List[str]
+    offsets: np.ndarray
+    columns: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], dtype=np.float64,
+                    fields: Iterable[str] = PANEL_FIELDS) -> 'BarPanel':
+        """拼接后一次解析（与 parse_bars 口径一致：丢弃无效行、volume 空值填 0）"""
+        fields = list(fields)
+        frames = {symbol: raw for symbol, raw in frames.items() if raw is not None and not raw.empty}
+        symbols = list(frames)
+        offsets = np.zeros(len(symbols) + 1, dtype=np.int64)
+        if not symbols:
+            return cls(symbols, offsets, {col: np.empty(0, dtype=dtype) for col in fields})
+
+        raw = pd.concat(list(frames.values()), ignore_index=True)
+        parsed = parse_bars_columns(raw, dtype=dtype, fields=fields)
+        valid = parsed.valid
+        raw_starts = np.cumsum([0] + [len(df) for df in frames.values()])[:-1]
+        np.cumsum(np.add.reduceat(valid.astype(np.int64), raw_starts), out=offsets[1:])
+
+        columns = {}
+        for col in fields:
+            values = parsed.columns.get(col)
+            if values is None:
+                values = np.full(len(raw), np.nan if col != 'volume' else 0, dtype=dtype)
+            elif col == 'volume':
+                values = np.where(parsed.masks[col], values, 0).astype(dtype)
+            columns[col] = values[valid]
+        return cls(symbols, offsets, columns)
+
+    def column(self, name: str, k: int) -> np.ndarray:
+        """第 k 只股票的一列（视图）"""
+        return self.columns[name][self.offsets[k]:self.offsets[k + 1]]
+
+    def tail_matrix(self, name: str, width: int) -> np.ndarray:
+        """各股票最近 width 根K线右对齐成 (股票数, width) 矩阵，不足部分为 NaN"""
+        values = self.columns[name]
+        index = self.offsets[1:, None] - width + np.arange(width)
+        inside = index >= self.offsets[:-1, None]
+        matrix = values[np.clip(index, 0, None)] if len(values) else np.zeros(index.shape)
+        return np.where(inside, matrix, np.nan)
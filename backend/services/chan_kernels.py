@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 缠论数组内核
+对整段K线（或 股票×K线 面板）做向量化计算，供核心版与高级版分析器共用
+"""
+
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# 分型判定窗口：当前K线与前后各 FRACTAL_SPAN 根比较
+FRACTAL_SPAN = 2
+
+# 成笔最小间隔：顶底分型所在合并K线的位置差（两分型不共用K线且中间至少一根独立K线）
+STROKE_MIN_GAP = 4
+
+@dataclass
+class MergedBars:
+    """
+    包含处理后的K线
+    high_idx[k] / low_idx[k] 为第 k 根合并K线的高点 / 低点所在的原始K线下标，
+    high[k] == 原始 high[high_idx[k]]，low[k] == 原始 low[low_idx[k]]
+    """
+    high: np.ndarray
+    low: np.ndarray
+    high_idx: np.ndarray
+    low_idx: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.high)
+
+class InclusionMerger:
+    """
+    K线包含关系处理的逐根状态（增量 ChanStream 使用；批量扫描见 merge_inclusion_panel，规则相同）
+
+    相邻两根存在包含关系时合并：向上处理取高高、高低，向下处理取低高、低低；
+    方向由前两根已合并K线的高点决定（不足两根时按向上处理）。
+    只有最后一根合并K线可能被后续K线改写，之前的都已定型。
+    """
+
+    def __init__(self):
+        self.high: List[float] = []
+        self.low: List[float] = []
+        self.high_idx: List[int] = []
+        self.low_idx: List[int] = []
+
+    def push(self, i: int, h: float, l: float) -> bool:
+        """推入原始第 i 根K线，返回是否新增了一根合并K线（False 表示并入最后一根）"""
+        m_high, m_low = self.high, self.low
+        if m_high:
+            last_h, last_l = m_high[-1], m_low[-1]
+            if (h <= last_h and l >= last_l) or (h >= last_h and l <= last_l):
+                if len(m_high) == 1 or last_h > m_high[-2]:
+                    if h > last_h:
+                        m_high[-1], self.high_idx[-1] = h, i
+                    if l > last_l:
+                        m_low[-1], self.low_idx[-1] = l, i
+                else:
+                    if h < last_h:
+                        m_high[-1], self.high_idx[-1] = h, i
+                    if l < last_l:
+                        m_low[-1], self.low_idx[-1] = l, i
+                return False
+        m_high.append(h)
+        m_low.append(l)
+        self.high_idx.append(i)
+        self.low_idx.append(i)
+        return True
+
+    def to_bars(self) -> 'MergedBars':
+        return MergedBars(np.array(self.high, dtype=np.float64), np.array(self.low, dtype=np.float64),
+                          np.array(self.high_idx, dtype=np.int64), np.array(self.low_idx, dtype=np.int64))
+
+def merge_inclusion_panel(high: np.ndarray, low: np.ndarray,
+                          offsets: np.ndarray) -> Tuple[MergedBars, np.ndarray]:
+    """
+    多只股票首尾相接的K线逐段做包含处理（整个面板一次线性扫描，股票边界处重置）
+    规则同 InclusionMerger；返回合并K线（下标为各股票内部下标）与合并后的 offsets
+    """
+    high_list = np.asarray(high, dtype=np.float64).tolist()
+    low_list = np.asarray(low, dtype=np.float64).tolist()
+    n = len(high_list)
+    m_high, m_low = [0.0] * n, [0.0] * n
+    m_high_idx, m_low_idx = [0] * n, [0] * n
+    bounds = np.asarray(offsets, dtype=np.int64).tolist()
+    m_offsets = [0]
+    k = -1
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        first = k + 1
+        for i in range(start, end):
+            h, l = high_list[i], low_list[i]
+            if k >= first:
+                last_h, last_l = m_high[k], m_low[k]
+                if (h <= last_h and l >= last_l) or (h >= last_h and l <= last_l):
+                    if k == first or last_h > m_high[k - 1]:
+                        if h > last_h:
+                            m_high[k], m_high_idx[k] = h, i - start
+                        if l > last_l:
+                            m_low[k], m_low_idx[k] = l, i - start
+                    else:
+                        if h < last_h:
+                            m_high[k], m_high_idx[k] = h, i - start
+                        if l < last_l:
+                            m_low[k], m_low_idx[k] = l, i - start
+                    continue
+            k += 1
+            m_high[k], m_low[k] = h, l
+            m_high_idx[k] = m_low_idx[k] = i - start
+        m_offsets.append(k + 1)
+    size = k + 1
+    bars = MergedBars(np.array(m_high[:size]), np.array(m_low[:size]),
+                      np.array(m_high_idx[:size], dtype=np.int64),
+                      np.array(m_low_idx[:size], dtype=np.int64))
+    return bars, np.array(m_offsets, dtype=np.int64)
+
+def merge_inclusion(high: np.ndarray, low: np.ndarray) -> MergedBars:
+    """单只股票的K线包含处理（单次线性扫描），规则见 InclusionMerger"""
+    return merge_inclusion_panel(high, low, [0, len(high)])[0]
+
+def fractal_masks(high: np.ndarray, low: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    顶/底分型布尔掩码，支持一维数组或二维面板（最后一维为K线）
+
+    顶分型：high[i] 严格大于前后各两根的 high；底分型：low[i] 严格小于前后各两根的 low。
+    首尾两根不判定；含 NaN 的比较为 False，与逐根循环的结果一致。
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    top = np.zeros(high.shape, dtype=bool)
+    bottom = np.zeros(low.shape, dtype=bool)
+    n = high.shape[-1]
+    span = FRACTAL_SPAN
+    if n < 2 * span + 1:
+        return top, bottom
+
+    center = slice(span, n - span)
+    h_mid, l_mid = high[..., center], low[..., center]
+    top_mid, bottom_mid = top[..., center], bottom[..., center]
+    top_mid[...] = True
+    bottom_mid[...] = True
+    for offset in range(1, span + 1):
+        for shift in (-offset, offset):
+            window = slice(span + shift, n - span + shift)
+            top_mid &= h_mid > high[..., window]
+            bottom_mid &= l_mid < low[..., window]
+    return top, bottom
+
+def fractal_points(high: np.ndarray, low: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """一维K线的顶分型、底分型下标数组（升序）"""
+    top, bottom = fractal_masks(high, low)
+    return np.flatnonzero(top), np.flatnonzero(bottom)
+
+def merge_fractal_points(high: np.ndarray, low: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    顶底分型按时间合并，返回 (下标, 价格, 是否为底)
+    同一根K线既是顶又是底时按价格从低到高排列（与原 (idx, price, type) 元组排序一致）
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    tops, bottoms = fractal_points(high, low)
+    idx = np.concatenate([tops, bottoms])
+    price = np.concatenate([high[tops], low[bottoms]])
+    is_low = np.concatenate([np.zeros(len(tops), dtype=bool), np.ones(len(bottoms), dtype=bool)])
+    order = np.lexsort((is_low, price, idx))
+    return idx[order], price[order], is_low[order]
+
+def merged_fractal_points(high: np.ndarray, low: np.ndarray,
+                          inclusion: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    先做包含处理再识别分型，返回值同 merge_fractal_points，下标映射回原始K线
+    inclusion=False 时直接在原始K线上识别
+    """
+    if not inclusion:
+        return merge_fractal_points(high, low)
+    idx, _, price, is_low = fractal_sequence(high, low)
+    return idx, price, is_low
+
+def fractal_sequence(high: np.ndarray, low: np.ndarray,
+                     inclusion: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """同 merged_fractal_points，另外返回分型所在合并K线的位置（成笔间隔按合并K线计）：(下标, 位置, 价格, 是否为底)"""
+    if not inclusion:
+        pos, price, is_low = merge_fractal_points(high, low)
+        return pos, pos, price, is_low
+    bars = merge_inclusion(high, low)
+    pos, price, is_low = merge_fractal_points(bars.high, bars.low)
+    return np.where(is_low, bars.low_idx[pos], bars.high_idx[pos]), pos, price, is_low
+
+def _group_bounds(groups: np.ndarray, n: int) -> List[Tuple[int, int]]:
+    """按分组切分的 [start, end) 区间（分组已连续排列）"""
+    if n == 0:
+        return []
+    if groups is None:
+        return [(0, n)]
+    cuts = np.flatnonzero(np.asarray(groups)[1:] != np.asarray(groups)[:-1]) + 1
+    bounds = [0] + cuts.tolist() + [n]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def build_strokes(pos: np.ndarray, price: np.ndarray, is_low: np.ndarray,
+                  min_gap: int = STROKE_MIN_GAP, groups: np.ndarray = None) -> np.ndarray:
+    """
+    笔：按时间顺序一次扫描分型点（线性）
+    同类分型取更极端者替换当前端点（更高的顶 / 更低的底）；异类分型须与当前端点相隔 >= min_gap 根
+    合并K线，且顶高于前底、底低于前顶才成为新端点。分组（股票）边界处重置。
+    返回笔端点在输入数组中的位置，同组内顶底交替
+    """
+    pos = np.asarray(pos, dtype=np.int64).tolist()
+    price = np.asarray(price, dtype=np.float64).tolist()
+    lows = np.asarray(is_low, dtype=bool).tolist()
+    ends = []
+    for start, end in _group_bounds(groups, len(pos)):
+        first = len(ends)
+        for k in range(start, end):
+            if len(ends) > first:
+                last = ends[-1]
+                beyond = price[k] < price[last] if lows[k] else price[k] > price[last]
+                if lows[k] == lows[last]:
+                    if beyond:
+                        ends[-1] = k
+                elif beyond and pos[k] - pos[last] >= min_gap:
+                    ends.append(k)
+                continue
+            ends.append(k)
+    return np.array(ends, dtype=np.int64)
+
+def _feature_segments(price: List[float], lows: List[bool], offset: int,
+                      starts: List[int], stops: List[int]):
+    """单组笔端点上的特征序列线段划分，结果以 offset 平移后追加到 starts / stops"""
+    m = len(price)
+    s = 0
+    while s + 3 < m:
+        up = lows[s]
+        # 特征元素 [高, 低, 极值端点]：向上线段取其中的向下笔（极值端点为笔起点的顶），向下线段对称
+        elems = []
+        end = broken = None
+        for i in range(s + 1, m - 1, 2):
+            hi, lo = max(price[i], price[i + 1]), min(price[i], price[i + 1])
+            if elems and ((hi <= elems[-1][0] and lo >= elems[-1][1]) or
+                          (hi >= elems[-1][0] and lo <= elems[-1][1])):
+                e = elems[-1]
+                if up:        # 向上处理：高高、低高
+                    if hi > e[0]:
+                        e[0], e[2] = hi, i
+                    e[1] = max(e[1], lo)
+                else:         # 向下处理：低低、高低
+                    if lo < e[1]:
+                        e[1], e[2] = lo, i
+                    e[0] = min(e[0], hi)
+            else:
+                elems.append([hi, lo, i])
+                if len(elems) >= 3:
+                    e1, e2, e3 = elems[-3:]
+                    if (up and e2[0] > e1[0] and e2[0] > e3[0]) or \
+                            (not up and e2[1] < e1[1] and e2[1] < e3[1]):
+                        end = e2[2]
+                        break
+            # 特征序列分型未形成前，起点已被跌破（升破）
+            if (price[i + 1] < price[s]) if up else (price[i + 1] > price[s]):
+                broken = i + 1
+                break
+        if broken is not None:
+            # 起点被跌破 / 升破：上一线段延伸到这个新极值点（首段则起点后移），从这里重新划分
+            if stops and stops[-1] == offset + s:
+                stops[-1] = offset + broken
+            s = broken
+            continue
+        if end is None:
+            # 末尾未完成的线段：延伸到其后最极端的同向端点，不少于三笔时保留
+            tail = range(s + 1, m, 2)
+            extreme = max(tail, key=lambda k: price[k]) if up else min(tail, key=lambda k: price[k])
+            if extreme - s >= 3:
+                starts.append(offset + s)
+                stops.append(offset + extreme)
+            break
+        starts.append(offset + s)
+        stops.append(offset + end)
+        s = end
+
+def build_segments(price: np.ndarray, is_low: np.ndarray,
+                   groups: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    线段（特征序列法）：在顶底交替的笔端点上划分，每条线段至少三笔
+    向上线段的特征序列为其中的向下笔，按向上方向做包含处理后出现顶分型时，线段在顶分型元素的
+    最高点结束，下一条向下线段从这里开始；向下线段对称。线段确认前起点被跌破（升破）时，
+    上一线段延伸到新极值点。线段结束后只回退到该端点继续扫描。
+    简化：不区分特征序列缺口的第二种情形。返回 (线段起点, 线段终点) 在端点数组中的位置
+    """
+    price = np.asarray(price, dtype=np.float64).tolist()
+    lows = np.asarray(is_low, dtype=bool).tolist()
+    starts, stops = [], []
+    for start, end in _group_bounds(groups, len(price)):
+        _feature_segments(price[start:end], lows[start:end], start, starts, stops)
+    return np.array(starts, dtype=np.int64), np.array(stops, dtype=np.int64)
+
+def extend_pivots(start: np.ndarray, end: np.ndarray, high: np.ndarray, low: np.ndarray,
+                  groups: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    中枢延伸：按 (分组, 起点) 排序后一次扫描，O(n log n)
+    后一个中枢与当前中枢时间上相接（起点 <= 当前终点）且价格区间与当前中枢区间重叠时，
+    并入当前中枢（区间保持首个中枢的 [low, high]，终点延长），否则开始新中枢；分组边界处重置。
+    返回 (保留中枢的原始位置, 合并后终点, 最后并入成员的原始位置)，按 (分组, 起点) 排列
+    """
+    start = np.asarray(start, dtype=np.int64)
+    n = len(start)
+    groups = np.zeros(n, dtype=np.int64) if groups is None else np.asarray(groups)
+    order = np.lexsort((start, groups))
+    s, e = start[order].tolist(), np.asarray(end, dtype=np.int64)[order].tolist()
+    h = np.asarray(high, dtype=np.float64)[order].tolist()
+    l = np.asarray(low, dtype=np.float64)[order].tolist()
+    g = groups[order].tolist()
+    keep, merged_end, last = [], [], []
+    cur = -1
+    for k in range(n):
+        if (cur >= 0 and g[k] == g[cur] and s[k] <= merged_end[-1]
+                and l[k] <= h[cur] and h[k] >= l[cur]):
+            if e[k] > merged_end[-1]:
+                merged_end[-1] = e[k]
+            last[-1] = k
+            continue
+        cur = k
+        keep.append(k)
+        merged_end.append(e[k])
+        last.append(k)
+    return (order[np.array(keep, dtype=np.int64)], np.array(merged_end, dtype=np.int64),
+            order[np.array(last, dtype=np.int64)])
+
+class IntervalIndex:
+    """
+    静态区间树：闭区间 [lo, hi] 按左端点排序，隐式平衡二叉树的每个节点记录子树右端点最大值
+    stab(x) 返回包含 x 的全部区间的原始位置（升序），每个命中 O(log n)
+    """
+
+    def __init__(self, lo: np.ndarray, hi: np.ndarray):
+        lo = np.asarray(lo, dtype=np.float64)
+        hi = np.asarray(hi, dtype=np.float64)
+        self._order = np.argsort(lo, kind='stable')
+        self._lo = lo[self._order].tolist()
+        self._hi = hi[self._order].tolist()
+        self._max = list(self._hi)
+        self._build(0, len(self._lo))
+
+    def __len__(self) -> int:
+        return len(self._lo)
+
+    def _build(self, left: int, right: int) -> float:
+        """子树 [left, right) 的右端点最大值，存放在中点节点上"""
+        if left >= right:
+            return -np.inf
+        mid = (left + right) // 2
+        self._max[mid] = max(self._hi[mid], self._build(left, mid), self._build(mid + 1, right))
+        return self._max[mid]
+
+    def stab(self, x: float) -> np.ndarray:
+        hits = []
+        stack = [(0, len(self._lo))]
+        while stack:
+            left, right = stack.pop()
+            if left >= right:
+                continue
+            mid = (left + right) // 2
+            if self._max[mid] < x:
+                continue            # 子树内没有区间能覆盖 x
+            stack.append((left, mid))
+            if self._lo[mid] <= x:
+                if self._hi[mid] >= x:
+                    hits.append(mid)
+                stack.append((mid + 1, right))   # 右子树左端点都 >= lo[mid]，否则整体跳过
+        return np.sort(self._order[np.array(hits, dtype=np.int64)])
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 数据源抽象
+统一 BaoStock / AKShare 调用入口，支持三种模式：
+  live   - 直连数据源
+  record - 直连并把每次响应写入本地归档
+  replay - 从归档回放，按录制耗时注入延迟，无需网络
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+import pandas as pd
+from abc import ABC, abstractmethod
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
+
+from backend.services.baostock_session import get_bs_session
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+DEFAULT_ARCHIVE_DIR = os.path.join(DATA_DIR, 'replay')
+
+# 归档根目录下记录录制时间的清单文件
+MANIFEST_NAME = 'manifest.json'
+
+class ReplayMissError(KeyError):
+    """回放归档中没有对应请求"""
+
+def request_key(source: str, method: str, kwargs: dict) -> str:
+    """请求指纹：数据源 + 方法 + 排序后的参数"""
+    payload = json.dumps([source, method, sorted(kwargs.items())], ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class DataProvider(ABC):
+    """
+    数据源接口
+
+    所有查询返回 DataFrame，参数与 bs.* / ak.* 同名。子类只需实现 call()，未实现时无法实例化。
+    """
+
+    mode = 'base'
+
+    @abstractmethod
+    def call(self, source: str, method: str, **kwargs) -> pd.DataFrame:
+        """执行 <source>.<method>(**kwargs)，返回 DataFrame"""
+
+    def login(self):
+        """返回带 error_code/error_msg 的登录结果（兼容原有打印逻辑）"""
+        return SimpleNamespace(error_code='0', error_msg='success')
+
+    def now(self) -> datetime:
+        """数据源视角的当前时间：查询日期区间以此为准，回放时为录制时间"""
+        return datetime.now()
+
+    # ------------------------------------------------------------------
+    # BaoStock
+    # ------------------------------------------------------------------
+
+    def query_history_k_data_plus(self, code: str, fields: str, start_date: str = None,
+                                  end_date: str = None, frequency: str = 'd',
+                                  adjustflag: str = '3') -> pd.DataFrame:
+        return self.call('baostock', 'query_history_k_data_plus', code=code, fields=fields,
+                         start_date=start_date, end_date=end_date,
+                         frequency=frequency, adjustflag=adjustflag)
+
+    def query_all_stock(self, day: str = None) -> pd.DataFrame:
+        return self.call('baostock', 'query_all_stock', day=day)
+
+    def query_stock_basic(self, code: str = '', code_name: str = '') -> pd.DataFrame:
+        return self.call('baostock', 'query_stock_basic', code=code, code_name=code_name)
+
+    def query_trade_dates(self, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        return self.call('baostock', 'query_trade_dates', start_date=start_date, end_date=end_date)
+
+    # ------------------------------------------------------------------
+    # AKShare
+    # ------------------------------------------------------------------
+
+    def stock_zh_a_hist_pre_min_em(self, symbol: str, start_time: str = '09:00:00',
+                                   end_time: str = '15:40:00') -> pd.DataFrame:
+        return self.call('akshare', 'stock_zh_a_hist_pre_min_em', symbol=symbol,
+                         start_time=start_time, end_time=end_time)
+
+class LiveDataProvider(DataProvider):
+    """直连：BaoStock 走进程共享会话，AKShare 直接调用"""
+
+    mode = 'live'
+
+    def login(self):
+        return get_bs_session().ensure_login()
+
+    def call(self, source: str, method: str, **kwargs) -> pd.DataFrame:
+        if source == 'baostock':
+            session = get_bs_session()
+            # 位置参数与 bs 函数签名保持一致
+            if method == 'query_history_k_data_plus':
+                code, fields = kwargs.pop('code'), kwargs.pop('fields')
+                return session.query(method, code, fields, **kwargs)
+            return session.query(method, **kwargs)
+        if source == 'akshare':
+            import akshare as ak
+            return getattr(ak, method)(**kwargs)
+        raise ValueError(f'未知数据源: {source}')
+
+class RecordingDataProvider(DataProvider):
+    """
+    录制：透传到 inner（默认直连），把响应或异常连同耗时写入归档
+    归档为 <archive>/<source>/<method>/<sha1>.pkl
+    """
+
+    mode = 'record'
+
+    def __init__(self, archive_dir: str = None, inner: DataProvider = None):
+        self.archive_dir = archive_dir or DEFAULT_ARCHIVE_DIR
+        self.inner = inner or LiveDataProvider()
+        self._as_of = None
+
+    def login(self):
+        return self.inner.login()
+
+    def now(self) -> datetime:
+        # 首次取时间即定为本次录制的 as_of，写入清单供回放使用
+        if self._as_of is None:
+            self._as_of = self.inner.now().replace(microsecond=0)
+            os.makedirs(self.archive_dir, exist_ok=True)
+            path = os.path.join(self.archive_dir, MANIFEST_NAME)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'as_of': self._as_of.isoformat(sep=' ')}, f)
+            os.replace(tmp_path, path)
+        return self._as_of
+
+    def call(self, source: str, method: str, **kwargs) -> pd.DataFrame:
+        self.now()
+        started = time.perf_counter()
+        try:
+            result, error = self.inner.call(source, method, **dict(kwargs)), None
+        except Exception as e:
+            result, error = None, e
+        elapsed = time.perf_counter() - started
+
+        path = os.path.join(self.archive_dir, source, method, f'{request_key(source, method, kwargs)}.pkl')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {'kwargs': kwargs, 'latency': elapsed, 'result': result,
+                  'error': (type(error).__name__, str(error)) if error else None}
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(record, f)
+        os.replace(tmp_path, path)
+
+        if error is not None:
+            raise error
+        return result
+
+class ReplayDataProvider(DataProvider):
+    """
+    回放：只读归档，不访问网络
+
+    latency='recorded' 按录制耗时 × latency_scale 睡眠；传数字则为固定延迟秒数；None 不注入延迟。
+    录制时抛出的异常回放为 RuntimeError（保留原异常名与信息），未录制的请求抛 ReplayMissError。
+    now() 返回 as_of（默认读归档清单中的录制时间），使按当前日期拼出的查询参数与录制时一致。
+    """
+
+    mode = 'replay'
+
+    def __init__(self, archive_dir: str = None, latency='recorded', latency_scale: float = 1.0,
+                 as_of: str = None):
+        self.archive_dir = archive_dir or DEFAULT_ARCHIVE_DIR
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self._cache = {}
+        if as_of is None:
+            path = os.path.join(self.archive_dir, MANIFEST_NAME)
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    as_of = json.load(f).get('as_of')
+        self.as_of = datetime.fromisoformat(as_of) if as_of else None
+
+    def now(self) -> datetime:
+        # 旧归档没有清单时退回当前时间
+        return self.as_of or datetime.now()
+
+    def _load(self, source: str, method: str, kwargs: dict) -> dict:
+        key = request_key(source, method, kwargs)
+        if key not in self._cache:
+            path = os.path.join(self.archive_dir, source, method, f'{key}.pkl')
+            if not os.path.exists(path):
+                raise ReplayMissError(f'{source}.{method}({kwargs}) 未录制')
+            with open(path, 'rb') as f:
+                self._cache[key] = pickle.load(f)
+        return self._cache[key]
+
+    def call(self, source: str, method: str, **kwargs) -> pd.DataFrame:
+        record = self._load(source, method, kwargs)
+
+        if self.latency == 'recorded':
+            delay = record['latency'] * self.latency_scale
+        else:
+            delay = float(self.latency or 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        if record['error'] is not None:
+            name, message = record['error']
+            raise RuntimeError(f'{name}: {message}')
+        # 返回副本，避免调用方修改污染回放缓存
+        return record['result'].copy()
+
+_provider: Optional[DataProvider] = None
+_provider_lock = threading.Lock()
+
+def create_data_provider(mode: str = None, archive_dir: str = None) -> DataProvider:
+    """
+    按模式创建数据源，默认读取环境变量：
+      CCHAN_DATA_MODE=live|record|replay
+      CCHAN_DATA_ARCHIVE=归档目录
+      CCHAN_REPLAY_LATENCY=recorded|秒数|none
+      CCHAN_REPLAY_AS_OF=回放时的当前日期（YYYY-MM-DD[ HH:MM:SS]，默认取归档清单）
+    """
+    mode = (mode or os.getenv('CCHAN_DATA_MODE', 'live')).lower()
+    archive_dir = archive_dir or os.getenv('CCHAN_DATA_ARCHIVE') or None
+    if mode == 'record':
+        return RecordingDataProvider(archive_dir)
+    if mode == 'replay':
+        latency = os.getenv('CCHAN_REPLAY_LATENCY', 'recorded').lower()
+        if latency == 'none':
+            latency = None
+        elif latency != 'recorded':
+            latency = float(latency)
+        return ReplayDataProvider(archive_dir, latency=latency,
+                                  as_of=os.getenv('CCHAN_REPLAY_AS_OF') or None)
+    if mode == 'live':
+        return LiveDataProvider()
+    raise ValueError(f'未知数据模式: {mode}')
+
+def get_data_provider() -> DataProvider:
+    """进程内默认数据源"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_data_provider()
+        return _provider
+
+def set_data_provider(provider: DataProvider):
+    """替换进程内默认数据源（测试/基准脚本使用）"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 背驰判定内核
+MACD 柱红绿面积、成交量各做一次前缀和，任意两段的面积/量能比较 O(1)；批量与增量共用
+"""
+
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+from backend.services.indicators import macd
+
+# MACD 口径：DIF = EMA12 - EMA26，DEA = DIF 的 EMA9，柱 = DIF - DEA（EWM 均为 adjust=True）
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+
+def macd_histogram(close) -> np.ndarray:
+    """整段收盘价的 MACD 柱（统一指标库）"""
+    return macd(close, MACD_FAST, MACD_SLOW, MACD_SIGNAL)[2]
+
+class SegmentAreas:
+    """
+    MACD 柱红/绿面积与成交量的前缀和（首项为 0）
+    第 s..e 根K线（闭区间）的和 = prefix[e + 1] - prefix[s]；
+    批量用 from_series 一次 cumsum，增量引擎逐根 append，查询口径相同
+    """
+
+    def __init__(self, red: Sequence[float] = None, green: Sequence[float] = None,
+                 volume: Sequence[float] = None):
+        self.red = [0.0] if red is None else red
+        self.green = [0.0] if green is None else green
+        self.volume = [0.0] if volume is None else volume
+
+    @classmethod
+    def from_series(cls, hist, volume) -> 'SegmentAreas':
+        hist = np.asarray(hist, dtype=np.float64)
+        volume = np.nan_to_num(np.asarray(volume, dtype=np.float64))
+        zero = np.zeros(1)
+        return cls(np.concatenate([zero, np.cumsum(np.maximum(hist, 0.0))]),
+                   np.concatenate([zero, np.cumsum(np.maximum(-hist, 0.0))]),
+                   np.concatenate([zero, np.cumsum(volume)]))
+
+    def __len__(self) -> int:
+        return len(self.red) - 1
+
+    def append(self, hist: float, volume: float):
+        """增量追加一根K线（要求由默认构造的列表前缀和）"""
+        self.red.append(self.red[-1] + (hist if hist > 0 else 0.0))
+        self.green.append(self.green[-1] + (-hist if hist < 0 else 0.0))
+        self.volume.append(self.volume[-1] + volume)
+
+    def area(self, start: int, end: int, up: bool) -> float:
+        """上涨段取红柱面积，下跌段取绿柱面积"""
+        prefix = self.red if up else self.green
+        return float(prefix[end + 1] - prefix[start])
+
+    def volume_sum(self, start: int, end: int) -> float:
+        return float(self.volume[end + 1] - self.volume[start])
+
+def segment_divergence(areas: SegmentAreas, prev: Tuple[int, int], last: Tuple[int, int],
+                       up: bool, ratio: float) -> Optional[Tuple[float, float]]:
+    """
+    同向两段（prev 在前、last 在后，均为 (起点, 终点) K线下标）的面积背驰判定
+    last 面积 < prev 面积 × ratio 时返回 (面积比, 量能比)，否则返回 None
+    """
+    prev_area = areas.area(prev[0], prev[1], up)
+    if prev_area <= 0:
+        return None
+    area_ratio = areas.area(last[0], last[1], up) / prev_area
+    if area_ratio >= ratio:
+        return None
+    prev_volume = areas.volume_sum(prev[0], prev[1])
+    volume_ratio = areas.volume_sum(last[0], last[1]) / prev_volume if prev_volume > 0 else 1.0
+    return area_ratio, volume_ratio
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 共享HTTP客户端
+长连接池 + 全局并发上限 + 按主机限速，get_many 用线程池并发请求
+"""
+
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Hashable, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+# 各行情主机每秒请求上限（未列出的主机使用 default_rate）
+DEFAULT_HOST_RATES = {
+    'push2.eastmoney.com': 30.0,
+    'hq.sinajs.cn': 10.0,
+}
+
+class RateLimiter:
+    """令牌桶：每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class HttpClient:
+    """
+    线程安全的HTTP客户端
+
+    所有请求共用一个 requests.Session（keep-alive 连接池），
+    信号量限制同时在途请求数，RateLimiter 限制单主机请求频率。
+    """
+
+    def __init__(self, max_concurrency: int = 16, pool_maxsize: int = 32,
+                 timeout: float = 3, host_rates: Dict[str, float] = None,
+                 default_rate: Optional[float] = None, headers: Dict[str, str] = None):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(headers or {'User-Agent': 'Mozilla/5.0'})
+        self.host_rates = dict(DEFAULT_HOST_RATES if host_rates is None else host_rates)
+        self.default_rate = default_rate
+        self._limiters: Dict[str, Optional[RateLimiter]] = {}
+        self._limiters_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _limiter(self, url: str) -> Optional[RateLimiter]:
+        host = urlsplit(url).hostname or ''
+        with self._limiters_lock:
+            if host not in self._limiters:
+                rate = self.host_rates.get(host, self.default_rate)
+                self._limiters[host] = RateLimiter(rate) if rate else None
+            return self._limiters[host]
+
+    def get(self, url: str, params: dict = None, timeout: float = None, **kwargs) -> requests.Response:
+        """限速、限并发后发出 GET 请求"""
+        limiter = self._limiter(url)
+        if limiter:
+            limiter.acquire()
+        with self._slots:
+            return self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+
+    def get_many(self, requests_by_key: Dict[Hashable, Union[str, Tuple[str, dict]]],
+                 timeout: float = None) -> Dict[Hashable, Union[requests.Response, Exception]]:
+        """
+        并发请求 {key: url 或 (url, params)}，返回 {key: Response 或 异常}
+        单个请求失败不影响其他请求
+        """
+        def fetch(item):
+            key, spec = item
+            url, params = (spec, None) if isinstance(spec, str) else spec
+            try:
+                return key, self.get(url, params=params, timeout=timeout)
+            except Exception as e:
+                return key, e
+
+        items = list(requests_by_key.items())
+        if not items:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as pool:
+            return dict(pool.map(fetch, items))
+
+    def close(self):
+        self.session.close()
+
+_default_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """进程内共享的HTTP客户端"""
+    global _default_client
+    with _client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 增量技术指标状态
+EMA / RSI / MACD / 滑动均值逐根 O(1) 更新，口径同 indicators.py 的批量版本；
+peek() 给出未收盘K线的临时值而不改变状态（盘中 / 竞价每 30 秒刷新只需 O(1)）；
+状态可序列化为 JSON，IndicatorStateStore 按周期落盘，跨进程重启、跨交易日延续。
+
+与批量版本的误差：只差浮点累加顺序，相对 / 绝对误差 < 1e-9（test_indicator_state 校验）。
+滑动窗口每转一圈按缓冲重算一次和并重设锚点，误差不随运行时长累积；
+和 / 平方和相对锚点累加，平盘窗口的标准差不被价格量级的相消误差放大。
+"""
+
+import os
+import json
+import math
+import threading
+from collections import deque
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+from backend.services.indicators import DEFAULT_SPEC, VOL_RATIO_EPS, IndicatorSpec
+
+NAN = float('nan')
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+DEFAULT_STATE_DIR = os.path.join(DATA_DIR, 'indicator_state')
+
+class EmaState:
+    """adjust=True 的 EWM 均值：分子 Σw^i·x、分母 Σw^i 各自递推"""
+    __slots__ = ('span', 'num', 'den')
+
+    def __init__(self, span: int, num: float = 0.0, den: float = 0.0):
+        self.span = span
+        self.num = num
+        self.den = den
+
+    @property
+    def decay(self) -> float:
+        return 1 - 2 / (self.span + 1)
+
+    @property
+    def value(self) -> float:
+        return self.num / self.den if self.den > 0 else NAN
+
+    def peek(self, x: float) -> float:
+        w = self.decay
+        return (x + w * self.num) / (1 + w * self.den)
+
+    def update(self, x: float) -> float:
+        w = self.decay
+        self.num = x + w * self.num
+        self.den = 1 + w * self.den
+        return self.num / self.den
+
+    def to_dict(self) -> dict:
+        return {'span': self.span, 'num': self.num, 'den': self.den}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'EmaState':
+        return cls(data['span'], data['num'], data['den'])
+
+class RollingWindow:
+    """
+    定长环形缓冲 + 滑动和 / 平方和（相对锚点 shift 累加，平盘窗口的方差不受价格量级的相消误差影响）
+    缓冲转满一圈时按缓冲重算一次和并重设锚点；窗口内全为 0 时（按非零个数判断）和精确为 0
+    """
+    __slots__ = ('window', 'values', 'pos', 'shift', 'total', 'total_sq', 'nonzero')
+
+    def __init__(self, window: int, values: List[float] = None, pos: int = 0):
+        self.window = window
+        self.values = list(values or [])
+        self.pos = pos
+        self._resum()
+
+    def _resum(self):
+        self.shift = math.fsum(self.values) / len(self.values) if self.values else 0.0
+        self.total = math.fsum(x - self.shift for x in self.values)
+        self.total_sq = math.fsum((x - self.shift) ** 2 for x in self.values)
+        self.nonzero = sum(1 for x in self.values if x != 0)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window
+
+    def _sums_with(self, x: float):
+        """推入 x 后的 (相对锚点的和, 平方和, 非零个数)"""
+        d = x - self.shift
+        if not self.full:
+            return self.total + d, self.total_sq + d * d, self.nonzero + (x != 0)
+        old = self.values[self.pos]
+        e = old - self.shift
+        return self.total - e + d, self.total_sq - e * e + d * d, self.nonzero - (old != 0) + (x != 0)
+
+    def update(self, x: float):
+        self.total, self.total_sq, self.nonzero = self._sums_with(x)
+        if not self.full:
+            self.values.append(x)
+            if self.full:
+                self._resum()
+            return
+        self.values[self.pos] = x
+        self.pos = (self.pos + 1) % self.window
+        if self.pos == 0:
+            self._resum()
+
+    def _full_after_push(self) -> bool:
+        return self.full or len(self.values) + 1 == self.window
+
+    def _stats(self, total: float, total_sq: float, nonzero: int, full: bool, ddof: int = 1):
+        """(和, 均值, 标准差)"""
+        if not full:
+            return NAN, NAN, NAN
+        if nonzero == 0:
+            return 0.0, 0.0, 0.0
+        w = self.window
+        std = math.sqrt(max((total_sq - total * total / w) / (w - ddof), 0.0)) if w > ddof else NAN
+        return total + w * self.shift, self.shift + total / w, std
+
+    def sum(self) -> float:
+        return self._stats(self.total, self.total_sq, self.nonzero, self.full)[0]
+
+    def mean(self) -> float:
+        return self._stats(self.total, self.total_sq, self.nonzero, self.full)[1]
+
+    def std(self) -> float:
+        return self._stats(self.total, self.total_sq, self.nonzero, self.full)[2]
+
+    def peek_sum(self, x: float) -> float:
+        """推入 x 后的窗口和，不改变状态"""
+        return self._stats(*self._sums_with(x), full=self._full_after_push())[0]
+
+    def peek_stats(self, x: float):
+        """推入 x 后的 (均值, 标准差)，不改变状态"""
+        return self._stats(*self._sums_with(x), full=self._full_after_push())[1:]
+
+    def to_dict(self) -> dict:
+        return {'window': self.window, 'values': self.values, 'pos': self.pos}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RollingWindow':
+        return cls(data['window'], data['values'], data['pos'])
+
+def _rsi_value(gain: float, loss: float) -> float:
+    """口径同 indicators.rsi：无跌幅时有涨为 100、涨跌皆无为 50"""
+    if gain != gain or loss != loss:
+        return NAN
+    if loss == 0:
+        return 50.0 if gain == 0 else 100.0
+    return 100 - 100 / (1 + gain / loss)
+
+class RsiState:
+    """
+    RSI：默认为涨跌幅的 period 日简单平均（滑动窗口）；wilder=True 时为 Wilder 平滑
+    首根没有涨跌幅，按 0 计入；满 period 根后才有值
+    """
+    __slots__ = ('period', 'wilder', 'prev', 'count', 'gains', 'losses', 'avg_gain', 'avg_loss')
+
+    def __init__(self, period: int = 14, wilder: bool = False):
+        self.period = period
+        self.wilder = wilder
+        self.prev = None
+        self.count = 0
+        self.gains = None if wilder else RollingWindow(period)
+        self.losses = None if wilder else RollingWindow(period)
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def _moves(self, x: float):
+        delta = 0.0 if self.prev is None else x - self.prev
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def _value(self, count, gain, loss) -> float:
+        return _rsi_value(gain, loss) if count >= self.period else NAN
+
+    def peek(self, x: float) -> float:
+        gain, loss = self._moves(x)
+        if self.wilder:
+            alpha = 1 / self.period
+            return self._value(self.count + 1, (1 - alpha) * self.avg_gain + alpha * gain,
+                               (1 - alpha) * self.avg_loss + alpha * loss)
+        return self._value(self.count + 1, self.gains.peek_sum(gain), self.losses.peek_sum(loss))
+
+    def update(self, x: float) -> float:
+        gain, loss = self._moves(x)
+        self.prev = x
+        self.count += 1
+        if self.wilder:
+            alpha = 1 / self.period
+            self.avg_gain = (1 - alpha) * self.avg_gain + alpha * gain
+            self.avg_loss = (1 - alpha) * self.avg_loss + alpha * loss
+            return self.value
+        self.gains.update(gain)
+        self.losses.update(loss)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.wilder:
+            return self._value(self.count, self.avg_gain, self.avg_loss)
+        return self._value(self.count, self.gains.sum(), self.losses.sum())
+
+    def to_dict(self) -> dict:
+        data = {'period': self.period, 'wilder': self.wilder, 'prev': self.prev, 'count': self.count}
+        if self.wilder:
+            data.update(avg_gain=self.avg_gain, avg_loss=self.avg_loss)
+        else:
+            data.update(gains=self.gains.to_dict(), losses=self.losses.to_dict())
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RsiState':
+        state = cls(data['period'], data['wilder'])
+        state.prev, state.count = data['prev'], data['count']
+        if state.wilder:
+            state.avg_gain, state.avg_loss = data['avg_gain'], data['avg_loss']
+        else:
+            state.gains = RollingWindow.from_dict(data['gains'])
+            state.losses = RollingWindow.from_dict(data['losses'])
+        return state
+
+class MacdState:
+    """MACD：DIF = EMA(fast) - EMA(slow)，DEA = DIF 的 EMA(signal)，柱 = DIF - DEA"""
+    __slots__ = ('fast', 'slow', 'signal')
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: Optional[int] = 9):
+        self.fast = EmaState(fast)
+        self.slow = EmaState(slow)
+        self.signal = EmaState(signal) if signal else None
+
+    def peek(self, x: float) -> Dict[str, float]:
+        dif = self.fast.peek(x) - self.slow.peek(x)
+        if self.signal is None:
+            return {'macd': dif}
+        dea = self.signal.peek(dif)
+        return {'macd': dif, 'macd_signal': dea, 'macd_hist': dif - dea}
+
+    def update(self, x: float) -> Dict[str, float]:
+        dif = self.fast.update(x) - self.slow.update(x)
+        if self.signal is None:
+            return {'macd': dif}
+        dea = self.signal.update(dif)
+        return {'macd': dif, 'macd_signal': dea, 'macd_hist': dif - dea}
+
+    def to_dict(self) -> dict:
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(),
+                'signal': self.signal.to_dict() if self.signal else None}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MacdState':
+        state = cls.__new__(cls)
+        state.fast = EmaState.from_dict(data['fast'])
+        state.slow = EmaState.from_dict(data['slow'])
+        state.signal = EmaState.from_dict(data['signal']) if data['signal'] else None
+        return state
+
+class IndicatorState:
+    """
+    按 IndicatorSpec 组合的增量指标（每个 symbol × 周期 一个实例）
+    update() 推入一根已收盘K线，返回与 compute_indicators(全部K线) 最后一行同名的指标；
+    peek() 给出当前未收盘K线的临时值；key（如K线时间）不大于上次时跳过，重启后重放历史不会重复计入
+    """
+
+    def __init__(self, spec: IndicatorSpec = DEFAULT_SPEC):
+        self.spec = spec
+        self.count = 0
+        self.last_key = None
+        self.latest: Dict[str, float] = {}
+        windows = set(spec.ma_periods) | ({spec.boll[0]} if spec.boll else set())
+        self.windows = {period: RollingWindow(period) for period in sorted(windows)}
+        self.emas = {span: EmaState(span) for span in spec.ema_spans}
+        self.rsi = RsiState(spec.rsi_period, spec.rsi_wilder) if spec.rsi_period else None
+        self.macd = MacdState(*spec.macd, spec.macd_signal) if spec.macd else None
+        self.volume = RollingWindow(spec.vol_period) if spec.vol_period else None
+        self.returns = RollingWindow(spec.volatility_period) if spec.volatility_period else None
+        # 动量 / 波动率需要的最近收盘价
+        self.closes = deque(maxlen=max(spec.momentum_periods + (1,)) + 1)
+
+    def _compute(self, close: float, volume: Optional[float], commit: bool) -> Dict[str, float]:
+        spec = self.spec
+        values = {}
+        stats = {}
+        for period, window in self.windows.items():
+            if commit:
+                window.update(close)
+                stats[period] = (window.mean(), window.std())
+            else:
+                stats[period] = window.peek_stats(close)
+        for period in spec.ma_periods:
+            values[f'ma{period}'] = stats[period][0]
+        for span, state in self.emas.items():
+            values[f'ema{span}'] = state.update(close) if commit else state.peek(close)
+        if self.rsi is not None:
+            values['rsi'] = self.rsi.update(close) if commit else self.rsi.peek(close)
+        if self.macd is not None:
+            values.update(self.macd.update(close) if commit else self.macd.peek(close))
+        if spec.boll:
+            period, width = spec.boll
+            mid, std = stats[period]
+            values.update(boll_mid=mid, boll_upper=mid + width * std, boll_lower=mid - width * std)
+        if self.volume is not None and volume is not None:
+            if commit:
+                self.volume.update(volume)
+                vol_ma = self.volume.mean()
+            else:
+                vol_ma = self.volume.peek_stats(volume)[0]
+            values.update(vol_ma=vol_ma, vol_ratio=volume / (vol_ma + VOL_RATIO_EPS))
+        history = list(self.closes) + [close]
+        for k in spec.momentum_periods:
+            values[f'momentum_{k}'] = close / history[-k - 1] - 1 if len(history) > k else NAN
+        if self.returns is not None:
+            ret = close / history[-2] - 1 if len(history) > 1 else None
+            if ret is None:
+                values['volatility'] = NAN
+            elif commit:
+                self.returns.update(ret)
+                values['volatility'] = self.returns.std()
+            else:
+                values['volatility'] = self.returns.peek_stats(ret)[1]
+        if commit:
+            self.closes.append(close)
+            self.count += 1
+        return values
+
+    def update(self, close: float, volume: float = None, key=None) -> Dict[str, float]:
+        if key is not None and self.last_key is not None and key <= self.last_key:
+            return self.latest
+        self.latest = self._compute(float(close), None if volume is None else float(volume), commit=True)
+        if key is not None:
+            self.last_key = key
+        return self.latest
+
+    def peek(self, close: float, volume: float = None) -> Dict[str, float]:
+        return self._compute(float(close), None if volume is None else float(volume), commit=False)
+
+    def to_dict(self) -> dict:
+        return {
+            'spec': asdict(self.spec),
+            'count': self.count,
+            'last_key': self.last_key,
+            'latest': self.latest,
+            'windows': [window.to_dict() for window in self.windows.values()],
+            'emas': [state.to_dict() for state in self.emas.values()],
+            'rsi': self.rsi.to_dict() if self.rsi else None,
+            'macd': self.macd.to_dict() if self.macd else None,
+            'volume': self.volume.to_dict() if self.volume else None,
+            'returns': self.returns.to_dict() if self.returns else None,
+            'closes': list(self.closes),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'IndicatorState':
+        spec = IndicatorSpec(**{name: tuple(value) if isinstance(value, list) else value
+                                for name, value in data['spec'].items()})
+        state = cls(spec)
+        state.count, state.last_key, state.latest = data['count'], data['last_key'], data['latest']
+        state.windows = {w['window']: RollingWindow.from_dict(w) for w in data['windows']}
+        state.emas = {e['span']: EmaState.from_dict(e) for e in data['emas']}
+        state.rsi = RsiState.from_dict(data['rsi']) if data['rsi'] else None
+        state.macd = MacdState.from_dict(data['macd']) if data['macd'] else None
+        state.volume = RollingWindow.from_dict(data['volume']) if data['volume'] else None
+        state.returns = RollingWindow.from_dict(data['returns']) if data['returns'] else None
+        state.closes.extend(data['closes'])
+        return state
+
+class IndicatorStateStore:
+    """
+    增量指标状态的磁盘存储：每个周期一个 JSON 文件 {symbol: state}，临时文件 + os.replace 原子写入
+    状态带 last_key，次日 / 重启后加载继续推入新K线即可
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or DEFAULT_STATE_DIR
+        self._lock = threading.Lock()
+
+    def _path(self, period: str) -> str:
+        return os.path.join(self.root, f'{period}.json')
+
+    def load(self, period: str = "D") -> Dict[str, IndicatorState]:
+        try:
+            with open(self._path(period), 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {symbol: IndicatorState.from_dict(data) for symbol, data in records.items()}
+
+    def save(self, states: Dict[str, IndicatorState], period: str = "D"):
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            path = self._path(period)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({symbol: state.to_dict() for symbol, state in states.items()}, f)
+            os.replace(tmp_path, path)
+
+_default_store = None
+
+def get_indicator_state_store() -> IndicatorStateStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = IndicatorStateStore()
+    return _default_store
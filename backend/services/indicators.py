@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 技术指标库
+MA / EMA / RSI / MACD / 布林带 / 量比 / 动量 / 波动率 统一口径，单序列与面板（行 = 股票、列 = 时间，
+左侧 NaN 补齐）共用同一套 NumPy 内核；各分析器按 IndicatorSpec 声明所需指标，一帧只算一遍。
+
+口径（与各脚本原先的 pandas 写法一致，数值误差 < 1e-9）：
+- MA：rolling(n).mean()；窗口内有缺失则为 NaN
+- EMA：ewm(span, adjust=True).mean()；NaN 不计权重但占位
+- RSI：涨跌幅的 n 日简单平均（首根没有涨跌幅，按 0 计入）；窗口无跌幅时有涨为 100、涨跌皆无为 50；
+  rsi_wilder=True 时改用 Wilder 平滑（ewm(alpha=1/n, adjust=False)）
+- MACD：DIF = EMA(fast) - EMA(slow)，DEA = DIF 的 EMA(signal)，柱 = DIF - DEA
+- 布林带：中轨 MA(n)，上下轨 ± k 倍 rolling(n).std()（ddof=1）
+- 量比：volume / (MA(volume, n) + 1e-10)；动量：pct_change(k)；波动率：pct_change() 的 rolling(n).std()
+"""
+
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+# EMA 分块扫描的块长：块内一次矩阵乘法，块间只传递一个累计值
+EMA_BLOCK = 64
+
+# 量比分母的保护项（沿用各脚本原口径）
+VOL_RATIO_EPS = 1e-10
+
+# 依赖成交量的输出列（帧无 volume 列时不写）
+VOLUME_COLUMNS = ('vol_ma', 'vol_ratio')
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    """
+    声明要计算的指标集合；None / 空元组表示不计算该项
+    macd 为 (fast, slow)，macd_signal 为 DEA 周期（None 时只算 DIF）；boll 为 (周期, 倍数)
+    """
+    ma_periods: Tuple[int, ...] = (5, 10, 20, 34)
+    ema_spans: Tuple[int, ...] = ()
+    rsi_period: Optional[int] = 14
+    rsi_wilder: bool = False
+    macd: Optional[Tuple[int, int]] = None
+    macd_signal: Optional[int] = 9
+    boll: Optional[Tuple[int, float]] = None
+    vol_period: Optional[int] = 20
+    momentum_periods: Tuple[int, ...] = (10,)
+    volatility_period: Optional[int] = None
+
+    def min_bars(self) -> Dict[str, int]:
+        """各输出列有意义所需的最少K线数（add_indicators 据此跳过帧长不足的列）"""
+        bars = {f'ma{p}': p for p in self.ma_periods}
+        bars.update({f'ema{s}': 1 for s in self.ema_spans})
+        if self.rsi_period:
+            bars['rsi'] = self.rsi_period + 1
+        if self.macd:
+            bars['macd'] = max(self.macd)
+            if self.macd_signal:
+                bars['macd_signal'] = bars['macd_hist'] = max(self.macd)
+        if self.boll:
+            bars.update(dict.fromkeys(('boll_mid', 'boll_upper', 'boll_lower'), self.boll[0]))
+        if self.vol_period:
+            bars['vol_ma'] = bars['vol_ratio'] = self.vol_period
+        bars.update({f'momentum_{k}': k + 1 for k in self.momentum_periods})
+        if self.volatility_period:
+            bars['volatility'] = self.volatility_period + 1
+        return bars
+
+DEFAULT_SPEC = IndicatorSpec()
+
+@dataclass(frozen=True)
+class Indicators:
+    """
+    指标计算结果：列名 -> 数组，最后一维为时间
+    单序列输入为一维、面板输入为 (股票数, 时间)；latest_indicators 的时间维长度为 1
+    """
+    spec: IndicatorSpec
+    columns: Dict[str, np.ndarray]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columns)
+
+    def at(self, i: int = -1) -> Dict[str, object]:
+        """第 i 根K线的全部指标：单序列为 float，面板为每只股票一个值的数组"""
+        return {name: (float(values[i]) if values.ndim == 1 else values[..., i])
+                for name, values in self.columns.items()}
+
+# ============================================================================
+# 内核：沿最后一维计算，支持一维 / 二维
+# ============================================================================
+
+def rolling_sum(values, window: int) -> np.ndarray:
+    """滑动窗口求和，前 window-1 根及窗口内有 NaN 时为 NaN（窗口内逐个相加，全 0 窗口结果精确为 0）"""
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    n = x.shape[-1]
+    if window < 1 or window > n:
+        return out
+    valid = ~np.isnan(x)
+    total = np.lib.stride_tricks.sliding_window_view(np.where(valid, x, 0.0), window, axis=-1).sum(axis=-1)
+    counts = np.cumsum(valid, axis=-1)
+    counts = counts[..., window - 1:] - np.concatenate(
+        [np.zeros(x.shape[:-1] + (1,), dtype=counts.dtype), counts[..., :n - window]], axis=-1)
+    out[..., window - 1:] = np.where(counts == window, total, np.nan)
+    return out
+
+def rolling_mean(values, window: int) -> np.ndarray:
+    return rolling_sum(values, window) / window
+
+# rolling_std 逐窗口两遍法：每批行数 × 时间 × 窗口 不超过该元素数，控制临时数组大小
+STD_CHUNK = 1 << 22
+
+def rolling_std(values, window: int, ddof: int = 1) -> np.ndarray:
+    """滑动标准差（同 pandas rolling(window).std()，ddof=1）；逐窗口先减均值再平方，平盘窗口精确为 0"""
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    n = x.shape[-1]
+    if window <= ddof or window > n:
+        return out
+    rows, result = x.reshape(-1, n), out.reshape(-1, n)
+    step = max(1, STD_CHUNK // (n * window))
+    for r in range(0, len(rows), step):
+        windows = np.lib.stride_tricks.sliding_window_view(rows[r:r + step], window, axis=-1)
+        result[r:r + step, window - 1:] = windows.std(axis=-1, ddof=ddof)
+    return out
+
+def pct_change(values, periods: int = 1) -> np.ndarray:
+    """同 pandas pct_change(periods)（不前向填充）"""
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if 0 < periods < x.shape[-1]:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[..., periods:] = x[..., periods:] / x[..., :-periods] - 1
+    return out
+
+def _decayed_sum(values: np.ndarray, decay: float) -> np.ndarray:
+    """s[t] = x[t] + decay * s[t-1]；块内用下三角权重矩阵一次乘完，块间只传递块末累计值"""
+    shape = values.shape
+    n = shape[-1]
+    if n == 0:
+        return values.copy()
+    block = min(EMA_BLOCK, n)
+    blocks = -(-n // block)
+    x = values.reshape(-1, n)
+    if blocks * block != n:
+        x = np.concatenate([x, np.zeros((len(x), blocks * block - n))], axis=1)
+    lag = np.arange(block)[:, None] - np.arange(block)[None, :]
+    kernel = np.where(lag >= 0, decay ** np.maximum(lag, 0), 0.0)
+    local = x.reshape(len(x), blocks, block) @ kernel.T
+    carry_weights = decay ** np.arange(1, block + 1)
+    carry = None
+    for b in range(blocks):
+        if carry is not None:
+            local[:, b] += carry[:, None] * carry_weights
+        carry = local[:, b, -1]
+    return local.reshape(len(x), -1)[:, :n].reshape(shape)
+
+def _decayed_last(values: np.ndarray, decay: float) -> np.ndarray:
+    """_decayed_sum 的最后一项：一次点积"""
+    return values @ decay ** np.arange(values.shape[-1] - 1, -1, -1)
+
+def ema(values, span: int) -> np.ndarray:
+    """同 pandas ewm(span=span).mean()（adjust=True）"""
+    x = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(x)
+    decay = 1 - 2 / (span + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _decayed_sum(np.where(valid, x, 0.0), decay) / _decayed_sum(valid.astype(np.float64), decay)
+
+def ema_last(values, span: int) -> np.ndarray:
+    """只取最后一根的 EMA（与 ema(values, span)[..., -1] 的相对误差 < 1e-12）"""
+    x = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(x)
+    decay = 1 - 2 / (span + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _decayed_last(np.where(valid, x, 0.0), decay) / _decayed_last(valid.astype(np.float64), decay)
+
+def rsi(close, period: int = 14, wilder: bool = False) -> np.ndarray:
+    """
+    RSI（首根涨跌按 0 计入，满 period 根后有值；无跌幅时有涨为 100、涨跌皆无为 50）
+    默认为涨跌幅的简单平均；wilder=True 时为 Wilder 平滑（首根涨跌为 0，平滑值即 α·Σ(1-α)^k·涨跌）
+    """
+    x = np.asarray(close, dtype=np.float64)
+    delta = np.diff(x, axis=-1, prepend=np.nan)
+    # 前一根缺失（序列首根 / 面板补齐段之后第一根）按 0 计入，本根缺失仍为 NaN
+    delta = np.where(np.isnan(delta) & ~np.isnan(x), 0.0, delta)
+    ups = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0))
+    downs = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0))
+    if wilder:
+        alpha = 1 / period
+        valid = ~np.isnan(x)
+        ready = valid & (np.cumsum(valid, axis=-1) >= period)
+        gain = np.where(ready, alpha * _decayed_sum(np.nan_to_num(ups), 1 - alpha), np.nan)
+        loss = np.where(ready, alpha * _decayed_sum(np.nan_to_num(downs), 1 - alpha), np.nan)
+    else:
+        gain = rolling_sum(ups, period)
+        loss = rolling_sum(downs, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100 - 100 / (1 + gain / loss)
+    return np.where((gain == 0) & (loss == 0), 50.0, out)
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """返回 (DIF, DEA, 柱)"""
+    dif = ema(close, fast) - ema(close, slow)
+    dea = ema(dif, signal)
+    return dif, dea, dif - dea
+
+def bollinger(close, period: int = 20, width: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """返回 (中轨, 上轨, 下轨)"""
+    mid = rolling_mean(close, period)
+    std = rolling_std(close, period)
+    return mid, mid + width * std, mid - width * std
+
+# ============================================================================
+# 按 IndicatorSpec 批量计算
+# ============================================================================
+
+def _tail(x: np.ndarray, width: int) -> np.ndarray:
+    """最后 width 根（不足时左侧补 NaN），使尾部窗口计算与全序列的最后一项逐位一致"""
+    n = x.shape[-1]
+    if width <= n:
+        return x[..., n - width:]
+    pad = np.full(x.shape[:-1] + (width - n,), np.nan)
+    return np.concatenate([pad, x], axis=-1)
+
+def compute_indicators(close, volume=None, spec: IndicatorSpec = DEFAULT_SPEC) -> Indicators:
+    """
+    一次计算 spec 声明的全部指标（逐K线序列）
+    close / volume 为一维序列或 (股票数, 时间) 面板；量比需要 volume，未提供时跳过
+    """
+    close = np.asarray(close, dtype=np.float64)
+    columns = {}
+    for period in spec.ma_periods:
+        columns[f'ma{period}'] = rolling_mean(close, period)
+    for span in spec.ema_spans:
+        columns[f'ema{span}'] = ema(close, span)
+    if spec.rsi_period:
+        columns['rsi'] = rsi(close, spec.rsi_period, spec.rsi_wilder)
+    if spec.macd:
+        dif = ema(close, spec.macd[0]) - ema(close, spec.macd[1])
+        columns['macd'] = dif
+        if spec.macd_signal:
+            columns['macd_signal'] = ema(dif, spec.macd_signal)
+            columns['macd_hist'] = dif - columns['macd_signal']
+    if spec.boll:
+        period, width = spec.boll
+        mid = columns.get(f'ma{period}')
+        mid = rolling_mean(close, period) if mid is None else mid
+        std = rolling_std(close, period)
+        columns.update(boll_mid=mid, boll_upper=mid + width * std, boll_lower=mid - width * std)
+    if spec.vol_period and volume is not None:
+        volume = np.asarray(volume, dtype=np.float64)
+        vol_ma = rolling_mean(volume, spec.vol_period)
+        columns.update(vol_ma=vol_ma, vol_ratio=volume / (vol_ma + VOL_RATIO_EPS))
+    for k in spec.momentum_periods:
+        columns[f'momentum_{k}'] = pct_change(close, k)
+    if spec.volatility_period:
+        columns['volatility'] = rolling_std(pct_change(close, 1), spec.volatility_period)
+    return Indicators(spec, columns)
+
+def latest_indicators(close, volume=None, spec: IndicatorSpec = DEFAULT_SPEC) -> Indicators:
+    """
+    只算最后一根K线的指标（结果时间维长度为 1）
+    滑动类指标只取尾部窗口，与 compute_indicators 的最后一项逐位一致；EMA 类用一次点积（相对误差 < 1e-12），
+    需要 DEA 时才对 DIF 做整段扫描
+    """
+    close = np.asarray(close, dtype=np.float64)
+    columns = {}
+    for period in spec.ma_periods:
+        columns[f'ma{period}'] = rolling_mean(_tail(close, period), period)[..., -1:]
+    for span in spec.ema_spans:
+        columns[f'ema{span}'] = ema_last(close, span)[..., None]
+    if spec.rsi_period:
+        # Wilder 平滑依赖全部历史，简单平均只依赖尾部窗口
+        window = close if spec.rsi_wilder else _tail(close, spec.rsi_period + 1)
+        columns['rsi'] = rsi(window, spec.rsi_period, spec.rsi_wilder)[..., -1:]
+    if spec.macd:
+        if spec.macd_signal:
+            dif = ema(close, spec.macd[0]) - ema(close, spec.macd[1])
+            dea = ema_last(dif, spec.macd_signal)
+            dif = dif[..., -1]
+            columns.update(macd=dif[..., None], macd_signal=dea[..., None], macd_hist=(dif - dea)[..., None])
+        else:
+            columns['macd'] = (ema_last(close, spec.macd[0]) - ema_last(close, spec.macd[1]))[..., None]
+    if spec.boll:
+        period, width = spec.boll
+        mid, upper, lower = bollinger(_tail(close, period), period, width)
+        columns.update(boll_mid=mid[..., -1:], boll_upper=upper[..., -1:], boll_lower=lower[..., -1:])
+    if spec.vol_period and volume is not None:
+        volume = np.asarray(volume, dtype=np.float64)
+        vol_ma = rolling_mean(_tail(volume, spec.vol_period), spec.vol_period)[..., -1:]
+        columns.update(vol_ma=vol_ma, vol_ratio=volume[..., -1:] / (vol_ma + VOL_RATIO_EPS))
+    for k in spec.momentum_periods:
+        columns[f'momentum_{k}'] = pct_change(_tail(close, k + 1), k)[..., -1:]
+    if spec.volatility_period:
+        returns = pct_change(_tail(close, spec.volatility_period + 1), 1)
+        columns['volatility'] = rolling_std(returns, spec.volatility_period)[..., -1:]
+    return Indicators(spec, columns)
+
+def _frame_stamp(df: pd.DataFrame) -> tuple:
+    """指标输入的指纹：(根数, 末根时间, 末根收盘, 收盘价之和)"""
+    close = df['close'].to_numpy(dtype=np.float64)
+    last = tuple(str(df[col].iat[-1]) for col in ('date', 'time') if col in df.columns) if len(df) else ()
+    return len(df), last, float(close[-1]) if len(close) else None, float(np.nansum(close))
+
+def add_indicators(df: pd.DataFrame, spec: IndicatorSpec = DEFAULT_SPEC) -> pd.DataFrame:
+    """
+    把 spec 的指标写成 df 的列（原地写入并返回 df）；帧长不足某列所需根数时不写该列
+    已按同一 spec 算过、指纹未变且各输出列都还在的帧直接返回（同一帧在一次运行中只算一遍）；
+    pandas 会把 attrs 带到列子集与拷贝上，因此只凭 attrs 标记不能判定
+    """
+    min_bars = spec.min_bars()
+    expected = [name for name, bars in min_bars.items() if len(df) >= bars
+                and (name not in VOLUME_COLUMNS or 'volume' in df.columns)]
+    stamp = _frame_stamp(df)
+    done = dict(df.attrs.get('indicators', {}))
+    if done.get(spec) == stamp and all(name in df.columns for name in expected):
+        return df
+    volume = df['volume'] if 'volume' in df.columns else None
+    result = compute_indicators(df['close'], volume, spec)
+    for name, values in result.columns.items():
+        if len(df) >= min_bars[name]:
+            df[name] = values
+    done[spec] = stamp
+    df.attrs['indicators'] = done
+    return df
+    volume = df['volume'] if 'volume' in df.columns else None
+    result = compute_indicators(df['close'], volume, spec)
+    min_bars = spec.min_bars()
+    for name, values in result.columns.items():
+        if len(df) >= min_bars[name]:
+            df[name] = values
+    df.attrs['indicators'] = done + (spec,)
+    return df
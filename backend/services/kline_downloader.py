@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 多进程K线下载器
+将股票列表分发给N个工作进程，每个进程独立登录BaoStock，下载完成的K线流式返回主进程
+"""
+
+import os
+import time
+import multiprocessing as mp
+from multiprocessing.util import Finalize
+import pandas as pd
+from tqdm import tqdm
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backend.services.baostock_session import get_bs_session
+from backend.services.data_provider import DataProvider
+from backend.services.kline_store import KlineStore, get_kline_store
+
+# BaoStock服务端对单IP并发连接有限制，默认不宜过多；可用环境变量覆盖
+DEFAULT_WORKERS = int(os.getenv('KLINE_DOWNLOAD_WORKERS', '4'))
+
+# 工作进程内的下载配置，由 _init_worker 设置
+_worker_config: dict = {}
+
+def _logout_worker():
+    """工作进程退出时登出本进程的BaoStock会话（未登录时无操作）"""
+    get_bs_session().logout()
+
+def _init_worker(start_date: str, end_date: Optional[str], frequency: str,
+                 fields: Optional[str], retries: int, retry_delay: float,
+                 store_root: Optional[str], fetcher: Optional[Callable],
+                 provider: Optional[DataProvider] = None):
+    """
+    工作进程初始化：BaoStock客户端是模块级全局socket且非线程安全，
+    每个进程首次查询时由 get_bs_session() 按pid重新登录，互不共享连接。
+    工作进程不走 atexit，登出注册为 multiprocessing 的退出回调，进程池 close()/join() 正常退出时执行
+    """
+    Finalize(None, _logout_worker, exitpriority=10)
+    if store_root or fetcher:
+        store = KlineStore(root=store_root, fetcher=fetcher)
+    else:
+        store = get_kline_store(provider)
+    _worker_config.update(
+        store=store, start_date=start_date, end_date=end_date, frequency=frequency,
+        fields=fields, retries=retries, retry_delay=retry_delay,
+    )
+
+def _fetch_one(symbol: str) -> Tuple[str, Optional[pd.DataFrame], Optional[str]]:
+    """下载单只股票，失败按配置重试；返回 (代码, DataFrame或None, 错误信息)"""
+    cfg = _worker_config
+    last_error = None
+    for attempt in range(cfg['retries'] + 1):
+        try:
+            df = cfg['store'].get_history(symbol, cfg['start_date'], cfg['end_date'],
+                                          frequency=cfg['frequency'], fields=cfg['fields'])
+            return symbol, df, None
+        except Exception as e:
+            last_error = f'{type(e).__name__}: {e}'
+            if attempt < cfg['retries']:
+                time.sleep(cfg['retry_delay'] * (attempt + 1))
+    return symbol, None, last_error
+
+def iter_klines(symbols: Iterable[str], start_date: str, end_date: str = None,
+                frequency: str = 'd', fields: str = None, workers: int = None,
+                retries: int = 2, retry_delay: float = 1.0, progress: bool = True,
+                desc: str = '获取K线', store_root: str = None,
+                fetcher: Callable = None, provider: DataProvider = None) -> Iterator[Tuple[str, Optional[pd.DataFrame], Optional[str]]]:
+    """
+    并行下载K线，按完成顺序逐只产出 (代码, DataFrame, 错误信息)
+
+    workers<=1 时在当前进程串行执行（不启动子进程）。
+    provider 为调用方绑定的数据源（直连/录制/回放），默认走进程默认数据源。
+    store_root/fetcher 仅用于测试或自定义数据源，fetcher 需可被pickle（模块级函数）。
+    """
+    symbols = list(symbols)
+    workers = DEFAULT_WORKERS if workers is None else workers
+    workers = max(1, min(workers, len(symbols) or 1))
+    init_args = (start_date, end_date, frequency, fields, retries, retry_delay, store_root, fetcher, provider)
+
+    bar = tqdm(total=len(symbols), desc=desc, disable=not progress)
+    try:
+        if workers == 1:
+            _init_worker(*init_args)
+            for symbol in symbols:
+                result = _fetch_one(symbol)
+                bar.update(1)
+                yield result
+            return
+
+        pool = mp.Pool(processes=workers, initializer=_init_worker, initargs=init_args)
+        try:
+            # chunksize=1 动态分发，慢股票不会拖住整个分片
+            for result in pool.imap_unordered(_fetch_one, symbols, chunksize=1):
+                bar.update(1)
+                yield result
+            # 正常结束时让工作进程自行退出，执行登出回调
+            pool.close()
+        except BaseException:
+            # 出错或调用方提前停止迭代时不等待剩余任务
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    finally:
+        bar.close()
+
+def download_klines(symbols: Iterable[str], start_date: str, end_date: str = None,
+                    frequency: str = 'd', fields: str = None, workers: int = None,
+                    min_bars: int = 0, retries: int = 2, progress: bool = True,
+                    desc: str = '获取K线', store_root: str = None,
+                    fetcher: Callable = None, provider: DataProvider = None) -> Dict[str, pd.DataFrame]:
+    """
+    并行下载K线并汇总为 {代码: DataFrame}，丢弃不足 min_bars 根的股票
+    """
+    symbols = list(symbols)
+    kline_data: Dict[str, pd.DataFrame] = {}
+    failed: List[str] = []
+    for symbol, df, error in iter_klines(symbols, start_date, end_date, frequency, fields,
+                                         workers=workers, retries=retries, progress=progress,
+                                         desc=desc, store_root=store_root, fetcher=fetcher,
+                                         provider=provider):
+        if error is not None:
+            failed.append(symbol)
+            continue
+        if df is not None and not df.empty and len(df) >= min_bars:
+            kline_data[symbol] = df
+
+    # 按输入顺序返回，保证下游排序结果与串行下载一致
+    kline_data = {s: kline_data[s] for s in symbols if s in kline_data}
+    if failed:
+        print(f'⚠️ {len(failed)} 只股票下载失败: {", ".join(failed[:10])}{" ..." if len(failed) > 10 else ""}')
+    return kline_data
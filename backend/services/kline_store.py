@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 本地K线列式存储
+按 (股票代码, 周期) 分区保存带类型的OHLCV列，增量追加最新K线
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Union
+
+from backend.services.data_provider import DataProvider, get_data_provider
+from backend.services.bar_parser import parse_column
+
+# 项目根目录下的 data/cache/kline
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+DEFAULT_STORE_DIR = os.path.join(DATA_DIR, 'cache', 'kline')
+
+# 分钟级别周期（BaoStock frequency 取值）
+MINUTE_FREQUENCIES = {'5', '15', '30', '60'}
+
+# 当日已检查过的分区在该秒数内不再请求增量：分钟线按一根K线的时长，日/周/月线一小时
+REFRESH_INTERVALS = {'5': 300, '15': 900, '30': 1800, '60': 3600, 'd': 3600, 'w': 3600, 'm': 3600}
+
+# 录制 / 回放模式的数据源使用不落盘的存储，使每次运行都发出完整（非增量）请求
+EPHEMERAL_MODES = ('record', 'replay')
+
+# 每个周期统一抓取并存储的数值列（全部为 float64）
+DAILY_FIELDS = ['open', 'high', 'low', 'close', 'preclose', 'volume', 'amount', 'turn', 'pctChg']
+WEEKLY_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'amount', 'turn', 'pctChg']
+MINUTE_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'amount']
+
+def store_fields(frequency: str) -> List[str]:
+    """返回某个周期存储的数值列"""
+    if frequency in MINUTE_FREQUENCIES:
+        return MINUTE_FIELDS
+    if frequency in ('w', 'm'):
+        return WEEKLY_FIELDS
+    return DAILY_FIELDS
+
+def _query_baostock(symbol: str, fields: str, start_date: str, end_date: str,
+                    frequency: str) -> pd.DataFrame:
+    """默认抓取函数：走进程默认数据源（直连/录制/回放）"""
+    return get_data_provider().query_history_k_data_plus(symbol, fields,
+                                                         start_date=start_date, end_date=end_date,
+                                                         frequency=frequency)
+
+class KlineStore:
+    """
+    本地K线列式存储
+
+    每个 (symbol, frequency) 一个 .npz 分区，列为 date(datetime64[D])、
+    time(int64, 仅分钟线)及 float64 数值列。get_history 只向数据源请求
+    最后一根已存K线之后的增量，重复运行不产生网络请求。
+    persist=False 时分区只保存在进程内存中，不读写磁盘。
+    """
+
+    def __init__(self, root: str = None, fetcher: Callable = None,
+                 refresh_interval: Union[float, Dict[str, float]] = None, clock: Callable[[], datetime] = None,
+                 persist: bool = True):
+        self.root = root or DEFAULT_STORE_DIR
+        self.persist = persist
+        self.fetcher = fetcher or _query_baostock
+        # 当前时间取数据源视角（回放时为录制时间），保证回放的增量区间与录制一致
+        self.clock = clock or (lambda: get_data_provider().now())
+        # 距上次检查不足该秒数时直接读本地，不再请求增量；传数字则对所有周期生效
+        if refresh_interval is None:
+            refresh_interval = REFRESH_INTERVALS
+        elif not isinstance(refresh_interval, dict):
+            refresh_interval = dict.fromkeys(REFRESH_INTERVALS, refresh_interval)
+        self.refresh_interval = dict(refresh_interval)
+        self._memory: Dict[tuple, Dict[str, np.ndarray]] = {}
+
+    # ------------------------------------------------------------------
+    # 分区读写
+    # ------------------------------------------------------------------
+
+    def _partition_path(self, symbol: str, frequency: str) -> str:
+        return os.path.join(self.root, frequency, f'{symbol}.npz')
+
+    def _empty_partition(self, frequency: str) -> Dict[str, np.ndarray]:
+        part = {'date': np.array([], dtype='datetime64[D]')}
+        if frequency in MINUTE_FREQUENCIES:
+            part['time'] = np.array([], dtype=np.int64)
+        for col in store_fields(frequency):
+            part[col] = np.array([], dtype=np.float64)
+        part['covered_from'] = np.array(['NaT'], dtype='datetime64[D]')
+        part['fetched_to'] = np.array(['NaT'], dtype='datetime64[D]')
+        part['checked_at'] = np.array([0.0])
+        return part
+
+    def _load(self, symbol: str, frequency: str) -> Dict[str, np.ndarray]:
+        key = (symbol, frequency)
+        if key in self._memory:
+            return self._memory[key]
+
+        path = self._partition_path(symbol, frequency)
+        if self.persist and os.path.exists(path):
+            try:
+                with np.load(path, allow_pickle=False) as npz:
+                    part = {name: npz[name] for name in npz.files}
+            except Exception:
+                # 分区损坏时丢弃并重新抓取
+                part = self._empty_partition(frequency)
+        else:
+            part = self._empty_partition(frequency)
+
+        self._memory[key] = part
+        return part
+
+    def _save(self, symbol: str, frequency: str, part: Dict[str, np.ndarray]):
+        if not self.persist:
+            self._memory[(symbol, frequency)] = part
+            return
+        path = self._partition_path(symbol, frequency)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换，避免并发读到半个文件
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        # 分钟线条数是日线的几十倍，压缩保存
+        save = np.savez_compressed if frequency in MINUTE_FREQUENCIES else np.savez
+        with open(tmp_path, 'wb') as f:
+            save(f, **part)
+        os.replace(tmp_path, path)
+        self._memory[(symbol, frequency)] = part
+
+    # ------------------------------------------------------------------
+    # 类型转换
+    # ------------------------------------------------------------------
+
+    def _to_columns(self, raw_df: pd.DataFrame, frequency: str) -> Dict[str, np.ndarray]:
+        """BaoStock 字符串结果 -> 带类型的列"""
+        cols = {'date': pd.to_datetime(raw_df['date']).values.astype('datetime64[D]')}
+        if frequency in MINUTE_FREQUENCIES:
+            # BaoStock time 形如 20250627093500000，保留到秒
+            cols['time'] = raw_df['time'].astype(str).str[:14].astype(np.int64).values
+        for col in store_fields(frequency):
+            if col in raw_df.columns:
+                cols[col] = parse_column(raw_df[col], extract_number=(col == 'amount'))
+            else:
+                cols[col] = np.full(len(raw_df), np.nan)
+        return cols
+
+    def _sort_key(self, cols: Dict[str, np.ndarray], frequency: str) -> np.ndarray:
+        if frequency in MINUTE_FREQUENCIES:
+            return cols['time']
+        return cols['date'].astype(np.int64)
+
+    def append(self, symbol: str, frequency: str, cols: Dict[str, np.ndarray]) -> int:
+        """追加新K线（只保留比已存最后一根更新的部分），返回新增条数"""
+        part = self._load(symbol, frequency)
+        if len(cols['date']) == 0:
+            return 0
+
+        new_key = self._sort_key(cols, frequency)
+        old_key = self._sort_key(part, frequency)
+        if len(old_key):
+            mask = new_key > old_key[-1]
+        else:
+            mask = np.ones(len(new_key), dtype=bool)
+        if not mask.any():
+            return 0
+
+        merged = dict(part)
+        for name, values in cols.items():
+            merged[name] = np.concatenate([part[name], values[mask]])
+        self._save(symbol, frequency, merged)
+        return int(mask.sum())
+
+    def _prepend(self, symbol: str, frequency: str, cols: Dict[str, np.ndarray]) -> int:
+        """向前补齐早于已存第一根的历史K线，返回新增条数"""
+        part = self._load(symbol, frequency)
+        new_key = self._sort_key(cols, frequency)
+        old_key = self._sort_key(part, frequency)
+        mask = new_key < old_key[0] if len(old_key) else np.ones(len(new_key), dtype=bool)
+        if not mask.any():
+            return 0
+        merged = dict(part)
+        for name, values in cols.items():
+            merged[name] = np.concatenate([values[mask], part[name]])
+        self._save(symbol, frequency, merged)
+        return int(mask.sum())
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+
+    def last_date(self, symbol: str, frequency: str = 'd') -> Optional[str]:
+        """已存最后一根K线的日期"""
+        part = self._load(symbol, frequency)
+        if len(part['date']) == 0:
+            return None
+        return str(part['date'][-1])
+
+    def update(self, symbol: str, start_date: str, end_date: str = None,
+               frequency: str = 'd') -> int:
+        """
+        同步分区到 end_date：只请求已存最后一根之后的K线，
+        若 start_date 早于已覆盖的起点则补齐前段。返回新增条数
+        """
+        now = self.clock()
+        end_date = end_date or now.strftime('%Y-%m-%d')
+        part = self._load(symbol, frequency)
+        fields = store_fields(frequency)
+        key_fields = 'date,time,code' if frequency in MINUTE_FREQUENCIES else 'date,code'
+        query_fields = f"{key_fields},{','.join(fields)}"
+
+        start = np.datetime64(start_date, 'D')
+        end = np.datetime64(end_date, 'D')
+        covered_from = part['covered_from'][0]
+        fetched_to = part['fetched_to'][0]
+        added = 0
+
+        # 前段补齐
+        if np.isnat(covered_from) or start < covered_from:
+            head_end = end if np.isnat(covered_from) else covered_from - 1
+            raw = self.fetcher(symbol, query_fields, start_date, str(head_end), frequency)
+            if raw is not None and not raw.empty:
+                cols = self._to_columns(raw, frequency)
+                if np.isnat(covered_from):
+                    added += self.append(symbol, frequency, cols)
+                else:
+                    added += self._prepend(symbol, frequency, cols)
+            part = self._load(symbol, frequency)
+            part['covered_from'] = np.array([start])
+            if np.isnat(fetched_to):
+                fetched_to = end
+
+        # 尾部增量
+        interval = self.refresh_interval.get(frequency, REFRESH_INTERVALS['d'])
+        recently_checked = time.time() - float(part['checked_at'][0]) < interval
+        if fetched_to < end and not recently_checked:
+            last = part['date'][-1] if len(part['date']) else start
+            # 分钟线需重新请求最后一天以补齐当日剩余K线；日线从下一天开始
+            delta_start = last if frequency in MINUTE_FREQUENCIES else last + 1
+            if delta_start <= end:
+                raw = self.fetcher(symbol, query_fields, str(delta_start), end_date, frequency)
+                if raw is not None and not raw.empty:
+                    added += self.append(symbol, frequency, self._to_columns(raw, frequency))
+            part = self._load(symbol, frequency)
+
+        part['fetched_to'] = np.array([max(end, fetched_to) if not np.isnat(fetched_to) else end])
+        # 当日日线收盘后才发布，今天的查询结果不作为最终覆盖
+        today = np.datetime64(now.strftime('%Y-%m-%d'), 'D')
+        if part['fetched_to'][0] >= today:
+            part['fetched_to'] = np.array([today - 1])
+            part['checked_at'] = np.array([time.time()])
+        self._save(symbol, frequency, part)
+        return added
+
+    def read(self, symbol: str, start_date: str = None, end_date: str = None,
+             frequency: str = 'd', fields: List[str] = None) -> pd.DataFrame:
+        """读取本地分区，返回与 BaoStock get_data() 同名列的 DataFrame（数值列已为 float64）"""
+        part = self._load(symbol, frequency)
+        dates = part['date']
+        mask = np.ones(len(dates), dtype=bool)
+        if start_date:
+            mask &= dates >= np.datetime64(start_date, 'D')
+        if end_date:
+            mask &= dates <= np.datetime64(end_date, 'D')
+
+        data = {'date': np.datetime_as_string(dates[mask], unit='D')}
+        if frequency in MINUTE_FREQUENCIES:
+            data['time'] = part['time'][mask].astype(str)
+        data['code'] = np.full(int(mask.sum()), symbol, dtype=object)
+        for col in (fields or store_fields(frequency)):
+            if col in ('date', 'time', 'code'):
+                continue
+            data[col] = part[col][mask] if col in part else np.full(int(mask.sum()), np.nan)
+        return pd.DataFrame(data)
+
+    def get_history(self, symbol: str, start_date: str, end_date: str = None,
+                    frequency: str = 'd', fields: List[str] = None) -> pd.DataFrame:
+        """
+        取代 bs.query_history_k_data_plus(...).get_data()：先增量同步再读本地
+        fields 可传 'date,code,open,...' 字符串或列表
+        """
+        if isinstance(fields, str):
+            fields = [f.strip() for f in fields.split(',') if f.strip()]
+        self.update(symbol, start_date, end_date, frequency)
+        return self.read(symbol, start_date, end_date, frequency, fields)
+
+_default_store: Optional[KlineStore] = None
+_provider_stores: Dict[DataProvider, KlineStore] = {}
+
+def get_kline_store(provider: DataProvider = None) -> KlineStore:
+    """
+    进程内共享的K线存储；传入 provider 时返回绑定该数据源的存储
+    录制 / 回放模式不使用本地缓存：录制时缓存已有的K线不会被请求、归档不完整，回放时请求区间随缓存而变
+    """
+    global _default_store
+    if provider is not None:
+        if provider not in _provider_stores:
+            _provider_stores[provider] = KlineStore(fetcher=lambda symbol, fields, start_date, end_date, frequency:
+                provider.query_history_k_data_plus(symbol, fields, start_date=start_date,
+                                                   end_date=end_date, frequency=frequency),
+                clock=provider.now, persist=provider.mode not in EPHEMERAL_MODES)
+        return _provider_stores[provider]
+    if _default_store is None:
+        _default_store = KlineStore(persist=get_data_provider().mode not in EPHEMERAL_MODES)
+    return _default_store
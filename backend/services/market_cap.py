@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 市值缓存服务
+统一 get_market_cap_optimized / MarketCapFilter / ShortTermTradingOptimizer 的市值获取：
+进程内LRU + 磁盘快照，按交易日失效，支持全市场批量刷新；
+无市值数据的结果同样缓存，请求失败只在内存中短暂记录
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from backend.services.kline_store import DATA_DIR
+from backend.services.http_client import HttpClient, get_http_client
+from backend.services.trading_calendar import get_trading_calendar
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(DATA_DIR, 'cache', 'market_cap.json')
+
+EASTMONEY_QUOTE_URL = 'http://push2.eastmoney.com/api/qt/stock/get'
+EASTMONEY_LIST_URL = 'http://push2.eastmoney.com/api/qt/clist/get'
+# 沪深A股（主板/创业板/科创板）
+EASTMONEY_A_SHARE_FS = 'm:0+t:6,m:0+t:80,m:1+t:2,m:1+t:23,m:0+t:81+s:2048'
+
+# 请求失败（超时、非200、响应无法解析）后在该秒数内不再重试
+ERROR_RETRY_SECONDS = 60
+
+def clean_code(symbol: str) -> str:
+    """sh.600000 / sz000001 / 600000 -> 600000"""
+    return symbol.replace('sh.', '').replace('sz.', '').replace('sh', '').replace('sz', '')
+
+def current_trade_date() -> str:
+    """市值所属交易日：非交易日（周末、节假日）回退到上一交易日"""
+    return get_trading_calendar().latest_trading_day()
+
+def _quote_params(code: str) -> dict:
+    market_prefix = '1' if code.startswith('6') else '0'
+    return {'secid': f'{market_prefix}.{code}', 'fields': 'f116,f117'}
+
+def _parse_quote(response) -> Optional[Dict]:
+    """解析东方财富单只行情：f116 总市值、f117 流通市值（元）；无市值返回 None，请求失败抛异常"""
+    response.raise_for_status()
+    data = response.json().get('data') or {}
+    market_cap = data.get('f116') or 0
+    if not isinstance(market_cap, (int, float)) or market_cap <= 0:
+        return None
+    circulating_cap = data.get('f117') or market_cap
+    return {'market_cap': float(market_cap), 'circulating_cap': float(circulating_cap),
+            'source': 'eastmoney'}
+
+def fetch_eastmoney_quote(code: str, timeout: float = 2, client: HttpClient = None,
+                          url: str = EASTMONEY_QUOTE_URL) -> Optional[Dict]:
+    """东方财富单只市值"""
+    response = (client or get_http_client()).get(url, params=_quote_params(code), timeout=timeout)
+    return _parse_quote(response)
+
+def fetch_eastmoney_quotes(codes: Iterable[str], timeout: float = 2, client: HttpClient = None,
+                           url: str = EASTMONEY_QUOTE_URL) -> Dict[str, Optional[Dict]]:
+    """东方财富多只市值并发获取（共享连接池）：无市值的代码为 None，请求失败的代码不出现在结果中"""
+    responses = (client or get_http_client()).get_many(
+        {code: (url, _quote_params(code)) for code in codes}, timeout=timeout)
+    records = {}
+    for code, response in responses.items():
+        if isinstance(response, Exception):
+            continue
+        try:
+            records[code] = _parse_quote(response)
+        except Exception:
+            continue
+    return records
+
+def fetch_eastmoney_all(page_size: int = 500, timeout: float = 5) -> Dict[str, Dict]:
+    """东方财富A股列表分页拉取全市场市值：f12 代码、f20 总市值、f21 流通市值"""
+    client = get_http_client()
+    records = {}
+    page = 1
+    while True:
+        response = client.get(EASTMONEY_LIST_URL, timeout=timeout, params={
+            'pn': page, 'pz': page_size, 'po': 1, 'np': 1, 'fltt': 2, 'invt': 2,
+            'fid': 'f12', 'fs': EASTMONEY_A_SHARE_FS, 'fields': 'f12,f20,f21',
+        })
+        data = response.json().get('data') or {}
+        rows = data.get('diff') or []
+        for row in rows:
+            market_cap = row.get('f20')
+            if isinstance(market_cap, (int, float)) and market_cap > 0:
+                circulating_cap = row.get('f21')
+                records[str(row['f12'])] = {
+                    'market_cap': float(market_cap),
+                    'circulating_cap': float(circulating_cap) if isinstance(circulating_cap, (int, float)) else float(market_cap),
+                    'source': 'eastmoney',
+                }
+        if not rows or page * page_size >= data.get('total', 0):
+            break
+        page += 1
+    return records
+
+class MarketCapService:
+    """
+    市值缓存
+
+    记录为 {'market_cap': 元, 'circulating_cap': 元, 'source': ...}；数据源正常返回但没有市值
+    （停牌、退市等）缓存为 None（负缓存），同一交易日内不再重复请求，随快照落盘。
+    请求失败不写入缓存与快照，只在内存中记录 retry_interval 秒，到期后重新请求。
+    两种情况都返回 None，调用方自行决定估算兜底。
+    """
+
+    def __init__(self, snapshot_path: str = None, maxsize: int = 8192,
+                 fetcher: Callable[[str], Optional[Dict]] = None,
+                 many_fetcher: Callable[[List[str]], Dict[str, Optional[Dict]]] = None,
+                 bulk_fetcher: Callable[[], Dict[str, Dict]] = None,
+                 trade_date_func: Callable[[], str] = None,
+                 retry_interval: float = ERROR_RETRY_SECONDS):
+        self.snapshot_path = snapshot_path or DEFAULT_SNAPSHOT_PATH
+        self.maxsize = maxsize
+        self.fetcher = fetcher or fetch_eastmoney_quote
+        self.many_fetcher = many_fetcher or fetch_eastmoney_quotes
+        self.bulk_fetcher = bulk_fetcher or fetch_eastmoney_all
+        self.trade_date_func = trade_date_func or current_trade_date
+        self.retry_interval = retry_interval
+        self._lru: 'OrderedDict[str, Optional[Dict]]' = OrderedDict()
+        self._trade_date: Optional[str] = None
+        self._snapshot: Dict[str, Optional[Dict]] = {}
+        # 请求失败的代码 -> 允许重试的时刻（time.monotonic）
+        self._failed: Dict[str, float] = {}
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # 交易日失效与磁盘快照
+    # ------------------------------------------------------------------
+
+    def _roll(self):
+        """交易日变化时清空缓存并加载当日快照"""
+        trade_date = self.trade_date_func()
+        if trade_date == self._trade_date:
+            return
+        self._trade_date = trade_date
+        self._lru.clear()
+        self._snapshot = {}
+        self._failed = {}
+        self._dirty = False
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('trade_date') == trade_date:
+                self._snapshot = snapshot.get('records', {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        """把当日缓存写回磁盘快照"""
+        with self._lock:
+            if not self._dirty or self._trade_date is None:
+                return
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp_path = f'{self.snapshot_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'trade_date': self._trade_date, 'records': self._snapshot},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+            self._dirty = False
+
+    def _failed_recently(self, code: str) -> bool:
+        return self._failed.get(code, 0) > time.monotonic()
+
+    def _mark_failed(self, code: str):
+        self._failed[code] = time.monotonic() + self.retry_interval
+
+    def _remember(self, code: str, record: Optional[Dict]):
+        self._lru[code] = record
+        self._lru.move_to_end(code)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        """获取市值记录；无市值或请求失败（含刚失败过、未到重试时间）返回 None"""
+        code = clean_code(symbol)
+        with self._lock:
+            self._roll()
+            if code in self._lru:
+                self._lru.move_to_end(code)
+                return self._lru[code]
+            if code in self._snapshot:
+                record = self._snapshot[code]
+                self._remember(code, record)
+                return record
+            if self._failed_recently(code):
+                return None
+
+        try:
+            record = self.fetcher(code)
+        except Exception:
+            with self._lock:
+                self._mark_failed(code)
+            return None
+
+        with self._lock:
+            self._failed.pop(code, None)
+            self._snapshot[code] = record
+            self._dirty = True
+            self._remember(code, record)
+        return record
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """
+        批量获取：缓存未命中的代码并发请求，返回 {原代码: 记录或None}
+        many_fetcher 结果中缺席的代码视为请求失败（整批异常时全部视为失败），不写入快照
+        """
+        codes = {symbol: clean_code(symbol) for symbol in symbols}
+        with self._lock:
+            self._roll()
+            missing = sorted({code for code in codes.values()
+                              if code not in self._lru and code not in self._snapshot
+                              and not self._failed_recently(code)})
+
+        if missing:
+            try:
+                fetched = self.many_fetcher(missing)
+            except Exception:
+                fetched = {}
+            with self._lock:
+                for code in missing:
+                    if code in fetched:
+                        self._failed.pop(code, None)
+                        self._snapshot[code] = fetched[code]
+                        self._dirty = True
+                    else:
+                        self._mark_failed(code)
+
+        return {symbol: self.get(symbol) for symbol in codes}
+
+    def get_billion(self, symbol: str) -> Optional[float]:
+        """总市值（亿元），失败返回 None"""
+        record = self.get(symbol)
+        return record['market_cap'] / 1e8 if record else None
+
+    def bulk_refresh(self, symbols: Iterable[str] = None) -> int:
+        """
+        一次拉取全市场市值填充缓存并落盘，返回成功条数
+        传入 symbols 时，其中未取到的代码记为负缓存
+        """
+        records = self.bulk_fetcher()
+        with self._lock:
+            self._roll()
+            for code, record in records.items():
+                self._failed.pop(code, None)
+                self._snapshot[code] = record
+                if code in self._lru:
+                    self._lru[code] = record
+            for symbol in symbols or []:
+                code = clean_code(symbol)
+                if code not in records:
+                    self._snapshot[code] = None
+                    self._lru.pop(code, None)
+            self._dirty = True
+        self.save()
+        return len(records)
+
+_default_service: Optional[MarketCapService] = None
+_service_lock = threading.Lock()
+
+def get_market_cap_service() -> MarketCapService:
+    """进程内共享的市值服务，进程退出时写回快照"""
+    global _default_service
+    with _service_lock:
+        if _default_service is None:
+            _default_service = MarketCapService()
+            atexit.register(_default_service.save)
+        return _default_service
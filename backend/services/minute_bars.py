@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 分钟线服务
+只下载5分钟K线（本地压缩存储），30分钟K线由5分钟线在本地合成，
+为 select_stock 的 D / 30m / 5m 三级别分析提供数据
+"""
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+from backend.services.data_provider import get_data_provider
+from backend.services.kline_downloader import download_klines
+
+# 5分钟线回看的自然日数（约20个交易日，合成约160根30分钟线）
+MINUTE_LOOKBACK_DAYS = 30
+# 5分钟级别结构分析只用最近几个交易日（每日48根）
+FIVE_MIN_WINDOW_DAYS = 5
+# 30分钟线至少需要的根数，不足时不提供该级别
+MIN_30M_BARS = 40
+
+MINUTE_QUERY_FIELDS = 'date,time,code,open,high,low,close,volume,amount'
+
+# A股交易时段（分钟数）：上午 9:30-11:30，下午 13:00-15:00
+_MORNING_OPEN = 9 * 60 + 30
+_AFTERNOON_OPEN = 13 * 60
+_MORNING_BUCKETS = 4
+
+def resample_30m(df_5m: pd.DataFrame) -> pd.DataFrame:
+    """
+    5分钟线合成30分钟线
+
+    BaoStock 分钟线 time 为K线结束时刻（如 20250627093500000 表示 9:30-9:35），
+    每个交易日按时段切成8根：上午 10:00/10:30/11:00/11:30，下午 13:30/14:00/14:30/15:00。
+    合成结果的 time 取该组最后一根5分钟线，与 BaoStock 30分钟线口径一致。
+    """
+    if df_5m.empty:
+        return df_5m.copy()
+
+    time_str = df_5m['time'].astype(str).str.slice(0, 12)
+    stamp = time_str.astype(np.int64).to_numpy()
+    minute_of_day = (stamp // 100 % 100) * 60 + stamp % 100
+    day = stamp // 10000
+
+    # 结束时刻落在 (开盘, 开盘+30] 内记为第1根，向上取整
+    morning = minute_of_day <= 11 * 60 + 30
+    bucket = np.where(morning,
+                      (minute_of_day - _MORNING_OPEN + 29) // 30,
+                      _MORNING_BUCKETS + (minute_of_day - _AFTERNOON_OPEN + 29) // 30)
+    key = day * 10 + bucket
+
+    # 数据按时间排序，分组边界即 key 变化处
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+
+    out = {
+        'date': df_5m['date'].to_numpy()[ends],
+        'time': df_5m['time'].to_numpy()[ends],
+        'code': df_5m['code'].to_numpy()[ends],
+    }
+    if 'open' in df_5m.columns:
+        out['open'] = df_5m['open'].to_numpy(dtype=np.float64)[starts]
+    if 'high' in df_5m.columns:
+        out['high'] = np.maximum.reduceat(df_5m['high'].to_numpy(dtype=np.float64), starts)
+    if 'low' in df_5m.columns:
+        out['low'] = np.minimum.reduceat(df_5m['low'].to_numpy(dtype=np.float64), starts)
+    if 'close' in df_5m.columns:
+        out['close'] = df_5m['close'].to_numpy(dtype=np.float64)[ends]
+    for col in ('volume', 'amount'):
+        if col in df_5m.columns:
+            out[col] = np.add.reduceat(np.nan_to_num(df_5m[col].to_numpy(dtype=np.float64)), starts)
+    return pd.DataFrame(out)
+
+def last_trading_days(df: pd.DataFrame, days: int) -> pd.DataFrame:
+    """截取最近 days 个交易日的分钟线"""
+    if df.empty:
+        return df
+    dates = df['date'].to_numpy()
+    keep = np.unique(dates)[-days:]
+    return df[np.isin(dates, keep)].reset_index(drop=True)
+
+def load_intraday_levels(symbols: Iterable[str], end_date: str = None,
+                         lookback_days: int = MINUTE_LOOKBACK_DAYS,
+                         workers: int = None, progress: bool = True) -> Dict[str, Dict[str, pd.DataFrame]]:
+    """
+    为候选股票准备分钟级别数据：{代码: {'30m': DataFrame, '5m': DataFrame}}
+
+    只应对通过日线趋势过滤的少量股票调用，5分钟线走本地存储增量更新。
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    end_date = end_date or get_data_provider().now().strftime('%Y-%m-%d')
+    start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+
+    m5_data = download_klines(symbols, start_date, end_date, frequency='5',
+                              fields=MINUTE_QUERY_FIELDS, workers=workers,
+                              progress=progress, desc='获取5分钟线')
+
+    levels = {}
+    for symbol, df_5m in m5_data.items():
+        entry = {'5m': last_trading_days(df_5m, FIVE_MIN_WINDOW_DAYS)}
+        df_30m = resample_30m(df_5m)
+        if len(df_30m) >= MIN_30M_BARS:
+            entry['30m'] = df_30m
+        levels[symbol] = entry
+    return levels
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 共享内存数组
+主进程把一组命名 NumPy 数组拷进一块 SharedMemory，工作进程按句柄挂载为只读视图，
+参数搜索等多进程任务共用同一份K线面板，不必每个任务 pickle 一遍
+"""
+
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# 各数组在共享块内按该字节数对齐
+ALIGN = 64
+
+# 可 pickle 的挂载句柄：(共享块名, [(数组名, dtype, 形状, 字节偏移), ...])
+SharedHandle = Tuple[str, List[Tuple[str, str, tuple, int]]]
+
+class SharedArrays:
+    """
+    一块共享内存里的多个命名数组
+
+    create() 由主进程调用，负责最终 unlink()；attach() 由工作进程调用，只读挂载、用完 close()。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: List[Tuple[str, str, tuple, int]],
+                 owner: bool):
+        self._shm = shm
+        self.layout = layout
+        self.owner = owner
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, dtype, shape, offset in layout:
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            array.flags.writeable = False
+            self.arrays[name] = array
+
+    @classmethod
+    def create(cls, arrays: Dict[str, np.ndarray]) -> 'SharedArrays':
+        """新建共享块并拷入数组"""
+        layout, size = [], 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            size = -(-size // ALIGN) * ALIGN
+            layout.append((name, array.dtype.str, array.shape, size))
+            size += array.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for (name, dtype, shape, offset), array in zip(layout, arrays.values()):
+            np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)[...] = array
+        return cls(shm, layout, owner=True)
+
+    @classmethod
+    def attach(cls, handle: SharedHandle) -> 'SharedArrays':
+        """按句柄挂载已有共享块（只读）"""
+        name, layout = handle
+        # 工作进程与主进程共用同一个 resource_tracker，挂载时的重复登记由主进程 unlink 一并注销
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, layout, owner=False)
+
+    @property
+    def handle(self) -> SharedHandle:
+        return self._shm.name, self.layout
+
+    @property
+    def nbytes(self) -> int:
+        return self._shm.size
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def close(self):
+        """释放本进程的映射（视图随之失效）"""
+        self.arrays = {}
+        try:
+            self._shm.close()
+        except BufferError:
+            # 仍有外部视图（如由视图构造的 DataFrame）引用映射：留待进程退出时释放
+            pass
+
+    def unlink(self):
+        """主进程用完后删除共享块"""
+        self.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc):
+        if self.owner:
+            self.unlink()
+        else:
+            self.close()
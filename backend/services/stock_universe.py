@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 股票池缓存
+按交易日缓存 query_all_stock 结果（代码、名称、板块），替代各模块重复的10天回溯循环
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from backend.services.data_provider import DataProvider, get_data_provider
+from backend.services.kline_store import DATA_DIR
+from backend.services.trading_calendar import TradingCalendar, get_trading_calendar
+
+DEFAULT_UNIVERSE_DIR = os.path.join(DATA_DIR, 'cache', 'universe')
+
+# 板块名称 -> 代码前缀（与各选股模块的多市场采样保持一致）
+BOARD_PREFIXES = {
+    '上海主板': 'sh.6',
+    '深圳主板': 'sz.000',
+    '中小板': 'sz.002',
+    '创业板': 'sz.30',
+}
+
+# 向前回溯查找最近交易日的最大天数
+MAX_LOOKBACK_DAYS = 10
+
+# 当日列表尚未发布时，间隔该秒数后再请求
+TODAY_RETRY_SECONDS = 600
+
+def _query_all_stock(day: str) -> pd.DataFrame:
+    """默认抓取函数：走进程默认数据源（直连/录制/回放）"""
+    return get_data_provider().query_all_stock(day=day)
+
+def add_board_column(stock_df: pd.DataFrame) -> pd.DataFrame:
+    """向量化推导板块列 board 与A股标记 is_a_share"""
+    codes = stock_df['code'].astype(str)
+    conditions = [codes.str.startswith(prefix).values for prefix in BOARD_PREFIXES.values()]
+    stock_df['board'] = np.select(conditions, list(BOARD_PREFIXES), default='')
+    stock_df['is_a_share'] = codes.str.match(r'sh\.6|sz\.0|sz\.3').values
+    return stock_df
+
+class StockUniverse:
+    """
+    股票池提供者
+
+    每个交易日一个 CSV 文件（data/cache/universe/YYYY-MM-DD.csv），进程内再缓存一层，
+    同一日期的重复调用直接返回内存中的 DataFrame（调用方不要原地修改）。
+    早于今天且查询为空的日期确定为非交易日，同样落盘，避免下次再请求。
+    提供交易日历时直接从最近交易日开始查询，只在交易日之间回溯（当日列表未发布时退到上一交易日）。
+    当日列表未发布时的空结果与回退结果不长期缓存，retry_interval 秒后重新请求当日列表。
+    """
+
+    def __init__(self, root: str = None, fetcher: Callable = None,
+                 max_lookback: int = MAX_LOOKBACK_DAYS, calendar: TradingCalendar = None,
+                 clock: Callable[[], datetime] = None, retry_interval: float = TODAY_RETRY_SECONDS):
+        self.root = root or DEFAULT_UNIVERSE_DIR
+        self.fetcher = fetcher or _query_all_stock
+        # 默认日期取数据源视角的今天（回放时为录制日）
+        self.clock = clock or (lambda: get_data_provider().now())
+        self.max_lookback = max_lookback
+        self.calendar = calendar
+        self.retry_interval = retry_interval
+        self._memory: Dict[str, Tuple[str, pd.DataFrame]] = {}
+        # 空日期 -> 失效时刻（time.monotonic），确定的非交易日为 inf
+        self._empty_days: Dict[str, float] = {}
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.root, f'{day}.csv')
+
+    def _empty_marker(self, day: str) -> str:
+        return os.path.join(self.root, f'{day}.empty')
+
+    def _load_day(self, day: str, today: str) -> Optional[pd.DataFrame]:
+        """读取某日股票池：磁盘缓存优先，缺失时请求数据源；非交易日返回 None"""
+        if self._empty_days.get(day, 0) > time.monotonic():
+            return None
+        path = self._path(day)
+        if os.path.exists(path):
+            return add_board_column(pd.read_csv(path, dtype=str, keep_default_na=False))
+        if os.path.exists(self._empty_marker(day)):
+            self._empty_days[day] = float('inf')
+            return None
+
+        raw = self.fetcher(day)
+        if raw is None or raw.empty:
+            if day < today:
+                self._empty_days[day] = float('inf')
+                os.makedirs(self.root, exist_ok=True)
+                open(self._empty_marker(day), 'w').close()
+            else:
+                # 今天的列表可能尚未发布，只在本进程内短暂记为空
+                self._empty_days[day] = time.monotonic() + self.retry_interval
+            return None
+        self._empty_days.pop(day, None)
+
+        stock_df = raw[['code', 'code_name'] + [c for c in ('tradeStatus',) if c in raw.columns]].copy()
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        stock_df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return add_board_column(stock_df.reset_index(drop=True))
+
+    def _candidate_days(self, day: str) -> Iterator[str]:
+        """回溯顺序：有交易日历时只走交易日，否则逐个自然日"""
+        if self.calendar is not None:
+            query_date = self.calendar.latest_trading_day(day)
+            for _ in range(self.max_lookback):
+                yield query_date
+                query_date = self.calendar.previous_trading_day(query_date)
+            return
+        start = datetime.strptime(day, '%Y-%m-%d')
+        for days_back in range(self.max_lookback):
+            yield (start - timedelta(days=days_back)).strftime('%Y-%m-%d')
+
+    def resolve(self, day: str = None) -> Tuple[str, pd.DataFrame]:
+        """返回 (实际交易日, 股票池)：从 day 起向前回溯到最近一个有数据的交易日"""
+        today = self.clock().strftime('%Y-%m-%d')
+        day = day or today
+        if day in self._memory:
+            return self._memory[day]
+
+        for query_date in self._candidate_days(day):
+            if query_date in self._memory:
+                result = self._memory[query_date]
+                break
+            stock_df = self._load_day(query_date, today)
+            if stock_df is not None:
+                result = (query_date, stock_df)
+                self._memory[query_date] = result
+                break
+        else:
+            return day, add_board_column(pd.DataFrame({'code': [], 'code_name': []}, dtype=str))
+
+        # 今天回退到上一交易日只是暂时的：不缓存映射，下次仍先看今天的列表（受 retry_interval 限流）
+        if result[0] == day or day < today:
+            self._memory[day] = result
+        return result
+
+    def get(self, day: str = None) -> pd.DataFrame:
+        """最近交易日（不晚于 day）的全部证券列表，含 code/code_name/board/is_a_share 列"""
+        return self.resolve(day)[1]
+
+    def a_shares(self, day: str = None) -> pd.DataFrame:
+        """沪深A股（sh.6 / sz.0 / sz.3）"""
+        stock_df = self.get(day)
+        return stock_df[stock_df['is_a_share']]
+
+    def by_board(self, day: str = None,
+                 boards: Iterable[str] = None) -> Dict[str, pd.DataFrame]:
+        """按板块分组 {板块名: DataFrame}，默认四个板块"""
+        stock_df = self.get(day)
+        return {board: stock_df[stock_df['board'] == board]
+                for board in (boards or BOARD_PREFIXES)}
+
+    def filter_boards(self, boards: Iterable[str], day: str = None) -> pd.DataFrame:
+        """只保留指定板块"""
+        stock_df = self.get(day)
+        return stock_df[stock_df['board'].isin(list(boards))]
+
+    def preload(self, day: str = None) -> str:
+        """预加载（供调度器夜间调用），返回实际交易日"""
+        return self.resolve(day)[0]
+
+_default_universe: Optional[StockUniverse] = None
+_provider_universes: Dict[DataProvider, StockUniverse] = {}
+
+def get_stock_universe(provider: DataProvider = None) -> StockUniverse:
+    """进程内共享的股票池提供者；传入 provider 时返回绑定该数据源的实例"""
+    global _default_universe
+    if provider is not None:
+        if provider not in _provider_universes:
+            _provider_universes[provider] = StockUniverse(
+                fetcher=provider.query_all_stock, calendar=get_trading_calendar(provider),
+                clock=provider.now)
+        return _provider_universes[provider]
+    if _default_universe is None:
+        _default_universe = StockUniverse(calendar=get_trading_calendar())
+    return _default_universe
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 结构分析结果缓存
+进程内 LRU + 磁盘 pickle 两级缓存，键为 (股票代码, 周期, K线指纹, 参数哈希)
+"""
+
+import os
+import json
+import pickle
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# 项目根目录下的 data/cache/structure
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+DEFAULT_CACHE_DIR = os.path.join(DATA_DIR, 'cache', 'structure')
+
+# 缓存格式版本：结果结构变化时递增，旧文件自动失效
+CACHE_VERSION = 1
+
+# 参与指纹内容哈希的价量列（结构结果含量能统计）
+STAMP_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+def _content_hash(df: pd.DataFrame) -> str:
+    """价量列内容的 sha1：数值列按 float64 字节哈希，字符串列（未解析的原始K线）按文本哈希"""
+    digest = hashlib.sha1()
+    for col in STAMP_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = df[col].to_numpy()
+        digest.update(col.encode('ascii'))
+        if values.dtype.kind in 'biuf':
+            digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        else:
+            digest.update('\x1f'.join(map(str, values)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def frame_stamp(df: pd.DataFrame) -> Optional[tuple]:
+    """
+    K线指纹：(首根时间, 末根时间, 根数, 价量内容哈希)
+    追加新K线、窗口起点变化、复权重新下载或中间K线被修正时指纹都会变化，旧缓存随之失效；
+    没有 date / time 列时返回 None（不缓存）
+    """
+    if df is None or df.empty:
+        return None
+    columns = list(df.columns)
+    stamps = [columns.index(col) for col in ('date', 'time') if col in columns]
+    if not stamps:
+        return None
+    # iat 按位置取标量，比逐列 df[col].iloc 快一个数量级（全市场复跑时这里是主要开销）
+    first = tuple(str(df.iat[0, j]) for j in stamps)
+    last = tuple(str(df.iat[-1, j]) for j in stamps)
+    return first, last, len(df), _content_hash(df)
+
+def params_hash(params: Dict[str, Any]) -> str:
+    """参数字典的稳定哈希（只应传入影响结果的参数）"""
+    text = json.dumps({'version': CACHE_VERSION, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+class StructureCache:
+    """
+    两级结构缓存
+
+    内存层为按访问顺序淘汰的 LRU；磁盘层每个 (参数哈希, 周期, 股票) 一个 pickle 文件，
+    文件内保存写入时的K线指纹，指纹不符即视为未命中并在重算后覆盖。
+    """
+
+    def __init__(self, root: str = None, maxsize: int = 4096, disk: bool = True):
+        self.root = root or DEFAULT_CACHE_DIR
+        self.maxsize = maxsize
+        self.disk = disk
+        self._memory: 'OrderedDict[tuple, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def _path(self, symbol: str, period: str, key_hash: str) -> str:
+        return os.path.join(self.root, key_hash, period, f'{symbol}.pkl')
+
+    def _remember(self, key: tuple, value: Any):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def get(self, symbol: str, period: str, stamp: tuple, key_hash: str) -> Optional[Any]:
+        """先查内存再查磁盘，未命中返回 None"""
+        key = (symbol, period, stamp, key_hash)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self._memory[key]
+        if self.disk:
+            try:
+                with open(self._path(symbol, period, key_hash), 'rb') as f:
+                    saved_stamp, value = pickle.load(f)
+                if saved_stamp == stamp:
+                    self._remember(key, value)
+                    self.stats['disk_hits'] += 1
+                    return value
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ 结构缓存读取失败 {symbol} {period}: {e}")
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, symbol: str, period: str, stamp: tuple, key_hash: str, value: Any):
+        self._remember((symbol, period, stamp, key_hash), value)
+        if not self.disk:
+            return
+        path = self._path(symbol, period, key_hash)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，避免并发读到半个文件
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((stamp, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ 结构缓存写入失败 {symbol} {period}: {e}")
+
+    def get_or_compute(self, symbol: str, period: str, df: pd.DataFrame,
+                       params: Dict[str, Any], compute: Callable[[pd.DataFrame], Any]) -> Any:
+        """命中直接返回，否则 compute(df) 并写入两级缓存；无法生成指纹时直接计算"""
+        stamp = frame_stamp(df)
+        if not symbol or stamp is None:
+            return compute(df)
+        key_hash = params_hash(params)
+        value = self.get(symbol, period, stamp, key_hash)
+        if value is None:
+            value = compute(df)
+            self.put(symbol, period, stamp, key_hash, value)
+        return value
+
+    def clear(self, disk: bool = False):
+        """清空内存层；disk=True 时同时删除磁盘文件"""
+        with self._lock:
+            self._memory.clear()
+        if disk and os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    if name.endswith('.pkl'):
+                        os.remove(os.path.join(dirpath, name))
+
+_default_cache: Optional[StructureCache] = None
+
+def get_structure_cache() -> StructureCache:
+    """进程级默认结构缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = StructureCache()
+    return _default_cache
+
+def set_structure_cache(cache: Optional[StructureCache]) -> Optional[StructureCache]:
+    """替换进程级默认结构缓存（如参数搜索的工作进程只用内存层），返回原缓存以便恢复"""
+    global _default_cache
+    previous, _default_cache = _default_cache, cache
+    return previous
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CChanTrader-AI 交易日历
+按年缓存 query_trade_dates 结果（data/cache/calendar/YYYY.csv），
+每年展开为按年内序号索引的数组，is_trading_day / previous / next 均为 O(1) 查表
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Union
+
+from backend.services.data_provider import DataProvider, get_data_provider
+from backend.services.kline_store import DATA_DIR
+
+DEFAULT_CALENDAR_DIR = os.path.join(DATA_DIR, 'cache', 'calendar')
+
+DateLike = Union[str, date, datetime, None]
+
+def _query_trade_dates(start_date: str, end_date: str) -> pd.DataFrame:
+    """默认抓取函数：走进程默认数据源（直连/录制/回放）"""
+    return get_data_provider().query_trade_dates(start_date=start_date, end_date=end_date)
+
+def _to_date(day: DateLike) -> date:
+    if day is None:
+        return datetime.now().date()
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, date):
+        return day
+    return datetime.strptime(str(day)[:10], '%Y-%m-%d').date()
+
+class _YearTable:
+    """
+    单年日历：flags[i] 表示1月1日起第 i 天是否交易日
+    prev[i] 为不晚于第 i 天的最近交易日序号（无则 -1），next[i] 为不早于第 i 天的最近交易日序号（无则 -1）
+    """
+
+    def __init__(self, year: int, flags: np.ndarray, complete: bool):
+        self.year = year
+        self.start = date(year, 1, 1)
+        self.flags = flags
+        self.complete = complete
+        self.loaded_on = datetime.now().date()
+        positions = np.arange(len(flags))
+        self.prev = np.maximum.accumulate(np.where(flags, positions, -1))
+        forward = np.minimum.accumulate(np.where(flags, positions, len(flags))[::-1])[::-1]
+        self.next = np.where(forward == len(flags), -1, forward)
+
+    def day(self, index: int) -> date:
+        return self.start + timedelta(days=int(index))
+
+class TradingCalendar:
+    """
+    交易日历
+
+    每年只请求一次数据源：覆盖全年的结果落盘，之后直接读文件；
+    尚未发布或请求失败的日期按工作日（周一至周五）兜底，只在本进程内使用，不落盘，次日重新请求。
+    """
+
+    def __init__(self, root: str = None, fetcher: Callable[[str, str], pd.DataFrame] = None):
+        self.root = root or DEFAULT_CALENDAR_DIR
+        self.fetcher = fetcher or _query_trade_dates
+        self._years: Dict[int, _YearTable] = {}
+
+    def _path(self, year: int) -> str:
+        return os.path.join(self.root, f'{year}.csv')
+
+    def _load_year(self, year: int) -> _YearTable:
+        """读取某年日历：磁盘缓存优先，缺失时请求数据源"""
+        table = self._years.get(year)
+        # 不完整的年份（兜底或未发布）每天最多重试一次
+        if table is not None and (table.complete or table.loaded_on == datetime.now().date()):
+            return table
+
+        path = self._path(year)
+        if os.path.exists(path):
+            raw = pd.read_csv(path, dtype=str)
+        else:
+            try:
+                raw = self.fetcher(f'{year}-01-01', f'{year}-12-31')
+            except Exception as e:
+                print(f"⚠️ 获取{year}年交易日历失败，按工作日兜底: {e}")
+                raw = None
+
+        start = date(year, 1, 1)
+        n_days = (date(year + 1, 1, 1) - start).days
+        # 先按工作日兜底，再用数据源结果覆盖
+        weekdays = (start.weekday() + np.arange(n_days)) % 7
+        flags = weekdays < 5
+        known = np.zeros(n_days, dtype=bool)
+        if raw is not None and not raw.empty:
+            dates = pd.to_datetime(raw['calendar_date'])
+            in_year = (dates.dt.year == year).to_numpy()
+            days = dates.dt.dayofyear.to_numpy()[in_year] - 1
+            flags[days] = raw['is_trading_day'].astype(str).to_numpy()[in_year] == '1'
+            known[days] = True
+
+        complete = bool(known.all())
+        if complete and not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            raw.loc[in_year, ['calendar_date', 'is_trading_day']].to_csv(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+        table = _YearTable(year, flags, complete)
+        self._years[year] = table
+        return table
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def is_trading_day(self, day: DateLike = None) -> bool:
+        """是否为交易日（默认今天）"""
+        day = _to_date(day)
+        table = self._load_year(day.year)
+        return bool(table.flags[(day - table.start).days])
+
+    def previous_trading_day(self, day: DateLike = None, inclusive: bool = False) -> str:
+        """day 之前（inclusive 时含当天）最近的交易日，返回 YYYY-MM-DD"""
+        day = _to_date(day)
+        if not inclusive:
+            day -= timedelta(days=1)
+        table = self._load_year(day.year)
+        index = table.prev[(day - table.start).days]
+        while index < 0:
+            table = self._load_year(table.year - 1)
+            index = table.prev[-1]
+        return table.day(index).strftime('%Y-%m-%d')
+
+    def next_trading_day(self, day: DateLike = None, inclusive: bool = False) -> str:
+        """day 之后（inclusive 时含当天）最近的交易日，返回 YYYY-MM-DD"""
+        day = _to_date(day)
+        if not inclusive:
+            day += timedelta(days=1)
+        table = self._load_year(day.year)
+        index = table.next[(day - table.start).days]
+        while index < 0:
+            table = self._load_year(table.year + 1)
+            index = table.next[0]
+        return table.day(index).strftime('%Y-%m-%d')
+
+    def latest_trading_day(self, day: DateLike = None) -> str:
+        """不晚于 day 的最近交易日（day 为交易日时返回自身）"""
+        return self.previous_trading_day(day, inclusive=True)
+
+    def trading_days(self, start_date: DateLike, end_date: DateLike = None) -> List[str]:
+        """[start_date, end_date] 内的全部交易日"""
+        start, end = _to_date(start_date), _to_date(end_date)
+        days = []
+        for year in range(start.year, end.year + 1):
+            table = self._load_year(year)
+            lo = (max(start, table.start) - table.start).days
+            hi = (min(end, date(year, 12, 31)) - table.start).days
+            days.extend(table.day(i).strftime('%Y-%m-%d')
+                        for i in np.flatnonzero(table.flags[lo:hi + 1]) + lo)
+        return days
+
+_default_calendar: Optional[TradingCalendar] = None
+_provider_calendars: Dict[DataProvider, TradingCalendar] = {}
+
+def get_trading_calendar(provider: DataProvider = None) -> TradingCalendar:
+    """进程内共享的交易日历；传入 provider 时返回绑定该数据源的实例"""
+    global _default_calendar
+    if provider is not None:
+        if provider not in _provider_calendars:
+            _provider_calendars[provider] = TradingCalendar(fetcher=provider.query_trade_dates)
+        return _provider_calendars[provider]
+    if _default_calendar is None:
+        _default_calendar = TradingCalendar()
+    return _default_calendar
@@ -9,9 +9,13 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
-import requests
+import os
+import sys
 import re
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.market_cap import get_market_cap_service
+
 class ShortTermTradingOptimizer:
     """短线交易优化器"""
     
@@ -73,24 +77,9 @@ class ShortTermTradingOptimizer:
             市值（亿元），失败返回0
         """
         try:
-            # 清理股票代码格式
-            clean_symbol = symbol.replace('sh.', '').replace('sz.', '')
-            
-            # 多数据源尝试获取市值
-            sources = [
-                self._get_mktcap_from_sina,
-                self._get_mktcap_from_eastmoney,
-                self._get_mktcap_fallback
-            ]
-            
-            for source_func in sources:
-                try:
-                    market_cap = source_func(clean_symbol)
-                    if market_cap and market_cap > 0:
-                        return market_cap / 1e8  # 转换为亿元
-                except Exception as e:
-                    self.logger.debug(f"数据源获取失败 {source_func.__name__}: {e}")
-                    continue
+            market_cap = get_market_cap_service().get_billion(symbol)
+            if market_cap:
+                return market_cap
             
             # 如果所有数据源都失败，返回模拟值（基于股价和行业）
             return self._estimate_market_cap(symbol)
@@ -99,47 +88,6 @@ class ShortTermTradingOptimizer:
             self.logger.warning(f"获取市值失败 {symbol}: {e}")
             return 0
     
-    def _get_mktcap_from_sina(self, symbol: str) -> float:
-        """从新浪财经获取市值"""
-        url = f"http://hq.sinajs.cn/list={symbol}"
-        response = requests.get(url, timeout=3)
-        if response.status_code == 200:
-            data = response.text
-            # 解析新浪财经数据
-            if 'var hq_str_' in data:
-                parts = data.split('"')[1].split(',')
-                if len(parts) > 20:
-                    try:
-                        # 估算市值：股价 * 流通股本
-                        price = float(parts[3])
-                        shares = float(parts[18]) if parts[18] else 0  # 流通股本
-                        return price * shares * 10000 if shares > 0 else 0
-                    except (ValueError, IndexError):
-                        pass
-        return 0
-    
-    def _get_mktcap_from_eastmoney(self, symbol: str) -> float:
-        """从东方财富获取市值"""
-        # 简化的东方财富API调用
-        market_prefix = '1' if symbol.startswith('6') else '0'
-        url = f"http://push2.eastmoney.com/api/qt/stock/get?secid={market_prefix}.{symbol}&fields=f116,f117"
-        try:
-            response = requests.get(url, timeout=3)
-            if response.status_code == 200:
-                data = response.json()
-                if 'data' in data and data['data']:
-                    # f116是总市值，f117是流通市值
-                    market_cap = data['data'].get('f116', 0)
-                    return float(market_cap) if market_cap else 0
-        except Exception:
-            pass
-        return 0
-    
-    def _get_mktcap_fallback(self, symbol: str) -> float:
-        """备用市值获取方法"""
-        # 这里可以添加其他数据源
-        return 0
-    
     def _estimate_market_cap(self, symbol: str) -> float:
         """
         估算市值（当无法获取真实数据时）
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BaoStock会话管理测试
+用假的 bs.login / bs.query_* 验证：只登录一次、失效自动重连、非网络错误直接抛出
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from backend.services import baostock_session
+from backend.services.baostock_session import BaoStockSession, BaoStockError
+
+class _Result:
+    def __init__(self, error_code='0', error_msg='success', data=None):
+        self.error_code = error_code
+        self.error_msg = error_msg
+        self._data = data if data is not None else pd.DataFrame()
+
+    def get_data(self):
+        return self._data
+
+class _FakeBs:
+    """模拟 baostock 模块：按预设顺序返回查询结果"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.login_calls = 0
+        self.logout_calls = 0
+
+    def login(self):
+        self.login_calls += 1
+        return _Result()
+
+    def logout(self):
+        self.logout_calls += 1
+
+    def query_all_stock(self, day=None):
+        return self.responses.pop(0)
+
+def _with_fake_bs(fake, func):
+    original = baostock_session.bs
+    baostock_session.bs = fake
+    try:
+        return func()
+    finally:
+        baostock_session.bs = original
+
+def test_single_login_for_many_queries():
+    """多次查询只登录一次"""
+    df = pd.DataFrame({'code': ['sh.600000'], 'code_name': ['浦发银行']})
+    fake = _FakeBs([_Result(data=df) for _ in range(5)])
+    session = BaoStockSession()
+
+    def run():
+        for _ in range(5):
+            result = session.query_all_stock(day='2025-06-26')
+            assert list(result['code']) == ['sh.600000']
+        session.logout()
+
+    _with_fake_bs(fake, run)
+    print(f"登录次数: {fake.login_calls}, 登出次数: {fake.logout_calls}")
+    assert fake.login_calls == 1
+    assert fake.logout_calls == 1
+
+def test_reconnect_on_session_expired():
+    """会话失效(10001001)时重新登录并重试"""
+    df = pd.DataFrame({'code': ['sz.000001']})
+    fake = _FakeBs([_Result('10001001', '用户未登陆'), _Result(data=df)])
+    session = BaoStockSession()
+
+    result = _with_fake_bs(fake, lambda: session.query_all_stock())
+    print(f"重连后登录次数: {fake.login_calls}")
+    assert list(result['code']) == ['sz.000001']
+    assert fake.login_calls == 2
+
+def test_non_network_error_raises():
+    """参数类错误不重试，直接抛出 BaoStockError"""
+    fake = _FakeBs([_Result('10004011', '日期格式不正确')])
+    session = BaoStockSession()
+
+    try:
+        _with_fake_bs(fake, lambda: session.query_all_stock(day='bad'))
+    except BaoStockError as e:
+        print(f"捕获错误: {e}")
+        assert e.error_code == '10004011'
+    else:
+        raise AssertionError('应抛出 BaoStockError')
+    assert fake.login_calls == 1
+
+if __name__ == "__main__":
+    print("🧪 BaoStock会话管理测试")
+    print("=" * 50)
+    test_single_login_for_many_queries()
+    test_reconnect_on_session_expired()
+    test_non_network_error_raises()
+    print("✅ 全部通过")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线解析器测试
+验证与旧 safe_data_conversion 结果一致、有效性掩码、已解析帧直接透传
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from backend.services.bar_parser import parse_bars, parse_bars_columns
+
+def _legacy_safe_data_conversion(df: pd.DataFrame) -> pd.DataFrame:
+    """旧版 cchan_trader_optimized.safe_data_conversion（对照用）"""
+    df = df.copy()
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+            df[col] = df[col].str.split().str[0]
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    if 'amount' in df.columns:
+        df['amount'] = df['amount'].astype(str)
+        df['amount'] = df['amount'].str.extract(r'([0-9.]+)')[0]
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+    df = df.dropna(subset=['high', 'low', 'close'])
+    df = df[(df['high'] > 0) & (df['low'] > 0) & (df['close'] > 0)]
+    if 'volume' in df.columns:
+        df['volume'] = df['volume'].fillna(0)
+    return df
+
+RAW = pd.DataFrame({
+    'date': ['2025-06-23', '2025-06-24', '2025-06-25', '2025-06-26', '2025-06-27'],
+    'code': 'sh.600000',
+    'open': ['10.01', '10.20', '', '10.50 10.60', '10.70'],
+    'high': ['10.30', '10.40', '10.45', '10.80', '0'],
+    'low': ['9.90', '10.10', '10.20', '10.40', '10.60'],
+    'close': ['10.20', '10.35 10.36', '10.40', '10.75', '10.90'],
+    'volume': ['120000', '', '90000', '110000', '80000'],
+    'amount': ['1224000.00', 'x1500000.5', '936000.00', '1182500.00', '872000.00'],
+})
+
+def test_matches_legacy_conversion():
+    """字符串输入与旧转换逐值一致"""
+    legacy = _legacy_safe_data_conversion(RAW)
+    parsed = parse_bars(RAW)
+    print(f"旧版保留 {len(legacy)} 行, 新版保留 {len(parsed)} 行")
+    assert list(parsed.index) == list(legacy.index)
+    for col in ['open', 'high', 'low', 'close', 'volume', 'amount']:
+        np.testing.assert_array_equal(parsed[col].to_numpy(), legacy[col].to_numpy())
+        assert parsed[col].dtype == np.float64
+    assert list(parsed['date']) == list(legacy['date'])
+
+def test_validity_masks():
+    """逐列掩码与行有效掩码"""
+    bars = parse_bars_columns(RAW)
+    assert bars.masks['open'].tolist() == [True, True, False, True, True]
+    assert bars.masks['volume'].tolist() == [True, False, True, True, True]
+    # 最后一行 high=0 无效
+    assert bars.valid.tolist() == [True, True, True, True, False]
+    assert bars.columns['close'].flags['C_CONTIGUOUS']
+
+def test_typed_frame_passthrough():
+    """已是浮点列的帧跳过字符串处理，结果不变；支持 float32"""
+    typed = parse_bars(RAW)
+    again = parse_bars(typed)
+    pd.testing.assert_frame_equal(typed, again)
+
+    small = parse_bars(RAW, dtype=np.float32)
+    assert small['close'].dtype == np.float32
+
+if __name__ == "__main__":
+    print("🧪 K线解析器测试")
+    print("=" * 50)
+    test_matches_legacy_conversion()
+    test_validity_masks()
+    test_typed_frame_passthrough()
+    print("✅ 全部通过")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缠论数组内核测试
+向量化分型识别与原逐根 .iloc 循环逐项比对（含平价、NaN、二维面板），K线包含处理
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.services.chan_kernels import fractal_masks, fractal_points, merge_inclusion
+from backend.cchan_trader_core import Segment, _identify_segments, parse_structure
+from backend.cchan_trader_advanced import ADVANCED_PARAMS, AdvancedChanAnalyzer
+
+def _legacy_fractals(df):
+    """原 identify_fractal_points 的逐根循环实现（对照用）"""
+    highs, lows = [], []
+    for i in range(2, len(df) - 2):
+        if (df['high'].iloc[i] > df['high'].iloc[i-1] and
+            df['high'].iloc[i] > df['high'].iloc[i+1] and
+            df['high'].iloc[i] > df['high'].iloc[i-2] and
+            df['high'].iloc[i] > df['high'].iloc[i+2]):
+            highs.append(i)
+        if (df['low'].iloc[i] < df['low'].iloc[i-1] and
+            df['low'].iloc[i] < df['low'].iloc[i+1] and
+            df['low'].iloc[i] < df['low'].iloc[i-2] and
+            df['low'].iloc[i] < df['low'].iloc[i+2]):
+            lows.append(i)
+    return highs, lows
+
+def _legacy_segments(df):
+    """原 _identify_segments 的实现（对照用）"""
+    highs, lows = _legacy_fractals(df)
+    points = [(i, df['high'].iloc[i], 'high') for i in highs] + \
+             [(i, df['low'].iloc[i], 'low') for i in lows]
+    points.sort()
+    segments = []
+    for i in range(len(points) - 1):
+        start_idx, start_price, start_type = points[i]
+        end_idx, end_price, end_type = points[i + 1]
+        if start_type != end_type:
+            segments.append(Segment(start_idx, end_idx, 'up' if start_type == 'low' else 'down',
+                                    max(start_price, end_price), min(start_price, end_price),
+                                    start_price, end_price))
+    return segments
+
+def test_fractals_match_legacy():
+    """一维：与逐根循环完全一致，含 NaN 与短序列"""
+    for seed in range(20):
+        df = random_bars(200, seed)
+        if seed % 4 == 0:
+            df.loc[[17, 90], 'high'] = np.nan
+            df.loc[[33], 'low'] = np.nan
+        tops, bottoms = fractal_points(df['high'].to_numpy(), df['low'].to_numpy())
+        assert (tops.tolist(), bottoms.tolist()) == _legacy_fractals(df)
+    for n in range(6):
+        df = random_bars(n, n)
+        tops, bottoms = fractal_points(df['high'].to_numpy(), df['low'].to_numpy())
+        assert (tops.tolist(), bottoms.tolist()) == _legacy_fractals(df)
+
+def test_panel_matches_rows():
+    """二维面板逐行结果等于逐只计算"""
+    frames = [random_bars(120, seed) for seed in range(30)]
+    high = np.vstack([f['high'].to_numpy() for f in frames])
+    low = np.vstack([f['low'].to_numpy() for f in frames])
+    top, bottom = fractal_masks(high, low)
+    for row, df in enumerate(frames):
+        tops, bottoms = _legacy_fractals(df)
+        assert np.flatnonzero(top[row]).tolist() == tops
+        assert np.flatnonzero(bottom[row]).tolist() == bottoms
+
+def test_analyzers_unchanged():
+    """关闭包含处理时，核心版线段、高级版分型输出与原实现一致"""
+    ADVANCED_PARAMS["chan"]["kline_inclusion"] = False
+    try:
+        for seed in range(10):
+            df = random_bars(200, seed)
+            assert _identify_segments(df, inclusion=False) == _legacy_segments(df)
+            analyzer = AdvancedChanAnalyzer(df)
+            assert analyzer.identify_fractal_points() == _legacy_fractals(analyzer.df)
+    finally:
+        ADVANCED_PARAMS["chan"]["kline_inclusion"] = True
+
+    df = random_bars(200, 0)
+    started = time.perf_counter()
+    for _ in range(20):
+        _legacy_segments(df)
+    legacy = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(20):
+        _identify_segments(df, inclusion=False)
+    fast = time.perf_counter() - started
+    print(f"200根K线线段识别: 原实现 {legacy / 20 * 1000:.2f}ms, 向量化 {fast / 20 * 1000:.2f}ms")
+
+def _includes(h1, l1, h2, l2):
+    return (h1 >= h2 and l1 <= l2) or (h1 <= h2 and l1 >= l2)
+
+def test_inclusion_merge():
+    """合并后相邻K线无包含关系，方向正确，高低点可映射回原始K线"""
+    # 向上处理：第2根被第1根包含 -> 高高、高低
+    bars = merge_inclusion([10, 12, 11.5, 13], [9, 10, 10.5, 11])
+    assert bars.high.tolist() == [10, 12, 13] and bars.low.tolist() == [9, 10.5, 11]
+    assert bars.high_idx.tolist() == [0, 1, 3] and bars.low_idx.tolist() == [0, 2, 3]
+    # 向下处理：第3根包含第2根 -> 低高、低低
+    bars = merge_inclusion([13, 12, 12.5, 11], [11, 10, 9.5, 9])
+    assert bars.high.tolist() == [13, 12, 11] and bars.low.tolist() == [11, 9.5, 9]
+    assert bars.high_idx.tolist() == [0, 1, 3] and bars.low_idx.tolist() == [0, 2, 3]
+
+    for seed in range(20):
+        df = random_bars(300, seed)
+        high, low = df['high'].to_numpy(), df['low'].to_numpy()
+        bars = merge_inclusion(high, low)
+        assert len(bars) < len(df)
+        assert np.array_equal(bars.high, high[bars.high_idx])
+        assert np.array_equal(bars.low, low[bars.low_idx])
+        assert np.all(np.diff(bars.high_idx) > 0) and np.all(np.diff(bars.low_idx) > 0)
+        assert not any(_includes(bars.high[k], bars.low[k], bars.high[k + 1], bars.low[k + 1])
+                       for k in range(len(bars) - 1))
+
+def test_inclusion_reduces_fractals():
+    """包含处理后分型与线段更少，信号K线下标仍指向原始K线"""
+    df = random_bars(200, 3)
+    raw = _identify_segments(df, inclusion=False)
+    merged = _identify_segments(df)
+    print(f"线段数: 原始K线 {len(raw)}, 包含处理后 {len(merged)}")
+    assert len(merged) < len(raw)
+    for seg in merged:
+        start_col = 'low' if seg.direction == 'up' else 'high'
+        assert df[start_col].iloc[seg.start_idx] == seg.start_price
+    info = parse_structure(df)
+    for signals in info.signals.values():
+        assert all(0 <= s.k_idx < len(df) for s in signals)
+
+if __name__ == "__main__":
+    print("🧪 缠论数组内核测试")
+    print("=" * 50)
+    test_fractals_match_legacy()
+    test_panel_matches_rows()
+    test_analyzers_unchanged()
+    test_inclusion_merge()
+    test_inclusion_reduces_fractals()
+    print("✅ 全部通过")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量缠论结构测试
+逐根推入K线，每一步快照都与 parse_structure(前k根) 比对
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.cchan_trader_core import PARAMS, ChanStream, parse_structure
+
+def _assert_same(stream_info, batch_info):
+    assert stream_info.segments == batch_info.segments
+    assert stream_info.pivots == batch_info.pivots
+    assert stream_info.trend == batch_info.trend
+    assert stream_info.signals == batch_info.signals
+    for got, want in ((stream_info.vol_stats, batch_info.vol_stats),
+                      (stream_info.tech_indicators, batch_info.tech_indicators)):
+        assert got.keys() == want.keys()
+        for key in want:
+            np.testing.assert_allclose(got[key], want[key], rtol=1e-9, atol=1e-9, err_msg=key)
+
+def test_snapshot_matches_batch():
+    """包含处理开/关两种口径下，每根K线后的快照都等于批量结果"""
+    try:
+        for inclusion in (True, False):
+            PARAMS["kline_inclusion"] = inclusion
+            for seed in range(4):
+                df = random_bars(160, seed)
+                stream = ChanStream()
+                for k, bar in enumerate(df.to_dict('records'), start=1):
+                    assert stream.push(bar)
+                    if k >= 5:
+                        _assert_same(stream.snapshot(), parse_structure(df.iloc[:k]))
+    finally:
+        PARAMS["kline_inclusion"] = True
+
+def test_invalid_bars_and_extend():
+    """无效K线被丢弃；extend 批量预热后继续逐根推入"""
+    df = random_bars(120, 7)
+    stream = ChanStream()
+    assert not stream.push({'high': np.nan, 'low': 1.0, 'close': 1.0, 'volume': 1})
+    assert not stream.push({'high': 0.0, 'low': 0.0, 'close': 0.0})
+    assert stream.extend(df.iloc[:100]) == 100
+    for bar in df.iloc[100:].to_dict('records'):
+        stream.push(bar)
+    assert len(stream) == 120
+    _assert_same(stream.snapshot(), parse_structure(df))
+
+def test_push_cost_is_constant():
+    """推入耗时不随历史长度增长"""
+    df = random_bars(6000, 11)
+    records = df.to_dict('records')
+    stream = ChanStream()
+    started = time.perf_counter()
+    for bar in records[:1000]:
+        stream.push(bar)
+    early = time.perf_counter() - started
+    for bar in records[1000:5000]:
+        stream.push(bar)
+    started = time.perf_counter()
+    for bar in records[5000:]:
+        stream.push(bar)
+    late = time.perf_counter() - started
+    print(f"每根推入: 前1000根 {early:.4f}s, 第5000根后1000根 {late:.4f}s")
+    assert late < early * 3
+
+if __name__ == "__main__":
+    print("🧪 增量缠论结构测试")
+    print("=" * 50)
+    test_snapshot_matches_batch()
+    test_invalid_bars_and_extend()
+    test_push_cost_is_constant()
+    print("✅ 全部通过")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缠论记录表测试
+SegmentTable / PivotTable 与记录列表互转，中枢识别与趋势、5分钟确认在两种表示下结果一致
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.cchan_trader_core import (Pivot, PivotTable, Segment, SegmentTable, StructureInfo,
+                                       _identify_pivots, _identify_segments, confirm_5m_pullback,
+                                       is_daily_uptrend, parse_structure, parse_structure_panel)
+from backend.cchan_trader_advanced import AdvancedSegment
+
+def _as_tables(info):
+    return StructureInfo(SegmentTable.from_records(info.segments), PivotTable.from_records(info.pivots),
+                         info.trend, info.signals, info.vol_stats, info.tech_indicators)
+
+def test_round_trip_and_views():
+    """记录 -> 表 -> 记录无损；切片、tail、where 返回同类表"""
+    segments = _identify_segments(random_bars(300, 1))
+    table = SegmentTable.from_records(segments)
+    assert len(table) == len(segments) and table == segments
+    assert table.to_records() == segments
+    assert table[-1] == segments[-1] and table[0] == segments[0]
+    assert table.tail(3) == segments[-3:] and table.tail(10 ** 6) == segments
+    assert isinstance(table[2:5], SegmentTable)
+    ups = table.where(table.up)
+    assert ups == [seg for seg in segments if seg.direction == 'up']
+    np.testing.assert_array_equal(table.high, [seg.high for seg in segments])
+    assert len(SegmentTable()) == 0 and not PivotTable.from_records([])
+
+def test_pivots_on_tables():
+    """中枢识别：传入 SegmentTable 返回 PivotTable，内容与列表版一致"""
+    for seed in range(20):
+        df = random_bars(250, seed)
+        segments = _identify_segments(df)
+        pivots = _identify_pivots(df, segments)
+        table = _identify_pivots(df, SegmentTable.from_records(segments))
+        assert isinstance(table, PivotTable)
+        assert table == pivots
+
+def test_filters_on_tables():
+    """is_daily_uptrend / confirm_5m_pullback 对两种表示给出相同结论"""
+    checked = 0
+    for seed in range(40):
+        df = random_bars(200, seed)
+        info = parse_structure(df)
+        compact = _as_tables(info)
+        assert is_daily_uptrend(compact, df) == is_daily_uptrend(info, df)
+        for entry in (df['close'].iloc[-1], df['low'].min(), df['high'].max()):
+            assert confirm_5m_pullback(compact, entry) == confirm_5m_pullback(info, entry)
+            checked += 1
+    assert checked == 120
+
+def test_compact_panel():
+    """compact 面板：各股票的表是同一数组的视图，逐项等于列表版"""
+    frames = {f'sh.{600000 + i}': random_bars(n, i) for i, n in enumerate([200, 90, 40, 8, 160])}
+    lists = parse_structure_panel(frames)
+    tables = parse_structure_panel(frames, compact=True)
+    for symbol in frames:
+        if len(frames[symbol]) >= 10:   # 过短的股票与 parse_structure 一样返回空结构
+            assert isinstance(tables[symbol].segments, SegmentTable)
+        assert tables[symbol].segments == lists[symbol].segments
+        assert tables[symbol].pivots == lists[symbol].pivots
+        assert tables[symbol].trend == lists[symbol].trend
+        assert tables[symbol].signals == lists[symbol].signals
+    first, second = tables['sh.600000'].segments, tables['sh.600001'].segments
+    assert first.data.base is not None and first.data.base is second.data.base
+
+def test_records_are_slotted():
+    """记录类使用 __slots__，不带实例字典"""
+    seg = Segment(0, 5, 'up', 11.0, 10.0, 10.0, 11.0)
+    for record in (seg, Pivot(0, 5, 11.0, 10.0, 10.5, 0.1)):
+        assert not hasattr(record, '__dict__')
+    assert not hasattr(AdvancedSegment(0, 5, 'up', 10.0, 11.0, 11.0, 10.0, 0.1, 1.0, 5), '__dict__')
+
+if __name__ == "__main__":
+    print("🧪 缠论记录表测试")
+    print("=" * 50)
+    test_round_trip_and_views()
+    test_pivots_on_tables()
+    test_filters_on_tables()
+    test_compact_panel()
+    test_records_are_slotted()
+    print("✅ 全部通过")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量化截面评分测试
+逐只评分明细与 calculate_stock_score 逐位相同、选股结果与逐只评分的写法一致、参数广播与逐组计算一致、
+全网格搜索与逐组选股评估一致、按阈值组合去重且快于原 50 组子集
+"""
+
+import os
+import sys
+import time
+import tempfile
+from itertools import product
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import backend.services.market_cap as market_cap_module
+from backend.bar_fixtures import random_bars
+from backend.services.market_cap import MarketCapService
+from backend.cchan_trader_optimized import (BASE_PARAMS, PARAM_GRID, calculate_mktcap_score,
+                                            calculate_mktcap_scores, calculate_stock_score,
+                                            extract_score_features, grid_search_optimization,
+                                            score_components, score_cross_section,
+                                            select_stocks_with_params)
+
+DEFAULT_PARAMS = {'ma_short': 5, 'ma_long': 20, 'rsi_buy_threshold': 35, 'rsi_sell_threshold': 75,
+                  'volume_threshold': 1.5, 'momentum_threshold': 0.03}
+
+# 合成K线：几何游走、0.01 价位、一半K线放量、带日期列
+BAR_SHAPE = dict(geometric=True, sigma=0.03, tick=0.01, spread=0.01, spike=0.5, start='2025-01-01')
+
+def _universe(count=200):
+    """含上涨 / 下跌漂移、不足20根、空帧；市值覆盖全部区间，部分取不到（按代码估算）"""
+    kline_data = {}
+    for i in range(count):
+        n = [120, 60, 15, 0][i % 4] if i % 10 == 0 else 120
+        kline_data[f'sh.{600000 + i}'] = random_bars(n, i, drift=(i % 3 - 1) * 0.01, **BAR_SHAPE)
+    return kline_data
+
+def _caps(symbols):
+    values = [0, 10, 20, 39.9, 40, 60, 150, 200, 200.5, 500, 800, 1200, None]
+    return {s.replace('sh.', ''): values[k % len(values)] for k, s in enumerate(symbols)}
+
+def _install_market_caps(root, caps):
+    """进程内市值服务换成本地假数据（不访问网络）"""
+    def fetch(code):
+        cap = caps.get(code)
+        return {'market_cap': cap * 1e8} if cap is not None else None
+    market_cap_module._default_service = MarketCapService(
+        snapshot_path=os.path.join(root, 'caps.json'), fetcher=fetch,
+        many_fetcher=lambda codes: {code: fetch(code) for code in codes},
+        trade_date_func=lambda: '2026-10-16')
+
+def _legacy_select(kline_data, params):
+    """向量化前的 select_stocks_with_params（对照用）：逐只 calculate_stock_score"""
+    selected = []
+    for symbol, df in kline_data.items():
+        result = calculate_stock_score(df, symbol, params)
+        cap = result.get('market_cap_billion', 0)
+        min_score = BASE_PARAMS["selection"]["min_score"]
+        if cap > 0:
+            if cap < 20 or cap > 1000:
+                continue
+            if not (40 <= cap <= 200):
+                min_score += 0.1
+        if result['total_score'] >= min_score:
+            price = result['details']['current_price']
+            selected.append({
+                'symbol': symbol, 'entry_price': round(price, 2),
+                'stop_loss': round(price * (1 - 0.06), 2),
+                'take_profit': round(price * (1 + 0.06 * 2.5), 2),
+                'total_score': round(result['total_score'], 3),
+                'market_cap_billion': round(cap, 1),
+                'mktcap_score': round(result['mktcap_score'], 3),
+                'trend': result['details']['trend'], 'rsi': round(result['details']['rsi'], 1),
+                'volume_ratio': round(result['details']['vol_ratio'], 2),
+                'momentum': round(result['details']['momentum'], 4), 'risk_reward_ratio': 2.5})
+    return sorted(selected, key=lambda s: (s['total_score'], 40 <= s['market_cap_billion'] <= 200),
+                  reverse=True)
+
+def _param_sets():
+    grid = [dict(zip(PARAM_GRID, values)) for values in product(*PARAM_GRID.values())]
+    return [DEFAULT_PARAMS] + grid[::97]
+
+def test_mktcap_scores():
+    """市值评分向量版与标量版逐元素相同（含区间边界、0、负数、NaN）"""
+    caps = [0, -5, 0.5, 19.99, 20, 39.99, 40, 59.99, 60, 150, 150.01, 200, 200.01, 500, 500.01, 3000, np.nan]
+    assert list(calculate_mktcap_scores(caps)) == [calculate_mktcap_score(c) for c in caps]
+
+def test_breakdown_bit_identical():
+    """每只股票、每组参数的评分明细与 calculate_stock_score 逐位相同"""
+    kline_data = _universe()
+    with tempfile.TemporaryDirectory() as root:
+        _install_market_caps(root, _caps(kline_data))
+        try:
+            features = extract_score_features(kline_data)
+            for params in _param_sets():
+                scores = score_components(features, params)
+                for k, (symbol, df) in enumerate(kline_data.items()):
+                    want = calculate_stock_score(df, symbol, params)
+                    for name in ('total_score', 'trend_score', 'rsi_score', 'volume_score',
+                                 'mktcap_score', 'momentum_score', 'price_score', 'market_cap_billion'):
+                        assert scores[name][k] == want[name], (symbol, name, scores[name][k], want[name])
+                    if want['details']:
+                        assert scores['trend'][k] == want['details']['trend'], symbol
+                        assert scores['signals'][k] == want['details']['signals'], symbol
+        finally:
+            market_cap_module._default_service = None
+
+def test_select_matches_legacy():
+    """选股结果（字段、取整、排序）与逐只评分的写法一致"""
+    kline_data = _universe()
+    with tempfile.TemporaryDirectory() as root:
+        _install_market_caps(root, _caps(kline_data))
+        try:
+            features = extract_score_features(kline_data)
+            for params in _param_sets():
+                got = select_stocks_with_params(kline_data, params, features)
+                assert got == _legacy_select(kline_data, params), params
+            assert select_stocks_with_params(kline_data, DEFAULT_PARAMS) == \
+                _legacy_select(kline_data, DEFAULT_PARAMS)
+        finally:
+            market_cap_module._default_service = None
+
+def test_broadcast_and_rank():
+    """参数数组 (P, 1) 对全部股票一次广播，与逐组计算相同；排名表按总分降序"""
+    rng = np.random.default_rng(5)
+    n = 5000
+    features = pd.DataFrame({
+        'close': rng.uniform(1, 300, n), 'ma5': rng.uniform(1, 300, n), 'ma20': rng.uniform(1, 300, n),
+        'momentum': rng.normal(0, 0.05, n), 'vol_ratio': rng.uniform(0.3, 3, n),
+        'rsi': rng.uniform(0, 100, n), 'market_cap': rng.choice([0, 30, 80, 180, 400, 900], n),
+        'valid': rng.random(n) > 0.01}, index=[f'sz.{k:06d}' for k in range(n)])
+    grid = [dict(zip(PARAM_GRID, values)) for values in product(*PARAM_GRID.values())]
+    stacked = {name: np.array([p[name] for p in grid])[:, None] for name in PARAM_GRID}
+    started = time.perf_counter()
+    broadcast = score_components(features, stacked)['total_score']
+    elapsed = time.perf_counter() - started
+    print(f"{len(grid)}组参数 × {n}只股票一次评分: {elapsed * 1000:.1f}ms")
+    assert broadcast.shape == (len(grid), n)
+    for row in (0, 300, len(grid) - 1):
+        assert np.array_equal(broadcast[row], score_components(features, grid[row])['total_score'])
+
+    ranked = score_cross_section(features, DEFAULT_PARAMS)
+    assert list(ranked.index) != list(features.index)
+    assert (np.diff(ranked['total_score'].to_numpy()) <= 0).all()
+    assert ranked.loc[features.index[~features['valid']], 'total_score'].eq(0.1).all()
+
+def _legacy_evaluate(selected):
+    """原网格搜索对一组选股结果的评估（对照用）"""
+    if not selected:
+        return 0
+    diversity = len(set(s['trend'] for s in selected)) / 3
+    return np.mean([s['total_score'] for s in selected]) * 0.5 + (len(selected) / 50) * 0.3 + diversity * 0.2
+
+def test_full_grid_search():
+    """729 组全部评估：评估分数与逐组选股逐位相同；结果按阈值组合去重；整网格耗时低于原来逐组重算的 50 组子集"""
+    kline_data = _universe()
+    grid = [dict(zip(PARAM_GRID, values)) for values in product(*PARAM_GRID.values())]
+    with tempfile.TemporaryDirectory() as root:
+        _install_market_caps(root, _caps(kline_data))
+        try:
+            started = time.perf_counter()
+            result = grid_search_optimization(kline_data)
+            full_grid = time.perf_counter() - started
+
+            features = extract_score_features(kline_data)
+            legacy = [_legacy_evaluate(select_stocks_with_params(kline_data, p, features)) for p in grid]
+            best = int(np.argmax(legacy))
+            assert result['best_params'] == grid[best]
+            assert result['best_score'] == legacy[best]
+
+            # 均线参数不影响评分：各均线组合的 81 组分数相同，结果只列出互不相同的阈值组合
+            assert result['inactive_params'] == ['ma_short', 'ma_long']
+            distinct = len(grid) // 9
+            assert all(legacy[k] == legacy[k % distinct] for k in range(len(grid)))
+            top = sorted(range(distinct), key=lambda k: legacy[k], reverse=True)[:10]
+            assert [r['params'] for r in result['all_results']] == [grid[k] for k in top]
+            assert [r['evaluation_score'] for r in result['all_results']] == [legacy[k] for k in top]
+
+            # 原实现：每组都重新解析、计算指标、逐只评分；计时前 5 组，按 50 组折算
+            started = time.perf_counter()
+            for params in grid[:5]:
+                for symbol, df in kline_data.items():
+                    calculate_stock_score(df, symbol, params)
+            subset = (time.perf_counter() - started) * 10
+            print(f"全部{len(grid)}组: {full_grid:.2f}s, 原50组子集(折算): {subset:.2f}s")
+            assert full_grid < subset
+        finally:
+            market_cap_module._default_service = None
+
+if __name__ == "__main__":
+    print("🧪 向量化截面评分测试")
+    print("=" * 50)
+    test_mktcap_scores()
+    test_breakdown_bit_identical()
+    test_select_matches_legacy()
+    test_broadcast_and_rank()
+    test_full_grid_search()
+    print("✅ 全部通过")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据源录制/回放测试
+用假的上游数据源录制，再离线回放：结果一致、延迟注入、未录制请求报错
+"""
+
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from backend.services.data_provider import (DataProvider, RecordingDataProvider,
+                                            ReplayDataProvider, ReplayMissError)
+from backend.services.kline_store import KlineStore, get_kline_store
+from backend.services.kline_downloader import download_klines
+from backend.daily_report_generator import DailyReportGenerator
+
+class _FakeUpstream(DataProvider):
+    """模拟网络数据源：固定耗时，竞价数据带中文列名"""
+
+    mode = 'fake'
+
+    def __init__(self, delay: float = 0.02, now: datetime = None):
+        self.delay = delay
+        self.calls = 0
+        self._now = now
+
+    def now(self):
+        return self._now or super().now()
+
+    def call(self, source, method, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if method == 'query_history_k_data_plus':
+            return pd.DataFrame({'date': ['2025-06-26', '2025-06-27'], 'code': kwargs['code'],
+                                 'close': ['10.10', '10.30']})
+        if method == 'stock_zh_a_hist_pre_min_em':
+            return pd.DataFrame({'时间': ['2025-06-27 09:15:00', '2025-06-27 09:25:00', '2025-06-27 09:31:00'],
+                                 '开盘': [10.0, 10.2, 10.3], '成交量': [100, 300, 500]})
+        if method == 'query_stock_basic':
+            raise ConnectionError('模拟网络断开')
+        return pd.DataFrame()
+
+def test_record_then_replay():
+    """录制后回放结果一致，回放不访问上游"""
+    with tempfile.TemporaryDirectory() as archive:
+        upstream = _FakeUpstream()
+        recorder = RecordingDataProvider(archive, inner=upstream)
+        live_k = recorder.query_history_k_data_plus('sh.600000', 'date,code,close',
+                                                    start_date='2025-06-26', end_date='2025-06-27')
+        live_auction = recorder.stock_zh_a_hist_pre_min_em(symbol='600000', start_time='09:00:00',
+                                                           end_time='09:30:00')
+        try:
+            recorder.query_stock_basic(code='sh.600000')
+        except ConnectionError:
+            pass
+        assert upstream.calls == 3
+
+        replay = ReplayDataProvider(archive, latency=None)
+        pd.testing.assert_frame_equal(live_k, replay.query_history_k_data_plus(
+            'sh.600000', 'date,code,close', start_date='2025-06-26', end_date='2025-06-27'))
+        pd.testing.assert_frame_equal(live_auction, replay.stock_zh_a_hist_pre_min_em(
+            symbol='600000', start_time='09:00:00', end_time='09:30:00'))
+
+        # 录制时的异常同样回放
+        try:
+            replay.query_stock_basic(code='sh.600000')
+        except RuntimeError as e:
+            assert 'ConnectionError' in str(e)
+        else:
+            raise AssertionError('应回放录制时的异常')
+
+        # 未录制的请求
+        try:
+            replay.query_all_stock(day='2025-06-27')
+        except ReplayMissError:
+            pass
+        else:
+            raise AssertionError('应抛出 ReplayMissError')
+
+def test_replay_latency_injection():
+    """按录制耗时注入延迟"""
+    with tempfile.TemporaryDirectory() as archive:
+        recorder = RecordingDataProvider(archive, inner=_FakeUpstream(delay=0.05))
+        recorder.query_all_stock(day='2025-06-27')
+
+        replay = ReplayDataProvider(archive, latency='recorded')
+        started = time.perf_counter()
+        replay.query_all_stock(day='2025-06-27')
+        elapsed = time.perf_counter() - started
+        print(f"回放耗时: {elapsed:.3f}s")
+        assert elapsed >= 0.05
+
+        fast = ReplayDataProvider(archive, latency='recorded', latency_scale=0.0)
+        started = time.perf_counter()
+        fast.query_all_stock(day='2025-06-27')
+        assert time.perf_counter() - started < 0.05
+
+def test_report_generator_accepts_provider():
+    """日报生成器通过注入的数据源离线获取竞价数据"""
+    with tempfile.TemporaryDirectory() as archive:
+        recorder = RecordingDataProvider(archive, inner=_FakeUpstream(delay=0))
+        DailyReportGenerator(provider=recorder).get_auction_data_quick('600000')
+
+        generator = DailyReportGenerator(provider=ReplayDataProvider(archive, latency=None))
+        auction = generator.get_auction_data_quick('600000')
+        print(f"竞价数据: {auction}")
+        assert auction['status'] == 'success'
+        assert auction['final_price'] == 10.2
+        assert auction['data_points'] == 2
+
+def _provider_store(root, provider):
+    return KlineStore(root=root, clock=provider.now,
+                      fetcher=lambda symbol, fields, start_date, end_date, frequency:
+                      provider.query_history_k_data_plus(symbol, fields, start_date=start_date,
+                                                         end_date=end_date, frequency=frequency))
+
+def test_replay_as_of():
+    """回放的当前时间取录制时间：换一天、换一个空的本地存储回放，按当前日期拼出的请求仍命中归档"""
+    recorded_at = datetime(2025, 6, 27, 16, 30)
+    with tempfile.TemporaryDirectory() as root:
+        archive = os.path.join(root, 'archive')
+        recorder = RecordingDataProvider(archive, inner=_FakeUpstream(delay=0, now=recorded_at))
+        live = _provider_store(os.path.join(root, 'live'), recorder).get_history('sh.600000', '2025-06-01')
+        assert recorder.now() == recorded_at
+
+        replay = ReplayDataProvider(archive, latency=None)
+        assert replay.now() == recorded_at
+        replayed = _provider_store(os.path.join(root, 'replay'), replay).get_history('sh.600000', '2025-06-01')
+        pd.testing.assert_frame_equal(live, replayed)
+
+        # 显式指定 as_of 时覆盖清单
+        assert ReplayDataProvider(archive, as_of='2025-07-01').now() == datetime(2025, 7, 1)
+
+def test_record_replay_bypass_local_store():
+    """录制 / 回放不读写本地K线缓存：第二次录制仍请求完整区间，新归档可在另一台机器上独立回放"""
+    recorded_at = datetime(2025, 6, 27, 16, 30)
+    symbols = ['sh.600000', 'sz.000001']
+    with tempfile.TemporaryDirectory() as root:
+        for run in ('first', 'second'):
+            upstream = _FakeUpstream(delay=0, now=recorded_at)
+            recorder = RecordingDataProvider(os.path.join(root, run), inner=upstream)
+            assert not get_kline_store(recorder).persist
+            live = download_klines(symbols, '2025-06-01', workers=1, progress=False, provider=recorder)
+            assert upstream.calls == len(symbols)
+
+        replay = ReplayDataProvider(os.path.join(root, 'second'), latency=None)
+        replayed = download_klines(symbols, '2025-06-01', workers=2, progress=False, provider=replay)
+        assert list(replayed) == symbols
+        for symbol in symbols:
+            pd.testing.assert_frame_equal(live[symbol], replayed[symbol])
+
+def test_incomplete_provider_rejected():
+    """未实现 call() 的数据源在实例化时即报错"""
+    class _Incomplete(DataProvider):
+        mode = 'incomplete'
+
+    try:
+        _Incomplete()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('应在实例化时抛出 TypeError')
+
+if __name__ == "__main__":
+    print("🧪 数据源录制/回放测试")
+    print("=" * 50)
+    test_record_then_replay()
+    test_replay_latency_injection()
+    test_report_generator_accepts_provider()
+    test_replay_as_of()
+    test_record_replay_bypass_local_store()
+    test_incomplete_provider_rejected()
+    print("✅ 全部通过")
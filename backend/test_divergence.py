@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+背驰判定测试
+前缀和面积与逐段求和一致、一买/一卖信号与朴素实现一致、增量引擎与批量结果一致
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.services.divergence import SegmentAreas, macd_histogram, segment_divergence
+from backend.cchan_trader_core import PARAMS, ChanStream, _identify_segments, parse_structure
+
+def _naive_divergence(df, segments):
+    """朴素实现（对照用）：每次对两段重新切片求和"""
+    if len(segments) < 3 or segments[-3].direction != segments[-1].direction:
+        return None
+    prev, last = segments[-3], segments[-1]
+    up = last.direction == 'up'
+    if (last.end_price > prev.end_price) != up or last.end_price == prev.end_price:
+        return None
+    hist = macd_histogram(df['close'])
+    part = np.maximum(hist, 0) if up else np.maximum(-hist, 0)
+    prev_area = part[prev.start_idx:prev.end_idx + 1].sum()
+    last_area = part[last.start_idx:last.end_idx + 1].sum()
+    if prev_area <= 0 or last_area / prev_area >= PARAMS["divergence_ratio"]:
+        return None
+    volume = df['volume'].to_numpy()
+    shrink = volume[last.start_idx:last.end_idx + 1].sum() < volume[prev.start_idx:prev.end_idx + 1].sum()
+    return ('1_sell' if up else '1_buy'), (0.85 if shrink else 0.75)
+
+def test_prefix_areas():
+    """任意区间面积 / 量能与切片求和一致；逐根 append 与一次 cumsum 一致"""
+    rng = np.random.default_rng(0)
+    hist, volume = rng.normal(0, 1, 500), rng.uniform(1, 10, 500)
+    areas = SegmentAreas.from_series(hist, volume)
+    stepped = SegmentAreas()
+    for h, v in zip(hist, volume):
+        stepped.append(h, v)
+    assert len(areas) == len(stepped) == 500
+    for _ in range(200):
+        s, e = sorted(rng.integers(0, 500, 2))
+        for up in (True, False):
+            want = np.maximum(hist[s:e + 1] if up else -hist[s:e + 1], 0).sum()
+            assert abs(areas.area(s, e, up) - want) < 1e-9
+            assert abs(stepped.area(s, e, up) - want) < 1e-9
+        assert abs(areas.volume_sum(s, e) - volume[s:e + 1].sum()) < 1e-6
+    assert segment_divergence(areas, (0, 10), (20, 30), True, 0.0) is None
+
+def test_signals_match_naive():
+    """批量 parse_structure 的一买/一卖与朴素实现一致，且确有信号产生"""
+    fired = 0
+    for seed in range(80):
+        df = random_bars(200, seed, floor=2.0)
+        info = parse_structure(df)
+        got = [(tag, s.confidence) for tag in ('1_buy', '1_sell') for s in info.signals[tag]]
+        want = _naive_divergence(df, _identify_segments(df))
+        assert got == ([want] if want else []), seed
+        fired += bool(got)
+    print(f"80只随机K线中出现一买/一卖: {fired} 只")
+    assert fired > 0
+
+def test_stream_divergence():
+    """增量引擎：每根K线后的一买/一卖与批量结果一致"""
+    fired = 0
+    for seed in range(6):
+        df = random_bars(200, seed, floor=2.0)
+        stream = ChanStream()
+        for k, bar in enumerate(df.to_dict('records'), start=1):
+            stream.push(bar)
+            if k >= 10:
+                got = stream.snapshot().signals
+                want = parse_structure(df.iloc[:k]).signals
+                assert got['1_buy'] == want['1_buy'] and got['1_sell'] == want['1_sell']
+                fired += bool(want['1_buy'] or want['1_sell'])
+    assert fired > 0
+
+def test_pair_cost_is_constant():
+    """长序列上逐对比较所有同向段：前缀和查询不随段长增长"""
+    df = random_bars(20000, 4, floor=2.0)
+    segments = _identify_segments(df)
+    hist = macd_histogram(df['close'])
+    started = time.perf_counter()
+    areas = SegmentAreas.from_series(hist, df['volume'])
+    for prev, last in zip(segments, segments[2:]):
+        segment_divergence(areas, (prev.start_idx, prev.end_idx), (last.start_idx, last.end_idx),
+                           last.direction == 'up', 1.0)
+    prefix = time.perf_counter() - started
+    started = time.perf_counter()
+    for prev, last in zip(segments, segments[2:]):
+        for seg in (prev, last):
+            np.maximum(hist[seg.start_idx:seg.end_idx + 1], 0).sum()
+            df['volume'].iloc[seg.start_idx:seg.end_idx + 1].sum()
+    naive = time.perf_counter() - started
+    print(f"{len(segments)} 段逐对比较: 前缀和 {prefix * 1000:.1f}ms, 逐段求和 {naive * 1000:.1f}ms")
+    assert prefix < naive
+
+if __name__ == "__main__":
+    print("🧪 背驰判定测试")
+    print("=" * 50)
+    test_prefix_areas()
+    test_signals_match_naive()
+    test_stream_divergence()
+    test_pair_cost_is_constant()
+    print("✅ 全部通过")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享HTTP客户端测试
+在本地启动模拟东方财富行情的桩服务器，验证并发、连接复用、按主机限速
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.http_client import HttpClient
+from backend.services.market_cap import fetch_eastmoney_quotes
+
+RESPONSE_DELAY = 0.05
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """模拟 push2.eastmoney.com/api/qt/stock/get：每个请求延迟50ms"""
+
+    protocol_version = 'HTTP/1.1'  # 支持 keep-alive
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _StubHandler.lock:
+            _StubHandler.connections += 1
+
+    def do_GET(self):
+        time.sleep(RESPONSE_DELAY)
+        secid = parse_qs(urlsplit(self.path).query).get('secid', ['0.000000'])[0]
+        code = secid.split('.')[-1]
+        # 以 9 结尾的代码模拟停牌/无数据
+        data = None if code.endswith('9') else {'f116': int(code) * 1e4, 'f117': int(code) * 5e3}
+        body = json.dumps({'rc': 0, 'data': data}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _start_server():
+    _StubHandler.connections = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/api/qt/stock/get'
+
+def test_get_many_concurrent_and_pooled():
+    """40个请求并发完成，远快于串行，且复用长连接"""
+    server, url = _start_server()
+    try:
+        client = HttpClient(max_concurrency=10, pool_maxsize=10, host_rates={})
+        codes = [f'{600000 + i}' for i in range(40)]
+        started = time.perf_counter()
+        records = fetch_eastmoney_quotes(codes, client=client, url=url)
+        elapsed = time.perf_counter() - started
+        print(f"40个请求耗时 {elapsed:.2f}s（串行约 {40 * RESPONSE_DELAY:.1f}s），连接数 {_StubHandler.connections}")
+
+        assert elapsed < 40 * RESPONSE_DELAY / 2
+        assert _StubHandler.connections <= 10
+        assert records['600000']['market_cap'] == 600000 * 1e4
+        assert records['600009'] is None
+
+        # 第二批请求复用已建立的连接
+        fetch_eastmoney_quotes(codes, client=client, url=url)
+        assert _StubHandler.connections <= 10
+        client.close()
+    finally:
+        server.shutdown()
+
+def test_host_rate_limit():
+    """单主机每秒50个请求：前50个为突发额度，之后按速率放行"""
+    global RESPONSE_DELAY
+    server, url = _start_server()
+    delay, RESPONSE_DELAY = RESPONSE_DELAY, 0
+    try:
+        client = HttpClient(max_concurrency=20, host_rates={'127.0.0.1': 50})
+        started = time.perf_counter()
+        responses = client.get_many({i: (url, {'secid': f'1.{600000 + i}'}) for i in range(75)})
+        elapsed = time.perf_counter() - started
+        print(f"75个请求限速耗时 {elapsed:.2f}s")
+        assert all(r.status_code == 200 for r in responses.values())
+        assert elapsed >= (75 - 50) / 50 * 0.9
+        client.close()
+    finally:
+        RESPONSE_DELAY = delay
+        server.shutdown()
+
+if __name__ == "__main__":
+    print("🧪 共享HTTP客户端测试")
+    print("=" * 50)
+    test_get_many_concurrent_and_pooled()
+    test_host_rate_limit()
+    print("✅ 全部通过")
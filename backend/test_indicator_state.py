@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量技术指标状态测试
+逐根更新与批量 compute_indicators 一致、peek 不改变状态、序列化后续算一致、重放已计入K线被跳过
+"""
+
+import os
+import sys
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.services.indicators import IndicatorSpec, compute_indicators, latest_indicators
+from backend.services.indicator_state import IndicatorState, IndicatorStateStore, RollingWindow
+
+FULL_SPEC = IndicatorSpec(ma_periods=(5, 20, 60), ema_spans=(12,), rsi_period=14, macd=(12, 26),
+                          macd_signal=9, boll=(20, 2.0), vol_period=20, momentum_periods=(5, 10),
+                          volatility_period=20)
+WILDER_SPEC = IndicatorSpec(ma_periods=(10,), rsi_period=14, rsi_wilder=True, momentum_periods=())
+
+# 合成K线：几何游走、0.01 价位
+BAR_SHAPE = dict(geometric=True, sigma=0.02, tick=0.01, spread=0.01)
+
+def _assert_row(got, batch, k):
+    assert set(got) == set(batch), k
+    for name, values in batch.items():
+        np.testing.assert_allclose(got[name], values[k], rtol=1e-9, atol=1e-9, err_msg=f'{name}@{k}')
+
+def test_matches_batch():
+    """每根K线后的指标与整段批量计算一致（含预热期的 NaN、Wilder RSI、平盘窗口）"""
+    df = random_bars(400, 0, **BAR_SHAPE)
+    df.loc[100:130, 'close'] = df['close'].iloc[100]
+    for spec in (FULL_SPEC, WILDER_SPEC):
+        batch = compute_indicators(df['close'], df['volume'], spec).columns
+        state = IndicatorState(spec)
+        for k, (c, v) in enumerate(zip(df['close'], df['volume'])):
+            _assert_row(state.update(c, v), batch, k)
+
+def test_peek_and_roundtrip():
+    """peek 等于推入后的值且不改变状态；JSON 落盘后续算与不中断一致；重放已计入的K线被跳过"""
+    df = random_bars(300, 1, **BAR_SHAPE)
+    batch = compute_indicators(df['close'], df['volume'], FULL_SPEC).columns
+    state = IndicatorState(FULL_SPEC)
+    with tempfile.TemporaryDirectory() as root:
+        store = IndicatorStateStore(root)
+        for k, (c, v) in enumerate(zip(df['close'][:200], df['volume'][:200])):
+            before = state.to_dict()
+            _assert_row(state.peek(c, v), batch, k)
+            assert state.to_dict() == before
+            state.update(c, v, key=k)
+        store.save({'sh.600000': state}, period='5m')
+        restored = store.load(period='5m')['sh.600000']
+        assert store.load(period='30m') == {}
+
+    # 重启后从头重放：已计入的K线按 key 跳过，只推入新K线
+    for k, (c, v) in enumerate(zip(df['close'], df['volume'])):
+        got = restored.update(c, v, key=k)
+        _assert_row(got, batch, max(k, 199))
+    assert restored.count == 300
+
+def test_long_run_drift():
+    """长时间运行：滑动和每圈重算，与精确值的误差不累积"""
+    rng = np.random.default_rng(2)
+    values = rng.uniform(1e5, 1e6, 200000)
+    window = RollingWindow(20)
+    for x in values:
+        window.update(x)
+    assert abs(window.mean() - values[-20:].mean()) < 1e-9 * values[-20:].mean()
+    assert abs(window.std() - values[-20:].std(ddof=1)) < 1e-6 * values[-20:].std(ddof=1)
+
+def test_refresh_cost():
+    """盘中刷新：peek 只做 O(1) 运算，快于对整段历史重算最后一根"""
+    df = random_bars(5000, 3, **BAR_SHAPE)
+    state = IndicatorState(FULL_SPEC)
+    for c, v in zip(df['close'], df['volume']):
+        state.update(c, v)
+    started = time.perf_counter()
+    for _ in range(200):
+        state.peek(df['close'].iloc[-1] * 1.01, 1e6)
+    incremental = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(200):
+        latest_indicators(df['close'], df['volume'], FULL_SPEC)
+    recompute = time.perf_counter() - started
+    print(f"5000根历史、200次刷新: 增量 {incremental * 1000:.1f}ms, 整段重算 {recompute * 1000:.1f}ms")
+    assert incremental < recompute
+
+if __name__ == "__main__":
+    print("🧪 增量技术指标状态测试")
+    print("=" * 50)
+    test_matches_batch()
+    test_peek_and_roundtrip()
+    test_long_run_drift()
+    test_refresh_cost()
+    print("✅ 全部通过")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统一技术指标库测试
+与原 pandas 写法一致、面板逐行与单序列一致、只算最后一根与整段一致、同一帧只算一次
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.services.bar_parser import parse_bars
+from backend.services.indicators import (IndicatorSpec, add_indicators, compute_indicators,
+                                         latest_indicators, rsi)
+from backend.cchan_trader_optimized import INDICATOR_SPEC, SimpleChanAnalyzer, add_technical_indicators
+
+FULL_SPEC = IndicatorSpec(ma_periods=(5, 20, 60), ema_spans=(12,), rsi_period=14, macd=(12, 26),
+                          macd_signal=9, boll=(20, 2.0), vol_period=20, momentum_periods=(5, 10),
+                          volatility_period=20)
+
+# 合成K线：几何游走、0.01 价位
+BAR_SHAPE = dict(geometric=True, sigma=0.02, tick=0.01, spread=0.01)
+
+def _pandas_reference(df):
+    """原各脚本的 pandas 写法（对照用）"""
+    close, volume = df['close'], df['volume']
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(14).mean()
+    loss = -delta.where(delta < 0, 0).rolling(14).mean()
+    dif = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    dea = dif.ewm(span=9).mean()
+    vol_ma = volume.rolling(20).mean()
+    ref = {f'ma{p}': close.rolling(p).mean() for p in (5, 20, 60)}
+    ref.update({
+        'ema12': close.ewm(span=12).mean(),
+        # 窗口内涨跌皆无：原写法为 NaN（核心按 50 处理），指标库直接给 50
+        'rsi': (100 - 100 / (1 + gain / loss)).mask((gain == 0) & (loss == 0), 50.0),
+        'macd': dif, 'macd_signal': dea, 'macd_hist': dif - dea,
+        'boll_mid': close.rolling(20).mean(),
+        'boll_upper': close.rolling(20).mean() + 2 * close.rolling(20).std(),
+        'boll_lower': close.rolling(20).mean() - 2 * close.rolling(20).std(),
+        'vol_ma': vol_ma, 'vol_ratio': volume / (vol_ma + 1e-10),
+        'momentum_5': close.pct_change(5), 'momentum_10': close.pct_change(10),
+        'volatility': close.pct_change().rolling(20).std(),
+    })
+    return ref
+
+def test_matches_pandas():
+    """全部指标与原 pandas 写法一致（含短序列）"""
+    for seed, n in enumerate([3000, 200, 61, 25, 9]):
+        df = random_bars(n, seed, **BAR_SHAPE)
+        result = compute_indicators(df['close'], df['volume'], FULL_SPEC)
+        ref = _pandas_reference(df)
+        assert set(result) == set(ref)
+        for name, want in ref.items():
+            np.testing.assert_allclose(result[name], want.to_numpy(dtype=np.float64),
+                                       rtol=1e-9, atol=1e-9, err_msg=name)
+
+def test_rsi_flat_window():
+    """窗口内无涨跌为 50，只涨为 100，只跌为 0"""
+    assert rsi(np.full(20, 10.0))[-1] == 50
+    assert rsi(np.arange(20.0))[-1] == 100
+    assert rsi(np.arange(20.0)[::-1])[-1] == 0
+    assert np.isnan(rsi(np.arange(20.0))[12])
+
+def test_panel_rows_match_series():
+    """左侧 NaN 补齐的面板：每行与该股票单独计算一致；latest 与整段最后一项一致"""
+    frames = [random_bars(n, seed, **BAR_SHAPE) for seed, n in enumerate([300, 120, 40, 12])]
+    width = max(len(df) for df in frames)
+    close = np.full((len(frames), width), np.nan)
+    volume = np.full((len(frames), width), np.nan)
+    for k, df in enumerate(frames):
+        close[k, width - len(df):] = df['close']
+        volume[k, width - len(df):] = df['volume']
+    panel = compute_indicators(close, volume, FULL_SPEC)
+    latest = latest_indicators(close, volume, FULL_SPEC)
+    for k, df in enumerate(frames):
+        single = compute_indicators(df['close'], df['volume'], FULL_SPEC)
+        for name in single:
+            np.testing.assert_allclose(panel[name][k, width - len(df):], single[name],
+                                       rtol=1e-12, atol=1e-12, err_msg=name)
+            np.testing.assert_allclose(latest[name][k], single[name][-1:], rtol=1e-12, atol=1e-12,
+                                       err_msg=name)
+
+def test_computed_once():
+    """同一帧、同一口径只算一次；解析后未丢行的帧仍被识别为已算过"""
+    df = parse_bars(random_bars(120, 3, **BAR_SHAPE))
+    df = add_technical_indicators(df)
+    assert list(df.attrs['indicators']) == [INDICATOR_SPEC]
+    df['ma5'] = -1.0
+    again = add_technical_indicators(parse_bars(df))
+    assert (again['ma5'] == -1.0).all()
+    # 帧长不足的列不写入；不同口径各算一次
+    short = add_indicators(random_bars(30, 4, **BAR_SHAPE), IndicatorSpec(ma_periods=(5, 34)))
+    assert 'ma5' in short.columns and 'ma34' not in short.columns
+    add_indicators(short, IndicatorSpec(ma_periods=(10,)))
+    assert len(short.attrs['indicators']) == 2 and 'ma10' in short.columns
+
+def test_attrs_carried_to_subsets():
+    """attrs 会随列子集与拷贝传递：缺列或收盘价变化时重新计算"""
+    df = add_technical_indicators(parse_bars(random_bars(120, 5, **BAR_SHAPE)))
+    subset = df[['close', 'volume']]
+    assert 'indicators' in subset.attrs
+    subset = add_indicators(subset, INDICATOR_SPEC)
+    np.testing.assert_array_equal(subset['ma5'], df['ma5'])
+
+    doubled = df.copy()
+    doubled['close'] = doubled['close'] * 2
+    add_indicators(doubled, INDICATOR_SPEC)
+    np.testing.assert_allclose(doubled['ma5'], df['ma5'] * 2, rtol=1e-12)
+
+    # 已分析过的帧取原始列子集后再分析（原先 KeyError: 'rsi'）
+    raw = df[['high', 'low', 'close', 'volume']]
+    analyzed = SimpleChanAnalyzer(raw).df
+    assert {'rsi', 'ma5', 'momentum'} <= set(analyzed.columns)
+
+if __name__ == "__main__":
+    print("🧪 统一技术指标库测试")
+    print("=" * 50)
+    test_matches_pandas()
+    test_rsi_flat_window()
+    test_panel_rows_match_series()
+    test_computed_once()
+    test_attrs_carried_to_subsets()
+    print("✅ 全部通过")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程K线下载器测试
+用假数据源验证：多进程结果与串行一致、按输入顺序返回、失败重试、工作进程退出时登出
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from backend.services import baostock_session
+from backend.services.baostock_session import BaoStockSession
+from backend.services.kline_downloader import download_klines
+
+_flaky_calls = {}
+
+def _fake_fetcher(symbol, fields, start_date, end_date, frequency):
+    """按代码生成确定性的日K线（模块级函数，可被子进程pickle）"""
+    dates = pd.bdate_range(start_date, end_date)
+    base = int(symbol.split('.')[-1]) % 100 + 10
+    close = [base + i * 0.1 for i in range(len(dates))]
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'), 'code': symbol,
+        'open': close, 'high': close, 'low': close, 'close': close,
+        'volume': 1000.0, 'amount': 10000.0,
+    })
+
+def _flaky_fetcher(symbol, fields, start_date, end_date, frequency):
+    """第一次请求失败，第二次成功"""
+    _flaky_calls[symbol] = _flaky_calls.get(symbol, 0) + 1
+    if _flaky_calls[symbol] == 1:
+        raise ConnectionError('模拟网络断开')
+    return _fake_fetcher(symbol, fields, start_date, end_date, frequency)
+
+SYMBOLS = ['sh.600000', 'sz.000001', 'sz.002415', 'sz.300750', 'sh.601318', 'sz.000858']
+FIELDS = 'date,code,open,high,low,close,volume'
+
+def test_parallel_matches_serial():
+    """多进程下载与串行下载结果一致，且保持输入顺序"""
+    with tempfile.TemporaryDirectory() as serial_root, tempfile.TemporaryDirectory() as parallel_root:
+        serial = download_klines(SYMBOLS, '2025-01-01', '2025-03-31', fields=FIELDS,
+                                 workers=1, progress=False, store_root=serial_root,
+                                 fetcher=_fake_fetcher)
+        parallel = download_klines(SYMBOLS, '2025-01-01', '2025-03-31', fields=FIELDS,
+                                   workers=3, progress=False, store_root=parallel_root,
+                                   fetcher=_fake_fetcher)
+
+    print(f"串行: {len(serial)}只, 并行: {len(parallel)}只")
+    assert list(parallel) == SYMBOLS
+    for symbol in SYMBOLS:
+        pd.testing.assert_frame_equal(serial[symbol], parallel[symbol])
+
+def test_min_bars_and_retry():
+    """失败后重试成功；不足 min_bars 的股票被丢弃"""
+    _flaky_calls.clear()
+    with tempfile.TemporaryDirectory() as root:
+        data = download_klines(SYMBOLS[:2], '2025-03-01', '2025-03-31', fields=FIELDS,
+                               workers=1, retries=1, progress=False, store_root=root,
+                               fetcher=_flaky_fetcher)
+        assert set(data) == set(SYMBOLS[:2])
+        assert all(_flaky_calls[s] == 2 for s in SYMBOLS[:2])
+
+        short = download_klines(SYMBOLS[:2], '2025-03-01', '2025-03-31', fields=FIELDS,
+                                workers=1, min_bars=60, progress=False, store_root=root,
+                                fetcher=_fake_fetcher)
+        assert short == {}
+
+class _MarkerSession(BaoStockSession):
+    """登出时在目录下留一个以 pid 命名的标记文件"""
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+
+    def logout(self):
+        open(os.path.join(self.root, str(os.getpid())), 'w').close()
+
+def test_workers_logout_on_exit():
+    """进程池正常结束时每个工作进程都执行登出"""
+    session = baostock_session._session
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as markers:
+        baostock_session._session = _MarkerSession(markers)
+        try:
+            data = download_klines(SYMBOLS, '2025-03-01', '2025-03-31', fields=FIELDS,
+                                   workers=3, progress=False, store_root=root, fetcher=_fake_fetcher)
+        finally:
+            baostock_session._session = session
+        assert list(data) == SYMBOLS
+        logged_out = os.listdir(markers)
+    assert len(logged_out) == 3 and str(os.getpid()) not in logged_out
+
+if __name__ == "__main__":
+    print("🧪 多进程K线下载器测试")
+    print("=" * 50)
+    test_parallel_matches_serial()
+    test_min_bars_and_retry()
+    test_workers_logout_on_exit()
+    print("✅ 全部通过")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地K线列式存储的增量同步
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.kline_store import KlineStore
+
+TRADE_DATES = pd.bdate_range('2025-01-01', '2025-06-30').strftime('%Y-%m-%d').tolist()
+
+def make_fetcher(calls: list):
+    """构造模拟BaoStock返回字符串数据的抓取函数"""
+    def fetch(symbol, fields, start_date, end_date, frequency):
+        calls.append((start_date, end_date))
+        dates = [d for d in TRADE_DATES if start_date <= d <= end_date]
+        return pd.DataFrame({
+            'date': dates,
+            'code': symbol,
+            'open': '10.0', 'high': '11.0', 'low': '9.5',
+            'close': [f'{10 + i * 0.01:.2f}' for i in range(len(dates))],
+            'preclose': '', 'volume': '120000', 'amount': '1200000.0',
+            'turn': '', 'pctChg': '0.1'
+        })
+    return fetch
+
+def test_incremental_update():
+    """首次全量，之后只请求增量"""
+    print("🧪 测试K线增量同步...")
+    calls = []
+    store = KlineStore(tempfile.mkdtemp(), make_fetcher(calls))
+
+    df = store.get_history('sh.600000', '2025-03-01', '2025-04-30',
+                           fields='date,code,open,high,low,close,volume')
+    assert len(calls) == 1
+    assert df['close'].dtype == 'float64'
+    assert list(df.columns) == ['date', 'code', 'open', 'high', 'low', 'close', 'volume']
+
+    df = store.get_history('sh.600000', '2025-03-01', '2025-05-30')
+    assert calls[-1] == ('2025-05-01', '2025-05-30')
+    assert df['date'].iloc[-1] == '2025-05-30'
+
+    # 向前扩展只补前段
+    df = store.get_history('sh.600000', '2025-02-01', '2025-05-30')
+    assert calls[-1] == ('2025-02-01', '2025-02-28')
+    assert df['date'].is_monotonic_increasing
+    print(f"✅ 共请求 {len(calls)} 次，本地 {len(df)} 根K线")
+
+def test_repeat_run_no_network():
+    """新进程重复运行不再请求"""
+    print("🧪 测试重复运行无网络请求...")
+    calls = []
+    root = tempfile.mkdtemp()
+    KlineStore(root, make_fetcher(calls)).get_history('sz.000001', '2025-03-01', '2025-04-30')
+    count = len(calls)
+
+    df = KlineStore(root, make_fetcher(calls)).get_history('sz.000001', '2025-03-01', '2025-04-30')
+    assert len(calls) == count
+    assert len(df) > 0
+    print("✅ 重复运行直接读取本地分区")
+
+def test_prepend_counts_new_bars_only():
+    """向前补齐的区间与已存数据重叠时，只计入实际插入的条数"""
+    print("🧪 测试向前补齐计数...")
+    calls = []
+    fetcher = make_fetcher(calls)
+    store = KlineStore(tempfile.mkdtemp(), fetcher)
+    store.get_history('sh.600000', '2025-03-01', '2025-04-30')
+
+    cols = store._to_columns(fetcher('sh.600000', '', '2025-02-01', '2025-03-31', 'd'), 'd')
+    expected = len([d for d in TRADE_DATES if '2025-02-01' <= d < '2025-03-01'])
+    assert store._prepend('sh.600000', 'd', cols) == expected
+    assert store._prepend('sh.600000', 'd', cols) == 0
+    df = store.get_history('sh.600000', '2025-02-01', '2025-04-30')
+    assert df['date'].is_unique and df['date'].is_monotonic_increasing
+    print(f"✅ 补齐 {expected} 根，重复补齐 0 根")
+
+def make_minute_fetcher(calls: list):
+    """模拟5分钟线：每个交易日两根"""
+    def fetch(symbol, fields, start_date, end_date, frequency):
+        calls.append((frequency, start_date, end_date))
+        dates = [d for d in TRADE_DATES if start_date <= d <= end_date]
+        return pd.DataFrame({
+            'date': np.repeat(dates, 2), 'code': symbol,
+            'time': [f"{d.replace('-', '')}{t}000" for d in dates for t in ('093500', '094000')],
+            'open': '10.0', 'high': '11.0', 'low': '9.5', 'close': '10.2',
+            'volume': '1000', 'amount': '10200.0'
+        })
+    return fetch
+
+def _age(store, symbol, frequency, seconds):
+    """把分区的上次检查时间往前拨"""
+    store._memory[(symbol, frequency)]['checked_at'] -= seconds
+
+def test_refresh_interval_per_frequency():
+    """当日5分钟线过一根K线的时长就重新请求，日线仍按一小时"""
+    print("🧪 测试按周期的刷新间隔...")
+    calls = []
+    fetcher = make_fetcher(calls)
+    minute_fetcher = make_minute_fetcher(calls)
+    store = KlineStore(tempfile.mkdtemp(), clock=lambda: datetime(2025, 6, 30, 10, 0),
+                       fetcher=lambda symbol, fields, start, end, frequency:
+                       (minute_fetcher if frequency == '5' else fetcher)(symbol, fields, start, end, frequency))
+    store.get_history('sh.600000', '2025-06-20', frequency='5')
+    store.get_history('sh.600000', '2025-06-20')
+    count = len(calls)
+    store.get_history('sh.600000', '2025-06-20', frequency='5')
+    store.get_history('sh.600000', '2025-06-20')
+    assert len(calls) == count
+
+    _age(store, 'sh.600000', '5', 360)
+    _age(store, 'sh.600000', 'd', 360)
+    store.get_history('sh.600000', '2025-06-20', frequency='5')
+    store.get_history('sh.600000', '2025-06-20')
+    assert calls[count:] == [('5', '2025-06-30', '2025-06-30')]
+    print("✅ 5分钟线按5分钟刷新，日线按小时刷新")
+
+if __name__ == "__main__":
+    test_incremental_update()
+    test_repeat_run_no_network()
+    test_prepend_counts_new_bars_only()
+    test_refresh_interval_per_frequency()
+    print("\n🎉 K线存储测试全部通过！")
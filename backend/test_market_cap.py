@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+市值缓存服务测试
+用假数据源验证：当日缓存命中、无数据负缓存、失败短暂记录不落盘、磁盘快照、跨交易日失效、批量刷新
+"""
+
+import os
+import sys
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.market_cap import MarketCapService
+
+class _FakeQuotes:
+    """单只行情：000001 请求超时，000002 无市值，其余返回固定市值"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, code):
+        self.calls.append(code)
+        if code == '000001':
+            raise ConnectionError('模拟超时')
+        if code == '000002':
+            return None
+        return {'market_cap': 100e8, 'circulating_cap': 80e8, 'source': 'eastmoney'}
+
+def _fake_bulk():
+    return {'600000': {'market_cap': 2500e8, 'circulating_cap': 2500e8, 'source': 'eastmoney'},
+            '300750': {'market_cap': 9000e8, 'circulating_cap': 8000e8, 'source': 'eastmoney'}}
+
+def test_cache_and_negative_cache():
+    """同一交易日重复查询只请求一次，失败也只请求一次"""
+    with tempfile.TemporaryDirectory() as root:
+        fetcher = _FakeQuotes()
+        service = MarketCapService(os.path.join(root, 'mc.json'), fetcher=fetcher,
+                                   trade_date_func=lambda: '2025-06-27')
+        for _ in range(50):
+            assert service.get_billion('sh.600519') == 100
+            assert service.get('sz.000001') is None
+        print(f"请求次数: {len(fetcher.calls)}")
+        assert fetcher.calls == ['600519', '000001']
+
+def test_snapshot_and_trade_date_rollover():
+    """快照在同一交易日被新实例复用，换交易日后失效"""
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'mc.json')
+        service = MarketCapService(path, fetcher=_FakeQuotes(), trade_date_func=lambda: '2025-06-27')
+        service.get('600519')
+        service.save()
+
+        fetcher = _FakeQuotes()
+        same_day = MarketCapService(path, fetcher=fetcher, trade_date_func=lambda: '2025-06-27')
+        assert same_day.get_billion('600519') == 100
+        assert fetcher.calls == []
+
+        next_day = MarketCapService(path, fetcher=fetcher, trade_date_func=lambda: '2025-06-30')
+        next_day.get('600519')
+        assert fetcher.calls == ['600519']
+
+def test_bulk_refresh_and_lru_limit():
+    """批量刷新后不再逐只请求；未返回的代码记为负缓存；LRU 有容量上限"""
+    with tempfile.TemporaryDirectory() as root:
+        fetcher = _FakeQuotes()
+        service = MarketCapService(os.path.join(root, 'mc.json'), maxsize=2, fetcher=fetcher,
+                                   bulk_fetcher=_fake_bulk, trade_date_func=lambda: '2025-06-27')
+        assert service.bulk_refresh(['sh.600000', 'sz.300750', 'sz.002999']) == 2
+        assert service.get_billion('sh.600000') == 2500
+        assert service.get_billion('sz.300750') == 9000
+        assert service.get('sz.002999') is None
+        assert fetcher.calls == []
+        assert len(service._lru) == 2
+
+def test_errors_not_persisted():
+    """无市值的结果落盘并整日复用；请求失败只在重试间隔内跳过，不写入快照"""
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'mc.json')
+        fetcher = _FakeQuotes()
+        service = MarketCapService(path, fetcher=fetcher, trade_date_func=lambda: '2025-06-27',
+                                   retry_interval=0)
+        assert service.get('000002') is None
+        assert service.get('000001') is None
+        assert service.get('000001') is None
+        assert service.get('000002') is None
+        assert fetcher.calls == ['000002', '000001', '000001']
+        service.save()
+
+        fetcher = _FakeQuotes()
+        same_day = MarketCapService(path, fetcher=fetcher, trade_date_func=lambda: '2025-06-27')
+        assert same_day.get('000002') is None
+        assert same_day.get('000001') is None
+        assert fetcher.calls == ['000001']
+
+def test_batch_failure():
+    """批量请求整批异常或个别代码缺席时，只记为失败，到期后重新请求"""
+    with tempfile.TemporaryDirectory() as root:
+        batches = []
+
+        def many_fetcher(codes):
+            batches.append(list(codes))
+            if len(batches) == 1:
+                raise ConnectionError('模拟整批超时')
+            return {code: {'market_cap': 50e8, 'circulating_cap': 50e8, 'source': 'eastmoney'}
+                    for code in codes if code != '600001'}
+
+        fetcher = _FakeQuotes()
+        service = MarketCapService(os.path.join(root, 'mc.json'), fetcher=fetcher,
+                                   many_fetcher=many_fetcher, trade_date_func=lambda: '2025-06-27',
+                                   retry_interval=0.2)
+        symbols = ['sh.600000', 'sh.600001']
+        assert service.get_many(symbols) == {'sh.600000': None, 'sh.600001': None}
+        assert fetcher.calls == [] and service._snapshot == {}
+
+        time.sleep(0.25)
+        records = service.get_many(symbols)
+        assert records['sh.600000']['market_cap'] == 50e8 and records['sh.600001'] is None
+        assert batches == [['600000', '600001']] * 2
+        assert list(service._snapshot) == ['600000']
+
+if __name__ == "__main__":
+    print("🧪 市值缓存服务测试")
+    print("=" * 50)
+    test_cache_and_negative_cache()
+    test_snapshot_and_trade_date_rollover()
+    test_bulk_refresh_and_lru_limit()
+    test_errors_not_persisted()
+    test_batch_failure()
+    print("✅ 全部通过")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分钟线服务测试
+验证5分钟线本地存储往返、30分钟线合成口径（每日8根，时间取段末）
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from backend.services.kline_store import KlineStore
+from backend.services.minute_bars import resample_30m, last_trading_days
+
+def _session_times():
+    """A股一天48根5分钟线的结束时刻"""
+    morning = pd.date_range('2000-01-01 09:35', '2000-01-01 11:30', freq='5min')
+    afternoon = pd.date_range('2000-01-01 13:05', '2000-01-01 15:00', freq='5min')
+    return [t.strftime('%H%M') for t in morning.append(afternoon)]
+
+def _fake_5m(symbol, fields, start_date, end_date, frequency):
+    """生成 BaoStock 格式的5分钟线（字符串）"""
+    rows = []
+    for day in pd.bdate_range(start_date, end_date):
+        for i, hhmm in enumerate(_session_times()):
+            price = 10 + day.day * 0.1 + i * 0.01
+            rows.append({
+                'date': day.strftime('%Y-%m-%d'),
+                'time': f"{day.strftime('%Y%m%d')}{hhmm}00000",
+                'code': symbol,
+                'open': f'{price:.2f}', 'high': f'{price + 0.05:.2f}',
+                'low': f'{price - 0.05:.2f}', 'close': f'{price + 0.01:.2f}',
+                'volume': str(1000 + i), 'amount': str(10000 + i),
+            })
+    return pd.DataFrame(rows)
+
+def test_store_roundtrip_and_resample():
+    """5分钟线入库后读出，合成30分钟线与逐组聚合结果一致"""
+    with tempfile.TemporaryDirectory() as root:
+        store = KlineStore(root=root, fetcher=_fake_5m)
+        df_5m = store.get_history('sh.600000', '2025-06-23', '2025-06-27', frequency='5',
+                                  fields='date,time,code,open,high,low,close,volume,amount')
+        assert len(df_5m) == 5 * 48
+        assert os.path.exists(os.path.join(root, '5', 'sh.600000.npz'))
+
+    df_30m = resample_30m(df_5m)
+    print(f"5分钟线 {len(df_5m)} 根 -> 30分钟线 {len(df_30m)} 根")
+    assert len(df_30m) == 5 * 8
+    assert [t[8:12] for t in df_30m['time'][:8]] == ['1000', '1030', '1100', '1130',
+                                                     '1330', '1400', '1430', '1500']
+
+    # 对照：每6根一组
+    groups = np.arange(len(df_5m)) // 6
+    ref = df_5m.groupby(groups).agg({'open': 'first', 'high': 'max', 'low': 'min',
+                                     'close': 'last', 'volume': 'sum', 'amount': 'sum'})
+    for col in ['open', 'high', 'low', 'close', 'volume', 'amount']:
+        np.testing.assert_allclose(df_30m[col].to_numpy(), ref[col].to_numpy())
+
+def test_last_trading_days():
+    """截取最近N个交易日"""
+    df_5m = _fake_5m('sz.000001', '', '2025-06-23', '2025-06-27', '5')
+    recent = last_trading_days(df_5m, 2)
+    assert sorted(recent['date'].unique()) == ['2025-06-26', '2025-06-27']
+    assert len(recent) == 2 * 48
+
+if __name__ == "__main__":
+    print("🧪 分钟线服务测试")
+    print("=" * 50)
+    test_store_roundtrip_and_resample()
+    test_last_trading_days()
+    print("✅ 全部通过")
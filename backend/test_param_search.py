@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+策略参数搜索测试
+共享内存面板只读挂载、止损 / 止盈收益计算、多进程与串行结果一致、检查点续跑只补跑缺失试验、逐次减半各档预算
+"""
+
+import os
+import sys
+import json
+import tempfile
+import multiprocessing as mp
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.cchan_trader_core import PARAMS
+from backend.services.shared_arrays import SharedArrays
+from backend.services.structure_cache import get_structure_cache
+from backend.cchan_param_search import (CORE_SEARCH_SPACE, ParamSearch, applied_params, rank_trials,
+                                        sample_params, trade_return)
+
+SETTINGS = {'warmup': 60, 'step': 4, 'horizon': 5}
+
+# 合成数据上放宽量价确认，保证有足够交易（搜索机制与参数取值无关）
+TEST_SPACE = {
+    'v_break_min': [0.5, 1.0, 1.8],
+    'v_pull_max': [0.5, 1.5, 3.0],
+    'daily_up_cross_ratio': [1.0, 1.02],
+    'stop_buffer_pct': [0.02, 0.04],
+}
+
+# 合成K线：带周期回撤的上涨走势，放量K线随机出现
+BAR_SHAPE = dict(geometric=True, drift=0.006, sigma=0.03, tick=0.01, spread=0.02, cycle=0.15,
+                 spike=0.15, start='2024-01-01')
+
+def _universe(count=9, n=140):
+    return {f'sh.{600000 + i}': random_bars(n, i, **BAR_SHAPE) for i in range(count)}
+
+def _strip(records):
+    """去掉耗时等与结果无关的字段"""
+    return [{k: v for k, v in r.items() if k not in ('seconds', 'resumed', 'fingerprint')} for r in records]
+
+def _column_sum(handle):
+    shared = SharedArrays.attach(handle)
+    total = float(shared['x'].sum())
+    writable = shared['x'].flags.writeable
+    shared.close()
+    return total, writable
+
+def test_shared_arrays():
+    """工作进程按句柄只读挂载，数值与主进程一致"""
+    x = np.arange(1000.0)
+    with SharedArrays.create({'x': x, 'day': np.array(['2025-01-02'], dtype='datetime64[D]')}) as shared:
+        with mp.Pool(2) as pool:
+            results = pool.map(_column_sum, [shared.handle] * 4)
+        assert results == [(x.sum(), False)] * 4
+        assert str(shared['day'][0]) == '2025-01-02'
+
+def test_trade_return():
+    """先触及止损 / 止盈即退出（同根都触及按止损），否则按到期收盘"""
+    close = np.array([10, 10.2, 10.4, 10.1, 10.8, 11.0])
+    high, low = close + 0.1, close - 0.1
+    assert trade_return(high, low, close, 0, 5, 0.97, None) == close[5] / 10 - 1
+    assert trade_return(high, low, close, 0, 5, 1.0, None) == 0.0
+    assert trade_return(high, low, close, 0, 5, 0.9, 1.04) == 1.04 - 1
+    assert trade_return(high, low, close, 0, 5, 1.011, 1.02) == 1.011 - 1
+
+def test_sample_and_apply():
+    """抽样不重复且加大 n_trials 时前缀不变；参数临时写入、退出后恢复"""
+    trials = sample_params(CORE_SEARCH_SPACE, 20, seed=3)
+    assert len({json.dumps(t, sort_keys=True) for t in trials}) == 20
+    assert sample_params(CORE_SEARCH_SPACE, 8, seed=3) == trials[:8]
+    assert all(t[name] in CORE_SEARCH_SPACE[name] for t in trials for name in t)
+    before = dict(PARAMS)
+    with applied_params('core', {'v_break_min': 9.9, 'stop_buffer_pct': 0.5}):
+        assert PARAMS['v_break_min'] == 9.9 and PARAMS['stop_buffer_pct'] == 0.5
+    assert PARAMS == before
+
+def test_parallel_matches_serial():
+    """进程池与串行结果一致；串行结束后恢复当前进程的结构缓存"""
+    kline_data = _universe()
+    cache = get_structure_cache()
+    with ParamSearch(kline_data, 'core', space=TEST_SPACE, workers=1, progress=False, **SETTINGS) as search:
+        serial = search.random_search(6)
+    assert get_structure_cache() is cache
+    with ParamSearch(kline_data, 'core', space=TEST_SPACE, workers=3, progress=False, **SETTINGS) as search:
+        parallel = search.random_search(6)
+    assert _strip(serial) == _strip(parallel)
+    assert any(r['trades'] for r in serial)
+    assert [r['score'] for r in serial] == sorted((r['score'] for r in serial), reverse=True)
+
+def test_checkpoint_resume():
+    """中断后续跑：已完成的试验从检查点读取，只补跑缺失的；数据变化时旧记录不复用"""
+    kline_data = _universe()
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'search.jsonl')
+        with ParamSearch(kline_data, 'core', space=TEST_SPACE, workers=2, checkpoint=path, progress=False, **SETTINGS) as search:
+            search.random_search(3)   # 模拟只跑完前 3 组就被中断
+            resumed = search.random_search(7)
+        with open(path, encoding='utf-8') as f:
+            assert len(f.readlines()) == 7
+        assert sum(bool(r.get('resumed')) for r in resumed) == 3
+        with ParamSearch(kline_data, 'core', space=TEST_SPACE, workers=1, progress=False, **SETTINGS) as search:
+            fresh = search.random_search(7)
+        assert _strip(resumed) == _strip(fresh)
+
+        changed = dict(kline_data)
+        changed['sh.600000'] = random_bars(140, 99, **BAR_SHAPE)
+        with ParamSearch(changed, 'core', space=TEST_SPACE, workers=1, checkpoint=path, progress=False, **SETTINGS) as search:
+            assert not any(r.get('resumed') for r in search.random_search(3))
+
+def test_successive_halving():
+    """9 组 × eta=3：各档 9组×1只、3组×3只、1组×9只，每档保留上一档评分前 1/3"""
+    kline_data = _universe()
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'halving.jsonl')
+        with ParamSearch(kline_data, 'core', space=TEST_SPACE, workers=2, checkpoint=path, progress=False, **SETTINGS) as search:
+            final = search.successive_halving(9, eta=3)
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+    rungs = {}
+    for record in records:
+        rungs.setdefault(record['budget'], []).append(record)
+    assert sorted((budget, len(rs)) for budget, rs in rungs.items()) == [(1, 9), (3, 3), (9, 1)]
+    assert {r['trial'] for r in rungs[3]} == {r['trial'] for r in rank_trials(rungs[1])[:3]}
+    assert {r['trial'] for r in rungs[9]} == {r['trial'] for r in rank_trials(rungs[3])[:1]}
+    assert len(final) == 1 and final[0]['budget'] == 9
+
+if __name__ == "__main__":
+    print("🧪 策略参数搜索测试")
+    print("=" * 50)
+    test_shared_arrays()
+    test_trade_return()
+    test_sample_and_apply()
+    test_parallel_matches_serial()
+    test_checkpoint_resume()
+    test_successive_halving()
+    print("✅ 全部通过")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中枢延伸与区间索引测试
+排序扫描合并与逐个并入一致、合并后不再可并、区间树查询与暴力扫描一致、高级版关闭合并时输出不变
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.services.chan_kernels import IntervalIndex, extend_pivots
+from backend.cchan_trader_core import (PARAMS, PivotIndex, PivotTable, SegmentTable, _identify_pivots,
+                                       _identify_segments, parse_structure)
+from backend.cchan_trader_advanced import ADVANCED_PARAMS, AdvancedChanAnalyzer
+
+def _raw_and_merged(df):
+    segments = _identify_segments(df)
+    try:
+        PARAMS["pivot_merge"] = False
+        raw = _identify_pivots(df, segments)
+    finally:
+        PARAMS["pivot_merge"] = True
+    return segments, raw, _identify_pivots(df, segments)
+
+def _mergeable(a, b):
+    return b.start_idx <= a.end_idx and b.low <= a.high and b.high >= a.low
+
+def test_merge_rules():
+    """合并后相邻中枢不可再并；每个原始中枢都落在某个合并中枢的时间跨度内"""
+    reduced = 0
+    for seed in range(20):
+        df = random_bars(400, seed, floor=2.0)
+        segments, raw, merged = _raw_and_merged(df)
+        assert len(merged) <= len(raw)
+        reduced += len(raw) - len(merged)
+        assert not any(_mergeable(a, b) for a, b in zip(merged, merged[1:]))
+        heads = {(p.start_idx, p.high, p.low) for p in merged}
+        for pivot in raw:
+            owner = [m for m in merged if m.start_idx <= pivot.start_idx <= m.end_idx]
+            assert owner and owner[-1].end_idx >= pivot.end_idx
+        assert heads <= {(p.start_idx, p.high, p.low) for p in raw}
+        # SegmentTable 输入走排序扫描内核，结果与逐个并入一致
+        assert _identify_pivots(df, SegmentTable.from_records(segments)) == merged
+    assert reduced > 0
+
+def test_kernel_groups_and_order():
+    """乱序输入按 (分组, 起点) 排序；分组边界处不合并"""
+    start = np.array([10, 0, 4, 0, 3])
+    end = np.array([14, 6, 9, 5, 8])
+    high = np.array([5.0, 5.0, 5.5, 5.0, 5.2])
+    low = np.array([4.0, 4.0, 4.5, 4.0, 4.1])
+    groups = np.array([0, 0, 0, 1, 1])
+    keep, merged_end, last = extend_pivots(start, end, high, low, groups=groups)
+    assert keep.tolist() == [1, 0, 3]
+    assert merged_end.tolist() == [9, 14, 8]
+    assert last.tolist() == [2, 0, 4]
+    empty = extend_pivots([], [], [], [])
+    assert all(len(a) == 0 for a in empty)
+
+def test_interval_index():
+    """区间树 stab 与暴力扫描一致（含端点、重复区间、空索引）"""
+    rng = np.random.default_rng(0)
+    lo = rng.integers(0, 1000, 3000).astype(float)
+    hi = lo + rng.integers(0, 50, 3000)
+    lo[:10], hi[:10] = 500.0, 520.0
+    index = IntervalIndex(lo, hi)
+    for x in list(rng.uniform(-10, 1060, 300)) + [500.0, 520.0, 0.0]:
+        assert index.stab(x).tolist() == np.flatnonzero((lo <= x) & (x <= hi)).tolist()
+    assert len(IntervalIndex([], []).stab(1.0)) == 0
+
+    started = time.perf_counter()
+    for x in rng.uniform(0, 1000, 2000):
+        index.stab(x)
+    tree = time.perf_counter() - started
+    print(f"3000个区间、2000次点查询: {tree * 1000:.1f}ms")
+
+def test_pivot_index():
+    """按K线下标 / 价格查询中枢，列表与 PivotTable 结果一致"""
+    df = random_bars(3000, 5, floor=2.0)
+    pivots = parse_structure(df).pivots
+    assert len(pivots) > 10
+    by_list, by_table = PivotIndex(pivots), PivotIndex(PivotTable.from_records(pivots))
+    for k in range(0, 3000, 37):
+        want = [p for p in pivots if p.start_idx <= k <= p.end_idx]
+        assert by_list.at_bar(k) == want and by_table.at_bar(k) == want
+    for price in np.linspace(df['low'].min(), df['high'].max(), 50):
+        want = [p for p in pivots if p.low <= price <= p.high]
+        assert by_list.at_price(price) == want and by_table.at_price(price) == want
+
+def test_long_history():
+    """多年日线：合并后中枢数量明显减少"""
+    df = random_bars(5000, 9, floor=2.0)
+    _, raw, merged = _raw_and_merged(df)
+    print(f"5000根K线中枢数: 逐窗口 {len(raw)}, 合并后 {len(merged)}")
+    assert len(merged) < len(raw)
+
+def test_advanced_pivots():
+    """高级版：关闭合并时与逐窗口口径一致，开启后中枢更少且不可再并"""
+    df = random_bars(600, 3, floor=2.0)
+    analyzer = AdvancedChanAnalyzer(df)
+    segments = analyzer.identify_segments()
+    ADVANCED_PARAMS["chan"]["pivot_merge"] = False
+    try:
+        raw = analyzer.identify_pivots(segments)
+    finally:
+        ADVANCED_PARAMS["chan"]["pivot_merge"] = True
+    merged = analyzer.identify_pivots(segments)
+    assert 0 < len(merged) <= len(raw)
+    assert not any(_mergeable(a, b) for a, b in zip(merged, merged[1:]))
+    assert {(p.start_idx, p.high, p.low) for p in merged} <= {(p.start_idx, p.high, p.low) for p in raw}
+
+if __name__ == "__main__":
+    print("🧪 中枢延伸与区间索引测试")
+    print("=" * 50)
+    test_merge_rules()
+    test_kernel_groups_and_order()
+    test_interval_index()
+    test_pivot_index()
+    test_long_history()
+    test_advanced_pivots()
+    print("✅ 全部通过")
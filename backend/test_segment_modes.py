@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+笔与特征序列线段测试
+成笔间隔与顶底交替、特征序列线段划分（手工样例）、三种口径下批量 / 面板 / 增量结果一致
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.services.chan_kernels import build_segments, build_strokes, fractal_sequence
+from backend.cchan_trader_core import (PARAMS, ChanStream, _identify_segments, parse_structure,
+                                       parse_structure_panel)
+
+def _segments(df, mode):
+    try:
+        PARAMS["segment_mode"] = mode
+        return _identify_segments(df)
+    finally:
+        PARAMS["segment_mode"] = 'fractal'
+
+def test_strokes():
+    """笔端点顶底交替、间隔满足最小根数、向上笔终点高于起点"""
+    for seed in range(10):
+        df = random_bars(500, seed, floor=2.0)
+        idx, pos, price, is_low = fractal_sequence(df['high'].to_numpy(), df['low'].to_numpy())
+        ends = build_strokes(pos, price, is_low, 4)
+        assert np.all(is_low[ends][1:] != is_low[ends][:-1])
+        assert np.all(np.diff(pos[ends]) >= 4)
+        up = is_low[ends][:-1]
+        rise = np.diff(price[ends])
+        assert np.all(rise[up] > 0) and np.all(rise[~up] < 0)
+        strokes = _segments(df, 'stroke')
+        assert len(strokes) == len(ends) - 1
+        assert all(a.end_idx == b.start_idx for a, b in zip(strokes, strokes[1:]))
+
+def test_feature_sequence_example():
+    """手工样例：向上线段在特征序列顶分型处结束，末尾未完成的向下线段延伸到最低点"""
+    price = [10, 15, 12, 18, 14, 16, 11, 13, 9, 12]
+    is_low = [True, False] * 5
+    starts, stops = build_segments(price, is_low)
+    assert starts.tolist() == [0, 3] and stops.tolist() == [3, 8]
+    # 特征元素包含关系：(18, 12) 包含 (15, 12)、又包含 (17.5, 13)，向上处理合并后顶分型推迟到 19
+    price = [10, 15, 12, 18, 12, 17.5, 13, 19, 16, 17, 14, 15, 13]
+    is_low = [True, False] * 6 + [True]
+    starts, stops = build_segments(price, is_low)
+    assert starts.tolist() == [0, 7] and stops.tolist() == [7, 12]
+    # 分组边界处重置；不足三笔不成线段
+    starts, stops = build_segments([10, 15, 12, 18, 14] * 2, [True, False, True, False, True] * 2,
+                                   groups=[0] * 5 + [1] * 5)
+    assert starts.tolist() == [0, 5] and stops.tolist() == [3, 8]
+    assert len(build_segments([10, 15, 12], [True, False, True])[0]) == 0
+
+def test_feature_segments_are_coarser():
+    """线段首尾相接、方向交替、每段至少三笔；数量远少于笔和分型段"""
+    df = random_bars(5000, 1, floor=2.0)
+    fractal, strokes, segments = (_segments(df, mode) for mode in ('fractal', 'stroke', 'feature'))
+    print(f"5000根K线: 分型段 {len(fractal)}, 笔 {len(strokes)}, 特征序列线段 {len(segments)}")
+    assert len(segments) < len(strokes) < len(fractal)
+    stroke_ends = {s.start_idx for s in strokes} | {strokes[-1].end_idx}
+    for a, b in zip(segments, segments[1:]):
+        assert a.end_idx == b.start_idx and a.direction != b.direction
+    for seg in segments:
+        assert seg.start_idx in stroke_ends and seg.end_idx in stroke_ends
+        inner = sum(1 for s in strokes if seg.start_idx <= s.start_idx and s.end_idx <= seg.end_idx)
+        assert inner >= 3
+        assert (seg.end_price > seg.start_price) == (seg.direction == 'up')
+
+def test_modes_consistent():
+    """笔 / 特征序列口径下，面板与增量结果都等于逐只批量解析"""
+    frames = {f'sh.{600000 + i}': random_bars(n, i, floor=2.0) for i, n in enumerate([300, 250, 120, 60, 9])}
+    try:
+        for mode in ('stroke', 'feature'):
+            PARAMS["segment_mode"] = mode
+            panel = parse_structure_panel(frames)
+            for symbol, df in frames.items():
+                batch = parse_structure(df)
+                assert panel[symbol].segments == batch.segments
+                assert panel[symbol].pivots == batch.pivots
+                assert panel[symbol].signals == batch.signals
+            df = frames['sh.600000']
+            stream = ChanStream()
+            for k, bar in enumerate(df.to_dict('records'), start=1):
+                stream.push(bar)
+                if k >= 10 and k % 7 == 0:
+                    snap, batch = stream.snapshot(), parse_structure(df.iloc[:k])
+                    assert snap.segments == batch.segments and snap.pivots == batch.pivots
+                    assert snap.trend == batch.trend and snap.signals == batch.signals
+    finally:
+        PARAMS["segment_mode"] = 'fractal'
+
+if __name__ == "__main__":
+    print("🧪 笔与特征序列线段测试")
+    print("=" * 50)
+    test_strokes()
+    test_feature_sequence_example()
+    test_feature_segments_are_coarser()
+    test_modes_consistent()
+    print("✅ 全部通过")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+惰性结构与选股过滤顺序测试
+LazyStructureInfo 按需计算且与 parse_structure 一致；调整过滤顺序后选股结果不变、被淘汰的股票不再识别结构
+"""
+
+import os
+import sys
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend.services.structure_cache as structure_cache
+from backend.bar_fixtures import random_bars
+from backend.services.structure_cache import StructureCache
+from backend.cchan_trader_core import (PARAMS, LazyStructureInfo, Signal, detect_30m_entry,
+                                       filter_daily_uptrend, is_daily_uptrend, is_hot_leader,
+                                       parse_structure, select_stock)
+
+# 合成K线：0.01 价位、价格不低于1元、带日期列
+BAR_SHAPE = dict(tick=0.01, floor=1.0, start='2025-01-01')
+
+def _universe(count=300):
+    """一半随机游走、一半带上涨漂移，保证有股票能走完全部环节"""
+    return {f'sh.{600000 + i}': random_bars(200, i, drift=0.12 if i % 2 else 0.0, **BAR_SHAPE)
+            for i in range(count)}
+
+def _legacy_select(symbol, kdict):
+    """调整顺序前的 select_stock（对照用）：先解析全部日线结构，热点与RSI最后判定"""
+    day_df = kdict.get("D")
+    day_info = parse_structure(day_df, "D")
+    if not is_daily_uptrend(day_info, day_df):
+        return None
+    m30_df = kdict.get("30m")
+    if m30_df is not None and not m30_df.empty:
+        ok, tag, entry, stop = detect_30m_entry(parse_structure(m30_df, "30m"))
+        if not ok:
+            return None
+    else:
+        if not day_info.signals.get('2_buy') and not day_info.signals.get('3_buy'):
+            return None
+        tag = '2_buy' if day_info.signals.get('2_buy') else '3_buy'
+        entry = day_df['close'].iloc[-1]
+    if not is_hot_leader(symbol, day_df)[0]:
+        return None
+    rsi = day_info.tech_indicators.get('rsi')
+    if rsi is not None and not PARAMS["rsi_oversold"] <= rsi <= PARAMS["rsi_overbought"]:
+        return None
+    return (tag, round(entry, 2), day_info.trend,
+            round(day_info.signals.get(tag, [Signal('', 0, 0, 0.5)])[-1].confidence, 2))
+
+def _with_cache(root):
+    structure_cache._default_cache = StructureCache(root=root)
+
+def test_lazy_fields():
+    """只访问技术指标时不识别线段；全部字段与 parse_structure 一致"""
+    for seed in range(10):
+        df = random_bars(150, seed, **BAR_SHAPE)
+        lazy = LazyStructureInfo(df)
+        assert lazy.tech_indicators == parse_structure(df).tech_indicators
+        assert lazy.computed == ['tech_indicators']
+        assert lazy.trend == parse_structure(df).trend
+        assert set(lazy.computed) == {'segments', 'pivots', 'trend', 'tech_indicators'}
+        assert lazy.materialize() == parse_structure(df)
+    short = LazyStructureInfo(random_bars(8, 0, **BAR_SHAPE))
+    assert short.materialize() == parse_structure(random_bars(8, 0, **BAR_SHAPE))
+
+def test_select_results_unchanged():
+    """过滤顺序调整前后选股结果一致"""
+    frames = _universe()
+    with tempfile.TemporaryDirectory() as root:
+        _with_cache(root)
+        try:
+            picked = 0
+            for symbol, df in frames.items():
+                result = select_stock(symbol, {'D': df})
+                legacy = _legacy_select(symbol, {'D': df})
+                if result is None:
+                    assert legacy is None, symbol
+                    continue
+                picked += 1
+                assert (result['signal'], result['entry_price'], result['trend'],
+                        result['confidence']) == legacy
+            print(f"300只中选出 {picked} 只")
+            assert picked > 0
+        finally:
+            structure_cache._default_cache = None
+
+def test_prefilter_and_cost():
+    """日线预筛与逐环节判定一致；多数股票在廉价环节淘汰，整体明显快于先解析再过滤"""
+    frames = _universe()
+    with tempfile.TemporaryDirectory() as root:
+        _with_cache(root)
+        try:
+            started = time.perf_counter()
+            candidates = filter_daily_uptrend({symbol: {'D': df} for symbol, df in frames.items()})
+            staged = time.perf_counter() - started
+        finally:
+            structure_cache._default_cache = None
+
+    started = time.perf_counter()
+    expected = []
+    for symbol, df in frames.items():
+        info = parse_structure(df)
+        rsi = info.tech_indicators.get('rsi')
+        if (is_hot_leader(symbol, df)[0] and is_daily_uptrend(info, df) and
+                (rsi is None or PARAMS["rsi_oversold"] <= rsi <= PARAMS["rsi_overbought"])):
+            expected.append(symbol)
+    eager = time.perf_counter() - started
+    print(f"日线预筛: 先解析再过滤 {eager:.2f}s, 廉价环节优先 {staged:.2f}s, 候选 {len(candidates)} 只")
+    assert candidates == expected
+    assert staged < eager / 2
+
+if __name__ == "__main__":
+    print("🧪 惰性结构与选股过滤顺序测试")
+    print("=" * 50)
+    test_lazy_fields()
+    test_select_results_unchanged()
+    test_prefilter_and_cost()
+    print("✅ 全部通过")
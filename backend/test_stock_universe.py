@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票池缓存测试
+用假数据源验证：向前回溯到最近交易日、磁盘缓存命中、板块推导、当日列表发布前的回退不长期缓存
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from backend.services.stock_universe import StockUniverse
+
+ALL_STOCKS = pd.DataFrame({
+    'code': ['sh.000001', 'sh.600000', 'sh.688981', 'sz.000001', 'sz.002415', 'sz.300750', 'sz.399001'],
+    'tradeStatus': ['1'] * 7,
+    'code_name': ['上证指数', '浦发银行', '中芯国际', '平安银行', '海康威视', '宁德时代', '深证成指'],
+})
+
+class _FakeFetcher:
+    """只有 trading_days 中的日期返回股票列表"""
+
+    def __init__(self, trading_days):
+        self.trading_days = set(trading_days)
+        self.calls = []
+
+    def __call__(self, day):
+        self.calls.append(day)
+        return ALL_STOCKS.copy() if day in self.trading_days else pd.DataFrame()
+
+def test_lookback_and_disk_cache():
+    """周末回溯到周五；新实例从磁盘读取，不再请求数据源"""
+    with tempfile.TemporaryDirectory() as root:
+        fetcher = _FakeFetcher(['2025-06-27'])
+        universe = StockUniverse(root=root, fetcher=fetcher)
+        trade_date, stock_df = universe.resolve('2025-06-29')
+        print(f"实际交易日: {trade_date}, 请求: {fetcher.calls}")
+        assert trade_date == '2025-06-27'
+        assert fetcher.calls == ['2025-06-29', '2025-06-28', '2025-06-27']
+        assert len(stock_df) == len(ALL_STOCKS)
+
+        # 同一实例重复调用直接命中内存
+        assert universe.get('2025-06-29') is stock_df
+        assert len(fetcher.calls) == 3
+
+        # 新实例：非交易日已落盘标记，交易日读CSV
+        fetcher2 = _FakeFetcher(['2025-06-27'])
+        trade_date2, stock_df2 = StockUniverse(root=root, fetcher=fetcher2).resolve('2025-06-29')
+        assert trade_date2 == '2025-06-27'
+        assert fetcher2.calls == []
+        pd.testing.assert_frame_equal(stock_df[['code', 'code_name']], stock_df2[['code', 'code_name']])
+
+def test_board_filters():
+    """板块列与A股过滤"""
+    with tempfile.TemporaryDirectory() as root:
+        universe = StockUniverse(root=root, fetcher=_FakeFetcher(['2025-06-27']))
+        boards = universe.by_board('2025-06-27')
+        assert list(boards['上海主板']['code']) == ['sh.600000', 'sh.688981']
+        assert list(boards['深圳主板']['code']) == ['sz.000001']
+        assert list(boards['中小板']['code']) == ['sz.002415']
+        assert list(boards['创业板']['code']) == ['sz.300750']
+
+        # 与原 str.contains('sh.6|sz.0|sz.3') 过滤结果一致
+        expected = ALL_STOCKS[ALL_STOCKS['code'].str.contains('sh.6|sz.0|sz.3')]['code']
+        assert list(universe.a_shares('2025-06-27')['code']) == list(expected)
+
+        small = universe.filter_boards(['中小板', '创业板'], '2025-06-27')
+        assert list(small['code']) == ['sz.002415', 'sz.300750']
+
+def test_today_not_published():
+    """当日列表未发布时回退到上一交易日，但不缓存回退结果；间隔到期后重新请求并取到当日列表"""
+    with tempfile.TemporaryDirectory() as root:
+        fetcher = _FakeFetcher(['2025-06-27'])
+        clock = lambda: datetime(2025, 6, 30, 8, 30)
+        universe = StockUniverse(root=root, fetcher=fetcher, clock=clock)
+        assert universe.preload() == '2025-06-27'
+        assert fetcher.calls == ['2025-06-30', '2025-06-29', '2025-06-28', '2025-06-27']
+        assert not os.path.exists(os.path.join(root, '2025-06-30.empty'))
+
+        # 间隔内不再请求当日列表
+        assert universe.resolve()[0] == '2025-06-27'
+        assert len(fetcher.calls) == 4
+
+        # 间隔到期：只重新请求当日，已发布则改用当日列表
+        retrying = StockUniverse(root=root, fetcher=fetcher, clock=clock, retry_interval=0)
+        assert retrying.resolve()[0] == '2025-06-27'
+        assert fetcher.calls[4:] == ['2025-06-30']
+        fetcher.trading_days.add('2025-06-30')
+        assert retrying.resolve()[0] == '2025-06-30'
+        assert fetcher.calls[5:] == ['2025-06-30']
+
+if __name__ == "__main__":
+    print("🧪 股票池缓存测试")
+    print("=" * 50)
+    test_lookback_and_disk_cache()
+    test_board_filters()
+    test_today_not_published()
+    print("✅ 全部通过")
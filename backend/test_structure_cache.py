@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构缓存测试
+内存 / 磁盘两级命中、新K线与结构参数变化自动失效、无关参数不影响命中、面板只解析未命中股票
+"""
+
+import os
+import sys
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend.services.structure_cache as structure_cache
+from backend.bar_fixtures import random_bars
+from backend.services.structure_cache import StructureCache, frame_stamp
+from backend.cchan_trader_core import (PARAMS, parse_structure, parse_structure_cached,
+                                       parse_structure_panel_cached)
+
+class _Counting:
+    """记录 compute 调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, df):
+        self.calls += 1
+        return parse_structure(df)
+
+def _with_cache(root, **kwargs):
+    cache = StructureCache(root=root, **kwargs)
+    structure_cache._default_cache = cache
+    return cache
+
+def test_memory_and_disk_hits():
+    """同一K线只计算一次；新实例从磁盘命中；LRU 按容量淘汰"""
+    df = random_bars(200, 1, start='2025-01-01')
+    params = {'ma_short': 5}
+    with tempfile.TemporaryDirectory() as root:
+        cache, compute = StructureCache(root=root, maxsize=2), _Counting()
+        first = cache.get_or_compute('sh.600000', 'D', df, params, compute)
+        assert cache.get_or_compute('sh.600000', 'D', df, params, compute) is first
+        assert compute.calls == 1 and cache.stats['memory_hits'] == 1
+
+        fresh = StructureCache(root=root)
+        restored = fresh.get_or_compute('sh.600000', 'D', df, params, compute)
+        assert compute.calls == 1 and fresh.stats['disk_hits'] == 1
+        assert restored.segments == first.segments and restored.trend == first.trend
+
+        for i in range(3):
+            cache.put(f'sz.00000{i}', 'D', ('x',), 'h', i)
+        assert len(cache._memory) == 2
+
+        # 无日期列无法生成指纹：直接计算，不缓存
+        assert frame_stamp(df.drop(columns='date')) is None
+        cache.get_or_compute('sh.600000', 'D', df.drop(columns='date'), params, compute)
+        cache.get_or_compute('sh.600000', 'D', df.drop(columns='date'), params, compute)
+        assert compute.calls == 3
+
+def test_new_bars_invalidate():
+    """K线存储追加新K线后指纹变化，重新计算并覆盖磁盘文件"""
+    df = random_bars(201, 2, start='2025-01-01')
+    with tempfile.TemporaryDirectory() as root:
+        cache, compute = StructureCache(root=root), _Counting()
+        cache.get_or_compute('sh.600000', 'D', df.iloc[:200], {}, compute)
+        cache.get_or_compute('sh.600000', 'D', df, {}, compute)
+        assert compute.calls == 2
+        files = [name for _, _, names in os.walk(root) for name in names]
+        assert files == ['sh.600000.pkl']
+        assert StructureCache(root=root).get_or_compute('sh.600000', 'D', df.iloc[:200], {}, compute)
+        assert compute.calls == 3
+
+def test_rewritten_history_invalidates():
+    """复权重新下载（整段价格改写）或中间K线修正时，首末时间、根数、末根收盘不变，缓存仍失效"""
+    df = random_bars(200, 4, start='2025-01-01')
+    adjusted = df.copy()
+    adjusted.loc[:198, ['open', 'high', 'low', 'close']] *= 0.9
+    corrected = df.copy()
+    corrected.loc[100, 'high'] += 0.5
+    assert len({frame_stamp(df), frame_stamp(adjusted), frame_stamp(corrected)}) == 3
+    assert frame_stamp(df) == frame_stamp(df.copy())
+    assert frame_stamp(df.astype(str)) == frame_stamp(df.astype(str))
+    with tempfile.TemporaryDirectory() as root:
+        cache, compute = StructureCache(root=root), _Counting()
+        for frame in (df, adjusted, corrected, df):
+            cache.get_or_compute('sh.600000', 'D', frame, {}, compute)
+        assert compute.calls == 3 and cache.stats['memory_hits'] == 1
+
+def test_params_scope():
+    """结构参数变化使缓存失效；非结构参数（风控、RSI 阈值）不影响命中"""
+    df = random_bars(200, 3, start='2025-01-01')
+    saved = dict(PARAMS)
+    with tempfile.TemporaryDirectory() as root:
+        cache = _with_cache(root)
+        try:
+            base = parse_structure_cached('sh.600000', df)
+            PARAMS["stop_buffer_pct"] = 0.05
+            PARAMS["rsi_overbought"] = 80
+            assert parse_structure_cached('sh.600000', df) is base
+            PARAMS["kline_inclusion"] = False
+            changed = parse_structure_cached('sh.600000', df)
+            assert changed is not base
+            assert changed.segments == parse_structure(df).segments
+            assert cache.stats['misses'] == 2
+        finally:
+            PARAMS.update(saved)
+            structure_cache._default_cache = None
+
+def test_panel_reuses_cache():
+    """面板解析只处理未命中的股票；复跑接近瞬时"""
+    frames = {f'sh.{600000 + i}': random_bars(200, i, start='2025-01-01') for i in range(200)}
+    with tempfile.TemporaryDirectory() as root:
+        cache = _with_cache(root)
+        try:
+            started = time.perf_counter()
+            infos = parse_structure_panel_cached(frames)
+            cold = time.perf_counter() - started
+            assert list(infos) == list(frames)
+
+            frames['sh.600000'] = random_bars(201, 0, start='2025-01-01')
+            _with_cache(root)
+            started = time.perf_counter()
+            again = parse_structure_panel_cached(frames)
+            warm = time.perf_counter() - started
+            cache = structure_cache._default_cache
+            print(f"200只日线: 首次 {cold:.3f}s, 复跑(磁盘命中) {warm:.3f}s")
+            assert cache.stats['disk_hits'] == 199 and cache.stats['misses'] == 1
+            assert again['sh.600001'].segments == infos['sh.600001'].segments
+            assert again['sh.600000'].segments == parse_structure(frames['sh.600000']).segments
+        finally:
+            structure_cache._default_cache = None
+
+if __name__ == "__main__":
+    print("🧪 结构缓存测试")
+    print("=" * 50)
+    test_memory_and_disk_hits()
+    test_new_bars_invalidate()
+    test_rewritten_history_invalidates()
+    test_params_scope()
+    test_panel_reuses_cache()
+    print("✅ 全部通过")
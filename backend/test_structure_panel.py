@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+面板模式结构解析测试
+多只股票一次解析，与逐只 parse_structure 逐项比对（不同长度、无效行、字符串列）
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from backend.bar_fixtures import random_bars
+from backend.services.bar_parser import BarPanel
+from backend.cchan_trader_core import PARAMS, parse_structure, parse_structure_panel, structure_table
+
+def _frames():
+    frames = {f'sh.{600000 + i}': random_bars(n, i, start='2025-01-01')
+              for i, n in enumerate([200, 150, 60, 30, 26, 14, 12, 9, 5, 200, 180, 120])}
+    # 含无效行（停牌空值、零价）与字符串列
+    broken = random_bars(100, 99, start='2025-01-01')
+    broken.loc[[3, 50], 'close'] = np.nan
+    broken.loc[[70], ['high', 'low', 'close']] = 0
+    broken.loc[[20], 'volume'] = np.nan
+    frames['sz.000001'] = broken
+    frames['sz.000002'] = random_bars(80, 98, start='2025-01-01').astype(str)
+    return frames
+
+def _assert_same(got, want):
+    assert got.segments == want.segments
+    assert got.pivots == want.pivots
+    assert got.trend == want.trend
+    assert got.signals == want.signals
+    for a, b in ((got.vol_stats, want.vol_stats), (got.tech_indicators, want.tech_indicators)):
+        assert a.keys() == b.keys()
+        for key in b:
+            np.testing.assert_allclose(a[key], b[key], rtol=1e-9, atol=1e-9, err_msg=key)
+
+def test_panel_matches_per_symbol():
+    """包含处理开/关两种口径下与逐只解析一致"""
+    frames = _frames()
+    try:
+        for inclusion in (True, False):
+            PARAMS["kline_inclusion"] = inclusion
+            infos = parse_structure_panel(frames)
+            assert list(infos) == list(frames)
+            for symbol, df in frames.items():
+                _assert_same(infos[symbol], parse_structure(df))
+    finally:
+        PARAMS["kline_inclusion"] = True
+
+def test_bar_panel_and_table():
+    """BarPanel 丢弃无效行；汇总表一行一只股票"""
+    frames = _frames()
+    panel = BarPanel.from_frames(frames)
+    assert panel.lengths[panel.symbols.index('sz.000001')] == 97
+    tail = panel.tail_matrix('close', 10)
+    assert np.isnan(tail[panel.symbols.index('sh.600008')][:5]).all()
+    np.testing.assert_array_equal(tail[0], frames['sh.600000']['close'].to_numpy()[-10:])
+
+    table = structure_table(parse_structure_panel(panel))
+    assert list(table.index) == list(frames)
+    assert {'trend', 'pivots', 'rsi', 'macd', 'volume_factor'} <= set(table.columns)
+
+def test_panel_speedup():
+    """全市场规模的日线扫描：面板模式明显快于逐只解析"""
+    frames = {f'sh.{600000 + i}': random_bars(200, i, start='2025-01-01') for i in range(300)}
+    started = time.perf_counter()
+    for df in frames.values():
+        parse_structure(df)
+    loop = time.perf_counter() - started
+    started = time.perf_counter()
+    parse_structure_panel(frames)
+    panel = time.perf_counter() - started
+    print(f"300只×200根: 逐只 {loop:.2f}s, 面板 {panel:.2f}s, 加速 {loop / panel:.1f}x")
+    assert panel < loop / 3
+
+if __name__ == "__main__":
+    print("🧪 面板模式结构解析测试")
+    print("=" * 50)
+    test_panel_matches_per_symbol()
+    test_bar_panel_and_table()
+    test_panel_speedup()
+    print("✅ 全部通过")
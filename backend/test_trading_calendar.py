@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易日历测试
+用假数据源验证：节假日判断、前后交易日（含跨年）、按年落盘只请求一次、失败按工作日兜底
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from backend.services.stock_universe import StockUniverse
+from backend.services.trading_calendar import TradingCalendar
+
+HOLIDAYS = {'2025-01-01', '2025-10-01', '2025-10-02', '2025-10-03',
+            '2025-10-06', '2025-10-07', '2025-10-08', '2024-12-31'}
+
+class _FakeTradeDates:
+    """BaoStock query_trade_dates 格式：工作日为交易日，HOLIDAYS 除外"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, start_date, end_date):
+        self.calls.append(start_date[:4])
+        if self.fail:
+            raise ConnectionError('模拟网络错误')
+        days = pd.date_range(start_date, end_date)
+        dates = days.strftime('%Y-%m-%d')
+        trading = (days.weekday < 5) & ~dates.isin(HOLIDAYS)
+        return pd.DataFrame({'calendar_date': dates,
+                             'is_trading_day': ['1' if t else '0' for t in trading]})
+
+def test_holidays_and_neighbours():
+    """国庆长假：节前最后一个交易日与节后第一个交易日"""
+    with tempfile.TemporaryDirectory() as root:
+        calendar = TradingCalendar(root=root, fetcher=_FakeTradeDates())
+        assert calendar.is_trading_day('2025-09-30')
+        assert not calendar.is_trading_day('2025-10-08')   # 周三，节假日
+        assert not calendar.is_trading_day('2025-10-11')   # 周六
+        assert calendar.previous_trading_day('2025-10-09') == '2025-09-30'
+        assert calendar.next_trading_day('2025-09-30') == '2025-10-09'
+        assert calendar.latest_trading_day('2025-10-05') == '2025-09-30'
+        assert calendar.latest_trading_day('2025-09-30') == '2025-09-30'
+        assert calendar.next_trading_day('2025-10-04', inclusive=True) == '2025-10-09'
+        assert calendar.trading_days('2025-09-29', '2025-10-10') == ['2025-09-29', '2025-09-30',
+                                                                     '2025-10-09', '2025-10-10']
+
+def test_cross_year_and_disk_cache():
+    """跨年查找加载相邻年份；每年只请求一次，新实例直接读文件"""
+    with tempfile.TemporaryDirectory() as root:
+        fetcher = _FakeTradeDates()
+        calendar = TradingCalendar(root=root, fetcher=fetcher)
+        assert calendar.previous_trading_day('2025-01-02') == '2024-12-30'
+        assert calendar.next_trading_day('2024-12-30') == '2025-01-02'
+        for _ in range(100):
+            calendar.is_trading_day('2025-06-27')
+        print(f"请求年份: {fetcher.calls}")
+        assert fetcher.calls == ['2025', '2024']
+        assert os.path.exists(os.path.join(root, '2025.csv'))
+
+        fetcher2 = _FakeTradeDates()
+        assert not TradingCalendar(root=root, fetcher=fetcher2).is_trading_day('2025-10-01')
+        assert fetcher2.calls == []
+
+def test_fetch_failure_falls_back_to_weekdays():
+    """数据源不可用时按工作日判断，且不落盘"""
+    with tempfile.TemporaryDirectory() as root:
+        calendar = TradingCalendar(root=root, fetcher=_FakeTradeDates(fail=True))
+        assert calendar.is_trading_day('2025-10-01')
+        assert not calendar.is_trading_day('2025-10-04')
+        assert calendar.previous_trading_day('2025-10-06') == '2025-10-03'
+        assert not os.path.exists(os.path.join(root, '2025.csv'))
+
+def test_universe_jumps_to_trading_day():
+    """股票池按日历直接定位节前交易日，不再逐个查询假期日期"""
+    queried = []
+
+    def fetcher(day):
+        queried.append(day)
+        return pd.DataFrame({'code': ['sh.600000'], 'code_name': ['浦发银行']})
+
+    with tempfile.TemporaryDirectory() as root:
+        calendar = TradingCalendar(root=os.path.join(root, 'cal'), fetcher=_FakeTradeDates())
+        universe = StockUniverse(root=root, fetcher=fetcher, calendar=calendar)
+        trade_date, stock_df = universe.resolve('2025-10-07')
+        assert trade_date == '2025-09-30'
+        assert queried == ['2025-09-30']
+        assert len(stock_df) == 1
+
+if __name__ == "__main__":
+    print("🧪 交易日历测试")
+    print("=" * 50)
+    test_holidays_and_neighbours()
+    test_cross_year_and_disk_cache()
+    test_fetch_failure_falls_back_to_weekdays()
+    test_universe_jumps_to_trading_day()
+    print("✅ 全部通过")